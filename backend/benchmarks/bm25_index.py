@@ -0,0 +1,119 @@
+"""
+BM25 latency across collection sizes, persistent index against a rebuild
+
+Grows one collection to 2000, 10000 and 50000 chunks of 120 words drawn
+from a zipf-like vocabulary, then times 5 four-term queries for the top 10
+two ways: the old path, which loaded the whole collection from the vector
+db and built a BM25Retriever per query, and BM25Index.search. Peak memory
+is traced for both, and the top 10 scores must match rank_bm25.
+
+Run from backend/ against a scratch data dir, the collection is deleted at
+the end:
+
+    DATA_DIR=/tmp/bench-data python benchmarks/bm25_index.py
+"""
+
+import random
+import time
+import tracemalloc
+import uuid
+
+from langchain_community.retrievers import BM25Retriever
+from rank_bm25 import BM25Okapi
+
+from open_webui.models.bm25 import BM25Index, tokenize
+from open_webui.retrieval.vector.factory import VECTOR_DB_CLIENT
+
+SIZES = (2000, 10000, 50000)
+QUERIES = 5
+K = 10
+
+
+def insert_chunks(
+    collection_name: str, vocab: list[str], weights: list[float], count: int
+) -> None:
+    for start in range(0, count, 1000):
+        texts = [
+            " ".join(random.choices(vocab, weights, k=120))
+            for _ in range(min(1000, count - start))
+        ]
+        items = [
+            {
+                "id": str(uuid.uuid4()),
+                "text": text,
+                "vector": [random.random() for _ in range(8)],
+                "metadata": {"file_id": f"file-{start}"},
+            }
+            for text in texts
+        ]
+        VECTOR_DB_CLIENT.insert(collection_name, items)
+        BM25Index.add(
+            collection_name,
+            [item["id"] for item in items],
+            texts,
+            [item["metadata"] for item in items],
+        )
+
+
+def rebuild_search(collection_name: str, query: str) -> list[str]:
+    result = VECTOR_DB_CLIENT.get(collection_name=collection_name)
+    retriever = BM25Retriever.from_texts(
+        texts=result.documents[0], metadatas=result.metadatas[0]
+    )
+    retriever.k = K
+    return [doc.page_content for doc in retriever.invoke(query)]
+
+
+def index_search(collection_name: str, query: str) -> list[str]:
+    return BM25Index.search(collection_name, query, K).documents
+
+
+def measure(search, collection_name: str, queries: list[str]) -> tuple[float, float]:
+    tracemalloc.start()
+    start = time.perf_counter()
+    for query in queries:
+        search(collection_name, query)
+    elapsed = (time.perf_counter() - start) / len(queries)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    random.seed(1)
+    vocab = [uuid.uuid4().hex[: random.randint(3, 9)] for _ in range(20000)]
+    weights = [1 / (i + 1) for i in range(len(vocab))]
+    queries = [" ".join(random.choices(vocab[50:2000], k=4)) for _ in range(QUERIES)]
+    collection_name = f"bench-bm25-{uuid.uuid4().hex[:8]}"
+
+    print(f"{'chunks':>6} {'rebuild':>22} {'index':>22}")
+    inserted = 0
+    try:
+        for size in SIZES:
+            insert_chunks(collection_name, vocab, weights, size - inserted)
+            inserted = size
+
+            rebuild_time, rebuild_peak = measure(
+                rebuild_search, collection_name, queries
+            )
+            index_time, index_peak = measure(index_search, collection_name, queries)
+            print(
+                f"{size:>6} {rebuild_time * 1000:>8.0f}ms {rebuild_peak / 1e6:>6.1f}MB peak"
+                f" {index_time * 1000:>8.0f}ms {index_peak / 1e6:>6.1f}MB peak"
+            )
+
+            documents = VECTOR_DB_CLIENT.get(collection_name=collection_name)
+            bm25 = BM25Okapi([tokenize(text) for text in documents.documents[0]])
+            for query in queries:
+                expected = sorted(bm25.get_scores(tokenize(query)), reverse=True)[:K]
+                scores = BM25Index.search(collection_name, query, K).scores
+                assert [round(s, 6) for s in scores] == [
+                    round(s, 6) for s in expected
+                ], f"scores differ from rank_bm25 for {query!r}"
+    finally:
+        VECTOR_DB_CLIENT.delete_collection(collection_name)
+        BM25Index.delete_collection(collection_name)
+
+
+if __name__ == "__main__":
+    main()
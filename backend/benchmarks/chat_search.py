@@ -0,0 +1,89 @@
+"""
+Chat search latency, full-text index against the old scan
+
+Grows one user's history to 1000, 5000 and 20000 chats of 10 messages x 80
+random words, then times get_chats_by_user_id_and_search_text (mean of 5,
+limit 1000) for a phrase in every 97th chat, a common word and a query too
+short for the trigram index. The scan is timed by turning the index off,
+and must return the same chats while under the limit.
+
+Run from backend/ against a scratch data dir, the chats are left in it:
+
+    DATA_DIR=/tmp/bench-data python benchmarks/chat_search.py
+"""
+
+import random
+import time
+import uuid
+
+import open_webui.config  # noqa: F401, runs the migrations
+from open_webui.models.chats import ChatForm, Chats
+
+SIZES = (1000, 5000, 20000)
+RUNS = 5
+
+
+def insert_chats(user_id: str, words: list[str], start: int, end: int) -> None:
+    for i in range(start, end):
+        messages = [
+            {
+                "id": str(j),
+                "role": "user",
+                "content": " ".join(random.choices(words, k=80)),
+            }
+            for j in range(10)
+        ]
+        if i % 97 == 0:
+            messages[3]["content"] += " Needle Phrase here"
+        Chats.insert_new_chat(
+            user_id,
+            ChatForm(
+                chat={
+                    "title": f"chat {i}",
+                    "messages": messages,
+                    "history": {"messages": {}},
+                }
+            ),
+        )
+
+
+def search(user_id: str, query: str) -> tuple[float, set[str]]:
+    start = time.perf_counter()
+    for _ in range(RUNS):
+        chats = Chats.get_chats_by_user_id_and_search_text(user_id, query, limit=1000)
+    return (time.perf_counter() - start) / RUNS, {chat.id for chat in chats}
+
+
+def main():
+    random.seed(1)
+    user_id = f"bench-{uuid.uuid4().hex}"
+    words = [uuid.uuid4().hex[:6] for _ in range(5000)]
+    queries = {"phrase": "needle phrase", "word": words[10], "short": "ab"}
+
+    print(f"{'chats':>6} {'query':8} {'index':>9} {'scan':>9} {'hits':>6}")
+    inserted = 0
+    for size in SIZES:
+        insert_chats(user_id, words, inserted, size)
+        inserted = size
+
+        indexed = {name: search(user_id, query) for name, query in queries.items()}
+        # an empty index name makes search fall back to the scan
+        Chats._search_index = ""
+        try:
+            scanned = {name: search(user_id, query) for name, query in queries.items()}
+        finally:
+            Chats._search_index = None
+
+        for name in queries:
+            index_time, index_ids = indexed[name]
+            scan_time, scan_ids = scanned[name]
+            if len(scan_ids) < 1000:
+                assert index_ids == scan_ids, f"{name}: results differ"
+            print(
+                f"{size:>6} {name:8} {index_time * 1000:>7.1f}ms "
+                f"{scan_time * 1000:>7.1f}ms {len(index_ids):>6}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Credit deductions per second, direct writes against the write-behind ledger
+
+Bills 2000 deductions spread over 20 users, first with
+Credits.add_credit_by_user_id per deduction as CreditDeduct does without a
+ledger, then through a memory mode CreditLedger flushed in batches of 500.
+Both must leave the same balances.
+
+Run from backend/ against a scratch data dir:
+
+    DATA_DIR=/tmp/bench-data python benchmarks/credit_ledger.py
+"""
+
+import time
+import uuid
+from decimal import Decimal
+
+from open_webui.models.credits import AddCreditForm, Credits, SetCreditFormDetail
+from open_webui.utils.credit.ledger import CreditLedger
+
+DEDUCTIONS = 2000
+USERS = 20
+AMOUNT = Decimal("-0.001")
+
+
+def get_form(user_id: str) -> AddCreditForm:
+    return AddCreditForm(
+        user_id=user_id,
+        amount=AMOUNT,
+        detail=SetCreditFormDetail(desc="bench", usage={"total_price": 0.001}),
+    )
+
+
+def get_balances(user_ids: list[str]) -> dict[str, Decimal]:
+    return {
+        user_id: Credits.get_credit_by_user_id(user_id).credit for user_id in user_ids
+    }
+
+
+def main():
+    user_ids = [uuid.uuid4().hex for _ in range(USERS)]
+    for user_id in user_ids:
+        Credits.init_credit_by_user_id(user_id)
+    expected = AMOUNT * (DEDUCTIONS // USERS)
+
+    before = get_balances(user_ids)
+    start = time.perf_counter()
+    for i in range(DEDUCTIONS):
+        Credits.add_credit_by_user_id(get_form(user_ids[i % USERS]))
+    elapsed = time.perf_counter() - start
+    after = get_balances(user_ids)
+    assert all(after[u] - before[u] == expected for u in user_ids)
+    print(f"direct   {DEDUCTIONS / elapsed:8.0f} deductions/s")
+
+    before = after
+    ledger = CreditLedger(mode="memory", batch_size=500)
+    start = time.perf_counter()
+    for i in range(DEDUCTIONS):
+        ledger.add_credit(get_form(user_ids[i % USERS]))
+    enqueued = time.perf_counter() - start
+    flushed = ledger.flush()
+    elapsed = time.perf_counter() - start
+    after = get_balances(user_ids)
+    assert flushed == DEDUCTIONS, f"flushed {flushed} of {DEDUCTIONS}"
+    assert all(after[u] - before[u] == expected for u in user_ids)
+    print(
+        f"ledger   {DEDUCTIONS / elapsed:8.0f} deductions/s "
+        f"({DEDUCTIONS / enqueued:.0f}/s enqueued, flushed in "
+        f"{(elapsed - enqueued) * 1000:.0f}ms)"
+    )
+
+
+if __name__ == "__main__":
+    main()
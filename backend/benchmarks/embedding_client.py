@@ -0,0 +1,103 @@
+"""
+Embedding throughput against a local stub server
+
+Starts an OpenAI compatible /v1/embeddings stub that takes 100ms per
+request and answers every 25th request with a 429, then embeds 2000 chunks
+of about 1KB in batches of 32. Compares one requests.post per batch after
+another, as ingestion did before EmbeddingClient, with the client at 1, 4
+and 8 requests in flight. Batches answered with a 429 are lost in the
+sequential run; the client retries them.
+
+Run from backend/ against a scratch data dir:
+
+    DATA_DIR=/tmp/bench-data python benchmarks/embedding_client.py
+"""
+
+import asyncio
+import threading
+import time
+
+import requests
+from aiohttp import web
+
+from open_webui.retrieval.embeddings import EmbeddingClient
+
+PORT = 18765
+URL = f"http://127.0.0.1:{PORT}/v1"
+CHUNKS = 2000
+BATCH_SIZE = 32
+
+
+def start_stub_server() -> None:
+    requests_seen = 0
+
+    async def embeddings(request):
+        nonlocal requests_seen
+        data = await request.json()
+        requests_seen += 1
+        if requests_seen % 25 == 0:
+            return web.Response(status=429, headers={"Retry-After": "0.2"})
+        await asyncio.sleep(0.1)
+        texts = data["input"]
+        return web.json_response(
+            {
+                "data": [{"embedding": [0.1] * 256} for _ in texts],
+                "usage": {"prompt_tokens": sum(len(text) // 4 for text in texts)},
+            }
+        )
+
+    async def serve():
+        app = web.Application()
+        app.router.add_post("/v1/embeddings", embeddings)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", PORT).start()
+        started.set()
+        await asyncio.Event().wait()
+
+    started = threading.Event()
+    threading.Thread(target=lambda: asyncio.run(serve()), daemon=True).start()
+    started.wait()
+
+
+def embed_sequentially(texts: list[str]) -> list[list[float]]:
+    embeddings = []
+    for start in range(0, len(texts), BATCH_SIZE):
+        r = requests.post(
+            f"{URL}/embeddings",
+            headers={"Authorization": "Bearer key"},
+            json={"model": "bench", "input": texts[start : start + BATCH_SIZE]},
+        )
+        if r.ok:
+            embeddings.extend(item["embedding"] for item in r.json()["data"])
+    return embeddings
+
+
+def main():
+    start_stub_server()
+    texts = [f"chunk {i} " + "lorem ipsum dolor sit amet " * 40 for i in range(CHUNKS)]
+
+    start = time.perf_counter()
+    embeddings = embed_sequentially(texts)
+    print(
+        f"sequential requests.post {time.perf_counter() - start:6.2f}s "
+        f"{len(embeddings)} embeddings"
+    )
+
+    for concurrency in (1, 4, 8):
+        client = EmbeddingClient(concurrency=concurrency, max_retries=5)
+        start = time.perf_counter()
+        embeddings = client.embed(
+            "openai", "bench", texts, url=URL, key="key", batch_size=BATCH_SIZE
+        )
+        elapsed = time.perf_counter() - start
+        asyncio.run(client.close())
+        assert embeddings is not None and len(embeddings) == CHUNKS
+        print(
+            f"client, {concurrency} in flight   {elapsed:6.2f}s "
+            f"{len(embeddings)} embeddings"
+        )
+
+
+if __name__ == "__main__":
+    main()
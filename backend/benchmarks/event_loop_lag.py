@@ -0,0 +1,119 @@
+"""
+Event loop lag under N concurrent streamed completions, sync against async db
+
+Runs 10, 50 and 100 simulated chat completions at once. Each reads its chat
+and the user's credit, streams 40 chunks 20ms apart, saves the message
+every 5 chunks and bills the user at the end, the db work the chat path does
+per completion. It runs once with the sync table methods called on the
+event loop, as before, and once with their *_async variants. A probe task
+sleeps 5ms at a time and records how late it wakes up.
+
+Run from backend/ against a scratch data dir, DATABASE_ENABLE_ASYNC=true
+times the async engine instead of worker threads:
+
+    DATA_DIR=/tmp/bench-data python benchmarks/event_loop_lag.py
+"""
+
+import asyncio
+import time
+import uuid
+from decimal import Decimal
+
+import open_webui.config  # noqa: F401, runs the migrations
+from open_webui.models.chats import ChatForm, Chats
+from open_webui.models.credits import AddCreditForm, Credits, SetCreditFormDetail
+
+STREAMS = (10, 50, 100)
+CHUNKS = 40
+CHUNK_INTERVAL = 0.02
+SAVE_EVERY = 5
+PROBE_INTERVAL = 0.005
+
+
+def get_form(user_id: str) -> AddCreditForm:
+    return AddCreditForm(
+        user_id=user_id,
+        amount=Decimal("-0.001"),
+        detail=SetCreditFormDetail(desc="bench", usage={"total_price": 0.001}),
+    )
+
+
+async def stream_sync(chat_id: str, user_id: str) -> None:
+    Chats.get_chat_by_id(chat_id)
+    Credits.init_credit_by_user_id(user_id)
+    content = ""
+    for i in range(CHUNKS):
+        await asyncio.sleep(CHUNK_INTERVAL)
+        content += f"token {i} "
+        if i % SAVE_EVERY == 0:
+            Chats.upsert_message_to_chat_by_id_and_message_id(
+                chat_id, "reply", {"role": "assistant", "content": content}
+            )
+    Credits.add_credit_by_user_id(get_form(user_id))
+
+
+async def stream_async(chat_id: str, user_id: str) -> None:
+    await Chats.get_chat_by_id_async(chat_id)
+    await Credits.init_credit_by_user_id_async(user_id)
+    content = ""
+    for i in range(CHUNKS):
+        await asyncio.sleep(CHUNK_INTERVAL)
+        content += f"token {i} "
+        if i % SAVE_EVERY == 0:
+            await Chats.upsert_message_to_chat_by_id_and_message_id_async(
+                chat_id, "reply", {"role": "assistant", "content": content}
+            )
+    await Credits.add_credit_by_user_id_async(get_form(user_id))
+
+
+async def probe(lags: list[float]) -> None:
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append(time.perf_counter() - start - PROBE_INTERVAL)
+
+
+async def run(stream, chats: list[tuple[str, str]]) -> tuple[float, list[float]]:
+    lags = []
+    probe_task = asyncio.create_task(probe(lags))
+    start = time.perf_counter()
+    await asyncio.gather(*[stream(chat_id, user_id) for chat_id, user_id in chats])
+    elapsed = time.perf_counter() - start
+    probe_task.cancel()
+    return elapsed, sorted(lags)
+
+
+def get_chats(count: int) -> list[tuple[str, str]]:
+    chats = []
+    for _ in range(count):
+        user_id = f"bench-{uuid.uuid4().hex}"
+        chat = Chats.insert_new_chat(
+            user_id,
+            ChatForm(chat={"title": "bench", "history": {"messages": {}}}),
+        )
+        chats.append((chat.id, user_id))
+    return chats
+
+
+async def main():
+    print(
+        f"{'streams':>7} {'db':6} {'total':>7} "
+        f"{'lag p50':>8} {'lag p99':>8} {'lag max':>8}"
+    )
+    for count in STREAMS:
+        for name, stream in (("sync", stream_sync), ("async", stream_async)):
+            chats = get_chats(count)
+            elapsed, lags = await run(stream, chats)
+            for chat_id, user_id in chats:
+                message = Chats.get_message_by_id_and_message_id(chat_id, "reply")
+                assert message["content"].startswith("token 0 token 1 ")
+            print(
+                f"{count:>7} {name:6} {elapsed:>6.2f}s "
+                f"{lags[len(lags) // 2] * 1000:>6.1f}ms "
+                f"{lags[int(len(lags) * 0.99)] * 1000:>6.1f}ms "
+                f"{lags[-1] * 1000:>6.1f}ms"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,118 @@
+"""
+Latency of hybrid search over several collections
+
+Indexes 3 collections of 1500 random chunks on the first run, then times
+query_collection_with_hybrid_search for 3 queries with and without a
+reranker. The embedder (3ms + 0.5ms per text) and the reranker (3ms + 0.3ms
+per pair) are fakes, so the numbers show the calls saved, not model speed.
+
+Run from backend/ against a scratch data dir:
+
+    DATA_DIR=/tmp/bench-data python benchmarks/hybrid_search.py
+"""
+
+import hashlib
+import logging
+import random
+import time
+from types import SimpleNamespace
+
+import numpy as np
+from langchain_core.documents import Document
+
+from open_webui.models.bm25 import BM25Index
+from open_webui.retrieval.utils import query_collection_with_hybrid_search
+from open_webui.routers import retrieval
+
+COLLECTIONS = [f"bench-hybrid-{i}" for i in range(3)]
+CHUNKS = 1500
+QUERIES = 3
+
+calls = {"embed": 0, "texts": 0, "rerank": 0, "pairs": 0}
+
+
+def get_vector(text: str) -> list[float]:
+    seed = int(hashlib.md5(text.encode()).hexdigest()[:8], 16)
+    return np.random.default_rng(seed).standard_normal(384).tolist()
+
+
+def embedding_function(texts, prefix=None, user=None):
+    single = not isinstance(texts, list)
+    texts = [texts] if single else texts
+    calls["embed"] += 1
+    calls["texts"] += len(texts)
+    time.sleep(0.003 + 0.0005 * len(texts))
+    vectors = [get_vector(text) for text in texts]
+    return vectors[0] if single else vectors
+
+
+def reranking_function(pairs):
+    calls["rerank"] += 1
+    calls["pairs"] += len(pairs)
+    time.sleep(0.003 + 0.0003 * len(pairs))
+    return [float(len(set(q.split()) & set(t.split()))) for q, t in pairs]
+
+
+def setup(words: list[str]) -> None:
+    config = SimpleNamespace(
+        TEXT_SPLITTER="",
+        CHUNK_SIZE=400,
+        CHUNK_OVERLAP=0,
+        RAG_EMBEDDING_ENGINE="openai",
+        RAG_EMBEDDING_MODEL="bench-hybrid",
+        BYPASS_EMBEDDING_AND_RETRIEVAL=False,
+    )
+    request = SimpleNamespace(app=SimpleNamespace(state=SimpleNamespace(config=config)))
+    retrieval.get_document_embedding_function = lambda request: embedding_function
+
+    for collection_name in COLLECTIONS:
+        if BM25Index.get_doc_count(collection_name):
+            continue
+        docs = [
+            Document(
+                page_content=" ".join(random.choice(words) for _ in range(60)),
+                metadata={"i": i},
+            )
+            for i in range(CHUNKS)
+        ]
+        retrieval.save_docs_to_vector_db(
+            request, docs, collection_name, split=False, add=True
+        )
+
+
+def main():
+    logging.getLogger("open_webui.retrieval.utils").setLevel(logging.WARNING)
+    random.seed(3)
+    words = [f"w{i}" for i in range(3000)]
+    setup(words)
+    queries = [" ".join(random.choice(words) for _ in range(5)) for _ in range(QUERIES)]
+
+    for reranker in (None, reranking_function):
+        for k, k_reranker in ((5, 3), (10, 5), (20, 10), (40, 20)):
+            best = None
+            for _ in range(3):
+                for key in calls:
+                    calls[key] = 0
+                start = time.perf_counter()
+                query_collection_with_hybrid_search(
+                    COLLECTIONS,
+                    queries,
+                    embedding_function,
+                    k,
+                    reranker,
+                    k_reranker,
+                    0.0,
+                    0.5,
+                )
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            print(
+                f"{'reranker' if reranker else 'cosine':8} k={k:<2} "
+                f"k_reranker={k_reranker:<2} {best * 1000:6.0f}ms "
+                f"embed calls={calls['embed']} texts={calls['texts']} "
+                f"rerank calls={calls['rerank']} pairs={calls['pairs']}"
+            )
+
+
+if __name__ == "__main__":
+    main()
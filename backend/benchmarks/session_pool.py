@@ -0,0 +1,104 @@
+"""
+Upstream request latency and throughput, pooled sessions against one per request
+
+Starts a mock /v1/chat/completions upstream that answers after 20ms, then
+sends 2000 POSTs with 50 in flight, first with a new ClientSession per
+request as the OpenAI and Ollama routers did, then with a shared session
+from a SessionPool. Latency is measured per request once it holds one of the
+50 slots.
+
+Run from backend/ against a scratch data dir:
+
+    DATA_DIR=/tmp/bench-data python benchmarks/session_pool.py
+"""
+
+import asyncio
+import threading
+import time
+
+import aiohttp
+from aiohttp import web
+
+from open_webui.utils.session_pool import SessionPool
+
+PORT = 18766
+URL = f"http://127.0.0.1:{PORT}/v1/chat/completions"
+REQUESTS = 2000
+CONCURRENCY = 50
+
+
+def start_mock_upstream() -> None:
+    async def completions(request):
+        await request.read()
+        await asyncio.sleep(0.02)
+        return web.json_response({"choices": [{"message": {"content": "ok"}}]})
+
+    async def serve():
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", completions)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", PORT).start()
+        started.set()
+        await asyncio.Event().wait()
+
+    started = threading.Event()
+    threading.Thread(target=lambda: asyncio.run(serve()), daemon=True).start()
+    started.wait()
+
+
+async def new_session_request() -> dict:
+    async with aiohttp.ClientSession(trust_env=True) as session:
+        async with session.post(URL, json={"model": "bench"}) as r:
+            return await r.json()
+
+
+def get_pooled_request(pool: SessionPool):
+    async def pooled_request() -> dict:
+        async with pool.get_session(URL).post(URL, json={"model": "bench"}) as r:
+            return await r.json()
+
+    return pooled_request
+
+
+async def run(request) -> tuple[float, list[float]]:
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    latencies = []
+
+    async def timed():
+        async with semaphore:
+            start = time.perf_counter()
+            response = await request()
+            latencies.append(time.perf_counter() - start)
+            assert response["choices"][0]["message"]["content"] == "ok"
+
+    start = time.perf_counter()
+    await asyncio.gather(*[timed() for _ in range(REQUESTS)])
+    return time.perf_counter() - start, sorted(latencies)
+
+
+async def main():
+    start_mock_upstream()
+    pool = SessionPool(limit=100)
+    try:
+        for name, request in (
+            ("new session per request", new_session_request),
+            ("pooled", get_pooled_request(pool)),
+        ):
+            elapsed, latencies = await run(request)
+            print(
+                f"{name:24} {REQUESTS / elapsed:6.0f} req/s "
+                f"p50 {latencies[len(latencies) // 2] * 1000:6.1f}ms "
+                f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:6.1f}ms"
+            )
+        stats = pool.stats()["origins"][SessionPool.get_origin(URL)]
+        print(
+            f"pooled: {stats['connections_created']} connections created, "
+            f"{stats['connections_reused']} reused"
+        )
+    finally:
+        await pool.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,112 @@
+"""
+Cost per chunk of counting stream usage in CreditDeduct
+
+Feeds 3000 SSE chunks of a reply to a 20 message prompt through
+CreditDeduct.run, and through the previous per-chunk path (a
+ChatCompletionChunk model and Calculator.calculate_usage per chunk) for
+comparison. Both must count the same tokens. Needs the tiktoken encoding of
+USAGE_DEFAULT_ENCODING_MODEL, fetched on first use.
+
+Run from backend/ against a scratch data dir:
+
+    DATA_DIR=/tmp/bench-data python benchmarks/stream_usage.py
+"""
+
+import json
+import time
+
+from open_webui.config import (
+    USAGE_CALCULATE_MODEL_PREFIX_TO_REMOVE,
+    USAGE_DEFAULT_ENCODING_MODEL,
+)
+from open_webui.models.users import UserModel
+from open_webui.utils.credit.models import ChatCompletionChunk
+from open_webui.utils.credit.usage import CreditDeduct, calculator
+
+MODEL_ID = "gpt-4o"
+CHUNKS = 3000
+MESSAGES = [
+    {
+        "role": "user" if i % 2 else "assistant",
+        "content": "hello world lorem ipsum " * 200,
+    }
+    for i in range(20)
+]
+
+
+def get_chunks() -> list[bytes]:
+    chunks = []
+    for i in range(CHUNKS):
+        chunk = {"id": "bench", "choices": [{"delta": {"content": f"tok{i} "}}]}
+        chunks.append(f"data: {json.dumps(chunk)}\n\n".encode())
+    return chunks
+
+
+def per_chunk_usage(credit_deduct: CreditDeduct, chunks: list[bytes]) -> None:
+    """The path CreditDeduct took for every chunk before counting incrementally"""
+    for chunk in chunks:
+        response = ChatCompletionChunk.model_validate(
+            credit_deduct.clean_response(response=chunk, default_response={})
+        )
+        _, usage = calculator.calculate_usage(
+            cached_usage=credit_deduct.usage,
+            model_id=MODEL_ID,
+            messages=MESSAGES,
+            response=response,
+            model_prefix_to_remove=USAGE_CALCULATE_MODEL_PREFIX_TO_REMOVE.value,
+            default_model_for_encoding=USAGE_DEFAULT_ENCODING_MODEL.value,
+        )
+        credit_deduct.usage.prompt_tokens = usage.prompt_tokens
+        credit_deduct.usage.completion_tokens += usage.completion_tokens
+        credit_deduct.usage.total_tokens = (
+            credit_deduct.usage.prompt_tokens + credit_deduct.usage.completion_tokens
+        )
+
+
+def incremental_usage(credit_deduct: CreditDeduct, chunks: list[bytes]) -> None:
+    for chunk in chunks:
+        credit_deduct.run(chunk)
+
+
+def main():
+    user = UserModel(
+        id="bench",
+        name="bench",
+        email="bench@example.com",
+        role="user",
+        profile_image_url="",
+        last_active_at=0,
+        updated_at=0,
+        created_at=0,
+    )
+    chunks = get_chunks()
+
+    results = {}
+    for name, run in (
+        ("per-chunk", per_chunk_usage),
+        ("incremental", incremental_usage),
+    ):
+        best = None
+        for _ in range(5):
+            credit_deduct = CreditDeduct(
+                user=user,
+                model_id=MODEL_ID,
+                body={"model": MODEL_ID, "messages": MESSAGES},
+                is_stream=True,
+            )
+            start = time.perf_counter()
+            run(credit_deduct, chunks)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        results[name] = credit_deduct.usage
+        print(
+            f"{name:11} {best / CHUNKS * 1e6:6.1f}us per chunk "
+            f"prompt={credit_deduct.usage.prompt_tokens} "
+            f"completion={credit_deduct.usage.completion_tokens}"
+        )
+
+    assert results["per-chunk"] == results["incremental"], "token counts differ"
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 import base64
 import os
 import random
+import time
 from pathlib import Path
 
 import typer
@@ -99,5 +100,29 @@ def dev(
     )
 
 
+@app.command()
+def rebuild_credit_rollup(batch_size: int = 1000):
+    from open_webui.models.credits import CreditLogRollups
+
+    total = CreditLogRollups.rebuild(batch_size=batch_size)
+    typer.echo(f"Rebuilt credit rollups before yesterday from {total} credit logs")
+
+
+@app.command()
+def rebuild_chat_search_index(batch_size: int = 500):
+    from open_webui.models.chats import Chats
+
+    total = Chats.rebuild_search_index(batch_size=batch_size)
+    typer.echo(f"Rebuilt chat search index from {total} chats")
+
+
+@app.command()
+def prune_chunk_embeddings(days: int = 90):
+    from open_webui.models.embeddings import ChunkEmbeddings
+
+    total = ChunkEmbeddings.delete_unused(before=int(time.time()) - days * 86400)
+    typer.echo(f"Deleted {total} chunk embeddings unused for {days} days")
+
+
 if __name__ == "__main__":
     app()
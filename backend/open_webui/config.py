@@ -2,6 +2,8 @@ import json
 import logging
 import os
 import shutil
+import threading
+import time
 import base64
 import redis
 
@@ -21,6 +23,7 @@ from open_webui.env import (
     DATA_DIR,
     DATABASE_URL,
     ENV,
+    CONFIG_SYNC_INTERVAL,
     REDIS_URL,
     REDIS_KEY_PREFIX,
     REDIS_SENTINEL_HOSTS,
@@ -278,9 +281,22 @@ class PersistentConfig(Generic[T]):
 
 
 class AppConfig:
+    """
+    Config of the app, read from an in-process snapshot
+
+    With Redis, writes are stored under {prefix}:config:{key} and bump
+    {prefix}:config:version. Reads check that version at most once every
+    sync_interval seconds and reload all keys when another instance changed
+    one, so attribute access doesn't cost a Redis round trip.
+    """
+
     _state: dict[str, PersistentConfig]
     _redis: Union[redis.Redis, redis.cluster.RedisCluster] = None
     _redis_key_prefix: str
+    _sync_interval: float
+    _version: Optional[str]
+    _checked_at: float
+    _lock: threading.Lock
 
     def __init__(
         self,
@@ -288,9 +304,14 @@ class AppConfig:
         redis_sentinels: Optional[list] = [],
         redis_cluster: Optional[bool] = False,
         redis_key_prefix: str = "open-webui",
+        sync_interval: float = CONFIG_SYNC_INTERVAL,
     ):
         super().__setattr__("_state", {})
         super().__setattr__("_redis_key_prefix", redis_key_prefix)
+        super().__setattr__("_sync_interval", sync_interval)
+        super().__setattr__("_version", None)
+        super().__setattr__("_checked_at", 0.0)
+        super().__setattr__("_lock", threading.Lock())
         if redis_url:
             super().__setattr__(
                 "_redis",
@@ -302,39 +323,72 @@ class AppConfig:
                 ),
             )
 
+    @property
+    def _redis_version_key(self) -> str:
+        return f"{self._redis_key_prefix}:config:version"
+
     def __setattr__(self, key, value):
         if isinstance(value, PersistentConfig):
             self._state[key] = value
+            # pick up the value of a new key on the next read
+            super().__setattr__("_version", None)
         else:
             self._state[key].value = value
             self._state[key].save()
 
             if self._redis:
                 redis_key = f"{self._redis_key_prefix}:config:{key}"
-                self._redis.set(redis_key, json.dumps(self._state[key].value))
+                pipe = self._redis.pipeline()
+                pipe.set(redis_key, json.dumps(self._state[key].value))
+                pipe.incr(self._redis_version_key)
+                pipe.execute()
 
     def __getattr__(self, key):
         if key not in self._state:
             raise AttributeError(f"Config key '{key}' not found")
 
-        # If Redis is available, check for an updated value
         if self._redis:
-            redis_key = f"{self._redis_key_prefix}:config:{key}"
-            redis_value = self._redis.get(redis_key)
+            self._sync()
 
-            if redis_value is not None:
-                try:
-                    decoded_value = json.loads(redis_value)
+        return self._state[key].value
 
-                    # Update the in-memory value if different
-                    if self._state[key].value != decoded_value:
-                        self._state[key].value = decoded_value
-                        log.info(f"Updated {key} from Redis: {decoded_value}")
+    def _sync(self):
+        now = time.monotonic()
+        if self._version is not None and now - self._checked_at < self._sync_interval:
+            return
+        # one thread checks, the others read the snapshot meanwhile
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            super().__setattr__("_checked_at", now)
+            version = self._redis.get(self._redis_version_key) or "0"
+            if version != self._version:
+                self._reload()
+                super().__setattr__("_version", version)
+        except Exception as e:
+            log.warning(f"Error syncing config from Redis: {e}")
+        finally:
+            self._lock.release()
+
+    def _reload(self):
+        keys = list(self._state.keys())
+        pipe = self._redis.pipeline()
+        for key in keys:
+            pipe.get(f"{self._redis_key_prefix}:config:{key}")
+
+        for key, redis_value in zip(keys, pipe.execute()):
+            if redis_value is None:
+                continue
+            try:
+                decoded_value = json.loads(redis_value)
 
-                except json.JSONDecodeError:
-                    log.error(f"Invalid JSON format in Redis for {key}: {redis_value}")
+                # Update the in-memory value if different
+                if self._state[key].value != decoded_value:
+                    self._state[key].value = decoded_value
+                    log.info(f"Updated {key} from Redis: {decoded_value}")
 
-        return self._state[key].value
+            except json.JSONDecodeError:
+                log.error(f"Invalid JSON format in Redis for {key}: {redis_value}")
 
 
 ####################################
@@ -915,6 +969,11 @@ AZURE_STORAGE_ENDPOINT = os.environ.get("AZURE_STORAGE_ENDPOINT", None)
 AZURE_STORAGE_CONTAINER_NAME = os.environ.get("AZURE_STORAGE_CONTAINER_NAME", None)
 AZURE_STORAGE_KEY = os.environ.get("AZURE_STORAGE_KEY", None)
 
+# Chunk size used to stream files to and from the storage provider
+STORAGE_CHUNK_SIZE = int(os.environ.get("STORAGE_CHUNK_SIZE", str(8 * 1024 * 1024)))
+# Max total size of the local copies kept by s3, gcs and azure, 0 keeps them all
+STORAGE_CACHE_MAX_SIZE = int(os.environ.get("STORAGE_CACHE_MAX_SIZE", "0"))
+
 ####################################
 # File Upload DIR
 ####################################
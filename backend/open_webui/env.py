@@ -345,6 +345,11 @@ DATABASE_ENABLE_SQLITE_WAL = (
     os.environ.get("DATABASE_ENABLE_SQLITE_WAL", "False").lower() == "true"
 )
 
+# Run hot queries on an async driver (asyncpg, aiosqlite) instead of a thread
+DATABASE_ENABLE_ASYNC = (
+    os.environ.get("DATABASE_ENABLE_ASYNC", "False").lower() == "true"
+)
+
 DATABASE_USER_ACTIVE_STATUS_UPDATE_INTERVAL = os.environ.get(
     "DATABASE_USER_ACTIVE_STATUS_UPDATE_INTERVAL", None
 )
@@ -356,6 +361,15 @@ if DATABASE_USER_ACTIVE_STATUS_UPDATE_INTERVAL is not None:
     except Exception:
         DATABASE_USER_ACTIVE_STATUS_UPDATE_INTERVAL = 0.0
 
+# Seconds between bulk writes of users' last active times, 0 writes each at once
+USER_LAST_ACTIVE_FLUSH_INTERVAL = os.environ.get(
+    "USER_LAST_ACTIVE_FLUSH_INTERVAL", "10"
+)
+try:
+    USER_LAST_ACTIVE_FLUSH_INTERVAL = max(float(USER_LAST_ACTIVE_FLUSH_INTERVAL), 0.0)
+except ValueError:
+    USER_LAST_ACTIVE_FLUSH_INTERVAL = 10.0
+
 RESET_CONFIG_ON_START = (
     os.environ.get("RESET_CONFIG_ON_START", "False").lower() == "true"
 )
@@ -387,6 +401,13 @@ try:
 except ValueError:
     REDIS_SENTINEL_MAX_RETRY_COUNT = 2
 
+# Seconds between checks for config changes made by other instances
+CONFIG_SYNC_INTERVAL = os.environ.get("CONFIG_SYNC_INTERVAL", "1")
+try:
+    CONFIG_SYNC_INTERVAL = max(float(CONFIG_SYNC_INTERVAL), 0.0)
+except ValueError:
+    CONFIG_SYNC_INTERVAL = 1.0
+
 ####################################
 # UVICORN WORKERS
 ####################################
@@ -528,6 +549,202 @@ else:
     except Exception:
         MODELS_CACHE_TTL = 1
 
+# Seconds a user's group ids are cached when filtering model lists, changes
+# apply at once on this worker and, with REDIS_URL, on the others, else the
+# others see them after the ttl
+GROUP_MEMBER_CACHE_TTL = os.environ.get("GROUP_MEMBER_CACHE_TTL", "5")
+try:
+    GROUP_MEMBER_CACHE_TTL = float(GROUP_MEMBER_CACHE_TTL)
+except ValueError:
+    GROUP_MEMBER_CACHE_TTL = 5.0
+
+# Seconds an authenticated user is cached for, by id and by api key
+USER_CACHE_TTL = os.environ.get("USER_CACHE_TTL", "5")
+try:
+    USER_CACHE_TTL = float(USER_CACHE_TTL)
+except ValueError:
+    USER_CACHE_TTL = 5.0
+
+
+####################################
+# CREDIT
+####################################
+
+# Max number of prompt token counts cached across requests
+USAGE_TOKEN_CACHE_SIZE = os.environ.get("USAGE_TOKEN_CACHE_SIZE", "10000")
+try:
+    USAGE_TOKEN_CACHE_SIZE = int(USAGE_TOKEN_CACHE_SIZE)
+except ValueError:
+    USAGE_TOKEN_CACHE_SIZE = 10000
+
+# Max number of image sizes cached for image token calculation
+USAGE_IMAGE_TOKEN_CACHE_SIZE = os.environ.get("USAGE_IMAGE_TOKEN_CACHE_SIZE", "1000")
+try:
+    USAGE_IMAGE_TOKEN_CACHE_SIZE = int(USAGE_IMAGE_TOKEN_CACHE_SIZE)
+except ValueError:
+    USAGE_IMAGE_TOKEN_CACHE_SIZE = 1000
+
+# Seconds to resolve the sizes of a prompt's images before billing them at the
+# default size, the upstream request waits for it
+USAGE_IMAGE_SIZE_TIMEOUT = os.environ.get("USAGE_IMAGE_SIZE_TIMEOUT", "2")
+try:
+    USAGE_IMAGE_SIZE_TIMEOUT = float(USAGE_IMAGE_SIZE_TIMEOUT)
+except ValueError:
+    USAGE_IMAGE_SIZE_TIMEOUT = 2.0
+
+# Seconds a resolved model price is cached, local cache is also cleared on update
+USAGE_MODEL_PRICE_CACHE_TTL = os.environ.get("USAGE_MODEL_PRICE_CACHE_TTL", "60")
+try:
+    USAGE_MODEL_PRICE_CACHE_TTL = float(USAGE_MODEL_PRICE_CACHE_TTL)
+except ValueError:
+    USAGE_MODEL_PRICE_CACHE_TTL = 60.0
+
+# Write-behind ledger for credit deductions: "" (disabled), "memory" or "redis"
+CREDIT_LEDGER_MODE = os.environ.get("CREDIT_LEDGER_MODE", "").lower()
+if CREDIT_LEDGER_MODE not in ("", "memory", "redis"):
+    CREDIT_LEDGER_MODE = ""
+
+CREDIT_LEDGER_FLUSH_INTERVAL = os.environ.get("CREDIT_LEDGER_FLUSH_INTERVAL", "1")
+try:
+    CREDIT_LEDGER_FLUSH_INTERVAL = float(CREDIT_LEDGER_FLUSH_INTERVAL)
+except ValueError:
+    CREDIT_LEDGER_FLUSH_INTERVAL = 1.0
+
+CREDIT_LEDGER_BATCH_SIZE = os.environ.get("CREDIT_LEDGER_BATCH_SIZE", "500")
+try:
+    CREDIT_LEDGER_BATCH_SIZE = int(CREDIT_LEDGER_BATCH_SIZE)
+except ValueError:
+    CREDIT_LEDGER_BATCH_SIZE = 500
+
+# Seconds a cached balance is trusted before reloading it from db
+CREDIT_LEDGER_BALANCE_TTL = os.environ.get("CREDIT_LEDGER_BALANCE_TTL", "5")
+try:
+    CREDIT_LEDGER_BALANCE_TTL = float(CREDIT_LEDGER_BALANCE_TTL)
+except ValueError:
+    CREDIT_LEDGER_BALANCE_TTL = 5.0
+
+# Seconds the total count of credit logs is cached for paging
+CREDIT_LOG_COUNT_CACHE_TTL = os.environ.get("CREDIT_LOG_COUNT_CACHE_TTL", "60")
+try:
+    CREDIT_LOG_COUNT_CACHE_TTL = float(CREDIT_LOG_COUNT_CACHE_TTL)
+except ValueError:
+    CREDIT_LOG_COUNT_CACHE_TTL = 60.0
+
+
+####################################
+# RETRIEVAL
+####################################
+
+# Max number of embeddings cached in process, 0 disables the cache
+RAG_EMBEDDING_CACHE_SIZE = os.environ.get("RAG_EMBEDDING_CACHE_SIZE", "10000")
+try:
+    RAG_EMBEDDING_CACHE_SIZE = int(RAG_EMBEDDING_CACHE_SIZE)
+except ValueError:
+    RAG_EMBEDDING_CACHE_SIZE = 10000
+
+# Max bytes of embeddings cached in process
+RAG_EMBEDDING_CACHE_MAX_BYTES = os.environ.get(
+    "RAG_EMBEDDING_CACHE_MAX_BYTES", str(128 * 1024 * 1024)
+)
+try:
+    RAG_EMBEDDING_CACHE_MAX_BYTES = int(RAG_EMBEDDING_CACHE_MAX_BYTES)
+except ValueError:
+    RAG_EMBEDDING_CACHE_MAX_BYTES = 128 * 1024 * 1024
+
+# Seconds an embedding is cached
+RAG_EMBEDDING_CACHE_TTL = os.environ.get("RAG_EMBEDDING_CACHE_TTL", "86400")
+try:
+    RAG_EMBEDDING_CACHE_TTL = float(RAG_EMBEDDING_CACHE_TTL)
+except ValueError:
+    RAG_EMBEDDING_CACHE_TTL = 86400.0
+
+# Share cached embeddings between workers through REDIS_URL
+ENABLE_RAG_EMBEDDING_CACHE_REDIS = (
+    os.environ.get("ENABLE_RAG_EMBEDDING_CACHE_REDIS", "False").lower() == "true"
+)
+
+# Reuse stored embeddings of identical document chunks
+ENABLE_RAG_EMBEDDING_DEDUP = (
+    os.environ.get("ENABLE_RAG_EMBEDDING_DEDUP", "True").lower() == "true"
+)
+
+# Days after which unused stored chunk embeddings are deleted, 0 keeps them
+RAG_EMBEDDING_DEDUP_PRUNE_DAYS = os.environ.get("RAG_EMBEDDING_DEDUP_PRUNE_DAYS", "90")
+try:
+    RAG_EMBEDDING_DEDUP_PRUNE_DAYS = int(RAG_EMBEDDING_DEDUP_PRUNE_DAYS)
+except ValueError:
+    RAG_EMBEDDING_DEDUP_PRUNE_DAYS = 90
+
+# Seconds between prunes of unused stored chunk embeddings
+RAG_EMBEDDING_DEDUP_PRUNE_INTERVAL = os.environ.get(
+    "RAG_EMBEDDING_DEDUP_PRUNE_INTERVAL", "86400"
+)
+try:
+    RAG_EMBEDDING_DEDUP_PRUNE_INTERVAL = float(RAG_EMBEDDING_DEDUP_PRUNE_INTERVAL)
+except ValueError:
+    RAG_EMBEDDING_DEDUP_PRUNE_INTERVAL = 86400.0
+
+# Embedding batches sent at once per call to the openai, azure_openai and ollama engines
+RAG_EMBEDDING_CONCURRENT_REQUESTS = os.environ.get(
+    "RAG_EMBEDDING_CONCURRENT_REQUESTS", "4"
+)
+try:
+    RAG_EMBEDDING_CONCURRENT_REQUESTS = int(RAG_EMBEDDING_CONCURRENT_REQUESTS)
+except ValueError:
+    RAG_EMBEDDING_CONCURRENT_REQUESTS = 4
+
+# Retries of an embedding batch on 429, 5xx and connection errors
+RAG_EMBEDDING_MAX_RETRIES = os.environ.get("RAG_EMBEDDING_MAX_RETRIES", "5")
+try:
+    RAG_EMBEDDING_MAX_RETRIES = int(RAG_EMBEDDING_MAX_RETRIES)
+except ValueError:
+    RAG_EMBEDDING_MAX_RETRIES = 5
+
+# Estimated tokens per embedding batch, 0 only limits the number of texts
+RAG_EMBEDDING_BATCH_MAX_TOKENS = os.environ.get(
+    "RAG_EMBEDDING_BATCH_MAX_TOKENS", "100000"
+)
+try:
+    RAG_EMBEDDING_BATCH_MAX_TOKENS = int(RAG_EMBEDDING_BATCH_MAX_TOKENS)
+except ValueError:
+    RAG_EMBEDDING_BATCH_MAX_TOKENS = 100000
+
+# Chunks embedded and inserted at a time while processing a file
+RAG_FILE_PROCESSING_WINDOW_SIZE = os.environ.get(
+    "RAG_FILE_PROCESSING_WINDOW_SIZE", "256"
+)
+try:
+    RAG_FILE_PROCESSING_WINDOW_SIZE = int(RAG_FILE_PROCESSING_WINDOW_SIZE)
+except ValueError:
+    RAG_FILE_PROCESSING_WINDOW_SIZE = 256
+
+# Files processed at once by a batch request
+RAG_FILE_PROCESSING_CONCURRENCY = os.environ.get("RAG_FILE_PROCESSING_CONCURRENCY", "4")
+try:
+    RAG_FILE_PROCESSING_CONCURRENCY = int(RAG_FILE_PROCESSING_CONCURRENCY)
+except ValueError:
+    RAG_FILE_PROCESSING_CONCURRENCY = 4
+
+# Max number of retrieval results cached in process, 0 disables the cache
+RAG_RESULT_CACHE_SIZE = os.environ.get("RAG_RESULT_CACHE_SIZE", "1000")
+try:
+    RAG_RESULT_CACHE_SIZE = int(RAG_RESULT_CACHE_SIZE)
+except ValueError:
+    RAG_RESULT_CACHE_SIZE = 1000
+
+# Seconds a retrieval result is cached, results of changed collections are never served
+RAG_RESULT_CACHE_TTL = os.environ.get("RAG_RESULT_CACHE_TTL", "600")
+try:
+    RAG_RESULT_CACHE_TTL = float(RAG_RESULT_CACHE_TTL)
+except ValueError:
+    RAG_RESULT_CACHE_TTL = 600.0
+
+# Cache retrieval results without REDIS_URL, only safe when one process of one
+# instance writes to the vector db, else another one's writes are not seen
+RAG_RESULT_CACHE_SINGLE_INSTANCE = (
+    os.environ.get("RAG_RESULT_CACHE_SINGLE_INSTANCE", "False").lower() == "true"
+)
+
 
 ####################################
 # CHAT
@@ -587,6 +804,15 @@ except ValueError:
 WEBSOCKET_SENTINEL_HOSTS = os.environ.get("WEBSOCKET_SENTINEL_HOSTS", "")
 WEBSOCKET_SENTINEL_PORT = os.environ.get("WEBSOCKET_SENTINEL_PORT", "26379")
 
+# Seconds chat message updates from event emitters are buffered before being
+# written to db, 0 writes every event
+websocket_event_flush_interval = os.environ.get("WEBSOCKET_EVENT_FLUSH_INTERVAL", "1")
+
+try:
+    WEBSOCKET_EVENT_FLUSH_INTERVAL = float(websocket_event_flush_interval)
+except ValueError:
+    WEBSOCKET_EVENT_FLUSH_INTERVAL = 1.0
+
 
 AIOHTTP_CLIENT_TIMEOUT = os.environ.get("AIOHTTP_CLIENT_TIMEOUT", "")
 
@@ -640,6 +866,63 @@ AIOHTTP_CLIENT_READ_BUFFER_SIZE = int(
     os.environ.get("AIOHTTP_CLIENT_READ_BUFFER_SIZE", 2**16)
 )
 
+# Pooled sessions of upstream connections, limits are per upstream origin.
+# 0 is unlimited, like the per-request sessions were. A limit is opt-in:
+# requests past it wait for a free connection, which stalls long streams.
+AIOHTTP_CLIENT_POOL_LIMIT = int(os.environ.get("AIOHTTP_CLIENT_POOL_LIMIT", "0"))
+
+AIOHTTP_CLIENT_POOL_LIMIT_PER_HOST = int(
+    os.environ.get("AIOHTTP_CLIENT_POOL_LIMIT_PER_HOST", "0")
+)
+
+AIOHTTP_CLIENT_POOL_KEEPALIVE_TIMEOUT = float(
+    os.environ.get("AIOHTTP_CLIENT_POOL_KEEPALIVE_TIMEOUT", "30")
+)
+
+AIOHTTP_CLIENT_POOL_DNS_CACHE_TTL = os.environ.get(
+    "AIOHTTP_CLIENT_POOL_DNS_CACHE_TTL", "300"
+)
+
+if AIOHTTP_CLIENT_POOL_DNS_CACHE_TTL == "":
+    AIOHTTP_CLIENT_POOL_DNS_CACHE_TTL = None
+else:
+    try:
+        AIOHTTP_CLIENT_POOL_DNS_CACHE_TTL = int(AIOHTTP_CLIENT_POOL_DNS_CACHE_TTL)
+    except Exception:
+        AIOHTTP_CLIENT_POOL_DNS_CACHE_TTL = 300
+
+
+####################################
+# UPSTREAM SCHEDULER
+####################################
+
+# How requests are spread over connections serving the same model:
+# least_outstanding, ewma, weighted_round_robin or random
+UPSTREAM_SCHEDULER_POLICY = os.environ.get(
+    "UPSTREAM_SCHEDULER_POLICY", "least_outstanding"
+).lower()
+
+if UPSTREAM_SCHEDULER_POLICY not in (
+    "least_outstanding",
+    "ewma",
+    "weighted_round_robin",
+    "random",
+):
+    UPSTREAM_SCHEDULER_POLICY = "least_outstanding"
+
+# Retries on another connection when one fails before responding
+UPSTREAM_MAX_RETRIES = int(os.environ.get("UPSTREAM_MAX_RETRIES", "1"))
+
+# Consecutive failures that take a connection out of rotation, and for how long
+UPSTREAM_FAILURE_THRESHOLD = int(os.environ.get("UPSTREAM_FAILURE_THRESHOLD", "3"))
+
+UPSTREAM_CIRCUIT_BREAKER_TIMEOUT = float(
+    os.environ.get("UPSTREAM_CIRCUIT_BREAKER_TIMEOUT", "30")
+)
+
+# Seconds between syncs of in-flight counts with the other workers over redis
+UPSTREAM_SYNC_INTERVAL = float(os.environ.get("UPSTREAM_SYNC_INTERVAL", "1"))
+
 
 ####################################
 # SENTENCE TRANSFORMERS
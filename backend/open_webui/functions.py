@@ -284,7 +284,7 @@ async def generate_function_chat_completion(
 
                 # Directly return if the response is a StreamingResponse
                 if isinstance(res, StreamingResponse):
-                    with CreditDeduct(
+                    async with CreditDeduct(
                         user=user,
                         model_id=model_id,
                         body=form_data,
@@ -300,7 +300,7 @@ async def generate_function_chat_completion(
                     return
 
                 if isinstance(res, dict):
-                    with CreditDeduct(
+                    async with CreditDeduct(
                         user=user,
                         model_id=model_id,
                         body=form_data,
@@ -316,7 +316,7 @@ async def generate_function_chat_completion(
                 yield f"data: {json.dumps({'error': {'detail': str(e)}})}\n\n"
                 return
 
-            with CreditDeduct(
+            async with CreditDeduct(
                 user=user,
                 model_id=model_id,
                 body=form_data,
@@ -362,7 +362,7 @@ async def generate_function_chat_completion(
             return {"error": {"detail": str(e)}}
 
         async def to_stream(response):
-            with CreditDeduct(
+            async with CreditDeduct(
                 user=user,
                 model_id=model_id,
                 body=form_data,
@@ -378,7 +378,7 @@ async def generate_function_chat_completion(
         if isinstance(res, StreamingResponse):
             return StreamingResponse(to_stream(res), media_type="text/event-stream")
 
-        with CreditDeduct(
+        async with CreditDeduct(
             user=user,
             model_id=model_id,
             body=form_data,
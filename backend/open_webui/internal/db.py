@@ -1,8 +1,10 @@
 import os
 import json
+import asyncio
 import logging
-from contextlib import contextmanager
-from typing import Any, Optional
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Callable, Optional, TypeVar
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 
 from open_webui.internal.wrappers import register_connection
 from open_webui.env import (
@@ -15,6 +17,7 @@ from open_webui.env import (
     DATABASE_POOL_SIZE,
     DATABASE_POOL_TIMEOUT,
     DATABASE_ENABLE_SQLITE_WAL,
+    DATABASE_ENABLE_ASYNC,
 )
 from peewee_migrate import Router
 from sqlalchemy import Dialect, create_engine, MetaData, event, types
@@ -162,3 +165,109 @@ def get_session():
 
 
 get_db = contextmanager(get_session)
+
+
+####################
+# Async access
+####################
+
+R = TypeVar("R")
+
+
+def get_async_database_url(url: str) -> Optional[str]:
+    """
+    Async driver url of the database url, None when there is no async driver
+    """
+    if url.startswith("sqlite:///"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+
+    if url.startswith(("postgresql://", "postgres://")):
+        scheme, netloc, path, query, fragment = urlsplit(url)
+        # asyncpg takes ssl instead of libpq's sslmode
+        params = [
+            ("ssl" if key == "sslmode" else key, value)
+            for key, value in parse_qsl(query)
+        ]
+        return urlunsplit(
+            ("postgresql+asyncpg", netloc, path, urlencode(params), fragment)
+        )
+
+    return None
+
+
+def create_async_db_engine():
+    async_url = get_async_database_url(SQLALCHEMY_DATABASE_URL)
+    if async_url is None:
+        log.warning("DATABASE_ENABLE_ASYNC is not supported for this database")
+        return None
+
+    try:
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        if async_url.startswith("sqlite"):
+            async_engine = create_async_engine(async_url)
+            event.listen(async_engine.sync_engine, "connect", on_connect)
+        elif isinstance(DATABASE_POOL_SIZE, int) and DATABASE_POOL_SIZE > 0:
+            async_engine = create_async_engine(
+                async_url,
+                pool_size=DATABASE_POOL_SIZE,
+                max_overflow=DATABASE_POOL_MAX_OVERFLOW,
+                pool_timeout=DATABASE_POOL_TIMEOUT,
+                pool_recycle=DATABASE_POOL_RECYCLE,
+                pool_pre_ping=True,
+            )
+        elif isinstance(DATABASE_POOL_SIZE, int):
+            async_engine = create_async_engine(
+                async_url, pool_pre_ping=True, poolclass=NullPool
+            )
+        else:
+            async_engine = create_async_engine(async_url, pool_pre_ping=True)
+    except ImportError as e:
+        log.warning(f"Async database driver not installed, using threads: {e}")
+        return None
+
+    log.info(f"Async database access enabled: {async_engine.url.drivername}")
+    return async_engine
+
+
+async_engine = create_async_db_engine() if DATABASE_ENABLE_ASYNC else None
+
+if async_engine is not None:
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+    AsyncSessionLocal = async_sessionmaker(
+        bind=async_engine,
+        class_=AsyncSession,
+        autoflush=False,
+        expire_on_commit=False,
+    )
+else:
+    AsyncSessionLocal = None
+
+
+@asynccontextmanager
+async def get_async_db():
+    if AsyncSessionLocal is None:
+        raise RuntimeError("Async database access is not enabled")
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def run_db(fn: Callable[..., R], *args, **kwargs) -> R:
+    """
+    Run fn(db, *args, **kwargs) without blocking the event loop
+
+    With DATABASE_ENABLE_ASYNC, fn gets a session on the async driver and its
+    queries are awaited. Otherwise it gets a regular session in a worker
+    thread. Either way table methods share one sync implementation.
+    """
+    if AsyncSessionLocal is None:
+
+        def run() -> R:
+            with get_db() as db:
+                return fn(db, *args, **kwargs)
+
+        return await asyncio.to_thread(run)
+
+    async with AsyncSessionLocal() as db:
+        return await db.run_sync(fn, *args, **kwargs)
@@ -44,11 +44,16 @@ from bs4 import BeautifulSoup
 from open_webui.models.credits import Credits
 from open_webui.utils import logger
 from open_webui.utils.audit import AuditLevel, AuditLoggingMiddleware
-from open_webui.utils.credit.utils import is_free_request, check_credit_by_user_id
+from open_webui.utils.credit.ledger import credit_ledger, periodic_credit_ledger_flush
+from open_webui.utils.credit.utils import (
+    is_free_request,
+    check_credit_by_user_id_async,
+)
 from open_webui.utils.logger import start_logger
 from open_webui.socket.main import (
     app as socket_app,
     periodic_usage_pool_cleanup,
+    CHAT_MESSAGE_BUFFER,
     get_event_emitter,
     get_models_in_use,
     get_active_user_ids,
@@ -88,6 +93,10 @@ from open_webui.routers.retrieval import (
     get_ef,
     get_rf,
 )
+from open_webui.retrieval.embeddings import embedding_client
+from open_webui.retrieval.utils import periodic_chunk_embedding_prune
+from open_webui.utils.session_pool import session_pool
+from open_webui.utils.upstream import periodic_upstream_sync, upstream_scheduler
 
 from open_webui.internal.db import Session, engine
 
@@ -420,6 +429,9 @@ from open_webui.config import (
 )
 from open_webui.env import (
     LICENSE_KEY,
+    USER_LAST_ACTIVE_FLUSH_INTERVAL,
+    ENABLE_RAG_EMBEDDING_DEDUP,
+    RAG_EMBEDDING_DEDUP_PRUNE_DAYS,
     AUDIT_EXCLUDED_PATHS,
     AUDIT_LOG_LEVEL,
     CHANGELOG,
@@ -477,11 +489,15 @@ from open_webui.utils.auth import (
     decode_token,
     get_admin_user,
     get_verified_user,
+    periodic_user_last_active_flush,
+    user_cache_listener,
+    group_cache_listener,
 )
 from open_webui.utils.plugin import install_tool_and_function_dependencies
 from open_webui.utils.oauth import OAuthManager
 from open_webui.utils.security_headers import SecurityHeadersMiddleware
 from open_webui.utils.redis import get_redis_connection
+from open_webui.utils.file_status import file_status_listener
 
 from open_webui.tasks import (
     redis_task_command_listener,
@@ -590,6 +606,12 @@ async def lifespan(app: FastAPI):
         app.state.redis_task_command_listener = asyncio.create_task(
             redis_task_command_listener(app)
         )
+        app.state.file_status_listener = asyncio.create_task(file_status_listener(app))
+        app.state.user_cache_listener = asyncio.create_task(user_cache_listener(app))
+        app.state.group_cache_listener = asyncio.create_task(group_cache_listener(app))
+
+    if upstream_scheduler.use_redis:
+        app.state.upstream_sync_task = asyncio.create_task(periodic_upstream_sync())
 
     if THREAD_POOL_SIZE and THREAD_POOL_SIZE > 0:
         limiter = anyio.to_thread.current_default_thread_limiter()
@@ -597,6 +619,21 @@ async def lifespan(app: FastAPI):
 
     asyncio.create_task(periodic_usage_pool_cleanup())
 
+    if credit_ledger.enabled:
+        app.state.credit_ledger_task = asyncio.create_task(
+            periodic_credit_ledger_flush()
+        )
+
+    if USER_LAST_ACTIVE_FLUSH_INTERVAL > 0:
+        app.state.user_last_active_task = asyncio.create_task(
+            periodic_user_last_active_flush()
+        )
+
+    if ENABLE_RAG_EMBEDDING_DEDUP and RAG_EMBEDDING_DEDUP_PRUNE_DAYS > 0:
+        app.state.chunk_embedding_prune_task = asyncio.create_task(
+            periodic_chunk_embedding_prune()
+        )
+
     if app.state.config.ENABLE_BASE_MODELS_CACHE:
         await get_all_models(
             Request(
@@ -623,6 +660,47 @@ async def lifespan(app: FastAPI):
     if hasattr(app.state, "redis_task_command_listener"):
         app.state.redis_task_command_listener.cancel()
 
+    if hasattr(app.state, "file_status_listener"):
+        app.state.file_status_listener.cancel()
+
+    if hasattr(app.state, "user_cache_listener"):
+        app.state.user_cache_listener.cancel()
+
+    if hasattr(app.state, "group_cache_listener"):
+        app.state.group_cache_listener.cancel()
+
+    if hasattr(app.state, "upstream_sync_task"):
+        app.state.upstream_sync_task.cancel()
+        try:
+            await app.state.upstream_sync_task
+        except asyncio.CancelledError:
+            pass
+
+    if hasattr(app.state, "credit_ledger_task"):
+        # flush queued deductions before exit
+        app.state.credit_ledger_task.cancel()
+        try:
+            await app.state.credit_ledger_task
+        except asyncio.CancelledError:
+            pass
+
+    if hasattr(app.state, "chunk_embedding_prune_task"):
+        app.state.chunk_embedding_prune_task.cancel()
+
+    if hasattr(app.state, "user_last_active_task"):
+        # write last active times still recorded
+        app.state.user_last_active_task.cancel()
+        try:
+            await app.state.user_last_active_task
+        except asyncio.CancelledError:
+            pass
+
+    # write chat message updates still buffered
+    await CHAT_MESSAGE_BUFFER.flush_all()
+
+    await embedding_client.close()
+    await session_pool.close()
+
 
 app = FastAPI(
     title="Open WebUI",
@@ -1354,11 +1432,21 @@ async def get_models(
     request: Request, refresh: bool = False, user=Depends(get_verified_user)
 ):
     def change_preset_model_price(models: list[dict]):
+        base_models = {
+            base_model.id: base_model
+            for base_model in Models.get_models_by_ids(
+                [
+                    model["info"]["base_model_id"]
+                    for model in models
+                    if model.get("info", {}).get("base_model_id")
+                ]
+            )
+        }
         for model in models:
             base_model_id = model.get("info", {}).get("base_model_id")
             if not base_model_id:
                 continue
-            base_model = Models.get_model_by_id(model["info"]["base_model_id"])
+            base_model = base_models.get(base_model_id)
             if not base_model:
                 continue
             model["info"]["price"] = base_model.price
@@ -1452,7 +1540,7 @@ async def chat_completion(
     form_data: dict,
     user=Depends(get_verified_user),
 ):
-    check_credit_by_user_id(user_id=user.id, form_data=form_data)
+    await check_credit_by_user_id_async(user_id=user.id, form_data=form_data)
 
     if not request.app.state.MODELS:
         await get_all_models(request, user=user)
@@ -1531,7 +1619,9 @@ async def chat_completion(
 
         if metadata.get("chat_id") and (user and user.role != "admin"):
             if metadata["chat_id"] != "local":
-                chat = Chats.get_chat_by_id_and_user_id(metadata["chat_id"], user.id)
+                chat = await Chats.get_chat_by_id_and_user_id_async(
+                    metadata["chat_id"], user.id
+                )
                 if chat is None:
                     raise HTTPException(
                         status_code=status.HTTP_404_NOT_FOUND,
@@ -1561,7 +1651,7 @@ async def chat_completion(
             response = await chat_completion_handler(request, form_data, user)
             if metadata.get("chat_id") and metadata.get("message_id"):
                 try:
-                    Chats.upsert_message_to_chat_by_id_and_message_id(
+                    await Chats.upsert_message_to_chat_by_id_and_message_id_async(
                         metadata["chat_id"],
                         metadata["message_id"],
                         {
@@ -1588,7 +1678,7 @@ async def chat_completion(
             if metadata.get("chat_id") and metadata.get("message_id"):
                 # Update the chat message with the error
                 try:
-                    Chats.upsert_message_to_chat_by_id_and_message_id(
+                    await Chats.upsert_message_to_chat_by_id_and_message_id_async(
                         metadata["chat_id"],
                         metadata["message_id"],
                         {
@@ -1689,7 +1779,7 @@ async def list_tasks_endpoint(request: Request, user=Depends(get_verified_user))
 async def list_tasks_by_chat_id_endpoint(
     request: Request, chat_id: str, user=Depends(get_verified_user)
 ):
-    chat = Chats.get_chat_by_id(chat_id)
+    chat = await Chats.get_chat_by_id_async(chat_id)
     if chat is None or chat.user_id != user.id:
         return {"task_ids": []}
 
@@ -1730,7 +1820,7 @@ async def get_app_config(request: Request):
                 detail="Invalid token",
             )
         if data is not None and "id" in data:
-            user = Users.get_user_by_id(data["id"])
+            user = await Users.get_user_by_id_async(data["id"])
 
     user_count = Users.get_num_users()
     onboarding = False
@@ -1939,6 +2029,15 @@ async def get_current_usage(user=Depends(get_verified_user)):
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
+@app.get("/api/usage/connections")
+async def get_connection_pool_usage(user=Depends(get_admin_user)):
+    """
+    Get usage of the pooled upstream connections and the upstream scheduler
+    state of this worker.
+    """
+    return {**session_pool.stats(), "scheduler": upstream_scheduler.stats()}
+
+
 ############################
 # OAuth Login & Callback
 ############################
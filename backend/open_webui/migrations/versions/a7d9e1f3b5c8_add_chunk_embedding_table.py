@@ -0,0 +1,36 @@
+"""add chunk embedding table
+
+Revision ID: a7d9e1f3b5c8
+Revises: f6c8d0e2a4b7
+Create Date: 2025-10-01 09:15:36.287410
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "a7d9e1f3b5c8"
+down_revision: Union[str, None] = "f6c8d0e2a4b7"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "chunk_embedding",
+        sa.Column("engine", sa.String(), nullable=False),
+        sa.Column("model", sa.String(), nullable=False),
+        sa.Column("chunk_hash", sa.String(), nullable=False),
+        sa.Column("vector", sa.LargeBinary(), nullable=True),
+        sa.Column("used_at", sa.BigInteger(), nullable=True),
+        sa.PrimaryKeyConstraint("engine", "model", "chunk_hash"),
+    )
+    op.create_index("chunk_embedding_used_at_idx", "chunk_embedding", ["used_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("chunk_embedding_used_at_idx", table_name="chunk_embedding")
+    op.drop_table("chunk_embedding")
@@ -0,0 +1,157 @@
+"""add credit log rollup
+
+Revision ID: b2e4c6d8f1a3
+Revises: 38d63c18f30f
+Create Date: 2025-09-20 10:12:31.204815
+
+"""
+
+import json
+from decimal import Decimal, InvalidOperation
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b2e4c6d8f1a3"
+down_revision: Union[str, None] = "38d63c18f30f"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 1000
+ROLLUP_PERIODS = {"hour": 3600, "day": 86400}
+
+
+def get_rollup_usage(detail):
+    """(model_id, total_tokens, total_price) of a usage log, else None"""
+    if isinstance(detail, str):
+        try:
+            detail = json.loads(detail)
+        except ValueError:
+            return None
+    if not isinstance(detail, dict):
+        return None
+    usage = detail.get("usage")
+    if not isinstance(usage, dict) or usage.get("total_price") is None:
+        return None
+    model = (detail.get("api_params") or {}).get("model")
+    model_id = (model.get("id") if isinstance(model, dict) else None) or ""
+    try:
+        return (
+            model_id,
+            int(usage.get("total_tokens") or 0),
+            Decimal(str(usage["total_price"])),
+        )
+    except (TypeError, ValueError, InvalidOperation):
+        return None
+
+
+def backfill(conn) -> None:
+    """Add the existing credit logs to the rollups, in created_at order"""
+    credit_log = sa.table(
+        "credit_log",
+        sa.column("id", sa.String()),
+        sa.column("user_id", sa.String()),
+        sa.column("detail", sa.JSON()),
+        sa.column("created_at", sa.BigInteger()),
+    )
+    credit_log_rollup = sa.table(
+        "credit_log_rollup",
+        sa.column("id", sa.String()),
+        sa.column("period", sa.String()),
+        sa.column("bucket_at", sa.BigInteger()),
+        sa.column("user_id", sa.String()),
+        sa.column("model_id", sa.String()),
+        sa.column("total_tokens", sa.BigInteger()),
+        sa.column("total_cost", sa.Numeric(precision=24, scale=12)),
+        sa.column("request_count", sa.BigInteger()),
+    )
+
+    rows = {}
+    last = None
+    while True:
+        query = (
+            sa.select(
+                credit_log.c.id,
+                credit_log.c.user_id,
+                credit_log.c.detail,
+                credit_log.c.created_at,
+            )
+            .where(credit_log.c.created_at.is_not(None))
+            .order_by(credit_log.c.created_at, credit_log.c.id)
+            .limit(BATCH_SIZE)
+        )
+        if last is not None:
+            query = query.where(
+                sa.tuple_(credit_log.c.created_at, credit_log.c.id) > last
+            )
+        logs = conn.execute(query).fetchall()
+        if not logs:
+            break
+
+        for log in logs:
+            usage = get_rollup_usage(log.detail)
+            if usage is None:
+                continue
+            model_id, tokens, cost = usage
+            for period, seconds in ROLLUP_PERIODS.items():
+                bucket_at = log.created_at - log.created_at % seconds
+                key = f"{period}:{bucket_at}:{log.user_id}:{model_id}"
+                row = rows.get(key)
+                if row is None:
+                    row = rows[key] = {
+                        "id": key,
+                        "period": period,
+                        "bucket_at": bucket_at,
+                        "user_id": log.user_id,
+                        "model_id": model_id,
+                        "total_tokens": 0,
+                        "total_cost": Decimal(0),
+                        "request_count": 0,
+                    }
+                row["total_tokens"] += tokens
+                row["total_cost"] += cost
+                row["request_count"] += 1
+        last = (logs[-1].created_at, logs[-1].id)
+
+        # logs are read in created_at order, earlier buckets are complete
+        done = [
+            key
+            for key, row in rows.items()
+            if row["bucket_at"] + ROLLUP_PERIODS[row["period"]] <= last[0]
+        ]
+        if done:
+            conn.execute(credit_log_rollup.insert(), [rows.pop(key) for key in done])
+
+    if rows:
+        conn.execute(credit_log_rollup.insert(), list(rows.values()))
+
+
+def upgrade() -> None:
+    op.create_table(
+        "credit_log_rollup",
+        sa.Column("id", sa.String(), nullable=False),
+        sa.Column("period", sa.String(), nullable=False),
+        sa.Column("bucket_at", sa.BigInteger(), nullable=False),
+        sa.Column("user_id", sa.String(), nullable=False),
+        sa.Column("model_id", sa.String(), nullable=False),
+        sa.Column("total_tokens", sa.BigInteger(), nullable=True),
+        sa.Column("total_cost", sa.Numeric(precision=24, scale=12), nullable=True),
+        sa.Column("request_count", sa.BigInteger(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "credit_log_rollup_period_bucket_at_idx",
+        "credit_log_rollup",
+        ["period", "bucket_at"],
+        unique=False,
+    )
+    backfill(op.get_bind())
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "credit_log_rollup_period_bucket_at_idx", table_name="credit_log_rollup"
+    )
+    op.drop_table("credit_log_rollup")
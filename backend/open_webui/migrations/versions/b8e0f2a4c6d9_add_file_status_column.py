@@ -0,0 +1,27 @@
+"""add file status column
+
+Revision ID: b8e0f2a4c6d9
+Revises: a7d9e1f3b5c8
+Create Date: 2025-10-03 14:02:11.518263
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b8e0f2a4c6d9"
+down_revision: Union[str, None] = "a7d9e1f3b5c8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # not backfilled, the status of older files is read from data
+    op.add_column("file", sa.Column("status", sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("file", "status")
@@ -0,0 +1,37 @@
+"""add keyset index to credit log
+
+Revision ID: c3f5d7e9a2b4
+Revises: b2e4c6d8f1a3
+Create Date: 2025-09-22 15:40:08.513927
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c3f5d7e9a2b4"
+down_revision: Union[str, None] = "b2e4c6d8f1a3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "credit_log_created_at_id_idx",
+        "credit_log",
+        ["created_at", "id"],
+        unique=False,
+    )
+    op.create_index(
+        "credit_log_user_id_created_at_id_idx",
+        "credit_log",
+        ["user_id", "created_at", "id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("credit_log_user_id_created_at_id_idx", table_name="credit_log")
+    op.drop_index("credit_log_created_at_id_idx", table_name="credit_log")
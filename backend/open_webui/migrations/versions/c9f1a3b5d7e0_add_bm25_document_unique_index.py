@@ -0,0 +1,59 @@
+"""add bm25 document unique index
+
+Revision ID: c9f1a3b5d7e0
+Revises: b8e0f2a4c6d9
+Create Date: 2025-10-04 09:31:45.270316
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c9f1a3b5d7e0"
+down_revision: Union[str, None] = "b8e0f2a4c6d9"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+
+    # Collections with duplicated chunks are dropped from the index, they
+    # are rebuilt from the vector db on their next insert or hybrid search
+    collection_names = [
+        row[0]
+        for row in conn.execute(
+            sa.text(
+                "SELECT DISTINCT collection_name FROM bm25_document "
+                "GROUP BY collection_name, doc_id HAVING COUNT(*) > 1"
+            )
+        )
+    ]
+    if collection_names:
+        for table in ("bm25_posting", "bm25_document", "bm25_collection"):
+            conn.execute(
+                sa.text(
+                    f"DELETE FROM {table} WHERE collection_name IN :names"
+                ).bindparams(sa.bindparam("names", expanding=True)),
+                {"names": collection_names},
+            )
+
+    op.drop_index("bm25_document_collection_name_idx", table_name="bm25_document")
+    op.create_index(
+        "bm25_document_collection_name_doc_id_idx",
+        "bm25_document",
+        ["collection_name", "doc_id"],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "bm25_document_collection_name_doc_id_idx", table_name="bm25_document"
+    )
+    op.create_index(
+        "bm25_document_collection_name_idx", "bm25_document", ["collection_name"]
+    )
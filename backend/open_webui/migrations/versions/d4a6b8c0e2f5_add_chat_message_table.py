@@ -0,0 +1,34 @@
+"""add chat message table
+
+Revision ID: d4a6b8c0e2f5
+Revises: c3f5d7e9a2b4
+Create Date: 2025-09-25 11:03:47.918226
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "d4a6b8c0e2f5"
+down_revision: Union[str, None] = "c3f5d7e9a2b4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "chat_message",
+        sa.Column("chat_id", sa.String(), nullable=False),
+        sa.Column("message_id", sa.String(), nullable=False),
+        sa.Column("message", sa.JSON(), nullable=True),
+        sa.Column("current_at", sa.BigInteger(), nullable=True),
+        sa.Column("updated_at", sa.BigInteger(), nullable=True),
+        sa.PrimaryKeyConstraint("chat_id", "message_id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("chat_message")
@@ -0,0 +1,166 @@
+"""add chat search table
+
+Revision ID: e5b7c9d1f3a6
+Revises: d4a6b8c0e2f5
+Create Date: 2025-09-27 16:21:05.331940
+
+"""
+
+import json
+import logging
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+log = logging.getLogger(__name__)
+
+# revision identifiers, used by Alembic.
+revision: str = "e5b7c9d1f3a6"
+down_revision: Union[str, None] = "d4a6b8c0e2f5"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 500
+
+
+def get_content(chat) -> str:
+    if isinstance(chat, str):
+        try:
+            chat = json.loads(chat)
+        except ValueError:
+            return ""
+    if not isinstance(chat, dict):
+        return ""
+    contents = []
+    for message in chat.get("messages", []) or []:
+        if isinstance(message, dict) and isinstance(message.get("content"), str):
+            contents.append(message["content"])
+    return "\n".join(contents).replace("\x00", "")
+
+
+def create_sqlite_index(conn) -> None:
+    # trigram keeps substring matching, it needs SQLite 3.34+
+    conn.execute(
+        sa.text(
+            "CREATE VIRTUAL TABLE chat_search_fts USING fts5("
+            "title, content, content='chat_search', content_rowid='rowid', "
+            "tokenize='trigram')"
+        )
+    )
+    conn.execute(
+        sa.text(
+            "CREATE TRIGGER chat_search_ai AFTER INSERT ON chat_search BEGIN "
+            "INSERT INTO chat_search_fts(rowid, title, content) "
+            "VALUES (new.rowid, new.title, new.content); END"
+        )
+    )
+    conn.execute(
+        sa.text(
+            "CREATE TRIGGER chat_search_ad AFTER DELETE ON chat_search BEGIN "
+            "INSERT INTO chat_search_fts(chat_search_fts, rowid, title, content) "
+            "VALUES ('delete', old.rowid, old.title, old.content); END"
+        )
+    )
+    conn.execute(
+        sa.text(
+            "CREATE TRIGGER chat_search_au AFTER UPDATE ON chat_search BEGIN "
+            "INSERT INTO chat_search_fts(chat_search_fts, rowid, title, content) "
+            "VALUES ('delete', old.rowid, old.title, old.content); "
+            "INSERT INTO chat_search_fts(rowid, title, content) "
+            "VALUES (new.rowid, new.title, new.content); END"
+        )
+    )
+
+
+def create_postgresql_index(conn) -> None:
+    conn.execute(
+        sa.text(
+            "ALTER TABLE chat_search ADD COLUMN tsv tsvector GENERATED ALWAYS AS ("
+            "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('simple', coalesce(content, '')), 'B')"
+            ") STORED"
+        )
+    )
+    conn.execute(
+        sa.text("CREATE INDEX chat_search_tsv_idx ON chat_search USING GIN (tsv)")
+    )
+
+
+def upgrade() -> None:
+    op.create_table(
+        "chat_search",
+        sa.Column("chat_id", sa.String(), nullable=False),
+        sa.Column("user_id", sa.String(), nullable=True),
+        sa.Column("title", sa.Text(), nullable=True),
+        sa.Column("content", sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint("chat_id"),
+    )
+    op.create_index("ix_chat_search_user_id", "chat_search", ["user_id"])
+
+    conn = op.get_bind()
+    try:
+        if conn.dialect.name == "sqlite":
+            with conn.begin_nested():
+                create_sqlite_index(conn)
+        elif conn.dialect.name == "postgresql":
+            with conn.begin_nested():
+                create_postgresql_index(conn)
+        else:
+            return
+    except Exception as e:
+        # search falls back to scanning chats
+        log.warning(f"Chat search index is not supported: {e}")
+        return
+
+    chat = sa.table(
+        "chat",
+        sa.column("id", sa.String()),
+        sa.column("user_id", sa.String()),
+        sa.column("title", sa.Text()),
+        sa.column("chat", sa.JSON()),
+    )
+    chat_search = sa.table(
+        "chat_search",
+        sa.column("chat_id", sa.String()),
+        sa.column("user_id", sa.String()),
+        sa.column("title", sa.Text()),
+        sa.column("content", sa.Text()),
+    )
+
+    last_id = None
+    while True:
+        query = (
+            sa.select(chat.c.id, chat.c.user_id, chat.c.title, chat.c.chat)
+            .where(~chat.c.user_id.startswith("shared-"))
+            .order_by(chat.c.id)
+            .limit(BATCH_SIZE)
+        )
+        if last_id is not None:
+            query = query.where(chat.c.id > last_id)
+        rows = conn.execute(query).fetchall()
+        if not rows:
+            break
+        conn.execute(
+            chat_search.insert(),
+            [
+                {
+                    "chat_id": row.id,
+                    "user_id": row.user_id,
+                    "title": row.title,
+                    "content": get_content(row.chat),
+                }
+                for row in rows
+            ],
+        )
+        last_id = rows[-1].id
+
+
+def downgrade() -> None:
+    conn = op.get_bind()
+    if conn.dialect.name == "sqlite":
+        for trigger in ("chat_search_ai", "chat_search_ad", "chat_search_au"):
+            conn.execute(sa.text(f"DROP TRIGGER IF EXISTS {trigger}"))
+        conn.execute(sa.text("DROP TABLE IF EXISTS chat_search_fts"))
+    op.drop_index("ix_chat_search_user_id", table_name="chat_search")
+    op.drop_table("chat_search")
@@ -0,0 +1,59 @@
+"""add bm25 index tables
+
+Revision ID: f6c8d0e2a4b7
+Revises: e5b7c9d1f3a6
+Create Date: 2025-09-29 10:42:18.604127
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "f6c8d0e2a4b7"
+down_revision: Union[str, None] = "e5b7c9d1f3a6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "bm25_collection",
+        sa.Column("collection_name", sa.String(), nullable=False),
+        sa.Column("doc_count", sa.BigInteger(), nullable=True),
+        sa.Column("total_length", sa.BigInteger(), nullable=True),
+        sa.PrimaryKeyConstraint("collection_name"),
+    )
+    op.create_table(
+        "bm25_document",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("collection_name", sa.String(), nullable=False),
+        sa.Column("doc_id", sa.String(), nullable=True),
+        sa.Column("length", sa.Integer(), nullable=True),
+        sa.Column("text", sa.Text(), nullable=True),
+        sa.Column("meta", sa.JSON(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "bm25_document_collection_name_idx", "bm25_document", ["collection_name"]
+    )
+    op.create_table(
+        "bm25_posting",
+        sa.Column("collection_name", sa.String(), nullable=False),
+        sa.Column("term", sa.String(), nullable=False),
+        sa.Column("document_id", sa.Integer(), nullable=False),
+        sa.Column("tf", sa.Integer(), nullable=True),
+        sa.Column("length", sa.Integer(), nullable=True),
+        sa.PrimaryKeyConstraint("collection_name", "term", "document_id"),
+    )
+    op.create_index("bm25_posting_document_id_idx", "bm25_posting", ["document_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("bm25_posting_document_id_idx", table_name="bm25_posting")
+    op.drop_table("bm25_posting")
+    op.drop_index("bm25_document_collection_name_idx", table_name="bm25_document")
+    op.drop_table("bm25_document")
+    op.drop_table("bm25_collection")
@@ -0,0 +1,365 @@
+import logging
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Any, Optional
+
+from open_webui.env import SRC_LOG_LEVELS
+from open_webui.internal.db import Base, get_db
+from open_webui.retrieval.vector.version import collection_versions
+from pydantic import BaseModel
+from sqlalchemy import JSON, BigInteger, Column, Index, Integer, String, Text, func
+from sqlalchemy.exc import IntegrityError
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["RAG"])
+
+####################
+# BM25 Index DB Schema
+####################
+
+
+class BM25Collection(Base):
+    __tablename__ = "bm25_collection"
+
+    collection_name = Column(String, primary_key=True)
+    doc_count = Column(BigInteger, default=0)
+    total_length = Column(BigInteger, default=0)
+
+
+class BM25Document(Base):
+    __tablename__ = "bm25_document"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    collection_name = Column(String, nullable=False)
+    doc_id = Column(String)
+    length = Column(Integer)
+    text = Column(Text)
+    meta = Column(JSON)
+
+    __table_args__ = (
+        Index(
+            "bm25_document_collection_name_doc_id_idx",
+            "collection_name",
+            "doc_id",
+            unique=True,
+        ),
+    )
+
+
+class BM25Posting(Base):
+    __tablename__ = "bm25_posting"
+
+    collection_name = Column(String, primary_key=True)
+    term = Column(String, primary_key=True)
+    document_id = Column(Integer, primary_key=True)
+    tf = Column(Integer)
+    # chunk length, so scoring doesn't read bm25_document
+    length = Column(Integer)
+
+    __table_args__ = (Index("bm25_posting_document_id_idx", "document_id"),)
+
+
+class BM25SearchResult(BaseModel):
+    ids: list[str]
+    documents: list[str]
+    metadatas: list[Any]
+    scores: list[float]
+
+
+def tokenize(text: str) -> list[str]:
+    return re.findall(r"\w+", text.lower())
+
+
+####################
+# Table Operations
+####################
+
+
+class BM25IndexTable:
+    """
+    Inverted index for the sparse side of hybrid search
+
+    Postings are kept per collection in the db, so a query only reads the
+    postings of its own terms and the top k chunks instead of the whole
+    collection.
+    """
+
+    k1 = 1.5
+    b = 0.75
+    idf_floor = 0.01
+
+    def has_collection(self, collection_name: str) -> bool:
+        with get_db() as db:
+            return db.get(BM25Collection, collection_name) is not None
+
+    def get_doc_count(self, collection_name: str) -> int:
+        with get_db() as db:
+            collection = db.get(BM25Collection, collection_name)
+            return collection.doc_count if collection else 0
+
+    def add(
+        self,
+        collection_name: str,
+        ids: list[str],
+        texts: list[str],
+        metadatas: list[Any],
+    ) -> None:
+        """
+        Index chunks, replacing the chunks already indexed under their ids
+        """
+        # the last of repeated ids wins
+        chunks = {
+            doc_id: (text, metadata)
+            for doc_id, text, metadata in zip(ids, texts, metadatas)
+        }
+        for attempt in range(3):
+            try:
+                self._add(collection_name, chunks)
+                break
+            except IntegrityError:
+                # the same ids added concurrently, replaced on the next attempt
+                if attempt == 2:
+                    raise
+        collection_versions.bump(collection_name)
+
+    def _add(self, collection_name: str, chunks: dict[str, tuple[str, Any]]) -> None:
+        with get_db() as db:
+            if db.get(BM25Collection, collection_name) is None:
+                try:
+                    db.add(
+                        BM25Collection(
+                            collection_name=collection_name,
+                            doc_count=0,
+                            total_length=0,
+                        )
+                    )
+                    db.commit()
+                except IntegrityError:
+                    # created by a concurrent add
+                    db.rollback()
+
+            doc_ids = list(chunks)
+            existing = []
+            for i in range(0, len(doc_ids), 500):
+                existing.extend(
+                    db.query(BM25Document.id, BM25Document.length)
+                    .filter(
+                        BM25Document.collection_name == collection_name,
+                        BM25Document.doc_id.in_(doc_ids[i : i + 500]),
+                    )
+                    .all()
+                )
+            if existing:
+                self._delete_documents(db, collection_name, [id for id, _ in existing])
+                self._update_stats(
+                    db,
+                    collection_name,
+                    -len(existing),
+                    -sum(length or 0 for _, length in existing),
+                )
+
+            documents = []
+            term_counts = []
+            for doc_id, (text, metadata) in chunks.items():
+                terms = Counter(tokenize(text or ""))
+                documents.append(
+                    BM25Document(
+                        collection_name=collection_name,
+                        doc_id=doc_id,
+                        length=sum(terms.values()),
+                        text=text,
+                        meta=metadata,
+                    )
+                )
+                term_counts.append(terms)
+            db.add_all(documents)
+            db.flush()
+
+            db.bulk_insert_mappings(
+                BM25Posting,
+                [
+                    {
+                        "collection_name": collection_name,
+                        "term": term,
+                        "document_id": document.id,
+                        "tf": tf,
+                        "length": document.length,
+                    }
+                    for document, terms in zip(documents, term_counts)
+                    for term, tf in terms.items()
+                ],
+            )
+
+            self._update_stats(
+                db,
+                collection_name,
+                len(documents),
+                sum(document.length for document in documents),
+            )
+            db.commit()
+
+    @staticmethod
+    def _update_stats(db, collection_name: str, doc_count: int, length: int):
+        db.query(BM25Collection).filter_by(collection_name=collection_name).update(
+            {
+                "doc_count": BM25Collection.doc_count + doc_count,
+                "total_length": BM25Collection.total_length + length,
+            },
+            synchronize_session=False,
+        )
+
+    @staticmethod
+    def _meta_equals(key: str, value: Any):
+        field = BM25Document.meta[key]
+        if isinstance(value, bool):
+            return field.as_boolean() == value
+        if isinstance(value, int):
+            return field.as_integer() == value
+        if isinstance(value, float):
+            return field.as_float() == value
+        if isinstance(value, str):
+            return field.as_string() == value
+        raise ValueError(f"Unsupported BM25 filter value for {key}: {value!r}")
+
+    def _delete_documents(self, db, collection_name: str, document_ids: list[int]):
+        for i in range(0, len(document_ids), 500):
+            batch = document_ids[i : i + 500]
+            db.query(BM25Posting).filter(
+                BM25Posting.collection_name == collection_name,
+                BM25Posting.document_id.in_(batch),
+            ).delete(synchronize_session=False)
+            db.query(BM25Document).filter(BM25Document.id.in_(batch)).delete(
+                synchronize_session=False
+            )
+
+    def delete(
+        self,
+        collection_name: str,
+        ids: Optional[list[str]] = None,
+        filter: Optional[dict] = None,
+    ) -> None:
+        """
+        Delete chunks by vector id or by metadata filter (key == value)
+        """
+        if not ids and not filter:
+            return
+        with get_db() as db:
+            if db.get(BM25Collection, collection_name) is None:
+                return
+
+            query = db.query(BM25Document.id, BM25Document.length).filter(
+                BM25Document.collection_name == collection_name
+            )
+            if ids:
+                query = query.filter(BM25Document.doc_id.in_(ids))
+            else:
+                for key, value in filter.items():
+                    query = query.filter(self._meta_equals(key, value))
+
+            documents = query.all()
+            if not documents:
+                return
+
+            self._delete_documents(db, collection_name, [id for id, _ in documents])
+            self._update_stats(
+                db,
+                collection_name,
+                -len(documents),
+                -sum(length or 0 for _, length in documents),
+            )
+            db.commit()
+        collection_versions.bump(collection_name)
+
+    def delete_collection(self, collection_name: str) -> None:
+        with get_db() as db:
+            db.query(BM25Posting).filter_by(collection_name=collection_name).delete()
+            db.query(BM25Document).filter_by(collection_name=collection_name).delete()
+            db.query(BM25Collection).filter_by(collection_name=collection_name).delete()
+            db.commit()
+        collection_versions.bump(collection_name)
+
+    def reset(self) -> None:
+        with get_db() as db:
+            db.query(BM25Posting).delete()
+            db.query(BM25Document).delete()
+            db.query(BM25Collection).delete()
+            db.commit()
+        collection_versions.bump_all()
+
+    def search(
+        self, collection_name: str, query: str, limit: int
+    ) -> Optional[BM25SearchResult]:
+        """
+        Top chunks of a collection by Okapi BM25 score
+        """
+        terms = set(tokenize(query))
+        with get_db() as db:
+            collection = db.get(BM25Collection, collection_name)
+            if collection is None:
+                return None
+            if not terms or not collection.doc_count:
+                return BM25SearchResult(ids=[], documents=[], metadatas=[], scores=[])
+
+            doc_count = collection.doc_count
+            avg_length = collection.total_length / doc_count
+
+            doc_freqs = dict(
+                db.query(BM25Posting.term, func.count())
+                .filter(
+                    BM25Posting.collection_name == collection_name,
+                    BM25Posting.term.in_(terms),
+                )
+                .group_by(BM25Posting.term)
+                .all()
+            )
+            # terms in most chunks add little to the ranking but have the most
+            # postings, skip them unless nothing else matches
+            rare_terms = [term for term, df in doc_freqs.items() if df <= doc_count / 2]
+            query_terms = rare_terms or list(doc_freqs)
+            if not query_terms:
+                return BM25SearchResult(ids=[], documents=[], metadatas=[], scores=[])
+
+            # Okapi idf as in rank_bm25, common terms get a small floor
+            idfs = {
+                term: max(
+                    math.log(
+                        (doc_count - doc_freqs[term] + 0.5) / (doc_freqs[term] + 0.5)
+                    ),
+                    self.idf_floor,
+                )
+                for term in query_terms
+            }
+
+            postings = db.query(
+                BM25Posting.term,
+                BM25Posting.document_id,
+                BM25Posting.tf,
+                BM25Posting.length,
+            ).filter(
+                BM25Posting.collection_name == collection_name,
+                BM25Posting.term.in_(query_terms),
+            )
+
+            scores = defaultdict(float)
+            for term, document_id, tf, length in postings:
+                norm = self.k1 * (1 - self.b + self.b * length / avg_length)
+                scores[document_id] += idfs[term] * tf * (self.k1 + 1) / (tf + norm)
+
+            top = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+            documents = {
+                document.id: document
+                for document in db.query(BM25Document)
+                .filter(BM25Document.id.in_([document_id for document_id, _ in top]))
+                .all()
+            }
+
+            return BM25SearchResult(
+                ids=[documents[document_id].doc_id for document_id, _ in top],
+                documents=[documents[document_id].text for document_id, _ in top],
+                metadatas=[documents[document_id].meta for document_id, _ in top],
+                scores=[score for _, score in top],
+            )
+
+
+BM25Index = BM25IndexTable()
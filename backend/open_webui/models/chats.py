@@ -2,16 +2,19 @@ import logging
 import json
 import time
 import uuid
-from typing import Optional
+from collections import defaultdict
+from typing import Iterable, Optional
 
-from open_webui.internal.db import Base, get_db
+from open_webui.internal.db import Base, get_db, run_db
 from open_webui.models.tags import TagModel, Tag, Tags
 from open_webui.models.folders import Folders
 from open_webui.env import SRC_LOG_LEVELS
 
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, PrivateAttr
 from sqlalchemy import BigInteger, Boolean, Column, String, Text, JSON, Index
-from sqlalchemy import or_, func, select, and_, text
+from sqlalchemy import Float, inspect, or_, func, select, and_, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.sql import exists
 from sqlalchemy.sql.expression import bindparam
 
@@ -56,6 +59,53 @@ class Chat(Base):
     )
 
 
+class ChatMessage(Base):
+    """
+    Messages updated since chat.chat was last written
+
+    Streaming updates are written here so they cost O(message) instead of
+    rewriting the whole chat, reads merge them into chat.history. A full
+    chat write removes the rows its chat was read with, rows written since
+    stay pending.
+    """
+
+    __tablename__ = "chat_message"
+
+    chat_id = Column(String, primary_key=True)
+    message_id = Column(String, primary_key=True)
+    # full message, replaces the message in chat.history
+    message = Column(JSON)
+    # when the message was last set as history.currentId, in nanoseconds
+    current_at = Column(BigInteger, nullable=True)
+
+    # in nanoseconds, identifies the version of the row a read folded in
+    updated_at = Column(BigInteger)
+
+
+class ChatSearch(Base):
+    """
+    Searchable text of chats
+
+    Indexed by the chat_search_fts FTS5 table (trigram) on SQLite and by a
+    generated tsvector column with a GIN index on PostgreSQL.
+    """
+
+    __tablename__ = "chat_search"
+
+    chat_id = Column(String, primary_key=True)
+    user_id = Column(String, index=True)
+    title = Column(Text)
+    content = Column(Text)
+
+
+def get_chat_search_content(chat: dict) -> str:
+    contents = []
+    for message in chat.get("messages", []) or []:
+        if isinstance(message, dict) and isinstance(message.get("content"), str):
+            contents.append(message["content"])
+    return "\n".join(contents).replace("\x00", "")
+
+
 class ChatModel(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
@@ -74,6 +124,13 @@ class ChatModel(BaseModel):
     meta: dict = {}
     folder_id: Optional[str] = None
 
+    # message_id -> updated_at of the pending message rows merged into chat
+    _folded_messages: dict[str, int] = PrivateAttr(default_factory=dict)
+
+    @property
+    def folded_messages(self) -> dict[str, int]:
+        return self._folded_messages
+
 
 ####################
 # Forms
@@ -123,6 +180,200 @@ class ChatTitleIdResponse(BaseModel):
 
 
 class ChatTable:
+    def __init__(self):
+        self._search_index = None
+
+    ####################
+    # Search index
+    ####################
+
+    def _get_search_index(self, db) -> Optional[str]:
+        """
+        Dialect name if the search index exists, else None
+        """
+        if self._search_index is None:
+            dialect_name = db.bind.dialect.name
+            inspector = inspect(db.bind)
+            if dialect_name == "sqlite" and inspector.has_table("chat_search_fts"):
+                self._search_index = dialect_name
+            elif dialect_name == "postgresql" and inspector.has_table("chat_search"):
+                columns = inspector.get_columns("chat_search")
+                if any(column["name"] == "tsv" for column in columns):
+                    self._search_index = dialect_name
+            self._search_index = self._search_index or ""
+        return self._search_index or None
+
+    def _index_chats(self, db, chats: list) -> None:
+        search_index = self._get_search_index(db)
+        if not search_index or not chats:
+            return
+
+        table = ChatSearch.__table__
+        stmt = (
+            postgresql.insert(table)
+            if search_index == "postgresql"
+            else sqlite.insert(table)
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.chat_id],
+            set_={
+                "user_id": stmt.excluded.user_id,
+                "title": stmt.excluded.title,
+                "content": stmt.excluded.content,
+            },
+        )
+        db.execute(
+            stmt,
+            [
+                {
+                    "chat_id": chat.id,
+                    "user_id": chat.user_id,
+                    "title": chat.title,
+                    "content": get_chat_search_content(chat.chat),
+                }
+                for chat in chats
+            ],
+        )
+
+    def _search_chats(self, db, user_id: str, search_text: str):
+        """
+        Subquery of (chat_id, rank) matching the search text, lower rank first,
+        or None if the index can't answer it
+        """
+        search_index = self._get_search_index(db)
+        if search_index == "sqlite" and len(search_text) >= 3:
+            # trigram phrase matches substrings like the LIKE scan did
+            return (
+                text(
+                    "SELECT chat_search.chat_id AS chat_id, "
+                    "bm25(chat_search_fts, 10.0, 1.0) AS rank "
+                    "FROM chat_search_fts "
+                    "JOIN chat_search ON chat_search.rowid = chat_search_fts.rowid "
+                    "WHERE chat_search_fts MATCH :search_match "
+                    "AND chat_search.user_id = :search_user_id"
+                )
+                .bindparams(
+                    search_match='"' + search_text.replace('"', '""') + '"',
+                    search_user_id=user_id,
+                )
+                .columns(chat_id=String, rank=Float)
+                .subquery()
+            )
+
+        words = [
+            "".join(c for c in word if c.isalnum()) for word in search_text.split()
+        ]
+        words = [word for word in words if word]
+        if search_index == "postgresql" and search_text.isascii() and words:
+            return (
+                text(
+                    "SELECT chat_id, -ts_rank_cd(tsv, query) AS rank "
+                    "FROM chat_search, to_tsquery('simple', :search_query) query "
+                    "WHERE tsv @@ query AND user_id = :search_user_id"
+                )
+                .bindparams(
+                    search_query=" & ".join(f"{word}:*" for word in words),
+                    search_user_id=user_id,
+                )
+                .columns(chat_id=String, rank=Float)
+                .subquery()
+            )
+
+        # short or non latin text keeps scanning chats
+        return None
+
+    def rebuild_search_index(self, batch_size: int = 500) -> int:
+        """
+        Rebuild the search index from chats, returns the number of chats indexed
+        """
+        total = 0
+        with get_db() as db:
+            if not self._get_search_index(db):
+                return 0
+            db.query(ChatSearch).delete()
+            last_id = None
+            while True:
+                query = (
+                    db.query(Chat)
+                    .filter(~Chat.user_id.startswith("shared-"))
+                    .order_by(Chat.id)
+                )
+                if last_id is not None:
+                    query = query.filter(Chat.id > last_id)
+                chats = query.limit(batch_size).all()
+                if not chats:
+                    break
+                self._index_chats(db, self._to_chat_models(db, chats))
+                db.commit()
+                db.expunge_all()
+                total += len(chats)
+                last_id = chats[-1].id
+        return total
+
+    ####################
+    # Chats
+    ####################
+
+    @staticmethod
+    def _merge_chat_messages(chat: dict, chat_messages: list[ChatMessage]) -> dict:
+        if not chat_messages:
+            return chat
+
+        history = {**chat.get("history", {})}
+        messages = {**history.get("messages", {})}
+        current = None
+
+        for chat_message in chat_messages:
+            messages[chat_message.message_id] = chat_message.message
+            if chat_message.current_at and (
+                current is None or chat_message.current_at > current.current_at
+            ):
+                current = chat_message
+
+        history["messages"] = messages
+        if current is not None:
+            history["currentId"] = current.message_id
+        return {**chat, "history": history}
+
+    def _to_chat_models(self, db, chats: Iterable[Chat]) -> list[ChatModel]:
+        """
+        Validate chats with pending message updates merged into chat.history
+        """
+        chats = list(chats)
+        if not chats:
+            return []
+
+        # chunked to stay under the bound parameter limit of sqlite
+        chat_ids = [chat.id for chat in chats]
+        chat_messages = defaultdict(list)
+        for i in range(0, len(chat_ids), 500):
+            for chat_message in (
+                db.query(ChatMessage)
+                .filter(ChatMessage.chat_id.in_(chat_ids[i : i + 500]))
+                .all()
+            ):
+                chat_messages[chat_message.chat_id].append(chat_message)
+
+        chat_models = []
+        for chat in chats:
+            chat_model = ChatModel.model_validate(chat)
+            if chat.id in chat_messages:
+                chat_model.chat = self._merge_chat_messages(
+                    chat_model.chat, chat_messages[chat.id]
+                )
+                chat_model.updated_at = max(
+                    chat_model.updated_at,
+                    *[
+                        (m.updated_at or 0) // 1_000_000_000
+                        for m in chat_messages[chat.id]
+                    ],
+                )
+                chat_model._folded_messages = {
+                    m.message_id: m.updated_at for m in chat_messages[chat.id]
+                }
+            chat_models.append(chat_model)
+        return chat_models
+
     def insert_new_chat(self, user_id: str, form_data: ChatForm) -> Optional[ChatModel]:
         with get_db() as db:
             id = str(uuid.uuid4())
@@ -144,6 +395,7 @@ class ChatTable:
 
             result = Chat(**chat.model_dump())
             db.add(result)
+            self._index_chats(db, [chat])
             db.commit()
             db.refresh(result)
             return ChatModel.model_validate(result) if result else None
@@ -181,33 +433,52 @@ class ChatTable:
 
             result = Chat(**chat.model_dump())
             db.add(result)
+            self._index_chats(db, [chat])
             db.commit()
             db.refresh(result)
             return ChatModel.model_validate(result) if result else None
 
-    def update_chat_by_id(self, id: str, chat: dict) -> Optional[ChatModel]:
+    def _update_chat_by_id(
+        self, db, id: str, chat: dict, folded_messages: Optional[dict] = None
+    ) -> Optional[ChatModel]:
         try:
-            with get_db() as db:
-                chat_item = db.get(Chat, id)
-                chat_item.chat = chat
-                chat_item.title = chat["title"] if "title" in chat else "New Chat"
-                chat_item.updated_at = int(time.time())
-                db.commit()
-                db.refresh(chat_item)
+            chat_item = db.get(Chat, id)
+            chat_item.chat = chat
+            chat_item.title = chat["title"] if "title" in chat else "New Chat"
+            chat_item.updated_at = int(time.time())
+            # the chat replaces the pending updates it was read with, updates
+            # written since are newer and stay pending
+            for message_id, updated_at in (folded_messages or {}).items():
+                db.query(ChatMessage).filter_by(
+                    chat_id=id, message_id=message_id, updated_at=updated_at
+                ).delete()
+            self._index_chats(db, [chat_item])
+            db.commit()
+            db.refresh(chat_item)
 
-                return ChatModel.model_validate(chat_item)
+            return ChatModel.model_validate(chat_item)
         except Exception:
             return None
 
+    def update_chat_by_id(
+        self, id: str, chat: dict, folded_messages: Optional[dict] = None
+    ) -> Optional[ChatModel]:
+        """
+        Write the full chat. folded_messages are the pending message updates
+        chat was read with (ChatModel.folded_messages), they are removed.
+        """
+        with get_db() as db:
+            return self._update_chat_by_id(db, id, chat, folded_messages)
+
     def update_chat_title_by_id(self, id: str, title: str) -> Optional[ChatModel]:
-        chat = self.get_chat_by_id(id)
-        if chat is None:
+        chat_model = self.get_chat_by_id(id)
+        if chat_model is None:
             return None
 
-        chat = chat.chat
+        chat = chat_model.chat
         chat["title"] = title
 
-        return self.update_chat_by_id(id, chat)
+        return self.update_chat_by_id(id, chat, chat_model.folded_messages)
 
     def update_chat_tags_by_id(
         self, id: str, tags: list[str], user
@@ -243,64 +514,149 @@ class ChatTable:
 
         return chat.chat.get("history", {}).get("messages", {}) or {}
 
-    def get_message_by_id_and_message_id(
-        self, id: str, message_id: str
-    ) -> Optional[dict]:
-        chat = self.get_chat_by_id(id)
-        if chat is None:
+    def _get_chat_message(
+        self, db, id: str, message_id: str, create: bool = True
+    ) -> Optional[ChatMessage]:
+        chat_message = db.get(ChatMessage, (id, message_id))
+        if chat_message is not None:
+            return chat_message
+
+        # only load the message from chat.chat
+        chat = (
+            db.query(Chat.id, Chat.chat[("history", "messages", message_id)])
+            .filter_by(id=id)
+            .first()
+        )
+        if chat is None or (chat[1] is None and not create):
             return None
 
-        return chat.chat.get("history", {}).get("messages", {}).get(message_id, {})
+        # a concurrent writer may create the row after the check above
+        values = {"chat_id": id, "message_id": message_id, "message": chat[1] or {}}
+        dialect_name = db.get_bind().dialect.name
+        if dialect_name in ("sqlite", "postgresql"):
+            insert = (
+                postgresql.insert if dialect_name == "postgresql" else sqlite.insert
+            )
+            db.execute(insert(ChatMessage).values(**values).on_conflict_do_nothing())
+            return db.get(ChatMessage, (id, message_id))
 
-    def upsert_message_to_chat_by_id_and_message_id(
-        self, id: str, message_id: str, message: dict
-    ) -> Optional[ChatModel]:
-        chat = self.get_chat_by_id(id)
+        try:
+            with db.begin_nested():
+                chat_message = ChatMessage(**values)
+                db.add(chat_message)
+            return chat_message
+        except IntegrityError:
+            return db.get(ChatMessage, (id, message_id))
+
+    def _get_message_by_id_and_message_id(
+        self, db, id: str, message_id: str
+    ) -> Optional[dict]:
+        chat_message = db.get(ChatMessage, (id, message_id))
+        if chat_message is not None:
+            return chat_message.message
+
+        chat = (
+            db.query(Chat.id, Chat.chat[("history", "messages", message_id)])
+            .filter_by(id=id)
+            .first()
+        )
         if chat is None:
             return None
+        return chat[1] or {}
+
+    def get_message_by_id_and_message_id(
+        self, id: str, message_id: str
+    ) -> Optional[dict]:
+        with get_db() as db:
+            return self._get_message_by_id_and_message_id(db, id, message_id)
 
+    async def get_message_by_id_and_message_id_async(
+        self, id: str, message_id: str
+    ) -> Optional[dict]:
+        return await run_db(self._get_message_by_id_and_message_id, id, message_id)
+
+    def _upsert_message_to_chat_by_id_and_message_id(
+        self, db, id: str, message_id: str, message: dict, set_current: bool = True
+    ) -> bool:
         # Sanitize message content for null characters before upserting
         if isinstance(message.get("content"), str):
             message["content"] = message["content"].replace("\x00", "")
 
-        chat = chat.chat
-        history = chat.get("history", {})
+        chat_message = self._get_chat_message(db, id, message_id)
+        if chat_message is None:
+            return False
 
-        if message_id in history.get("messages", {}):
-            history["messages"][message_id] = {
-                **history["messages"][message_id],
-                **message,
-            }
-        else:
-            history["messages"][message_id] = message
+        chat_message.message = {**chat_message.message, **message}
+        if set_current:
+            chat_message.current_at = time.time_ns()
+        chat_message.updated_at = time.time_ns()
+        db.commit()
+        return True
 
-        history["currentId"] = message_id
+    def upsert_message_to_chat_by_id_and_message_id(
+        self, id: str, message_id: str, message: dict, set_current: bool = True
+    ) -> bool:
+        """
+        Merge message fields into the message and set it as history.currentId
+        unless set_current is False, without rewriting the chat
+        """
+        with get_db() as db:
+            return self._upsert_message_to_chat_by_id_and_message_id(
+                db, id, message_id, message, set_current
+            )
 
-        chat["history"] = history
-        return self.update_chat_by_id(id, chat)
+    async def upsert_message_to_chat_by_id_and_message_id_async(
+        self, id: str, message_id: str, message: dict, set_current: bool = True
+    ) -> bool:
+        return await run_db(
+            self._upsert_message_to_chat_by_id_and_message_id,
+            id,
+            message_id,
+            message,
+            set_current,
+        )
 
     def add_message_status_to_chat_by_id_and_message_id(
         self, id: str, message_id: str, status: dict
-    ) -> Optional[ChatModel]:
-        chat = self.get_chat_by_id(id)
+    ) -> bool:
+        with get_db() as db:
+            chat_message = self._get_chat_message(db, id, message_id, create=False)
+            if chat_message is None:
+                return False
+
+            chat_message.message = {
+                **chat_message.message,
+                "statusHistory": [
+                    *chat_message.message.get("statusHistory", []),
+                    status,
+                ],
+            }
+            chat_message.updated_at = time.time_ns()
+            db.commit()
+            return True
+
+    def _compact_chat_by_id(self, db, id: str) -> Optional[ChatModel]:
+        if db.query(ChatMessage).filter_by(chat_id=id).first() is None:
+            return None
+        chat = self._get_chat_by_id(db, id)
         if chat is None:
             return None
+        return self._update_chat_by_id(db, id, chat.chat, chat.folded_messages)
 
-        chat = chat.chat
-        history = chat.get("history", {})
-
-        if message_id in history.get("messages", {}):
-            status_history = history["messages"][message_id].get("statusHistory", [])
-            status_history.append(status)
-            history["messages"][message_id]["statusHistory"] = status_history
+    def compact_chat_by_id(self, id: str) -> Optional[ChatModel]:
+        """
+        Fold pending message updates into chat.chat
+        """
+        with get_db() as db:
+            return self._compact_chat_by_id(db, id)
 
-        chat["history"] = history
-        return self.update_chat_by_id(id, chat)
+    async def compact_chat_by_id_async(self, id: str) -> Optional[ChatModel]:
+        return await run_db(self._compact_chat_by_id, id)
 
     def insert_shared_chat_by_chat_id(self, chat_id: str) -> Optional[ChatModel]:
         with get_db() as db:
             # Get the existing chat to share
-            chat = db.get(Chat, chat_id)
+            chat = self._to_chat_models(db, [db.get(Chat, chat_id)])[0]
             # Check if the chat is already shared
             if chat.share_id:
                 return self.get_chat_by_id_and_user_id(chat.share_id, "shared")
@@ -335,7 +691,7 @@ class ChatTable:
     def update_shared_chat_by_chat_id(self, chat_id: str) -> Optional[ChatModel]:
         try:
             with get_db() as db:
-                chat = db.get(Chat, chat_id)
+                chat = self._to_chat_models(db, [db.get(Chat, chat_id)])[0]
                 shared_chat = (
                     db.query(Chat).filter_by(user_id=f"shared-{chat_id}").first()
                 )
@@ -375,7 +731,7 @@ class ChatTable:
                 chat.share_id = share_id
                 db.commit()
                 db.refresh(chat)
-                return ChatModel.model_validate(chat)
+                return self._to_chat_models(db, [chat])[0]
         except Exception:
             return None
 
@@ -387,7 +743,7 @@ class ChatTable:
                 chat.updated_at = int(time.time())
                 db.commit()
                 db.refresh(chat)
-                return ChatModel.model_validate(chat)
+                return self._to_chat_models(db, [chat])[0]
         except Exception:
             return None
 
@@ -399,7 +755,7 @@ class ChatTable:
                 chat.updated_at = int(time.time())
                 db.commit()
                 db.refresh(chat)
-                return ChatModel.model_validate(chat)
+                return self._to_chat_models(db, [chat])[0]
         except Exception:
             return None
 
@@ -447,7 +803,7 @@ class ChatTable:
                 query = query.limit(limit)
 
             all_chats = query.all()
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._to_chat_models(db, all_chats)
 
     def get_chat_list_by_user_id(
         self,
@@ -486,7 +842,7 @@ class ChatTable:
                 query = query.limit(limit)
 
             all_chats = query.all()
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._to_chat_models(db, all_chats)
 
     def get_chat_title_id_list_by_user_id(
         self,
@@ -537,16 +893,24 @@ class ChatTable:
                 .order_by(Chat.updated_at.desc())
                 .all()
             )
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._to_chat_models(db, all_chats)
 
-    def get_chat_by_id(self, id: str) -> Optional[ChatModel]:
+    def _get_chat_by_id(self, db, id: str) -> Optional[ChatModel]:
         try:
-            with get_db() as db:
-                chat = db.get(Chat, id)
-                return ChatModel.model_validate(chat)
+            chat = db.get(Chat, id)
+            if chat is None:
+                return None
+            return self._to_chat_models(db, [chat])[0]
         except Exception:
             return None
 
+    def get_chat_by_id(self, id: str) -> Optional[ChatModel]:
+        with get_db() as db:
+            return self._get_chat_by_id(db, id)
+
+    async def get_chat_by_id_async(self, id: str) -> Optional[ChatModel]:
+        return await run_db(self._get_chat_by_id, id)
+
     def get_chat_by_share_id(self, id: str) -> Optional[ChatModel]:
         try:
             with get_db() as db:
@@ -561,14 +925,26 @@ class ChatTable:
         except Exception:
             return None
 
-    def get_chat_by_id_and_user_id(self, id: str, user_id: str) -> Optional[ChatModel]:
+    def _get_chat_by_id_and_user_id(
+        self, db, id: str, user_id: str
+    ) -> Optional[ChatModel]:
         try:
-            with get_db() as db:
-                chat = db.query(Chat).filter_by(id=id, user_id=user_id).first()
-                return ChatModel.model_validate(chat)
+            chat = db.query(Chat).filter_by(id=id, user_id=user_id).first()
+            if chat is None:
+                return None
+            return self._to_chat_models(db, [chat])[0]
         except Exception:
             return None
 
+    def get_chat_by_id_and_user_id(self, id: str, user_id: str) -> Optional[ChatModel]:
+        with get_db() as db:
+            return self._get_chat_by_id_and_user_id(db, id, user_id)
+
+    async def get_chat_by_id_and_user_id_async(
+        self, id: str, user_id: str
+    ) -> Optional[ChatModel]:
+        return await run_db(self._get_chat_by_id_and_user_id, id, user_id)
+
     def get_chats(self, skip: int = 0, limit: int = 50) -> list[ChatModel]:
         with get_db() as db:
             all_chats = (
@@ -576,7 +952,7 @@ class ChatTable:
                 # .limit(limit).offset(skip)
                 .order_by(Chat.updated_at.desc())
             )
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._to_chat_models(db, all_chats)
 
     def get_chats_by_user_id(self, user_id: str) -> list[ChatModel]:
         with get_db() as db:
@@ -585,7 +961,7 @@ class ChatTable:
                 .filter_by(user_id=user_id)
                 .order_by(Chat.updated_at.desc())
             )
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._to_chat_models(db, all_chats)
 
     def get_pinned_chats_by_user_id(self, user_id: str) -> list[ChatModel]:
         with get_db() as db:
@@ -594,7 +970,7 @@ class ChatTable:
                 .filter_by(user_id=user_id, pinned=True, archived=False)
                 .order_by(Chat.updated_at.desc())
             )
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._to_chat_models(db, all_chats)
 
     def get_archived_chats_by_user_id(self, user_id: str) -> list[ChatModel]:
         with get_db() as db:
@@ -603,7 +979,7 @@ class ChatTable:
                 .filter_by(user_id=user_id, archived=True)
                 .order_by(Chat.updated_at.desc())
             )
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._to_chat_models(db, all_chats)
 
     def get_chats_by_user_id_and_search_text(
         self,
@@ -695,6 +1071,15 @@ class ChatTable:
             if folder_ids:
                 query = query.filter(Chat.folder_id.in_(folder_ids))
 
+            # Use the search index if it exists, ranked by relevance
+            matches = (
+                self._search_chats(db, user_id, search_text) if search_text else None
+            )
+            if matches is not None:
+                query = query.join(matches, matches.c.chat_id == Chat.id).order_by(
+                    matches.c.rank
+                )
+
             query = query.order_by(Chat.updated_at.desc())
 
             # Check if the database dialect is either 'sqlite' or 'postgresql'
@@ -709,11 +1094,13 @@ class ChatTable:
                     ")"
                 )
                 sqlite_content_clause = text(sqlite_content_sql)
-                query = query.filter(
-                    or_(
-                        Chat.title.ilike(bindparam("title_key")), sqlite_content_clause
-                    ).params(title_key=f"%{search_text}%", content_key=search_text)
-                )
+                if matches is None:
+                    query = query.filter(
+                        or_(
+                            Chat.title.ilike(bindparam("title_key")),
+                            sqlite_content_clause,
+                        ).params(title_key=f"%{search_text}%", content_key=search_text)
+                    )
 
                 # Check if there are any tags to filter, it should have all the tags
                 if "none" in tag_ids:
@@ -755,12 +1142,13 @@ class ChatTable:
                     ")"
                 )
                 postgres_content_clause = text(postgres_content_sql)
-                query = query.filter(
-                    or_(
-                        Chat.title.ilike(bindparam("title_key")),
-                        postgres_content_clause,
-                    ).params(title_key=f"%{search_text}%", content_key=search_text)
-                )
+                if matches is None:
+                    query = query.filter(
+                        or_(
+                            Chat.title.ilike(bindparam("title_key")),
+                            postgres_content_clause,
+                        ).params(title_key=f"%{search_text}%", content_key=search_text)
+                    )
 
                 # Check if there are any tags to filter, it should have all the tags
                 if "none" in tag_ids:
@@ -802,7 +1190,7 @@ class ChatTable:
             log.info(f"The number of chats: {len(all_chats)}")
 
             # Validate and return chats
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._to_chat_models(db, all_chats)
 
     def get_chats_by_folder_id_and_user_id(
         self, folder_id: str, user_id: str
@@ -815,7 +1203,7 @@ class ChatTable:
             query = query.order_by(Chat.updated_at.desc())
 
             all_chats = query.all()
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._to_chat_models(db, all_chats)
 
     def get_chats_by_folder_ids_and_user_id(
         self, folder_ids: list[str], user_id: str
@@ -830,7 +1218,7 @@ class ChatTable:
             query = query.order_by(Chat.updated_at.desc())
 
             all_chats = query.all()
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._to_chat_models(db, all_chats)
 
     def update_chat_folder_id_by_id_and_user_id(
         self, id: str, user_id: str, folder_id: str
@@ -843,7 +1231,7 @@ class ChatTable:
                 chat.pinned = False
                 db.commit()
                 db.refresh(chat)
-                return ChatModel.model_validate(chat)
+                return self._to_chat_models(db, [chat])[0]
         except Exception:
             return None
 
@@ -882,7 +1270,7 @@ class ChatTable:
 
             all_chats = query.all()
             log.debug(f"all_chats: {all_chats}")
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._to_chat_models(db, all_chats)
 
     def add_chat_tag_by_id_and_user_id_and_tag_name(
         self, id: str, user_id: str, tag_name: str
@@ -903,7 +1291,7 @@ class ChatTable:
 
                 db.commit()
                 db.refresh(chat)
-                return ChatModel.model_validate(chat)
+                return self._to_chat_models(db, [chat])[0]
         except Exception:
             return None
 
@@ -979,6 +1367,8 @@ class ChatTable:
     def delete_chat_by_id(self, id: str) -> bool:
         try:
             with get_db() as db:
+                db.query(ChatMessage).filter_by(chat_id=id).delete()
+                db.query(ChatSearch).filter_by(chat_id=id).delete()
                 db.query(Chat).filter_by(id=id).delete()
                 db.commit()
 
@@ -989,7 +1379,9 @@ class ChatTable:
     def delete_chat_by_id_and_user_id(self, id: str, user_id: str) -> bool:
         try:
             with get_db() as db:
-                db.query(Chat).filter_by(id=id, user_id=user_id).delete()
+                if db.query(Chat).filter_by(id=id, user_id=user_id).delete():
+                    db.query(ChatMessage).filter_by(chat_id=id).delete()
+                    db.query(ChatSearch).filter_by(chat_id=id).delete()
                 db.commit()
 
                 return True and self.delete_shared_chat_by_chat_id(id)
@@ -1001,6 +1393,12 @@ class ChatTable:
             with get_db() as db:
                 self.delete_shared_chats_by_user_id(user_id)
 
+                db.query(ChatMessage).filter(
+                    ChatMessage.chat_id.in_(
+                        select(Chat.id).where(Chat.user_id == user_id)
+                    )
+                ).delete(synchronize_session=False)
+                db.query(ChatSearch).filter_by(user_id=user_id).delete()
                 db.query(Chat).filter_by(user_id=user_id).delete()
                 db.commit()
 
@@ -1013,6 +1411,14 @@ class ChatTable:
     ) -> bool:
         try:
             with get_db() as db:
+                for model in (ChatMessage, ChatSearch):
+                    db.query(model).filter(
+                        model.chat_id.in_(
+                            select(Chat.id).where(
+                                Chat.user_id == user_id, Chat.folder_id == folder_id
+                            )
+                        )
+                    ).delete(synchronize_session=False)
                 db.query(Chat).filter_by(user_id=user_id, folder_id=folder_id).delete()
                 db.commit()
 
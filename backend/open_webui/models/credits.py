@@ -1,19 +1,38 @@
 import time
 import uuid
+from collections import defaultdict
 from decimal import Decimal
-from typing import List, Optional, Tuple
+from typing import Iterable, Iterator, List, Optional, Tuple
 
 from fastapi import HTTPException
 from pydantic import BaseModel, ConfigDict, Field
-from sqlalchemy import JSON, BigInteger, Column, Numeric, String, or_
+from sqlalchemy import (
+    JSON,
+    BigInteger,
+    Column,
+    Index,
+    Numeric,
+    String,
+    and_,
+    bindparam,
+    func,
+    insert,
+    or_,
+    tuple_,
+    update,
+)
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
 
 from open_webui.env import (
+    CREDIT_LOG_COUNT_CACHE_TTL,
     REDIS_URL,
     REDIS_SENTINEL_HOSTS,
     REDIS_SENTINEL_PORT,
     REDIS_CLUSTER,
 )
-from open_webui.internal.db import Base, get_db
+from open_webui.internal.db import Base, get_db, run_db
+from open_webui.utils.cache import LRUCache
 from open_webui.utils.redis import get_redis_connection, get_sentinels_from_env
 
 
@@ -43,6 +62,11 @@ class CreditLog(Base):
 
     created_at = Column(BigInteger, index=True)
 
+    __table_args__ = (
+        Index("credit_log_created_at_id_idx", "created_at", "id"),
+        Index("credit_log_user_id_created_at_id_idx", "user_id", "created_at", "id"),
+    )
+
 
 class TradeTicket(Base):
     __tablename__ = "trade_ticket"
@@ -68,6 +92,24 @@ class RedemptionCode(Base):
     received_at = Column(BigInteger, index=True, nullable=True)
 
 
+class CreditLogRollup(Base):
+    __tablename__ = "credit_log_rollup"
+
+    # {period}:{bucket_at}:{user_id}:{model_id}
+    id = Column(String, primary_key=True)
+    period = Column(String, nullable=False)
+    bucket_at = Column(BigInteger, nullable=False)
+    user_id = Column(String, nullable=False)
+    model_id = Column(String, nullable=False)
+    total_tokens = Column(BigInteger)
+    total_cost = Column(Numeric(precision=24, scale=12))
+    request_count = Column(BigInteger)
+
+    __table_args__ = (
+        Index("credit_log_rollup_period_bucket_at_idx", "period", "bucket_at"),
+    )
+
+
 ####################
 # Forms
 ####################
@@ -172,40 +214,50 @@ class RedemptionCodeModel(BaseModel):
 
 
 class CreditsTable:
-    def insert_new_credit(self, user_id: str) -> Optional[CreditModel]:
+    def _insert_new_credit(self, db, user_id: str) -> Optional[CreditModel]:
         from open_webui.config import CREDIT_DEFAULT_CREDIT
 
         try:
             credit_model = CreditModel(
                 user_id=user_id, credit=Decimal(CREDIT_DEFAULT_CREDIT.value)
             )
-            with get_db() as db:
-                result = Credit(**credit_model.model_dump())
-                db.add(result)
-                db.commit()
-                db.refresh(result)
-                if credit_model:
-                    return credit_model
-                return None
+            db.add(Credit(**credit_model.model_dump()))
+            db.commit()
+            return credit_model
         except Exception:
+            db.rollback()
             return None
 
-    def init_credit_by_user_id(self, user_id: str) -> CreditModel:
-        credit_model = self.get_credit_by_user_id(
-            user_id=user_id
-        ) or self.insert_new_credit(user_id=user_id)
+    def insert_new_credit(self, user_id: str) -> Optional[CreditModel]:
+        with get_db() as db:
+            return self._insert_new_credit(db, user_id)
+
+    def _init_credit_by_user_id(self, db, user_id: str) -> CreditModel:
+        credit_model = self._get_credit_by_user_id(
+            db, user_id
+        ) or self._insert_new_credit(db, user_id)
         if credit_model is not None:
             return credit_model
         raise HTTPException(status_code=500, detail="credit initialize failed")
 
-    def get_credit_by_user_id(self, user_id: str) -> Optional[CreditModel]:
+    def init_credit_by_user_id(self, user_id: str) -> CreditModel:
+        with get_db() as db:
+            return self._init_credit_by_user_id(db, user_id)
+
+    async def init_credit_by_user_id_async(self, user_id: str) -> CreditModel:
+        return await run_db(self._init_credit_by_user_id, user_id)
+
+    def _get_credit_by_user_id(self, db, user_id: str) -> Optional[CreditModel]:
         try:
-            with get_db() as db:
-                credit = db.query(Credit).filter(Credit.user_id == user_id).first()
-                return CreditModel.model_validate(credit)
+            credit = db.query(Credit).filter(Credit.user_id == user_id).first()
+            return CreditModel.model_validate(credit)
         except Exception:
             return None
 
+    def get_credit_by_user_id(self, user_id: str) -> Optional[CreditModel]:
+        with get_db() as db:
+            return self._get_credit_by_user_id(db, user_id)
+
     def list_credits_by_user_id(self, user_ids: List[str]) -> List[CreditModel]:
         try:
             with get_db() as db:
@@ -223,6 +275,7 @@ class CreditsTable:
         )
         with get_db() as db:
             db.add(CreditLog(**log.model_dump()))
+            CreditLogRollups.add_logs(db, [log])
             db.query(Credit).filter(Credit.user_id == credit_model.user_id).update(
                 {"credit": form_data.credit, "updated_at": int(time.time())},
                 synchronize_session=False,
@@ -230,24 +283,99 @@ class CreditsTable:
             db.commit()
         return self.get_credit_by_user_id(user_id=form_data.user_id)
 
-    def add_credit_by_user_id(self, form_data: AddCreditForm) -> Optional[CreditModel]:
-        credit_model = self.init_credit_by_user_id(user_id=form_data.user_id)
+    def _add_credit_by_user_id(
+        self, db, form_data: AddCreditForm
+    ) -> Optional[CreditModel]:
+        credit_model = self._init_credit_by_user_id(db, form_data.user_id)
         log = CreditLogModel(
             user_id=form_data.user_id,
             credit=credit_model.credit + form_data.amount,
             detail=form_data.detail.model_dump(),
         )
+        db.add(CreditLog(**log.model_dump()))
+        CreditLogRollups.add_logs(db, [log])
+        db.query(Credit).filter(Credit.user_id == form_data.user_id).update(
+            {
+                "credit": Credit.credit + form_data.amount,
+                "updated_at": int(time.time()),
+            },
+            synchronize_session=False,
+        )
+        db.commit()
+        # the credit row loaded above still has the old amount
+        db.expire_all()
+        return self._get_credit_by_user_id(db, form_data.user_id)
+
+    def add_credit_by_user_id(self, form_data: AddCreditForm) -> Optional[CreditModel]:
         with get_db() as db:
-            db.add(CreditLog(**log.model_dump()))
-            db.query(Credit).filter(Credit.user_id == form_data.user_id).update(
-                {
-                    "credit": Credit.credit + form_data.amount,
-                    "updated_at": int(time.time()),
-                },
-                synchronize_session=False,
+            return self._add_credit_by_user_id(db, form_data)
+
+    async def add_credit_by_user_id_async(
+        self, form_data: AddCreditForm
+    ) -> Optional[CreditModel]:
+        return await run_db(self._add_credit_by_user_id, form_data)
+
+    def add_credit_logs_by_batch(
+        self, logs: List[Tuple[CreditLogModel, Decimal]]
+    ) -> int:
+        """
+        Insert logs and apply their amounts to user credits in one transaction
+
+        Logs already in db are skipped, so a batch can be safely replayed
+        """
+        from open_webui.config import CREDIT_DEFAULT_CREDIT
+
+        if not logs:
+            return 0
+        with get_db() as db:
+            exists = {
+                row[0]
+                for row in db.query(CreditLog.id)
+                .filter(CreditLog.id.in_([log.id for log, _ in logs]))
+                .all()
+            }
+            logs = [(log, amount) for log, amount in logs if log.id not in exists]
+            if not logs:
+                return 0
+            # sum amounts by user
+            amounts = defaultdict(Decimal)
+            for log, amount in logs:
+                amounts[log.user_id] += amount
+            # init credit for new users
+            user_ids = {
+                row[0]
+                for row in db.query(Credit.user_id)
+                .filter(Credit.user_id.in_(list(amounts.keys())))
+                .all()
+            }
+            new_credits = [
+                CreditModel(
+                    user_id=user_id, credit=Decimal(CREDIT_DEFAULT_CREDIT.value)
+                ).model_dump()
+                for user_id in amounts.keys()
+                if user_id not in user_ids
+            ]
+            if new_credits:
+                db.execute(insert(Credit.__table__), new_credits)
+            # multi-row insert and one update per user
+            db.execute(
+                insert(CreditLog.__table__), [log.model_dump() for log, _ in logs]
+            )
+            CreditLogRollups.add_logs(db, [log for log, _ in logs])
+            db.execute(
+                update(Credit.__table__)
+                .where(Credit.__table__.c.user_id == bindparam("b_user_id"))
+                .values(
+                    credit=Credit.__table__.c.credit + bindparam("b_amount"),
+                    updated_at=int(time.time()),
+                ),
+                [
+                    {"b_user_id": user_id, "b_amount": amount}
+                    for user_id, amount in amounts.items()
+                ],
             )
             db.commit()
-        return self.get_credit_by_user_id(form_data.user_id)
+        return len(logs)
 
 
 Credits = CreditsTable()
@@ -320,30 +448,78 @@ TradeTickets = TradeTicketTable()
 
 
 class CreditLogTable:
+    def __init__(self) -> None:
+        self._count_cache = LRUCache(max_size=1000, ttl=CREDIT_LOG_COUNT_CACHE_TTL)
+
     def count_credit_log(self, user_ids: list[str] = None) -> int:
+        """
+        Count logs, the result is cached for CREDIT_LOG_COUNT_CACHE_TTL seconds
+        """
+        key = tuple(sorted(user_ids)) if user_ids else None
+        total = self._count_cache.get(key)
+        if total is not None:
+            return total
         with get_db() as db:
-            query = db.query(CreditLog).order_by(CreditLog.created_at.desc())
+            query = db.query(func.count(CreditLog.id))
             if user_ids:
                 query = query.filter(CreditLog.user_id.in_(user_ids))
-            return query.count()
+            total = query.scalar()
+        self._count_cache.set(key, total)
+        return total
 
     def get_credit_log_by_page(
         self,
         user_ids: list[str] = None,
         offset: Optional[int] = None,
         limit: Optional[int] = None,
+        cursor: Optional[Tuple[int, str]] = None,
     ) -> list[CreditLogSimpleModel]:
+        """
+        Get logs ordered by (created_at, id) desc
+
+        cursor is the (created_at, id) of the last log in the previous page,
+        it avoids scanning skipped rows like offset does
+        """
         with get_db() as db:
-            query = db.query(CreditLog).order_by(CreditLog.created_at.desc())
+            query = db.query(CreditLog).order_by(
+                CreditLog.created_at.desc(), CreditLog.id.desc()
+            )
             if user_ids:
                 query = query.filter(CreditLog.user_id.in_(user_ids))
-            if offset:
+            if cursor:
+                query = query.filter(
+                    tuple_(CreditLog.created_at, CreditLog.id) < tuple(cursor)
+                )
+            elif offset:
                 query = query.offset(offset)
             if limit:
                 query = query.limit(limit)
             all_logs = query.all()
             return [CreditLogSimpleModel.model_validate(log) for log in all_logs]
 
+    def iter_credit_logs(
+        self,
+        user_ids: list[str] = None,
+        start_time: Optional[int] = None,
+        end_time: Optional[int] = None,
+        batch_size: int = 1000,
+    ) -> Iterator[CreditLogModel]:
+        """
+        Iterate logs ordered by created_at desc with a server side cursor
+        """
+        table = CreditLog.__table__
+        query = table.select().order_by(table.c.created_at.desc(), table.c.id.desc())
+        if user_ids is not None:
+            query = query.where(table.c.user_id.in_(user_ids))
+        if start_time is not None:
+            query = query.where(table.c.created_at >= start_time)
+        if end_time is not None:
+            query = query.where(table.c.created_at < end_time)
+        with get_db() as db:
+            result = db.execute(query.execution_options(yield_per=batch_size))
+            for log in result:
+                yield CreditLogModel.model_validate(log)
+
     def get_log_by_time(
         self, start_time: int, end_time: int
     ) -> list[CreditLogSimpleModel]:
@@ -359,21 +535,264 @@ class CreditLogTable:
         except Exception:
             return []
 
-    def delete_log_by_timestamp(self, timestamp: int) -> int:
+    def delete_log_by_timestamp(self, timestamp: int, batch_size: int = 1000) -> int:
+        """
+        Delete logs before timestamp, one short transaction per batch
+        """
+        total = 0
         try:
-            with get_db() as db:
-                query = db.query(CreditLog).filter(CreditLog.created_at < timestamp)
-                total = query.count()
-                query.delete()
-                db.commit()
-                return total
+            while True:
+                with get_db() as db:
+                    ids = [
+                        row[0]
+                        for row in db.query(CreditLog.id)
+                        .filter(CreditLog.created_at < timestamp)
+                        .limit(batch_size)
+                        .all()
+                    ]
+                    if not ids:
+                        break
+                    db.query(CreditLog).filter(CreditLog.id.in_(ids)).delete(
+                        synchronize_session=False
+                    )
+                    db.commit()
+                total += len(ids)
+            return total
         except Exception as err:
             raise HTTPException(status_code=500, detail=str(err))
+        finally:
+            self._count_cache.clear()
 
 
 CreditLogs = CreditLogTable()
 
 
+ROLLUP_PERIODS = {"hour": 3600, "day": 86400}
+
+
+def get_rollup_usage(detail: Optional[dict]) -> Optional[Tuple[str, int, Decimal]]:
+    """
+    Get (model_id, total_tokens, total_price) of a log detail, or None if the
+    log is not a usage record
+    """
+    usage = (detail or {}).get("usage")
+    if not isinstance(usage, dict) or usage.get("total_price") is None:
+        return None
+    model = (detail.get("api_params") or {}).get("model")
+    model_id = (model.get("id") if isinstance(model, dict) else None) or ""
+    return (
+        model_id,
+        int(usage.get("total_tokens") or 0),
+        Decimal(str(usage["total_price"])),
+    )
+
+
+class CreditLogRollupTable:
+    """
+    Hourly and daily usage totals per user and model
+
+    Rollups are written in the same transaction as the credit logs, so the
+    statistics can be answered without loading every log in the range.
+    Rollups are kept when old credit logs are deleted.
+    """
+
+    @staticmethod
+    def _build_rows(logs: Iterable) -> List[dict]:
+        rows = {}
+        for log in logs:
+            usage = get_rollup_usage(log.detail)
+            if usage is None:
+                continue
+            model_id, tokens, cost = usage
+            for period, seconds in ROLLUP_PERIODS.items():
+                bucket_at = log.created_at - log.created_at % seconds
+                key = f"{period}:{bucket_at}:{log.user_id}:{model_id}"
+                row = rows.get(key)
+                if row is None:
+                    row = rows[key] = {
+                        "id": key,
+                        "period": period,
+                        "bucket_at": bucket_at,
+                        "user_id": log.user_id,
+                        "model_id": model_id,
+                        "total_tokens": 0,
+                        "total_cost": Decimal(0),
+                        "request_count": 0,
+                    }
+                row["total_tokens"] += tokens
+                row["total_cost"] += cost
+                row["request_count"] += 1
+        return list(rows.values())
+
+    def add_logs(self, db: Session, logs: Iterable) -> None:
+        """
+        Add logs to rollups, the caller commits
+        """
+        rows = self._build_rows(logs)
+        if not rows:
+            return
+        table = CreditLogRollup.__table__
+        dialect = db.get_bind().dialect.name
+        if dialect in ("postgresql", "sqlite"):
+            stmt = (
+                postgresql.insert(table)
+                if dialect == "postgresql"
+                else sqlite.insert(table)
+            )
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.id],
+                set_={
+                    "total_tokens": table.c.total_tokens + stmt.excluded.total_tokens,
+                    "total_cost": table.c.total_cost + stmt.excluded.total_cost,
+                    "request_count": table.c.request_count
+                    + stmt.excluded.request_count,
+                },
+            )
+            db.execute(stmt, rows)
+            return
+        # other databases, update existing rows and insert the rest
+        exists = {
+            row[0]
+            for row in db.query(CreditLogRollup.id)
+            .filter(CreditLogRollup.id.in_([row["id"] for row in rows]))
+            .all()
+        }
+        new_rows = [row for row in rows if row["id"] not in exists]
+        if new_rows:
+            db.execute(insert(table), new_rows)
+        if exists:
+            db.execute(
+                update(table)
+                .where(table.c.id == bindparam("b_id"))
+                .values(
+                    total_tokens=table.c.total_tokens + bindparam("b_total_tokens"),
+                    total_cost=table.c.total_cost + bindparam("b_total_cost"),
+                    request_count=table.c.request_count + bindparam("b_request_count"),
+                ),
+                [
+                    {
+                        "b_id": row["id"],
+                        "b_total_tokens": row["total_tokens"],
+                        "b_total_cost": row["total_cost"],
+                        "b_request_count": row["request_count"],
+                    }
+                    for row in rows
+                    if row["id"] in exists
+                ],
+            )
+
+    def get_usage_by_time(
+        self, start_time: int, end_time: int
+    ) -> List[Tuple[str, str, int, Decimal]]:
+        """
+        Get (user_id, model_id, total_tokens, total_cost) in [start_time, end_time)
+
+        Whole days and hours are read from rollups, the partial hours at both
+        ends from credit logs
+        """
+        hour, day = ROLLUP_PERIODS["hour"], ROLLUP_PERIODS["day"]
+        hour_start = -(-start_time // hour) * hour
+        hour_end = end_time - end_time % hour
+        rollup_ranges = []
+        log_ranges = [(start_time, end_time)]
+        if hour_start < hour_end:
+            log_ranges = [(start_time, hour_start), (hour_end, end_time)]
+            day_start = -(-hour_start // day) * day
+            day_end = hour_end - hour_end % day
+            if day_start < day_end:
+                rollup_ranges = [
+                    ("hour", hour_start, day_start),
+                    ("day", day_start, day_end),
+                    ("hour", day_end, hour_end),
+                ]
+            else:
+                rollup_ranges = [("hour", hour_start, hour_end)]
+
+        usage = defaultdict(lambda: [0, Decimal(0)])
+        with get_db() as db:
+            conditions = [
+                and_(
+                    CreditLogRollup.period == period,
+                    CreditLogRollup.bucket_at >= start,
+                    CreditLogRollup.bucket_at < end,
+                )
+                for period, start, end in rollup_ranges
+                if start < end
+            ]
+            if conditions:
+                rows = (
+                    db.query(
+                        CreditLogRollup.user_id,
+                        CreditLogRollup.model_id,
+                        func.sum(CreditLogRollup.total_tokens),
+                        func.sum(CreditLogRollup.total_cost),
+                    )
+                    .filter(or_(*conditions))
+                    .group_by(CreditLogRollup.user_id, CreditLogRollup.model_id)
+                    .all()
+                )
+                for user_id, model_id, tokens, cost in rows:
+                    usage[(user_id, model_id)][0] += int(tokens or 0)
+                    usage[(user_id, model_id)][1] += Decimal(str(cost or 0))
+            for start, end in log_ranges:
+                if start >= end:
+                    continue
+                logs = db.execute(
+                    CreditLog.__table__.select()
+                    .where(CreditLog.__table__.c.created_at >= start)
+                    .where(CreditLog.__table__.c.created_at < end)
+                )
+                for log in logs:
+                    log_usage = get_rollup_usage(log.detail)
+                    if log_usage is None:
+                        continue
+                    model_id, tokens, cost = log_usage
+                    usage[(log.user_id, model_id)][0] += tokens
+                    usage[(log.user_id, model_id)][1] += cost
+        return [
+            (user_id, model_id, tokens, cost)
+            for (user_id, model_id), (tokens, cost) in usage.items()
+        ]
+
+    def rebuild(self, batch_size: int = 1000) -> int:
+        """
+        Rebuild the rollups of the days before yesterday from credit logs,
+        returns the number of logs read
+
+        Later buckets are left alone, requests being billed add their logs
+        to them while the rebuild runs, which would count them twice.
+        """
+        day = ROLLUP_PERIODS["day"]
+        now = int(time.time())
+        cutoff = now - now % day - day
+        table = CreditLog.__table__
+        total = 0
+        with get_db() as db:
+            db.query(CreditLogRollup).filter(
+                CreditLogRollup.bucket_at < cutoff
+            ).delete()
+            last = None
+            while True:
+                query = (
+                    table.select()
+                    .where(table.c.created_at < cutoff)
+                    .order_by(table.c.created_at, table.c.id)
+                )
+                if last is not None:
+                    query = query.where(tuple_(table.c.created_at, table.c.id) > last)
+                logs = db.execute(query.limit(batch_size)).all()
+                if not logs:
+                    break
+                self.add_logs(db, logs)
+                total += len(logs)
+                last = (logs[-1].created_at, logs[-1].id)
+            db.commit()
+        return total
+
+
+CreditLogRollups = CreditLogRollupTable()
+
+
 class RedemptionCodeTable:
     def get_code(self, code: str) -> Optional[RedemptionCodeModel]:
         try:
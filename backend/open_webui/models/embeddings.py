@@ -0,0 +1,152 @@
+import hashlib
+import time
+from array import array
+from typing import Optional
+
+from open_webui.internal.db import Base, get_db
+from sqlalchemy import BigInteger, Column, Index, LargeBinary, String, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+
+####################
+# Chunk Embedding DB Schema
+####################
+
+
+class ChunkEmbedding(Base):
+    __tablename__ = "chunk_embedding"
+
+    engine = Column(String, primary_key=True)
+    model = Column(String, primary_key=True)
+    chunk_hash = Column(String, primary_key=True)
+    # packed doubles
+    vector = Column(LargeBinary)
+    used_at = Column(BigInteger)
+
+    __table_args__ = (Index("chunk_embedding_used_at_idx", "used_at"),)
+
+
+def get_chunk_hash(text: str, prefix: Optional[str] = None) -> str:
+    return hashlib.sha256(
+        f"{prefix or ''}\x00{text}".encode("utf-8", "surrogatepass")
+    ).hexdigest()
+
+
+####################
+# Table Operations
+####################
+
+
+class ChunkEmbeddingsTable:
+    """
+    Embeddings of document chunks by content hash, so chunks already
+    embedded for any file or knowledge base are not embedded again
+    """
+
+    def get_vectors(
+        self, engine: str, model: str, chunk_hashes: list[str], touch: bool = True
+    ) -> dict[str, list[float]]:
+        """
+        Stored vectors by chunk hash, touch marks them used for pruning
+        """
+        vectors = {}
+        chunk_hashes = list(dict.fromkeys(chunk_hashes))
+        with get_db() as db:
+            for i in range(0, len(chunk_hashes), 500):
+                batch = chunk_hashes[i : i + 500]
+                rows = (
+                    db.query(ChunkEmbedding.chunk_hash, ChunkEmbedding.vector)
+                    .filter(
+                        ChunkEmbedding.engine == engine,
+                        ChunkEmbedding.model == model,
+                        ChunkEmbedding.chunk_hash.in_(batch),
+                    )
+                    .all()
+                )
+                for chunk_hash, vector in rows:
+                    vectors[chunk_hash] = array("d", vector).tolist()
+
+                found = [chunk_hash for chunk_hash, _ in rows]
+                if touch and found:
+                    db.query(ChunkEmbedding).filter(
+                        ChunkEmbedding.engine == engine,
+                        ChunkEmbedding.model == model,
+                        ChunkEmbedding.chunk_hash.in_(found),
+                    ).update({"used_at": int(time.time())}, synchronize_session=False)
+            db.commit()
+        return vectors
+
+    def add_vectors(
+        self, engine: str, model: str, vectors: dict[str, list[float]]
+    ) -> None:
+        now = int(time.time())
+        rows = [
+            {
+                "engine": engine,
+                "model": model,
+                "chunk_hash": chunk_hash,
+                "vector": array("d", vector).tobytes(),
+                "used_at": now,
+            }
+            for chunk_hash, vector in vectors.items()
+        ]
+        with get_db() as db:
+            dialect_name = db.get_bind().dialect.name
+            for i in range(0, len(rows), 500):
+                batch = rows[i : i + 500]
+                # the same chunk may be stored by a concurrent ingestion
+                if dialect_name in ("sqlite", "postgresql"):
+                    insert = (
+                        postgresql.insert
+                        if dialect_name == "postgresql"
+                        else sqlite.insert
+                    )
+                    db.execute(insert(ChunkEmbedding).on_conflict_do_nothing(), batch)
+                else:
+                    existing = {
+                        chunk_hash
+                        for (chunk_hash,) in db.query(ChunkEmbedding.chunk_hash).filter(
+                            ChunkEmbedding.engine == engine,
+                            ChunkEmbedding.model == model,
+                            ChunkEmbedding.chunk_hash.in_(
+                                [row["chunk_hash"] for row in batch]
+                            ),
+                        )
+                    }
+                    db.bulk_insert_mappings(
+                        ChunkEmbedding,
+                        [row for row in batch if row["chunk_hash"] not in existing],
+                    )
+            db.commit()
+
+    def delete_unused(self, before: int, batch_size: int = 1000) -> int:
+        """
+        Delete embeddings not used since the timestamp, returns the count
+        """
+        total = 0
+        with get_db() as db:
+            while True:
+                keys = (
+                    db.query(
+                        ChunkEmbedding.engine,
+                        ChunkEmbedding.model,
+                        ChunkEmbedding.chunk_hash,
+                    )
+                    .filter(ChunkEmbedding.used_at < before)
+                    .limit(batch_size)
+                    .all()
+                )
+                if not keys:
+                    break
+                db.query(ChunkEmbedding).filter(
+                    tuple_(
+                        ChunkEmbedding.engine,
+                        ChunkEmbedding.model,
+                        ChunkEmbedding.chunk_hash,
+                    ).in_([tuple(key) for key in keys])
+                ).delete(synchronize_session=False)
+                db.commit()
+                total += len(keys)
+        return total
+
+
+ChunkEmbeddings = ChunkEmbeddingsTable()
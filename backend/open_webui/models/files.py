@@ -1,9 +1,10 @@
 import logging
 import time
-from typing import Optional
+from typing import Any, Optional
 
-from open_webui.internal.db import Base, JSONField, get_db
+from open_webui.internal.db import Base, JSONField, get_db, run_db
 from open_webui.env import SRC_LOG_LEVELS
+from open_webui.utils.file_status import file_status
 from pydantic import BaseModel, ConfigDict
 from sqlalchemy import BigInteger, Column, String, Text, JSON
 
@@ -26,6 +27,8 @@ class File(Base):
 
     data = Column(JSON, nullable=True)
     meta = Column(JSON, nullable=True)
+    # copy of data["status"], read without loading data
+    status = Column(String, nullable=True)
 
     access_control = Column(JSON, nullable=True)
 
@@ -87,6 +90,13 @@ class FileMetadataResponse(BaseModel):
     updated_at: int  # timestamp in epoch
 
 
+class FileStatusResponse(BaseModel):
+    id: str
+    user_id: str
+    status: Optional[str] = None
+    error: Optional[Any] = None
+
+
 class FileForm(BaseModel):
     id: str
     hash: Optional[str] = None
@@ -110,7 +120,9 @@ class FilesTable:
             )
 
             try:
-                result = File(**file.model_dump())
+                result = File(
+                    **file.model_dump(), status=(file.data or {}).get("status")
+                )
                 db.add(result)
                 db.commit()
                 db.refresh(result)
@@ -122,14 +134,51 @@ class FilesTable:
                 log.exception(f"Error inserting a new file: {e}")
                 return None
 
+    def _get_file_by_id(self, db, id: str) -> Optional[FileModel]:
+        try:
+            file = db.get(File, id)
+            return FileModel.model_validate(file)
+        except Exception:
+            return None
+
     def get_file_by_id(self, id: str) -> Optional[FileModel]:
         with get_db() as db:
-            try:
-                file = db.get(File, id)
-                return FileModel.model_validate(file)
-            except Exception:
+            return self._get_file_by_id(db, id)
+
+    async def get_file_by_id_async(self, id: str) -> Optional[FileModel]:
+        return await run_db(self._get_file_by_id, id)
+
+    def _get_file_status_by_id(self, db, id: str) -> Optional[FileStatusResponse]:
+        # read the status column, not the extracted content in data
+        try:
+            file = db.query(File.id, File.user_id, File.status).filter_by(id=id).first()
+            if file is None:
                 return None
 
+            status, error = file.status, None
+            if status is None or status == "failed":
+                # files from before the status column, and the error
+                data = (
+                    db.query(File.data["status"], File.data["error"])
+                    .filter_by(id=id)
+                    .first()
+                )
+                status, error = data[0], data[1]
+            return FileStatusResponse(
+                id=file.id, user_id=file.user_id, status=status, error=error
+            )
+        except Exception:
+            return None
+
+    def get_file_status_by_id(self, id: str) -> Optional[FileStatusResponse]:
+        with get_db() as db:
+            return self._get_file_status_by_id(db, id)
+
+    async def get_file_status_by_id_async(
+        self, id: str
+    ) -> Optional[FileStatusResponse]:
+        return await run_db(self._get_file_status_by_id, id)
+
     def get_file_metadata_by_id(self, id: str) -> Optional[FileMetadataResponse]:
         with get_db() as db:
             try:
@@ -199,26 +248,48 @@ class FilesTable:
             except Exception:
                 return None
 
+    def _update_file_data_by_id(self, db, id: str, data: dict) -> Optional[FileModel]:
+        try:
+            file = db.query(File).filter_by(id=id).first()
+            file.data = {**(file.data if file.data else {}), **data}
+            if "status" in data:
+                file.status = data["status"]
+            db.commit()
+            if "status" in data:
+                file_status.notify(id)
+            return FileModel.model_validate(file)
+        except Exception as e:
+
+            return None
+
     def update_file_data_by_id(self, id: str, data: dict) -> Optional[FileModel]:
         with get_db() as db:
-            try:
-                file = db.query(File).filter_by(id=id).first()
-                file.data = {**(file.data if file.data else {}), **data}
-                db.commit()
-                return FileModel.model_validate(file)
-            except Exception as e:
-
-                return None
+            return self._update_file_data_by_id(db, id, data)
+
+    async def update_file_data_by_id_async(
+        self, id: str, data: dict
+    ) -> Optional[FileModel]:
+        return await run_db(self._update_file_data_by_id, id, data)
+
+    def _update_file_metadata_by_id(
+        self, db, id: str, meta: dict
+    ) -> Optional[FileModel]:
+        try:
+            file = db.query(File).filter_by(id=id).first()
+            file.meta = {**(file.meta if file.meta else {}), **meta}
+            db.commit()
+            return FileModel.model_validate(file)
+        except Exception:
+            return None
 
     def update_file_metadata_by_id(self, id: str, meta: dict) -> Optional[FileModel]:
         with get_db() as db:
-            try:
-                file = db.query(File).filter_by(id=id).first()
-                file.meta = {**(file.meta if file.meta else {}), **meta}
-                db.commit()
-                return FileModel.model_validate(file)
-            except Exception:
-                return None
+            return self._update_file_metadata_by_id(db, id, meta)
+
+    async def update_file_metadata_by_id_async(
+        self, id: str, meta: dict
+    ) -> Optional[FileModel]:
+        return await run_db(self._update_file_metadata_by_id, id, meta)
 
     def delete_file_by_id(self, id: str) -> bool:
         with get_db() as db:
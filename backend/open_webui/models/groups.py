@@ -5,7 +5,17 @@ from typing import Optional
 import uuid
 
 from open_webui.internal.db import Base, get_db
-from open_webui.env import SRC_LOG_LEVELS
+from open_webui.env import (
+    GROUP_MEMBER_CACHE_TTL,
+    REDIS_CLUSTER,
+    REDIS_KEY_PREFIX,
+    REDIS_SENTINEL_HOSTS,
+    REDIS_SENTINEL_PORT,
+    REDIS_URL,
+    SRC_LOG_LEVELS,
+)
+from open_webui.utils.cache import LRUCache
+from open_webui.utils.redis import get_redis_connection, get_sentinels_from_env
 
 from open_webui.models.files import FileMetadataResponse
 
@@ -17,6 +27,8 @@ from sqlalchemy import BigInteger, Column, String, Text, JSON, func
 log = logging.getLogger(__name__)
 log.setLevel(SRC_LOG_LEVELS["MODELS"])
 
+REDIS_GROUP_CACHE_CHANNEL = f"{REDIS_KEY_PREFIX}:groups:invalidate"
+
 ####################
 # UserGroup DB Schema
 ####################
@@ -92,6 +104,39 @@ class GroupUpdateForm(GroupForm, UserIdsForm):
 
 
 class GroupTable:
+    def __init__(self, use_redis: bool = False) -> None:
+        self._member_cache = LRUCache(max_size=10000, ttl=GROUP_MEMBER_CACHE_TTL)
+        self.use_redis = use_redis
+        self._redis = None
+
+    @property
+    def redis(self):
+        if self._redis is None:
+            self._redis = get_redis_connection(
+                redis_url=REDIS_URL,
+                redis_sentinels=get_sentinels_from_env(
+                    REDIS_SENTINEL_HOSTS, REDIS_SENTINEL_PORT
+                ),
+                redis_cluster=REDIS_CLUSTER,
+                decode_responses=True,
+            )
+        return self._redis
+
+    def invalidate_member_cache_local(self) -> None:
+        self._member_cache.clear()
+
+    def invalidate_member_cache(self) -> None:
+        """
+        Drop the cached group ids of all users, with Redis they are dropped
+        by every instance through group_cache_listener
+        """
+        self.invalidate_member_cache_local()
+        if self.use_redis:
+            try:
+                self.redis.publish(REDIS_GROUP_CACHE_CHANNEL, "*")
+            except Exception as e:
+                log.warning(f"Error publishing invalidation of group members: {e}")
+
     def insert_new_group(
         self, user_id: str, form_data: GroupForm
     ) -> Optional[GroupModel]:
@@ -110,6 +155,7 @@ class GroupTable:
                 result = Group(**group.model_dump())
                 db.add(result)
                 db.commit()
+                self.invalidate_member_cache()
                 db.refresh(result)
                 if result:
                     return GroupModel.model_validate(result)
@@ -141,6 +187,22 @@ class GroupTable:
                 .all()
             ]
 
+    def get_group_ids_by_member_id(self, user_id: str) -> set[str]:
+        """
+        Ids of the user's groups, cached for GROUP_MEMBER_CACHE_TTL seconds
+
+        Only meant for filtering model lists, permission checks read the
+        groups from the database since other workers may be stale until
+        they get the invalidation, or the ttl passes without Redis.
+        """
+        group_ids = self._member_cache.get(user_id)
+        if group_ids is None:
+            group_ids = frozenset(
+                group.id for group in self.get_groups_by_member_id(user_id)
+            )
+            self._member_cache.set(user_id, group_ids)
+        return set(group_ids)
+
     def get_group_by_id(self, id: str) -> Optional[GroupModel]:
         try:
             with get_db() as db:
@@ -168,6 +230,7 @@ class GroupTable:
                     }
                 )
                 db.commit()
+                self.invalidate_member_cache()
                 return self.get_group_by_id(id=id)
         except Exception as e:
             log.exception(e)
@@ -178,6 +241,7 @@ class GroupTable:
             with get_db() as db:
                 db.query(Group).filter_by(id=id).delete()
                 db.commit()
+                self.invalidate_member_cache()
                 return True
         except Exception:
             return False
@@ -187,6 +251,7 @@ class GroupTable:
             try:
                 db.query(Group).delete()
                 db.commit()
+                self.invalidate_member_cache()
 
                 return True
             except Exception:
@@ -207,6 +272,7 @@ class GroupTable:
                     )
                     db.commit()
 
+                self.invalidate_member_cache()
                 return True
             except Exception:
                 return False
@@ -274,6 +340,7 @@ class GroupTable:
                         )
 
                 db.commit()
+                self.invalidate_member_cache()
                 return True
             except Exception as e:
                 log.exception(e)
@@ -301,6 +368,7 @@ class GroupTable:
                 group.user_ids = group_user_ids
                 group.updated_at = int(time.time())
                 db.commit()
+                self.invalidate_member_cache()
                 db.refresh(group)
                 return GroupModel.model_validate(group)
         except Exception as e:
@@ -331,6 +399,7 @@ class GroupTable:
                 group.updated_at = int(time.time())
 
                 db.commit()
+                self.invalidate_member_cache()
                 db.refresh(group)
                 return GroupModel.model_validate(group)
         except Exception as e:
@@ -338,4 +407,4 @@ class GroupTable:
             return None
 
 
-Groups = GroupTable()
+Groups = GroupTable(use_redis=bool(REDIS_URL))
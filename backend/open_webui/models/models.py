@@ -241,6 +241,19 @@ class ModelsTable:
         except Exception:
             return None
 
+    def get_models_by_ids(self, ids: list[str]) -> list[ModelModel]:
+        ids = list(dict.fromkeys(ids))
+        models = []
+        with get_db() as db:
+            for i in range(0, len(ids), 500):
+                models.extend(
+                    ModelModel.model_validate(model)
+                    for model in db.query(Model)
+                    .filter(Model.id.in_(ids[i : i + 500]))
+                    .all()
+                )
+        return models
+
     def toggle_model_by_id(self, id: str) -> Optional[ModelModel]:
         with get_db() as db:
             try:
@@ -1,21 +1,42 @@
+import hashlib
+import hmac
+import logging
+import threading
 import time
 from typing import Optional
 
-from open_webui.internal.db import Base, JSONField, get_db
+from open_webui.internal.db import Base, JSONField, get_db, run_db
 
 
-from open_webui.env import DATABASE_USER_ACTIVE_STATUS_UPDATE_INTERVAL
+from open_webui.env import (
+    DATABASE_USER_ACTIVE_STATUS_UPDATE_INTERVAL,
+    REDIS_CLUSTER,
+    REDIS_KEY_PREFIX,
+    REDIS_SENTINEL_HOSTS,
+    REDIS_SENTINEL_PORT,
+    REDIS_URL,
+    SRC_LOG_LEVELS,
+    USER_CACHE_TTL,
+    USER_LAST_ACTIVE_FLUSH_INTERVAL,
+)
 from open_webui.models.chats import Chats
 from open_webui.models.groups import Groups
+from open_webui.utils.cache import LRUCache
 from open_webui.utils.misc import throttle
+from open_webui.utils.redis import get_redis_connection, get_sentinels_from_env
 
 
 from pydantic import BaseModel, ConfigDict
 from sqlalchemy import BigInteger, Column, String, Text, Date
-from sqlalchemy import or_
+from sqlalchemy import case, or_, update
 
 import datetime
 
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MODELS"])
+
+REDIS_USER_CACHE_CHANNEL = f"{REDIS_KEY_PREFIX}:users:invalidate"
+
 ####################
 # User DB Schema
 ####################
@@ -157,6 +178,28 @@ class UserCreditUpdateForm(BaseModel):
 
 
 class UsersTable:
+    def __init__(self, use_redis: bool = False) -> None:
+        # id:<user id> -> user, api_key:<sha256 of key> -> user id
+        self._auth_cache = LRUCache(max_size=10000, ttl=USER_CACHE_TTL)
+        # user id -> last active time not written yet
+        self._last_active: dict[str, int] = {}
+        self._last_active_lock = threading.Lock()
+        self.use_redis = use_redis
+        self._redis = None
+
+    @property
+    def redis(self):
+        if self._redis is None:
+            self._redis = get_redis_connection(
+                redis_url=REDIS_URL,
+                redis_sentinels=get_sentinels_from_env(
+                    REDIS_SENTINEL_HOSTS, REDIS_SENTINEL_PORT
+                ),
+                redis_cluster=REDIS_CLUSTER,
+                decode_responses=True,
+            )
+        return self._redis
+
     def insert_new_user(
         self,
         id: str,
@@ -189,22 +232,78 @@ class UsersTable:
             else:
                 return None
 
-    def get_user_by_id(self, id: str) -> Optional[UserModel]:
+    def _get_user_by_id(self, db, id: str) -> Optional[UserModel]:
         try:
-            with get_db() as db:
-                user = db.query(User).filter_by(id=id).first()
-                return UserModel.model_validate(user)
+            user = db.query(User).filter_by(id=id).first()
+            return UserModel.model_validate(user)
         except Exception:
             return None
 
-    def get_user_by_api_key(self, api_key: str) -> Optional[UserModel]:
+    def get_user_by_id(self, id: str) -> Optional[UserModel]:
+        with get_db() as db:
+            return self._get_user_by_id(db, id)
+
+    async def get_user_by_id_async(self, id: str) -> Optional[UserModel]:
+        return await run_db(self._get_user_by_id, id)
+
+    def _get_user_by_api_key(self, db, api_key: str) -> Optional[UserModel]:
         try:
-            with get_db() as db:
-                user = db.query(User).filter_by(api_key=api_key).first()
-                return UserModel.model_validate(user)
+            user = db.query(User).filter_by(api_key=api_key).first()
+            return UserModel.model_validate(user)
         except Exception:
             return None
 
+    def get_user_by_api_key(self, api_key: str) -> Optional[UserModel]:
+        with get_db() as db:
+            return self._get_user_by_api_key(db, api_key)
+
+    async def get_user_by_api_key_async(self, api_key: str) -> Optional[UserModel]:
+        return await run_db(self._get_user_by_api_key, api_key)
+
+    def get_auth_user_by_id(self, id: str) -> Optional[UserModel]:
+        """
+        User of an authenticated request, cached for USER_CACHE_TTL seconds
+
+        Changes made through this worker apply at once. With REDIS_URL set
+        they are published to every instance and user_cache_listener drops
+        their copies, otherwise other workers pick them up after the ttl.
+        """
+        user = self._auth_cache.get(f"id:{id}")
+        if user is None:
+            user = self.get_user_by_id(id)
+            if user is None:
+                return None
+            self._auth_cache.set(f"id:{id}", user)
+        return user.model_copy(deep=True)
+
+    def get_auth_user_by_api_key(self, api_key: str) -> Optional[UserModel]:
+        key = f"api_key:{hashlib.sha256(api_key.encode()).hexdigest()}"
+        user_id = self._auth_cache.get(key)
+        if user_id is not None:
+            user = self.get_auth_user_by_id(user_id)
+            # the key may have been replaced since
+            if user is not None and hmac.compare_digest(user.api_key or "", api_key):
+                return user
+            self._auth_cache.pop(key)
+
+        user = self.get_user_by_api_key(api_key)
+        if user is None:
+            return None
+        self._auth_cache.set(key, user.id)
+        self._auth_cache.set(f"id:{user.id}", user)
+        return user.model_copy(deep=True)
+
+    def invalidate_auth_user_local(self, id: str) -> None:
+        self._auth_cache.pop(f"id:{id}")
+
+    def invalidate_auth_user(self, id: str) -> None:
+        self.invalidate_auth_user_local(id)
+        if self.use_redis:
+            try:
+                self.redis.publish(REDIS_USER_CACHE_CHANNEL, id)
+            except Exception as e:
+                log.warning(f"Error publishing invalidation of user {id}: {e}")
+
     def get_user_by_email(self, email: str) -> Optional[UserModel]:
         try:
             with get_db() as db:
@@ -333,6 +432,7 @@ class UsersTable:
             with get_db() as db:
                 db.query(User).filter_by(id=id).update({"role": role})
                 db.commit()
+                self.invalidate_auth_user(id)
                 user = db.query(User).filter_by(id=id).first()
                 return UserModel.model_validate(user)
         except Exception:
@@ -347,6 +447,7 @@ class UsersTable:
                     {"profile_image_url": profile_image_url}
                 )
                 db.commit()
+                self.invalidate_auth_user(id)
 
                 user = db.query(User).filter_by(id=id).first()
                 return UserModel.model_validate(user)
@@ -367,6 +468,44 @@ class UsersTable:
         except Exception:
             return None
 
+    def mark_user_active_by_id(self, id: str) -> None:
+        """
+        Record the user as active now, written by flush_last_active
+        """
+        if USER_LAST_ACTIVE_FLUSH_INTERVAL <= 0:
+            self.update_user_last_active_by_id(id)
+            return
+        with self._last_active_lock:
+            self._last_active[id] = int(time.time())
+
+    def flush_last_active(self) -> int:
+        """
+        Write the recorded last active times in one bulk update
+        """
+        with self._last_active_lock:
+            last_active, self._last_active = self._last_active, {}
+        if not last_active:
+            return 0
+
+        try:
+            with get_db() as db:
+                ids = list(last_active)
+                for i in range(0, len(ids), 500):
+                    chunk = {id: last_active[id] for id in ids[i : i + 500]}
+                    db.execute(
+                        update(User)
+                        .where(User.id.in_(chunk))
+                        .values(last_active_at=case(chunk, value=User.id))
+                        .execution_options(synchronize_session=False)
+                    )
+                db.commit()
+        except Exception as e:
+            # keep them for the next flush, unless newer ones came in
+            with self._last_active_lock:
+                self._last_active = {**last_active, **self._last_active}
+            raise e
+        return len(last_active)
+
     def update_user_oauth_sub_by_id(
         self, id: str, oauth_sub: str
     ) -> Optional[UserModel]:
@@ -374,6 +513,7 @@ class UsersTable:
             with get_db() as db:
                 db.query(User).filter_by(id=id).update({"oauth_sub": oauth_sub})
                 db.commit()
+                self.invalidate_auth_user(id)
 
                 user = db.query(User).filter_by(id=id).first()
                 return UserModel.model_validate(user)
@@ -385,6 +525,7 @@ class UsersTable:
             with get_db() as db:
                 db.query(User).filter_by(id=id).update(updated)
                 db.commit()
+                self.invalidate_auth_user(id)
 
                 user = db.query(User).filter_by(id=id).first()
                 return UserModel.model_validate(user)
@@ -405,6 +546,7 @@ class UsersTable:
 
                 db.query(User).filter_by(id=id).update({"settings": user_settings})
                 db.commit()
+                self.invalidate_auth_user(id)
 
                 user = db.query(User).filter_by(id=id).first()
                 return UserModel.model_validate(user)
@@ -423,6 +565,7 @@ class UsersTable:
                     # Delete User
                     db.query(User).filter_by(id=id).delete()
                     db.commit()
+                self.invalidate_auth_user(id)
 
                 return True
             else:
@@ -435,6 +578,7 @@ class UsersTable:
             with get_db() as db:
                 result = db.query(User).filter_by(id=id).update({"api_key": api_key})
                 db.commit()
+                self.invalidate_auth_user(id)
                 return True if result == 1 else False
         except Exception:
             return False
@@ -461,4 +605,4 @@ class UsersTable:
                 return None
 
 
-Users = UsersTable()
+Users = UsersTable(use_redis=bool(REDIS_URL))
@@ -0,0 +1,191 @@
+import hashlib
+import logging
+from array import array
+from typing import Callable, Optional
+
+from open_webui.env import (
+    ENABLE_RAG_EMBEDDING_CACHE_REDIS,
+    RAG_EMBEDDING_CACHE_MAX_BYTES,
+    RAG_EMBEDDING_CACHE_SIZE,
+    RAG_EMBEDDING_CACHE_TTL,
+    REDIS_CLUSTER,
+    REDIS_KEY_PREFIX,
+    REDIS_SENTINEL_HOSTS,
+    REDIS_SENTINEL_PORT,
+    REDIS_URL,
+    SRC_LOG_LEVELS,
+)
+from open_webui.utils.cache import LRUCache
+from open_webui.utils.redis import get_redis_connection, get_sentinels_from_env
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["RAG"])
+
+
+class EmbeddingCache:
+    """
+    Embedding cache keyed by (engine, model, prefix, text hash)
+
+    Vectors are kept in process as packed doubles, so the byte cap matches
+    the real footprint. With redis enabled, local misses are looked up in
+    redis before calling the embedding engine, so workers share results.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 10000,
+        max_bytes: Optional[int] = None,
+        ttl: Optional[float] = None,
+        use_redis: bool = False,
+    ) -> None:
+        self.enabled = max_size > 0
+        self._cache = LRUCache(
+            max_size=max(max_size, 1),
+            ttl=ttl,
+            max_bytes=max_bytes,
+            sizeof=lambda value: value.itemsize * len(value) + 64,
+        )
+        self.ttl = ttl
+        self.use_redis = use_redis and bool(REDIS_URL)
+        self.redis_hits = 0
+        self.redis_misses = 0
+        self._redis = None
+
+    @property
+    def redis(self):
+        if self._redis is None:
+            self._redis = get_redis_connection(
+                redis_url=REDIS_URL,
+                redis_sentinels=get_sentinels_from_env(
+                    REDIS_SENTINEL_HOSTS, REDIS_SENTINEL_PORT
+                ),
+                redis_cluster=REDIS_CLUSTER,
+                decode_responses=False,
+            )
+        return self._redis
+
+    @staticmethod
+    def get_key(engine: str, model: str, prefix: Optional[str], text: str) -> str:
+        text_hash = hashlib.sha256(
+            f"{prefix or ''}\x00{text}".encode("utf-8", "surrogatepass")
+        ).hexdigest()
+        return f"{engine}:{model}:{text_hash}"
+
+    def _get_redis(self, keys: list[str]) -> list[Optional[array]]:
+        try:
+            values = self.redis.mget(
+                [f"{REDIS_KEY_PREFIX}:embedding:{key}" for key in keys]
+            )
+        except Exception as e:
+            log.warning(f"embedding cache redis get failed: {e}")
+            return [None] * len(keys)
+
+        vectors = []
+        for value in values:
+            if value is None:
+                self.redis_misses += 1
+                vectors.append(None)
+            else:
+                self.redis_hits += 1
+                vectors.append(array("d", value))
+        return vectors
+
+    def _set_redis(self, items: dict[str, array]) -> None:
+        try:
+            pipe = self.redis.pipeline()
+            for key, vector in items.items():
+                pipe.set(
+                    f"{REDIS_KEY_PREFIX}:embedding:{key}",
+                    vector.tobytes(),
+                    ex=int(self.ttl) if self.ttl else None,
+                )
+            pipe.execute()
+        except Exception as e:
+            log.warning(f"embedding cache redis set failed: {e}")
+
+    def get_many(self, keys: list[str]) -> list[Optional[list[float]]]:
+        vectors = [self._cache.get(key) for key in keys]
+
+        missing = [idx for idx, vector in enumerate(vectors) if vector is None]
+        if missing and self.use_redis:
+            for idx, vector in zip(
+                missing, self._get_redis([keys[idx] for idx in missing])
+            ):
+                if vector is not None:
+                    self._cache.set(keys[idx], vector)
+                    vectors[idx] = vector
+
+        return [vector.tolist() if vector is not None else None for vector in vectors]
+
+    def set_many(self, items: dict[str, list[float]]) -> None:
+        packed = {key: array("d", vector) for key, vector in items.items()}
+        for key, vector in packed.items():
+            self._cache.set(key, vector)
+        if packed and self.use_redis:
+            self._set_redis(packed)
+
+    def wrap(self, embedding_function: Callable, engine: str, model: str) -> Callable:
+        """
+        Wrap an embedding function (query, prefix, user), only uncached texts
+        are passed on, in one call
+        """
+        if not self.enabled:
+            return embedding_function
+
+        def cached_embedding_function(query, prefix=None, user=None):
+            texts = query if isinstance(query, list) else [query]
+            keys = [self.get_key(engine, model, prefix, text) for text in texts]
+            vectors = self.get_many(keys)
+
+            missing = [idx for idx, vector in enumerate(vectors) if vector is None]
+            if missing:
+                # the same text may repeat within one call
+                missing_keys = {}
+                for idx in missing:
+                    missing_keys.setdefault(keys[idx], texts[idx])
+                missing_texts = list(missing_keys.values())
+                embeddings = embedding_function(
+                    missing_texts if isinstance(query, list) else missing_texts[0],
+                    prefix=prefix,
+                    user=user,
+                )
+                if not isinstance(query, list):
+                    embeddings = [embeddings]
+                if (
+                    not embeddings
+                    or len(embeddings) != len(missing_texts)
+                    or any(embedding is None for embedding in embeddings)
+                ):
+                    # failed or partial, nothing to cache
+                    log.warning(f"embedding cache: {model} returned no embeddings")
+                    return embeddings if isinstance(query, list) else None
+
+                computed = dict(zip(missing_keys.keys(), embeddings))
+                self.set_many(computed)
+                for idx in missing:
+                    vectors[idx] = computed[keys[idx]]
+
+            return vectors if isinstance(query, list) else vectors[0]
+
+        return cached_embedding_function
+
+    def stats(self) -> dict:
+        redis_total = self.redis_hits + self.redis_misses
+        return {
+            **self._cache.stats(),
+            "redis": self.use_redis,
+            "redis_hits": self.redis_hits,
+            "redis_misses": self.redis_misses,
+            "redis_hit_rate": self.redis_hits / redis_total if redis_total else 0.0,
+        }
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+
+embedding_cache = EmbeddingCache(
+    max_size=RAG_EMBEDDING_CACHE_SIZE,
+    max_bytes=RAG_EMBEDDING_CACHE_MAX_BYTES,
+    ttl=RAG_EMBEDDING_CACHE_TTL,
+    use_redis=ENABLE_RAG_EMBEDDING_CACHE_REDIS,
+)
@@ -0,0 +1,435 @@
+import asyncio
+import concurrent.futures
+import logging
+import random
+import threading
+from typing import Optional
+from urllib.parse import quote
+
+import aiohttp
+
+from open_webui.config import RAG_EMBEDDING_PREFIX_FIELD_NAME
+from open_webui.env import (
+    AIOHTTP_CLIENT_SESSION_SSL,
+    AIOHTTP_CLIENT_TIMEOUT,
+    ENABLE_FORWARD_USER_INFO_HEADERS,
+    RAG_EMBEDDING_BATCH_MAX_TOKENS,
+    RAG_EMBEDDING_CONCURRENT_REQUESTS,
+    RAG_EMBEDDING_MAX_RETRIES,
+    SRC_LOG_LEVELS,
+)
+from open_webui.models.users import UserModel
+from open_webui.utils.credit.usage import CreditDeduct
+from open_webui.utils.credit.utils import (
+    check_credit_by_user_id,
+    check_credit_by_user_id_async,
+)
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["RAG"])
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 bytes per token for latin text, CJK is ~3 bytes per char and token,
+    # 3 bytes keeps batches under the limit for both
+    return len(text.encode("utf-8", "ignore")) // 3 + 1
+
+
+def pack_batches(
+    texts: list[str], batch_size: int, max_tokens: int = 0
+) -> list[tuple[int, int]]:
+    """
+    Split texts into (start, end) ranges of at most batch_size texts and,
+    if max_tokens is set, about max_tokens tokens
+    """
+    batches = []
+    start = 0
+    tokens = 0
+    for idx, text in enumerate(texts):
+        text_tokens = estimate_tokens(text) if max_tokens else 0
+        if idx > start and (
+            idx - start >= batch_size
+            or (max_tokens and tokens + text_tokens > max_tokens)
+        ):
+            batches.append((start, idx))
+            start = idx
+            tokens = 0
+        tokens += text_tokens
+    if start < len(texts):
+        batches.append((start, len(texts)))
+    return batches
+
+
+class EmbeddingRequestError(Exception):
+    pass
+
+
+class EmbeddingClient:
+    """
+    Embedding client for the openai, azure_openai and ollama engines
+
+    Requests run on a private event loop thread with one pooled session, so
+    sync callers (document processing runs in worker threads) share
+    connections with async ones. Batches of one call are sent concurrently,
+    retried with backoff on 429/5xx, and billed as a single deduction.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = 4,
+        max_retries: int = 5,
+        batch_max_tokens: int = 0,
+        timeout: Optional[int] = None,
+    ) -> None:
+        self.concurrency = max(concurrency, 1)
+        self.max_retries = max_retries
+        self.batch_max_tokens = batch_max_tokens
+        self.timeout = timeout
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._lock = threading.Lock()
+
+    ####################
+    # Loop and session
+    ####################
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=loop.run_forever, name="embedding-client", daemon=True
+                ).start()
+                self._loop = loop
+            return self._loop
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self.concurrency * 2, ssl=AIOHTTP_CLIENT_SESSION_SSL
+                ),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                trust_env=True,
+            )
+        return self._session
+
+    async def _close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    async def close(self) -> None:
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None or loop.is_closed():
+            return
+        await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self._close(), loop))
+        loop.call_soon_threadsafe(loop.stop)
+
+    ####################
+    # Requests
+    ####################
+
+    async def _post(self, url: str, headers: dict, json_data: dict) -> dict:
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            try:
+                async with self._get_session().post(
+                    url, headers=headers, json=json_data
+                ) as r:
+                    if r.status == 429 or r.status >= 500:
+                        error = f"{r.status}: {await r.text()}"
+                        retry_after = r.headers.get("Retry-After")
+                    else:
+                        r.raise_for_status()
+                        return await r.json()
+            except aiohttp.ClientResponseError:
+                raise
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = str(e) or e.__class__.__name__
+
+            if attempt == self.max_retries:
+                break
+            try:
+                delay = float(retry_after)
+            except (TypeError, ValueError):
+                delay = min(2**attempt, 30) * (0.5 + random.random() / 2)
+            log.warning(
+                f"embedding request failed ({error}), retry {attempt + 1} in {delay:.1f}s"
+            )
+            await asyncio.sleep(delay)
+        raise EmbeddingRequestError(error)
+
+    @staticmethod
+    def _get_user_headers(user: Optional[UserModel]) -> dict:
+        if ENABLE_FORWARD_USER_INFO_HEADERS and user:
+            return {
+                "X-OpenWebUI-User-Name": quote(user.name, safe=" "),
+                "X-OpenWebUI-User-Id": user.id,
+                "X-OpenWebUI-User-Email": user.email,
+                "X-OpenWebUI-User-Role": user.role,
+            }
+        return {}
+
+    async def _embed_batch(
+        self,
+        engine: str,
+        model: str,
+        texts: list[str],
+        prefix: Optional[str],
+        url: str,
+        key: str,
+        azure_api_version: Optional[str],
+        user: Optional[UserModel],
+    ) -> tuple[list[list[float]], Optional[int]]:
+        """
+        Embeddings and prompt tokens reported by the engine, if any
+        """
+        json_data = {"input": texts}
+        if isinstance(RAG_EMBEDDING_PREFIX_FIELD_NAME, str) and isinstance(prefix, str):
+            json_data[RAG_EMBEDDING_PREFIX_FIELD_NAME] = prefix
+
+        headers = {"Content-Type": "application/json", **self._get_user_headers(user)}
+        if engine == "azure_openai":
+            headers["api-key"] = key
+            url = f"{url}/openai/deployments/{model}/embeddings?api-version={azure_api_version}"
+        else:
+            headers["Authorization"] = f"Bearer {key}"
+            json_data["model"] = model
+            url = f"{url}/api/embed" if engine == "ollama" else f"{url}/embeddings"
+
+        data = await self._post(url, headers, json_data)
+
+        if engine == "ollama":
+            if "embeddings" not in data:
+                raise EmbeddingRequestError("Something went wrong :/")
+            return data["embeddings"], None
+
+        if "data" not in data:
+            raise EmbeddingRequestError("Something went wrong :/")
+        prompt_tokens = (data.get("usage") or {}).get("prompt_tokens")
+        return [elem["embedding"] for elem in data["data"]], prompt_tokens
+
+    async def _embed(
+        self,
+        engine: str,
+        model: str,
+        texts: list[str],
+        prefix: Optional[str],
+        url: str,
+        key: str,
+        batch_size: int,
+        azure_api_version: Optional[str],
+        user: Optional[UserModel],
+    ) -> tuple[list[list[float]], Optional[int]]:
+        """
+        Embeddings of all batches and the prompt tokens if every batch had them
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def embed_batch(start: int, end: int):
+            async with semaphore:
+                log.debug(f"embedding batch {start}:{end} of {len(texts)} ({model})")
+                return await self._embed_batch(
+                    engine,
+                    model,
+                    texts[start:end],
+                    prefix,
+                    url,
+                    key,
+                    azure_api_version,
+                    user,
+                )
+
+        results = await asyncio.gather(
+            *[
+                embed_batch(start, end)
+                for start, end in pack_batches(texts, batch_size, self.batch_max_tokens)
+            ]
+        )
+
+        embeddings = [embedding for batch, _ in results for embedding in batch]
+        if len(embeddings) != len(texts):
+            raise EmbeddingRequestError(
+                f"got {len(embeddings)} embeddings for {len(texts)} texts"
+            )
+
+        prompt_tokens = [tokens for _, tokens in results]
+        if all(tokens is not None for tokens in prompt_tokens):
+            return embeddings, sum(prompt_tokens)
+        return embeddings, None
+
+    async def _try_embed(
+        self,
+        engine: str,
+        model: str,
+        texts: list[str],
+        prefix: Optional[str],
+        url: str,
+        key: str,
+        batch_size: int,
+        azure_api_version: Optional[str],
+        user: Optional[UserModel],
+    ) -> Optional[tuple[list[list[float]], Optional[int]]]:
+        try:
+            return await self._embed(
+                engine,
+                model,
+                texts,
+                prefix,
+                url,
+                key,
+                batch_size,
+                azure_api_version,
+                user,
+            )
+        except Exception as e:
+            log.exception(f"Error generating {engine} embeddings: {e}")
+            return None
+
+    def _submit(
+        self,
+        engine: str,
+        model: str,
+        texts: list[str],
+        prefix: Optional[str],
+        url: str,
+        key: str,
+        batch_size: int,
+        azure_api_version: Optional[str],
+        user: Optional[UserModel],
+    ) -> concurrent.futures.Future:
+        """
+        Run the requests on the client loop. Only the HTTP calls run there,
+        billing touches the database and stays on the caller's loop or thread.
+        """
+        if prefix is not None and RAG_EMBEDDING_PREFIX_FIELD_NAME is None:
+            texts = [f"{prefix}{text}" for text in texts]
+
+        return asyncio.run_coroutine_threadsafe(
+            self._try_embed(
+                engine,
+                model,
+                texts,
+                prefix,
+                url,
+                key,
+                max(batch_size or 1, 1),
+                azure_api_version,
+                user,
+            ),
+            self._get_loop(),
+        )
+
+    @staticmethod
+    def _get_credit_deduct(
+        user: UserModel, model: str, texts: list[str]
+    ) -> CreditDeduct:
+        # one deduction for the whole call instead of one per batch
+        return CreditDeduct(
+            user=user,
+            model_id=model,
+            body={"messages": [{"role": "user", "content": "".join(texts)}]},
+            is_stream=False,
+            is_embedding=True,
+        )
+
+    @staticmethod
+    def _set_usage(
+        credit_deduct: CreditDeduct, texts: list[str], prompt_tokens: Optional[int]
+    ) -> None:
+        if prompt_tokens is not None:
+            credit_deduct.is_official_usage = True
+            credit_deduct.usage.prompt_tokens = prompt_tokens
+            credit_deduct.usage.total_tokens = prompt_tokens
+        else:
+            credit_deduct.run("".join(texts))
+
+    async def embed_async(
+        self,
+        engine: str,
+        model: str,
+        texts: list[str],
+        prefix: Optional[str] = None,
+        url: str = "",
+        key: str = "",
+        batch_size: int = 1,
+        azure_api_version: Optional[str] = None,
+        user: Optional[UserModel] = None,
+    ) -> Optional[list[list[float]]]:
+        """
+        Embed texts from async code, returns None if the engine failed
+        """
+        if user:
+            await check_credit_by_user_id_async(
+                user_id=user.id, form_data={}, is_embedding=True
+            )
+
+        result = await asyncio.wrap_future(
+            self._submit(
+                engine,
+                model,
+                texts,
+                prefix,
+                url,
+                key,
+                batch_size,
+                azure_api_version,
+                user,
+            )
+        )
+        if result is None:
+            return None
+        embeddings, prompt_tokens = result
+
+        if user:
+            async with self._get_credit_deduct(user, model, texts) as credit_deduct:
+                self._set_usage(credit_deduct, texts, prompt_tokens)
+        return embeddings
+
+    def embed(
+        self,
+        engine: str,
+        model: str,
+        texts: list[str],
+        prefix: Optional[str] = None,
+        url: str = "",
+        key: str = "",
+        batch_size: int = 1,
+        azure_api_version: Optional[str] = None,
+        user: Optional[UserModel] = None,
+    ) -> Optional[list[list[float]]]:
+        """
+        Embed texts from sync code, returns None if the engine failed. Blocks
+        until done, async code awaits embed_async instead.
+        """
+        if user:
+            check_credit_by_user_id(user_id=user.id, form_data={}, is_embedding=True)
+
+        result = self._submit(
+            engine,
+            model,
+            texts,
+            prefix,
+            url,
+            key,
+            batch_size,
+            azure_api_version,
+            user,
+        ).result()
+        if result is None:
+            return None
+        embeddings, prompt_tokens = result
+
+        if user:
+            with self._get_credit_deduct(user, model, texts) as credit_deduct:
+                self._set_usage(credit_deduct, texts, prompt_tokens)
+        return embeddings
+
+
+embedding_client = EmbeddingClient(
+    concurrency=RAG_EMBEDDING_CONCURRENT_REQUESTS,
+    max_retries=RAG_EMBEDDING_MAX_RETRIES,
+    batch_max_tokens=RAG_EMBEDDING_BATCH_MAX_TOKENS,
+    timeout=AIOHTTP_CLIENT_TIMEOUT,
+)
@@ -3,6 +3,7 @@ import logging
 import ftfy
 import sys
 import json
+from typing import Iterator
 
 from azure.identity import DefaultAzureCredential
 from langchain_community.document_loaders import (
@@ -242,6 +243,23 @@ class Loader:
             for doc in docs
         ]
 
+    def lazy_load(
+        self, filename: str, file_content_type: str, file_path: str
+    ) -> Iterator[Document]:
+        """
+        Yield documents as the underlying loader produces them (e.g. per pdf page)
+        """
+        loader = self._get_loader(filename, file_content_type, file_path)
+        try:
+            docs = loader.lazy_load()
+        except (AttributeError, NotImplementedError):
+            docs = loader.load()
+
+        for doc in docs:
+            yield Document(
+                page_content=ftfy.fix_text(doc.page_content), metadata=doc.metadata
+            )
+
     def _is_text_file(self, file_ext: str, file_content_type: str) -> bool:
         return file_ext in known_source_ext or (
             file_content_type
@@ -1,45 +1,52 @@
+import ast
+import asyncio
+import copy
 import logging
 import os
-from typing import Optional, Union
+import time
+from typing import Optional, Sequence, Union
 
-import requests
 import hashlib
+import threading
 from concurrent.futures import ThreadPoolExecutor
-import time
 
-from urllib.parse import quote
 from huggingface_hub import snapshot_download
-from langchain.retrievers import ContextualCompressionRetriever, EnsembleRetriever
-from langchain_community.retrievers import BM25Retriever
+from langchain.retrievers import EnsembleRetriever
 from langchain_core.documents import Document
 
 from open_webui.config import VECTOR_DB
 from open_webui.retrieval.vector.factory import VECTOR_DB_CLIENT
+from open_webui.retrieval.vector.version import collection_versions
 
+from open_webui.models.bm25 import BM25Index
+from open_webui.models.embeddings import ChunkEmbeddings, get_chunk_hash
 from open_webui.models.users import UserModel
+from open_webui.retrieval.embedding_cache import embedding_cache
+from open_webui.retrieval.embeddings import embedding_client
 from open_webui.models.files import Files
 from open_webui.models.knowledge import Knowledges
 
 from open_webui.models.chats import Chats
 from open_webui.models.notes import Notes
 
-from open_webui.retrieval.vector.main import GetResult
 from open_webui.utils.access_control import has_access
+from open_webui.utils.cache import LRUCache
 from open_webui.utils.misc import get_message_list
 
 
 from open_webui.env import (
     SRC_LOG_LEVELS,
     OFFLINE_MODE,
-    ENABLE_FORWARD_USER_INFO_HEADERS,
+    RAG_EMBEDDING_DEDUP_PRUNE_DAYS,
+    RAG_EMBEDDING_DEDUP_PRUNE_INTERVAL,
+    RAG_RESULT_CACHE_SIZE,
+    RAG_RESULT_CACHE_TTL,
 )
 from open_webui.config import (
     RAG_EMBEDDING_QUERY_PREFIX,
     RAG_EMBEDDING_CONTENT_PREFIX,
     RAG_EMBEDDING_PREFIX_FIELD_NAME,
 )
-from open_webui.utils.credit.usage import CreditDeduct
-from open_webui.utils.credit.utils import check_credit_by_user_id
 
 log = logging.getLogger(__name__)
 log.setLevel(SRC_LOG_LEVELS["RAG"])
@@ -83,6 +90,62 @@ class VectorSearchRetriever(BaseRetriever):
         return results
 
 
+class BM25SearchRetriever(BaseRetriever):
+    collection_name: Any
+    top_k: int
+
+    def _get_relevant_documents(
+        self,
+        query: str,
+        *,
+        run_manager: CallbackManagerForRetrieverRun,
+    ) -> list[Document]:
+        result = BM25Index.search(
+            collection_name=self.collection_name, query=query, limit=self.top_k
+        )
+        if result is None:
+            return []
+
+        return [
+            Document(metadata=metadata, page_content=document)
+            for document, metadata in zip(result.documents, result.metadatas)
+        ]
+
+
+# Striped locks, so concurrent inserts into a collection build its index once
+_bm25_index_locks = [threading.Lock() for _ in range(64)]
+
+
+def ensure_bm25_index(collection_name: str) -> None:
+    """
+    Build the BM25 index of a collection stored before the index existed
+
+    Vector db errors are raised and nothing is recorded, so the build is
+    retried on the next call.
+    """
+    if BM25Index.has_collection(collection_name):
+        return
+
+    with _bm25_index_locks[hash(collection_name) % len(_bm25_index_locks)]:
+        if BM25Index.has_collection(collection_name):
+            return
+
+        log.info(f"ensure_bm25_index:build {collection_name}")
+        # not created yet, some clients raise from get() instead of returning None
+        result = (
+            VECTOR_DB_CLIENT.get(collection_name=collection_name)
+            if VECTOR_DB_CLIENT.has_collection(collection_name=collection_name)
+            else None
+        )
+
+        BM25Index.add(
+            collection_name=collection_name,
+            ids=result.ids[0] if result else [],
+            texts=result.documents[0] if result else [],
+            metadatas=result.metadatas[0] if result else [],
+        )
+
+
 def query_doc(
     collection_name: str, query_embedding: list[float], k: int, user: UserModel = None
 ):
@@ -117,9 +180,65 @@ def get_doc(collection_name: str, user: UserModel = None):
         raise e
 
 
+def get_hybrid_search_candidates(
+    collection_name: str,
+    query: str,
+    embedding_function,
+    k: int,
+    hybrid_bm25_weight: float,
+) -> list[Document]:
+    bm25_retriever = BM25SearchRetriever(
+        collection_name=collection_name,
+        top_k=k,
+    )
+
+    vector_search_retriever = VectorSearchRetriever(
+        collection_name=collection_name,
+        embedding_function=embedding_function,
+        top_k=k,
+    )
+
+    if hybrid_bm25_weight <= 0:
+        ensemble_retriever = EnsembleRetriever(
+            retrievers=[vector_search_retriever], weights=[1.0]
+        )
+    elif hybrid_bm25_weight >= 1:
+        ensemble_retriever = EnsembleRetriever(
+            retrievers=[bm25_retriever], weights=[1.0]
+        )
+    else:
+        ensemble_retriever = EnsembleRetriever(
+            retrievers=[bm25_retriever, vector_search_retriever],
+            weights=[hybrid_bm25_weight, 1.0 - hybrid_bm25_weight],
+        )
+
+    return ensemble_retriever.invoke(query)
+
+
+def get_hybrid_search_result(
+    result: Sequence[Document], k: int, k_reranker: int
+) -> dict:
+    distances = [d.metadata.get("score") for d in result]
+    documents = [d.page_content for d in result]
+    metadatas = [d.metadata for d in result]
+
+    # retrieve only min(k, k_reranker) items, sort and cut by distance if k < k_reranker
+    if k < k_reranker and result:
+        sorted_items = sorted(
+            zip(distances, metadatas, documents), key=lambda x: x[0], reverse=True
+        )
+        sorted_items = sorted_items[:k]
+        distances, documents, metadatas = map(list, zip(*sorted_items))
+
+    return {
+        "distances": [distances],
+        "documents": [documents],
+        "metadatas": [metadatas],
+    }
+
+
 def query_doc_with_hybrid_search(
     collection_name: str,
-    collection_result: GetResult,
     query: str,
     embedding_function,
     k: int,
@@ -129,37 +248,16 @@ def query_doc_with_hybrid_search(
     hybrid_bm25_weight: float,
 ) -> dict:
     try:
-        if not collection_result.documents[0]:
+        ensure_bm25_index(collection_name)
+        if not BM25Index.get_doc_count(collection_name):
             log.warning(f"query_doc_with_hybrid_search:no_docs {collection_name}")
             return {"documents": [], "metadatas": [], "distances": []}
 
         log.debug(f"query_doc_with_hybrid_search:doc {collection_name}")
 
-        bm25_retriever = BM25Retriever.from_texts(
-            texts=collection_result.documents[0],
-            metadatas=collection_result.metadatas[0],
+        documents = get_hybrid_search_candidates(
+            collection_name, query, embedding_function, k, hybrid_bm25_weight
         )
-        bm25_retriever.k = k
-
-        vector_search_retriever = VectorSearchRetriever(
-            collection_name=collection_name,
-            embedding_function=embedding_function,
-            top_k=k,
-        )
-
-        if hybrid_bm25_weight <= 0:
-            ensemble_retriever = EnsembleRetriever(
-                retrievers=[vector_search_retriever], weights=[1.0]
-            )
-        elif hybrid_bm25_weight >= 1:
-            ensemble_retriever = EnsembleRetriever(
-                retrievers=[bm25_retriever], weights=[1.0]
-            )
-        else:
-            ensemble_retriever = EnsembleRetriever(
-                retrievers=[bm25_retriever, vector_search_retriever],
-                weights=[hybrid_bm25_weight, 1.0 - hybrid_bm25_weight],
-            )
 
         compressor = RerankCompressor(
             embedding_function=embedding_function,
@@ -168,30 +266,10 @@ def query_doc_with_hybrid_search(
             r_score=r,
         )
 
-        compression_retriever = ContextualCompressionRetriever(
-            base_compressor=compressor, base_retriever=ensemble_retriever
+        result = get_hybrid_search_result(
+            compressor.compress_documents(documents, query), k, k_reranker
         )
 
-        result = compression_retriever.invoke(query)
-
-        distances = [d.metadata.get("score") for d in result]
-        documents = [d.page_content for d in result]
-        metadatas = [d.metadata for d in result]
-
-        # retrieve only min(k, k_reranker) items, sort and cut by distance if k < k_reranker
-        if k < k_reranker:
-            sorted_items = sorted(
-                zip(distances, metadatas, documents), key=lambda x: x[0], reverse=True
-            )
-            sorted_items = sorted_items[:k]
-            distances, documents, metadatas = map(list, zip(*sorted_items))
-
-        result = {
-            "distances": [distances],
-            "documents": [documents],
-            "metadatas": [metadatas],
-        }
-
         log.info(
             "query_doc_with_hybrid_search:result "
             + f'{result["metadatas"]} {result["distances"]}'
@@ -344,20 +422,15 @@ def query_collection_with_hybrid_search(
 ) -> dict:
     results = []
     error = False
-    # Fetch collection data once per collection sequentially
-    # Avoid fetching the same data multiple times later
-    collection_results = {}
+    # Build missing BM25 indexes once per collection sequentially
+    # Skip collections that failed later
+    indexed_collections = set()
     for collection_name in collection_names:
         try:
-            log.debug(
-                f"query_collection_with_hybrid_search:VECTOR_DB_CLIENT.get:collection {collection_name}"
-            )
-            collection_results[collection_name] = VECTOR_DB_CLIENT.get(
-                collection_name=collection_name
-            )
+            ensure_bm25_index(collection_name)
+            indexed_collections.add(collection_name)
         except Exception as e:
-            log.exception(f"Failed to fetch collection {collection_name}: {e}")
-            collection_results[collection_name] = None
+            log.exception(f"Failed to index collection {collection_name}: {e}")
 
     log.info(
         f"Starting hybrid search for {len(queries)} queries in {len(collection_names)} collections..."
@@ -365,40 +438,52 @@ def query_collection_with_hybrid_search(
 
     def process_query(collection_name, query):
         try:
-            result = query_doc_with_hybrid_search(
-                collection_name=collection_name,
-                collection_result=collection_results[collection_name],
-                query=query,
-                embedding_function=embedding_function,
-                k=k,
-                reranking_function=reranking_function,
-                k_reranker=k_reranker,
-                r=r,
-                hybrid_bm25_weight=hybrid_bm25_weight,
+            if not BM25Index.get_doc_count(collection_name):
+                log.warning(f"query_doc_with_hybrid_search:no_docs {collection_name}")
+                return [], None
+
+            documents = get_hybrid_search_candidates(
+                collection_name, query, embedding_function, k, hybrid_bm25_weight
             )
-            return result, None
+            return documents, None
         except Exception as e:
             log.exception(f"Error when querying the collection with hybrid_search: {e}")
             return None, e
 
     # Prepare tasks for all collections and queries
-    # Avoid running any tasks for collections that failed to fetch data (have assigned None)
+    # Avoid running any tasks for collections that failed to be indexed
     tasks = [
-        (cn, q)
-        for cn in collection_names
-        if collection_results[cn] is not None
-        for q in queries
+        (cn, q) for cn in collection_names if cn in indexed_collections for q in queries
     ]
 
     with ThreadPoolExecutor() as executor:
         future_results = [executor.submit(process_query, cn, q) for cn, q in tasks]
         task_results = [future.result() for future in future_results]
 
-    for result, err in task_results:
+    items = []
+    for (_, query), (documents, err) in zip(tasks, task_results):
         if err is not None:
             error = True
-        elif result is not None:
-            results.append(result)
+        else:
+            items.append((query, documents))
+
+    # score the candidates of all collections and queries at once
+    try:
+        scores = get_relevance_scores(items, embedding_function, reranking_function)
+        for (_, documents), document_scores in zip(items, scores):
+            if document_scores is None:
+                error = True
+                continue
+            results.append(
+                get_hybrid_search_result(
+                    rerank_documents(documents, document_scores, k_reranker, r),
+                    k,
+                    k_reranker,
+                )
+            )
+    except Exception as e:
+        log.exception(f"Error when reranking hybrid search results: {e}")
+        error = True
 
     if error and not results:
         raise Exception(
@@ -418,40 +503,32 @@ def get_embedding_function(
     azure_api_version=None,
 ):
     if embedding_engine == "":
-        return lambda query, prefix=None, user=None: embedding_function.encode(
-            query, **({"prompt": prefix} if prefix else {})
-        ).tolist()
-    elif embedding_engine in ["ollama", "openai", "azure_openai"]:
-        func = lambda query, prefix=None, user=None: generate_embeddings(
-            engine=embedding_engine,
-            model=embedding_model,
-            text=query,
-            prefix=prefix,
-            url=url,
-            key=key,
-            user=user,
-            azure_api_version=azure_api_version,
+        return embedding_cache.wrap(
+            lambda query, prefix=None, user=None: embedding_function.encode(
+                query, **({"prompt": prefix} if prefix else {})
+            ).tolist(),
+            embedding_engine,
+            embedding_model,
         )
+    elif embedding_engine in ["ollama", "openai", "azure_openai"]:
 
-        def generate_multiple(query, prefix, user, func):
-            if isinstance(query, list):
-                embeddings = []
-                for i in range(0, len(query), embedding_batch_size):
-                    batch_embeddings = func(
-                        query[i : i + embedding_batch_size],
-                        prefix=prefix,
-                        user=user,
-                    )
-
-                    if isinstance(batch_embeddings, list):
-                        embeddings.extend(batch_embeddings)
+        def embed(query, prefix=None, user=None):
+            embeddings = embedding_client.embed(
+                engine=embedding_engine,
+                model=embedding_model,
+                texts=query if isinstance(query, list) else [query],
+                prefix=prefix,
+                url=url,
+                key=key,
+                batch_size=embedding_batch_size,
+                azure_api_version=azure_api_version,
+                user=user,
+            )
+            if isinstance(query, list) or embeddings is None:
                 return embeddings
-            else:
-                return func(query, prefix, user)
+            return embeddings[0]
 
-        return lambda query, prefix=None, user=None: generate_multiple(
-            query, prefix, user, func
-        )
+        return embedding_cache.wrap(embed, embedding_engine, embedding_model)
     else:
         raise ValueError(f"Unknown embedding engine: {embedding_engine}")
 
@@ -467,6 +544,63 @@ def get_reranking_function(reranking_engine, reranking_model, reranking_function
         return lambda sentences, user=None: reranking_function.predict(sentences)
 
 
+retrieval_result_cache = LRUCache(
+    max_size=max(RAG_RESULT_CACHE_SIZE, 1), ttl=RAG_RESULT_CACHE_TTL
+)
+# a write whose version bump failed may leave cached results stale
+collection_versions.on_bump_error = retrieval_result_cache.clear
+
+
+def get_retrieval_cache_key(
+    request,
+    collection_names: list[str],
+    queries: list[str],
+    k: int,
+    reranking: bool,
+    k_reranker: int,
+    r: float,
+    hybrid_bm25_weight: float,
+    hybrid_search: bool,
+    versions: Optional[tuple] = None,
+) -> Optional[tuple]:
+    """
+    Key of a search over the collections at their current versions, None if
+    results can't be cached. Read before searching, so a result is never
+    cached under a version older than the data it was computed from.
+    Pass the versions of an earlier key to key another search mode.
+    """
+    if RAG_RESULT_CACHE_SIZE <= 0 or not collection_versions.shared:
+        return None
+
+    collection_names = sorted(collection_names)
+    if versions is None:
+        versions = collection_versions.get_many(collection_names)
+    if versions is None:
+        return None
+
+    config = request.app.state.config
+    return (
+        tuple(collection_names),
+        versions,
+        tuple(queries),
+        k,
+        config.RAG_EMBEDDING_ENGINE,
+        config.RAG_EMBEDDING_MODEL,
+        hybrid_search,
+        (
+            (
+                config.RAG_RERANKING_ENGINE if reranking else None,
+                config.RAG_RERANKING_MODEL if reranking else None,
+                k_reranker,
+                r,
+                hybrid_bm25_weight,
+            )
+            if hybrid_search
+            else None
+        ),
+    )
+
+
 def get_sources_from_items(
     request,
     items,
@@ -680,8 +814,27 @@ def get_sources_from_items(
                 if full_context:
                     query_result = get_all_items_from_collections(collection_names)
                 else:
-                    query_result = None  # Initialize to None
-                    if hybrid_search:
+                    cache_key = get_retrieval_cache_key(
+                        request,
+                        collection_names,
+                        queries,
+                        k,
+                        reranking_function is not None,
+                        k_reranker,
+                        r,
+                        hybrid_bm25_weight,
+                        hybrid_search,
+                    )
+                    query_result = (
+                        copy.deepcopy(retrieval_result_cache.get(cache_key))
+                        if cache_key is not None
+                        else None
+                    )
+                    cached = query_result is not None
+                    if cached:
+                        log.debug(f"retrieval cache hit for {collection_names}")
+
+                    if hybrid_search and query_result is None:
                         try:
                             query_result = query_collection_with_hybrid_search(
                                 collection_names=collection_names,
@@ -699,13 +852,36 @@ def get_sources_from_items(
                             )
 
                     # fallback to non-hybrid search
-                    if not hybrid_search and query_result is None:
+                    if query_result is None:
                         query_result = query_collection(
                             collection_names=collection_names,
                             queries=queries,
                             embedding_function=embedding_function,
                             k=k,
                         )
+                        # cache the fallback as the non-hybrid search it is
+                        if hybrid_search and cache_key is not None:
+                            cache_key = get_retrieval_cache_key(
+                                request,
+                                collection_names,
+                                queries,
+                                k,
+                                reranking_function is not None,
+                                k_reranker,
+                                r,
+                                hybrid_bm25_weight,
+                                False,
+                                versions=cache_key[1],
+                            )
+
+                    if (
+                        cache_key is not None
+                        and not cached
+                        and query_result is not None
+                    ):
+                        retrieval_result_cache.set(
+                            cache_key, copy.deepcopy(query_result)
+                        )
             except Exception as e:
                 log.exception(e)
 
@@ -777,6 +953,33 @@ def get_model_path(model: str, update_model: bool = False):
         return model
 
 
+def _generate_batch_embeddings(
+    engine: str,
+    model: str,
+    texts: list[str],
+    url: str,
+    key: str,
+    prefix: Optional[str],
+    user: Optional[UserModel],
+    azure_api_version: Optional[str] = None,
+) -> Optional[list[list[float]]]:
+    log.debug(
+        f"generate_{engine}_batch_embeddings:model {model} batch size: {len(texts)}"
+    )
+    # texts already carry the prefix unless it is sent as a field
+    return embedding_client.embed(
+        engine=engine,
+        model=model,
+        texts=texts,
+        prefix=prefix if RAG_EMBEDDING_PREFIX_FIELD_NAME is not None else None,
+        url=url,
+        key=key,
+        batch_size=max(len(texts), 1),
+        azure_api_version=azure_api_version,
+        user=user,
+    )
+
+
 def generate_openai_batch_embeddings(
     model: str,
     texts: list[str],
@@ -785,63 +988,7 @@ def generate_openai_batch_embeddings(
     prefix: str = None,
     user: UserModel = None,
 ) -> Optional[list[list[float]]]:
-
-    # check credit
-    if user:
-        check_credit_by_user_id(user_id=user.id, form_data={}, is_embedding=True)
-
-    try:
-        log.debug(
-            f"generate_openai_batch_embeddings:model {model} batch size: {len(texts)}"
-        )
-        json_data = {"input": texts, "model": model}
-        if isinstance(RAG_EMBEDDING_PREFIX_FIELD_NAME, str) and isinstance(prefix, str):
-            json_data[RAG_EMBEDDING_PREFIX_FIELD_NAME] = prefix
-
-        r = requests.post(
-            f"{url}/embeddings",
-            headers={
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {key}",
-                **(
-                    {
-                        "X-OpenWebUI-User-Name": quote(user.name, safe=" "),
-                        "X-OpenWebUI-User-Id": user.id,
-                        "X-OpenWebUI-User-Email": user.email,
-                        "X-OpenWebUI-User-Role": user.role,
-                    }
-                    if ENABLE_FORWARD_USER_INFO_HEADERS and user
-                    else {}
-                ),
-            },
-            json=json_data,
-        )
-        r.raise_for_status()
-        data = r.json()
-        if "data" in data:
-            # calculate usage
-            if user:
-                input_text = "".join(texts)
-                with CreditDeduct(
-                    user=user,
-                    model_id=model,
-                    body={"messages": [{"role": "user", "content": input_text}]},
-                    is_stream=False,
-                    is_embedding=True,
-                ) as credit_deduct:
-                    if "usage" in data:
-                        credit_deduct.is_official_usage = True
-                        prompt_tokens = data["usage"]["prompt_tokens"]
-                        credit_deduct.usage.prompt_tokens = prompt_tokens
-                        credit_deduct.usage.total_tokens = prompt_tokens
-                    else:
-                        credit_deduct.run(input_text)
-            return [elem["embedding"] for elem in data["data"]]
-        else:
-            raise "Something went wrong :/"
-    except Exception as e:
-        log.exception(f"Error generating openai batch embeddings: {e}")
-        return None
+    return _generate_batch_embeddings("openai", model, texts, url, key, prefix, user)
 
 
 def generate_azure_openai_batch_embeddings(
@@ -853,72 +1000,9 @@ def generate_azure_openai_batch_embeddings(
     prefix: str = None,
     user: UserModel = None,
 ) -> Optional[list[list[float]]]:
-
-    # check credit
-    if user:
-        check_credit_by_user_id(user_id=user.id, form_data={}, is_embedding=True)
-
-    try:
-        log.debug(
-            f"generate_azure_openai_batch_embeddings:deployment {model} batch size: {len(texts)}"
-        )
-        json_data = {"input": texts}
-        if isinstance(RAG_EMBEDDING_PREFIX_FIELD_NAME, str) and isinstance(prefix, str):
-            json_data[RAG_EMBEDDING_PREFIX_FIELD_NAME] = prefix
-
-        url = f"{url}/openai/deployments/{model}/embeddings?api-version={version}"
-
-        for _ in range(5):
-            r = requests.post(
-                url,
-                headers={
-                    "Content-Type": "application/json",
-                    "api-key": key,
-                    **(
-                        {
-                            "X-OpenWebUI-User-Name": quote(user.name, safe=" "),
-                            "X-OpenWebUI-User-Id": user.id,
-                            "X-OpenWebUI-User-Email": user.email,
-                            "X-OpenWebUI-User-Role": user.role,
-                        }
-                        if ENABLE_FORWARD_USER_INFO_HEADERS and user
-                        else {}
-                    ),
-                },
-                json=json_data,
-            )
-            if r.status_code == 429:
-                retry = float(r.headers.get("Retry-After", "1"))
-                time.sleep(retry)
-                continue
-            r.raise_for_status()
-            data = r.json()
-            if "data" in data:
-                # calculate usage
-                if user:
-                    input_text = "".join(texts)
-                    with CreditDeduct(
-                        user=user,
-                        model_id=model,
-                        body={"messages": [{"role": "user", "content": input_text}]},
-                        is_stream=False,
-                        is_embedding=True,
-                    ) as credit_deduct:
-                        if "usage" in data:
-                            credit_deduct.is_official_usage = True
-                            prompt_tokens = data["usage"]["prompt_tokens"]
-                            credit_deduct.usage.prompt_tokens = prompt_tokens
-                            credit_deduct.usage.total_tokens = prompt_tokens
-                        else:
-                            credit_deduct.run(input_text)
-                # result
-                return [elem["embedding"] for elem in data["data"]]
-            else:
-                raise Exception("Something went wrong :/")
-        return None
-    except Exception as e:
-        log.exception(f"Error generating azure openai batch embeddings: {e}")
-        return None
+    return _generate_batch_embeddings(
+        "azure_openai", model, texts, url, key, prefix, user, version
+    )
 
 
 def generate_ollama_batch_embeddings(
@@ -929,60 +1013,7 @@ def generate_ollama_batch_embeddings(
     prefix: str = None,
     user: UserModel = None,
 ) -> Optional[list[list[float]]]:
-
-    # check credit
-    if user:
-        check_credit_by_user_id(user_id=user.id, form_data={}, is_embedding=True)
-
-    try:
-        log.debug(
-            f"generate_ollama_batch_embeddings:model {model} batch size: {len(texts)}"
-        )
-        json_data = {"input": texts, "model": model}
-        if isinstance(RAG_EMBEDDING_PREFIX_FIELD_NAME, str) and isinstance(prefix, str):
-            json_data[RAG_EMBEDDING_PREFIX_FIELD_NAME] = prefix
-
-        r = requests.post(
-            f"{url}/api/embed",
-            headers={
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {key}",
-                **(
-                    {
-                        "X-OpenWebUI-User-Name": quote(user.name, safe=" "),
-                        "X-OpenWebUI-User-Id": user.id,
-                        "X-OpenWebUI-User-Email": user.email,
-                        "X-OpenWebUI-User-Role": user.role,
-                    }
-                    if ENABLE_FORWARD_USER_INFO_HEADERS
-                    else {}
-                ),
-            },
-            json=json_data,
-        )
-        r.raise_for_status()
-        data = r.json()
-
-        if "embeddings" in data:
-
-            # calculate usage
-            if user:
-                input_text = "".join(texts)
-                with CreditDeduct(
-                    user=user,
-                    model_id=model,
-                    body={"messages": [{"role": "user", "content": input_text}]},
-                    is_stream=False,
-                    is_embedding=True,
-                ) as credit_deduct:
-                    credit_deduct.run(input_text)
-
-            return data["embeddings"]
-        else:
-            raise "Something went wrong :/"
-    except Exception as e:
-        log.exception(f"Error generating ollama batch embeddings: {e}")
-        return None
+    return _generate_batch_embeddings("ollama", model, texts, url, key, prefix, user)
 
 
 def generate_embeddings(
@@ -1036,10 +1067,221 @@ def generate_embeddings(
 import operator
 from typing import Optional, Sequence
 
+import numpy as np
+
 from langchain_core.callbacks import Callbacks
 from langchain_core.documents import BaseDocumentCompressor, Document
 
 
+def get_document_vectors(
+    documents: Sequence[Document], embedding_function, dim: Optional[int] = None
+) -> list[list[float]]:
+    """
+    Vectors of retrieved chunks, read from the chunk embedding table when
+    stored at ingestion and embedded in one call (deduplicated) otherwise
+    """
+    texts = [doc.page_content.replace("\n", " ") for doc in documents]
+    vectors: list[Optional[list[float]]] = [None] * len(documents)
+
+    groups = {}
+    for idx, doc in enumerate(documents):
+        embedding_config = (doc.metadata or {}).get("embedding_config")
+        if isinstance(embedding_config, str):
+            # stringified by stringify_metadata
+            try:
+                embedding_config = ast.literal_eval(embedding_config)
+            except (ValueError, SyntaxError):
+                embedding_config = None
+        if isinstance(embedding_config, dict) and embedding_config.get("model"):
+            key = (embedding_config.get("engine", ""), embedding_config["model"])
+            groups.setdefault(key, []).append(idx)
+
+    for (engine, model), indexes in groups.items():
+        chunk_hashes = [
+            get_chunk_hash(texts[idx], RAG_EMBEDDING_CONTENT_PREFIX) for idx in indexes
+        ]
+        try:
+            stored = ChunkEmbeddings.get_vectors(
+                engine, model, chunk_hashes, touch=False
+            )
+        except Exception as e:
+            log.warning(f"Error reading stored chunk embeddings: {e}")
+            stored = {}
+        for idx, chunk_hash in zip(indexes, chunk_hashes):
+            vector = stored.get(chunk_hash)
+            # another model than the query's, embed again
+            if vector is not None and (dim is None or len(vector) == dim):
+                vectors[idx] = vector
+
+    missing = {}
+    for idx, vector in enumerate(vectors):
+        if vector is None:
+            missing.setdefault(texts[idx], []).append(idx)
+    if missing:
+        embeddings = embedding_function(
+            list(missing.keys()), RAG_EMBEDDING_CONTENT_PREFIX
+        )
+        for indexes, embedding in zip(missing.values(), embeddings):
+            for idx in indexes:
+                vectors[idx] = embedding
+
+    return vectors
+
+
+async def periodic_chunk_embedding_prune():
+    """
+    Delete stored chunk embeddings not reused by an ingestion for
+    RAG_EMBEDDING_DEDUP_PRUNE_DAYS, every RAG_EMBEDDING_DEDUP_PRUNE_INTERVAL
+    """
+    while True:
+        before = int(time.time()) - RAG_EMBEDDING_DEDUP_PRUNE_DAYS * 86400
+        try:
+            total = await asyncio.to_thread(ChunkEmbeddings.delete_unused, before)
+            if total:
+                log.info(
+                    f"Deleted {total} chunk embeddings unused for "
+                    f"{RAG_EMBEDDING_DEDUP_PRUNE_DAYS} days"
+                )
+        except Exception as e:
+            log.warning(f"Error deleting unused chunk embeddings: {e}")
+        await asyncio.sleep(RAG_EMBEDDING_DEDUP_PRUNE_INTERVAL)
+
+
+def get_cosine_scores(query_vectors, document_vectors) -> np.ndarray:
+    """
+    Cosine similarity of every query to every document as a matrix
+    """
+    queries = np.asarray(query_vectors, dtype=np.float32)
+    documents = np.asarray(document_vectors, dtype=np.float32)
+    queries = queries / np.maximum(
+        np.linalg.norm(queries, axis=1, keepdims=True), 1e-12
+    )
+    documents = documents / np.maximum(
+        np.linalg.norm(documents, axis=1, keepdims=True), 1e-12
+    )
+    return queries @ documents.T
+
+
+def get_relevance_scores(
+    items: list[tuple[str, Sequence[Document]]],
+    embedding_function,
+    reranking_function=None,
+) -> list[Optional[list[float]]]:
+    """
+    Scores of the documents of each (query, documents) item
+
+    With a reranking function, each distinct query is scored in one call
+    against its distinct passages from all items (external and ColBERT
+    rerankers only take one query per call). Otherwise queries and
+    documents are embedded once and scored as a single cosine matrix.
+
+    A failed reranker call falls back to cosine scores for the items of its
+    query. Items that couldn't be scored at all are None, so one failure
+    doesn't fail every collection.
+    """
+    scores: list[Optional[list[float]]] = [
+        None if documents else [] for _, documents in items
+    ]
+
+    if reranking_function is not None:
+        passages = {}
+        for query, documents in items:
+            texts = passages.setdefault(query, {})
+            for doc in documents:
+                texts.setdefault(doc.page_content, len(texts))
+
+        def rerank(query: str):
+            try:
+                return reranking_function([(query, text) for text in passages[query]])
+            except Exception as e:
+                log.exception(f"Error reranking hybrid search candidates: {e}")
+                return None
+
+        # distinct queries are independent calls, e.g. to an external reranker
+        queries = [query for query, texts in passages.items() if texts]
+        with ThreadPoolExecutor() as executor:
+            results = list(executor.map(rerank, queries))
+
+        query_scores = {}
+        for query, result in zip(queries, results):
+            if result is not None:
+                query_scores[query] = (
+                    result.tolist() if not isinstance(result, list) else result
+                )
+
+        for idx, (query, documents) in enumerate(items):
+            if query in query_scores:
+                texts = passages[query]
+                scores[idx] = [
+                    query_scores[query][texts[doc.page_content]] for doc in documents
+                ]
+
+        failed = [idx for idx, score in enumerate(scores) if score is None]
+        if failed:
+            fallback = get_relevance_scores(
+                [items[idx] for idx in failed], embedding_function
+            )
+            for idx, score in zip(failed, fallback):
+                scores[idx] = score
+        return scores
+
+    queries = list(dict.fromkeys(query for query, _ in items))
+    documents = {}
+    for _, docs in items:
+        for doc in docs:
+            documents.setdefault(doc.page_content, doc)
+    if not queries or not documents:
+        return [[] for _ in items]
+
+    try:
+        query_vectors = embedding_function(queries, RAG_EMBEDDING_QUERY_PREFIX)
+        document_vectors = get_document_vectors(
+            list(documents.values()),
+            embedding_function,
+            dim=len(query_vectors[0]) if query_vectors else None,
+        )
+        matrix = get_cosine_scores(query_vectors, document_vectors)
+    except Exception as e:
+        log.exception(f"Error scoring hybrid search candidates: {e}")
+        return scores
+
+    query_index = {query: idx for idx, query in enumerate(queries)}
+    document_index = {text: idx for idx, text in enumerate(documents)}
+    for idx, (query, docs) in enumerate(items):
+        row = matrix[query_index[query]]
+        scores[idx] = [float(row[document_index[doc.page_content]]) for doc in docs]
+    return scores
+
+
+def rerank_documents(
+    documents: Sequence[Document],
+    scores: Optional[list[float]],
+    top_n: int,
+    r_score: float,
+) -> Sequence[Document]:
+    if scores is not None:
+        docs_with_scores = list(zip(documents, scores))
+        if r_score:
+            docs_with_scores = [(d, s) for d, s in docs_with_scores if s >= r_score]
+
+        result = sorted(docs_with_scores, key=operator.itemgetter(1), reverse=True)
+        final_results = []
+        for doc, doc_score in result[:top_n]:
+            metadata = doc.metadata
+            metadata["score"] = doc_score
+            doc = Document(
+                page_content=doc.page_content,
+                metadata=metadata,
+            )
+            final_results.append(doc)
+        return final_results
+    else:
+        log.warning(
+            "No valid scores found, check your reranking function. Returning original documents."
+        )
+        return documents
+
+
 class RerankCompressor(BaseDocumentCompressor):
     embedding_function: Any
     top_n: int
@@ -1056,47 +1298,7 @@ class RerankCompressor(BaseDocumentCompressor):
         query: str,
         callbacks: Optional[Callbacks] = None,
     ) -> Sequence[Document]:
-        reranking = self.reranking_function is not None
-
-        scores = None
-        if reranking:
-            scores = self.reranking_function(
-                [(query, doc.page_content) for doc in documents]
-            )
-        else:
-            from sentence_transformers import util
-
-            query_embedding = self.embedding_function(query, RAG_EMBEDDING_QUERY_PREFIX)
-            document_embedding = self.embedding_function(
-                [doc.page_content for doc in documents], RAG_EMBEDDING_CONTENT_PREFIX
-            )
-            scores = util.cos_sim(query_embedding, document_embedding)[0]
-
-        if scores is not None:
-            docs_with_scores = list(
-                zip(
-                    documents,
-                    scores.tolist() if not isinstance(scores, list) else scores,
-                )
-            )
-            if self.r_score:
-                docs_with_scores = [
-                    (d, s) for d, s in docs_with_scores if s >= self.r_score
-                ]
-
-            result = sorted(docs_with_scores, key=operator.itemgetter(1), reverse=True)
-            final_results = []
-            for doc, doc_score in result[: self.top_n]:
-                metadata = doc.metadata
-                metadata["score"] = doc_score
-                doc = Document(
-                    page_content=doc.page_content,
-                    metadata=metadata,
-                )
-                final_results.append(doc)
-            return final_results
-        else:
-            log.warning(
-                "No valid scores found, check your reranking function. Returning original documents."
-            )
-            return documents
+        scores = get_relevance_scores(
+            [(query, documents)], self.embedding_function, self.reranking_function
+        )[0]
+        return rerank_documents(documents, scores, self.top_n, self.r_score)
@@ -1,7 +1,10 @@
+import functools
 from pydantic import BaseModel
 from abc import ABC, abstractmethod
 from typing import Any, Dict, List, Optional, Union
 
+from open_webui.retrieval.vector.version import collection_versions
+
 
 class VectorItem(BaseModel):
     id: str
@@ -20,6 +23,34 @@ class SearchResult(GetResult):
     distances: Optional[List[List[float | int]]]
 
 
+def bumps_collection_version(method):
+    """Bump the version of the collection written by the method."""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        collection_name = kwargs.get("collection_name", args[0] if args else None)
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            if collection_name is not None:
+                collection_versions.bump(collection_name)
+
+    return wrapper
+
+
+def bumps_all_collection_versions(method):
+    """Bump the version of every collection after the method."""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            collection_versions.bump_all()
+
+    return wrapper
+
+
 class VectorDBBase(ABC):
     """
     Abstract base class for all vector database backends.
@@ -28,9 +59,18 @@ class VectorDBBase(ABC):
     vector insertion, deletion, similarity search, and metadata filtering.
 
     Any custom vector database integration must inherit from this class and
-    implement all abstract methods.
+    implement all abstract methods. Their write methods bump the collection
+    version (see retrieval.vector.version), which invalidates cached results.
     """
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for name in ("delete_collection", "insert", "upsert", "delete"):
+            if name in cls.__dict__:
+                setattr(cls, name, bumps_collection_version(cls.__dict__[name]))
+        if "reset" in cls.__dict__:
+            setattr(cls, "reset", bumps_all_collection_versions(cls.__dict__["reset"]))
+
     @abstractmethod
     def has_collection(self, collection_name: str) -> bool:
         """Check if the collection exists in the vector DB."""
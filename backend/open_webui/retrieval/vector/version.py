@@ -0,0 +1,136 @@
+import logging
+import random
+import threading
+from typing import Callable, Optional
+
+from open_webui.env import (
+    RAG_RESULT_CACHE_SINGLE_INSTANCE,
+    REDIS_CLUSTER,
+    REDIS_KEY_PREFIX,
+    REDIS_SENTINEL_HOSTS,
+    REDIS_SENTINEL_PORT,
+    REDIS_URL,
+    SRC_LOG_LEVELS,
+    UVICORN_WORKERS,
+)
+from open_webui.utils.redis import get_redis_connection, get_sentinels_from_env
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["RAG"])
+
+
+class CollectionVersions:
+    """
+    Version counters of vector db collections, bumped on every write
+
+    Results cached under an older version are never served again. With
+    REDIS_URL set the counters are shared by all workers, counters missing
+    from redis start at a random value so a flushed redis doesn't repeat a
+    version still cached somewhere.
+
+    Without Redis the counters are local to the process, so they are only
+    shared when single_instance says no other worker or replica writes.
+
+    A bump that fails calls `on_bump_error`, so the caller can drop results
+    it cached locally.
+    """
+
+    def __init__(self, use_redis: bool = False, single_instance: bool = False) -> None:
+        self.use_redis = use_redis
+        self.single_instance = single_instance
+        self._versions: dict[str, int] = {}
+        self._epoch = 0
+        self._lock = threading.Lock()
+        self._redis = None
+        self.on_bump_error: Optional[Callable[[], None]] = None
+
+    @property
+    def redis(self):
+        if self._redis is None:
+            self._redis = get_redis_connection(
+                redis_url=REDIS_URL,
+                redis_sentinels=get_sentinels_from_env(
+                    REDIS_SENTINEL_HOSTS, REDIS_SENTINEL_PORT
+                ),
+                redis_cluster=REDIS_CLUSTER,
+            )
+        return self._redis
+
+    @staticmethod
+    def _get_key(collection_name: Optional[str]) -> str:
+        # same hash slot, so mget works on redis cluster
+        if collection_name is None:
+            return f"{REDIS_KEY_PREFIX}:{{vector_version}}:epoch"
+        return f"{REDIS_KEY_PREFIX}:{{vector_version}}:collection:{collection_name}"
+
+    def get_many(self, collection_names: list[str]) -> Optional[tuple]:
+        """
+        Versions of the collections, None if they can't be read
+        """
+        if not self.use_redis:
+            with self._lock:
+                return (self._epoch,) + tuple(
+                    self._versions.get(name, 0) for name in collection_names
+                )
+
+        keys = [self._get_key(None)] + [
+            self._get_key(name) for name in collection_names
+        ]
+        try:
+            pipe = self.redis.pipeline()
+            for key in keys:
+                pipe.set(key, random.getrandbits(48), nx=True)
+            pipe.mget(keys)
+            return tuple(pipe.execute()[-1])
+        except Exception as e:
+            log.warning(f"Error reading collection versions: {e}")
+            return None
+
+    def _incr(self, key: str) -> None:
+        # seed a missing key first, so a flushed redis doesn't restart at 1
+        pipe = self.redis.pipeline()
+        pipe.set(key, random.getrandbits(48), nx=True)
+        pipe.incr(key)
+        pipe.execute()
+
+    def _bump_failed(self) -> None:
+        if self.on_bump_error is not None:
+            self.on_bump_error()
+
+    def bump(self, collection_name: str) -> None:
+        if not self.use_redis:
+            with self._lock:
+                self._versions[collection_name] = (
+                    self._versions.get(collection_name, 0) + 1
+                )
+            return
+
+        try:
+            self._incr(self._get_key(collection_name))
+        except Exception as e:
+            log.warning(f"Error bumping version of {collection_name}: {e}")
+            self._bump_failed()
+
+    def bump_all(self) -> None:
+        if not self.use_redis:
+            with self._lock:
+                self._epoch += 1
+            return
+
+        try:
+            self._incr(self._get_key(None))
+        except Exception as e:
+            log.warning(f"Error bumping collection versions: {e}")
+            self._bump_failed()
+
+    @property
+    def shared(self) -> bool:
+        """
+        Whether every worker sees the bumps of this one
+        """
+        return self.use_redis or (self.single_instance and UVICORN_WORKERS <= 1)
+
+
+collection_versions = CollectionVersions(
+    use_redis=bool(REDIS_URL), single_instance=RAG_RESULT_CACHE_SINGLE_INSTANCE
+)
@@ -4,6 +4,7 @@ from pydantic import BaseModel, ConfigDict, Field
 from typing import Optional, Literal
 
 from open_webui.utils.auth import get_admin_user, get_verified_user
+from open_webui.utils.credit.utils import model_price_cache
 from open_webui.config import get_config, save_config
 from open_webui.config import BannerModel
 
@@ -418,6 +419,7 @@ async def set_usage_config(
     request.app.state.config.EZFP_KEY = form_data.EZFP_KEY
     request.app.state.config.EZFP_CALLBACK_HOST = form_data.EZFP_CALLBACK_HOST
     request.app.state.config.EZFP_AMOUNT_CONTROL = form_data.EZFP_AMOUNT_CONTROL
+    model_price_cache.clear()
 
     return {
         "CREDIT_NO_CREDIT_MSG": request.app.state.config.CREDIT_NO_CREDIT_MSG,
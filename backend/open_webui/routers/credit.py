@@ -1,14 +1,22 @@
+import csv
 import datetime
+import io
+import json
 import logging
 import time
 import uuid
 from collections import defaultdict
 from decimal import Decimal
-from typing import Optional
+from typing import Iterator, Literal, Optional, Tuple
 from urllib.parse import quote
 
 from fastapi import APIRouter, Depends, Request, HTTPException
-from fastapi.responses import PlainTextResponse, RedirectResponse, Response
+from fastapi.responses import (
+    PlainTextResponse,
+    RedirectResponse,
+    Response,
+    StreamingResponse,
+)
 from pydantic import BaseModel, Field
 
 from open_webui.config import EZFP_CALLBACK_HOST
@@ -18,6 +26,7 @@ from open_webui.models.credits import (
     TradeTickets,
     CreditLogSimpleModel,
     CreditLogs,
+    CreditLogRollups,
     RedemptionCodes,
     RedemptionCodeModel,
 )
@@ -25,6 +34,9 @@ from open_webui.models.models import Models, ModelPriceForm
 from open_webui.models.users import UserModel, Users
 from open_webui.utils.auth import get_verified_user, get_admin_user
 from open_webui.utils.credit.ezfp import ezfp_client
+from open_webui.utils.credit.ledger import credit_ledger
+from open_webui.utils.credit.usage import calculator
+from open_webui.utils.credit.utils import model_price_cache
 from open_webui.utils.models import get_all_models
 
 log = logging.getLogger(__name__)
@@ -43,15 +55,39 @@ async def get_config(request: Request):
     }
 
 
+def parse_log_cursor(cursor: Optional[str]) -> Optional[Tuple[int, str]]:
+    """
+    Parse a "{created_at}:{id}" cursor
+    """
+    if not cursor:
+        return None
+    try:
+        created_at, log_id = cursor.split(":", 1)
+        return int(created_at), log_id
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def get_log_cursor(logs: list[CreditLogSimpleModel], limit: int) -> Optional[str]:
+    if len(logs) < limit:
+        return None
+    return f"{logs[-1].created_at}:{logs[-1].id}"
+
+
 @router.get("/logs", response_model=list[CreditLogSimpleModel])
 async def list_credit_logs(
-    page: Optional[int] = None, user: UserModel = Depends(get_verified_user)
+    page: Optional[int] = None,
+    cursor: Optional[str] = None,
+    user: UserModel = Depends(get_verified_user),
 ) -> TradeTicketModel:
-    if page:
+    if page or cursor:
         limit = PAGE_ITEM_COUNT
-        offset = (page - 1) * limit
+        offset = ((page or 1) - 1) * limit
         return CreditLogs.get_credit_log_by_page(
-            user_ids=[user.id], offset=offset, limit=limit
+            user_ids=[user.id],
+            offset=offset,
+            limit=limit,
+            cursor=parse_log_cursor(cursor),
         )
     else:
         return CreditLogs.get_credit_log_by_page(user_ids=[user.id], offset=0, limit=10)
@@ -79,6 +115,7 @@ async def get_all_logs(
     query: Optional[str] = None,
     page: Optional[int] = None,
     limit: Optional[int] = None,
+    cursor: Optional[str] = None,
     _: UserModel = Depends(get_admin_user),
 ):
     # init params
@@ -86,20 +123,134 @@ async def get_all_logs(
     limit = limit or PAGE_ITEM_COUNT
     offset = (page - 1) * limit
     # query users
-    users = Users.get_users(filter={"query": query})
-    user_map = {user.id: user.name for user in users["users"]}
-    if query and not user_map:
-        return {"total": 0, "results": []}
+    user_ids = None
+    if query:
+        users = Users.get_users(filter={"query": query})["users"]
+        if not users:
+            return {"total": 0, "results": [], "next_cursor": None}
+        user_ids = [user.id for user in users]
     # query db
-    user_ids = list(user_map.keys()) if query else None
     results = CreditLogs.get_credit_log_by_page(
-        user_ids=user_ids, offset=offset, limit=limit
+        user_ids=user_ids, offset=offset, limit=limit, cursor=parse_log_cursor(cursor)
     )
     total = CreditLogs.count_credit_log(user_ids=user_ids)
     # add username to results
+    users = Users.get_users_by_user_ids(list({result.user_id for result in results}))
+    user_map = {user.id: user.name for user in users}
     for result in results:
         setattr(result, "username", user_map.get(result.user_id, ""))
-    return {"total": total, "results": results}
+    return {
+        "total": total,
+        "results": results,
+        "next_cursor": get_log_cursor(results, limit),
+    }
+
+
+LOG_EXPORT_BATCH_SIZE = 1000
+LOG_EXPORT_CSV_HEADER = [
+    "id",
+    "created_at",
+    "user_id",
+    "username",
+    "credit",
+    "desc",
+    "model_id",
+    "prompt_tokens",
+    "completion_tokens",
+    "total_tokens",
+    "total_price",
+]
+
+
+def iter_log_export(
+    user_ids: Optional[list[str]],
+    start_time: Optional[int],
+    end_time: Optional[int],
+    export_format: str,
+) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if export_format == "csv":
+        writer.writerow(LOG_EXPORT_CSV_HEADER)
+    user_map = {}
+    batch = []
+
+    def flush() -> str:
+        # load names of new users in this batch only
+        new_user_ids = {log.user_id for log in batch} - user_map.keys()
+        if new_user_ids:
+            user_map.update({user_id: "" for user_id in new_user_ids})
+            for user in Users.get_users_by_user_ids(list(new_user_ids)):
+                user_map[user.id] = user.name
+        for log in batch:
+            username = user_map.get(log.user_id, "")
+            if export_format == "csv":
+                usage = log.detail.get("usage") or {}
+                model = (log.detail.get("api_params") or {}).get("model") or {}
+                writer.writerow(
+                    [
+                        log.id,
+                        log.created_at,
+                        log.user_id,
+                        username,
+                        log.credit,
+                        log.detail.get("desc", ""),
+                        model.get("id", ""),
+                        usage.get("prompt_tokens", ""),
+                        usage.get("completion_tokens", ""),
+                        usage.get("total_tokens", ""),
+                        usage.get("total_price", ""),
+                    ]
+                )
+            else:
+                buffer.write(
+                    json.dumps(
+                        {**log.model_dump(mode="json"), "username": username},
+                        default=str,
+                    )
+                    + "\n"
+                )
+        batch.clear()
+        data = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        return data
+
+    for log in CreditLogs.iter_credit_logs(
+        user_ids=user_ids,
+        start_time=start_time,
+        end_time=end_time,
+        batch_size=LOG_EXPORT_BATCH_SIZE,
+    ):
+        batch.append(log)
+        if len(batch) >= LOG_EXPORT_BATCH_SIZE:
+            yield flush()
+    data = flush()
+    if data:
+        yield data
+
+
+@router.get("/all_logs/export")
+async def export_all_logs(
+    query: Optional[str] = None,
+    start_time: Optional[int] = None,
+    end_time: Optional[int] = None,
+    format: Literal["csv", "ndjson"] = "csv",
+    _: UserModel = Depends(get_admin_user),
+) -> StreamingResponse:
+    user_ids = None
+    if query:
+        users = Users.get_users(filter={"query": query})["users"]
+        user_ids = [user.id for user in users]
+    filename = f"credit_logs_{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}"
+    # sync generator runs in threadpool, db reads don't block the event loop
+    return StreamingResponse(
+        iter_log_export(user_ids, start_time, end_time, format),
+        media_type="text/csv" if format == "csv" else "application/x-ndjson",
+        headers={
+            "Content-Disposition": f"attachment; filename={filename}.{format}",
+        },
+    )
 
 
 @router.post("/tickets", response_model=TradeTicketModel)
@@ -144,6 +295,7 @@ async def ticket_callback(request: Request) -> str:
 
     ticket.detail["callback"] = callback
     TradeTickets.update_credit_by_id(ticket.id, ticket.detail)
+    credit_ledger.invalidate(ticket.user_id)
 
     return "success"
 
@@ -176,9 +328,18 @@ async def update_model_price(
             ModelPriceForm.model_validate(price).model_dump() if price else None
         )
         Models.update_model_by_id(id=model_id, model=model)
+    model_price_cache.clear()
     return f"success update price for {len(form_data)} models"
 
 
+@router.get("/usage/cache")
+async def get_usage_cache_stats(_: UserModel = Depends(get_admin_user)) -> dict:
+    """
+    Get hit/miss stats of the usage token caches
+    """
+    return calculator.cache_stats()
+
+
 class StatisticRequest(BaseModel):
     start_time: int
     end_time: int
@@ -188,14 +349,14 @@ class StatisticRequest(BaseModel):
 async def get_statistics(
     form_data: StatisticRequest, _: UserModel = Depends(get_admin_user)
 ):
-    # load credit data
-    logs = CreditLogs.get_log_by_time(form_data.start_time, form_data.end_time)
+    # load usage from rollups
+    usage = CreditLogRollups.get_usage_by_time(form_data.start_time, form_data.end_time)
     trade_logs = TradeTickets.get_ticket_by_time(
         form_data.start_time, form_data.end_time
     )
 
     # load user data
-    users = Users.get_users()["users"]
+    users = Users.get_users_by_user_ids(list({user_id for user_id, *_ in usage}))
     user_map = {user.id: user.name for user in users}
 
     # build graph data
@@ -205,24 +366,20 @@ async def get_statistics(
     model_token_pie = defaultdict(int)
     user_cost_pie = defaultdict(int)
     user_token_pie = defaultdict(int)
-    for log in logs:
-        if not log.detail.usage or log.detail.usage.total_price is None:
-            continue
-
-        model = log.detail.api_params.model
-        if not model:
+    for user_id, model_id, tokens, cost in usage:
+        # logs without a model are not usage of a model
+        if not model_id:
             continue
 
-        total_tokens += log.detail.usage.total_tokens
-        total_credit += log.detail.usage.total_price
+        total_tokens += tokens
+        total_credit += cost
 
-        model_key = log.detail.api_params.model.id
-        model_cost_pie[model_key] += log.detail.usage.total_price
-        model_token_pie[model_key] += log.detail.usage.total_tokens
+        model_cost_pie[model_id] += cost
+        model_token_pie[model_id] += tokens
 
-        user_key = f"{log.user_id}:{user_map.get(log.user_id, log.user_id)}"
-        user_cost_pie[user_key] += log.detail.usage.total_price
-        user_token_pie[user_key] += log.detail.usage.total_tokens
+        user_key = f"{user_id}:{user_map.get(user_id, user_id)}"
+        user_cost_pie[user_key] += cost
+        user_token_pie[user_key] += tokens
 
     # build trade data
     total_payment = 0
@@ -439,4 +596,5 @@ async def receive_redemption_code(
     Receive a redemption code.
     """
     RedemptionCodes.receive_code(code, user.id)
+    credit_ledger.invalidate(user.id)
     return None
@@ -1,9 +1,9 @@
 import logging
 import os
+import time
 import uuid
 import json
 from fnmatch import fnmatch
-from pathlib import Path
 from typing import Optional
 from urllib.parse import quote
 import asyncio
@@ -33,6 +33,7 @@ from open_webui.models.files import (
     FileModelResponse,
     Files,
 )
+from open_webui.models.bm25 import BM25Index
 from open_webui.models.knowledge import Knowledges
 
 from open_webui.routers.knowledge import get_knowledge, get_knowledge_list
@@ -40,6 +41,7 @@ from open_webui.routers.retrieval import ProcessFileForm, process_file
 from open_webui.routers.audio import transcribe
 from open_webui.storage.provider import Storage
 from open_webui.utils.auth import get_admin_user, get_verified_user
+from open_webui.utils.file_status import file_status
 from pydantic import BaseModel
 
 log = logging.getLogger(__name__)
@@ -198,7 +200,7 @@ def upload_file_handler(
         id = str(uuid.uuid4())
         name = filename
         filename = f"{id}_{filename}"
-        contents, file_path = Storage.upload_file(
+        size, sha256, file_path = Storage.upload_file(
             file.file,
             filename,
             {
@@ -222,7 +224,8 @@ def upload_file_handler(
                     "meta": {
                         "name": name,
                         "content_type": file.content_type,
-                        "size": len(contents),
+                        "size": size,
+                        "sha256": sha256,
                         "data": file_metadata,
                     },
                 }
@@ -342,6 +345,7 @@ async def delete_all_files(user=Depends(get_admin_user)):
         try:
             Storage.delete_all_files()
             VECTOR_DB_CLIENT.reset()
+            BM25Index.reset()
         except Exception as e:
             log.exception(e)
             log.error("Error deleting files")
@@ -364,7 +368,7 @@ async def delete_all_files(user=Depends(get_admin_user)):
 
 @router.get("/{id}", response_model=Optional[FileModel])
 async def get_file_by_id(id: str, user=Depends(get_verified_user)):
-    file = Files.get_file_by_id(id)
+    file = await Files.get_file_by_id_async(id)
 
     if not file:
         raise HTTPException(
@@ -389,7 +393,7 @@ async def get_file_by_id(id: str, user=Depends(get_verified_user)):
 async def get_file_process_status(
     id: str, stream: bool = Query(False), user=Depends(get_verified_user)
 ):
-    file = Files.get_file_by_id(id)
+    file = await Files.get_file_status_by_id_async(id)
 
     if not file:
         raise HTTPException(
@@ -404,28 +408,48 @@ async def get_file_process_status(
     ):
         if stream:
             MAX_FILE_PROCESSING_DURATION = 3600 * 2
+            # status changes wake the stream up, this only covers changes
+            # made by another instance without redis
+            FALLBACK_INTERVAL = 10
 
             async def event_stream(file_item):
                 if file_item:
-                    for _ in range(MAX_FILE_PROCESSING_DURATION):
-                        file_item = Files.get_file_by_id(file_item.id)
-                        if file_item:
-                            data = file_item.model_dump().get("data", {})
-                            status = data.get("status")
-
-                            if status:
-                                event = {"status": status}
-                                if status == "failed":
-                                    event["error"] = data.get("error")
-
-                                yield f"data: {json.dumps(event)}\n\n"
-                                if status in ("completed", "failed"):
+                    changed = file_status.subscribe(file_item.id)
+                    deadline = time.monotonic() + MAX_FILE_PROCESSING_DURATION
+                    last_status = None
+                    try:
+                        while time.monotonic() < deadline:
+                            changed.clear()
+                            file_item = await Files.get_file_status_by_id_async(
+                                file_item.id
+                            )
+                            if file_item:
+                                status = file_item.status
+
+                                if status:
+                                    if status != last_status:
+                                        event = {"status": status}
+                                        if status == "failed":
+                                            event["error"] = file_item.error
+
+                                        yield f"data: {json.dumps(event)}\n\n"
+                                        last_status = status
+                                    if status in ("completed", "failed"):
+                                        break
+                                else:
+                                    # Legacy
                                     break
                             else:
-                                # Legacy
                                 break
 
-                        await asyncio.sleep(0.5)
+                            try:
+                                await asyncio.wait_for(
+                                    changed.wait(), timeout=FALLBACK_INTERVAL
+                                )
+                            except asyncio.TimeoutError:
+                                pass
+                    finally:
+                        file_status.unsubscribe(id, changed)
                 else:
                     yield f"data: {json.dumps({'status': 'not_found'})}\n\n"
 
@@ -434,7 +458,7 @@ async def get_file_process_status(
                 media_type="text/event-stream",
             )
         else:
-            return {"status": file.data.get("status", "pending")}
+            return {"status": file.status or "pending"}
     else:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -449,7 +473,7 @@ async def get_file_process_status(
 
 @router.get("/{id}/data/content")
 async def get_file_data_content_by_id(id: str, user=Depends(get_verified_user)):
-    file = Files.get_file_by_id(id)
+    file = await Files.get_file_by_id_async(id)
 
     if not file:
         raise HTTPException(
@@ -483,7 +507,7 @@ class ContentForm(BaseModel):
 async def update_file_data_content_by_id(
     request: Request, id: str, form_data: ContentForm, user=Depends(get_verified_user)
 ):
-    file = Files.get_file_by_id(id)
+    file = await Files.get_file_by_id_async(id)
 
     if not file:
         raise HTTPException(
@@ -502,7 +526,7 @@ async def update_file_data_content_by_id(
                 ProcessFileForm(file_id=id, content=form_data.content),
                 user=user,
             )
-            file = Files.get_file_by_id(id=id)
+            file = await Files.get_file_by_id_async(id=id)
         except Exception as e:
             log.exception(e)
             log.error(f"Error processing file: {file.id}")
@@ -520,11 +544,105 @@ async def update_file_data_content_by_id(
 ############################
 
 
+def parse_range_header(range_header: Optional[str], size: int):
+    """
+    Parses a single byte range, returning its first and last byte
+
+    Multiple or malformed ranges are ignored and the whole file is served.
+    """
+    if not range_header or "," in range_header:
+        return None
+    unit, _, byte_range = range_header.partition("=")
+    start, _, end = byte_range.strip().partition("-")
+    if unit.strip() != "bytes" or not (start or end):
+        return None
+
+    try:
+        if start:
+            start = int(start)
+            if end and int(end) < start:
+                return None
+            end = min(int(end), size - 1) if end else size - 1
+        else:
+            # suffix range, the last bytes of the file
+            start, end = max(size - int(end), 0), size - 1
+    except ValueError:
+        return None
+
+    if start >= size:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+    return start, end
+
+
+class CachedFileResponse(FileResponse):
+    """Serves a pinned local copy, releasing it once sent or abandoned."""
+
+    def __init__(self, file_path: str, local_file_path: str, **kwargs):
+        super().__init__(local_file_path, **kwargs)
+        self.file_path = file_path
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            Storage.release_cached_file(self.file_path)
+
+
+async def get_file_response(
+    request: Request,
+    file_path: str,
+    headers: Optional[dict] = None,
+    media_type: Optional[str] = None,
+):
+    """
+    Serves the local copy of a stored file when there is one, otherwise
+    streams it from the storage provider. Both honour Range requests.
+    """
+    local_file_path = await asyncio.to_thread(Storage.get_cached_file, file_path)
+    if local_file_path:
+        return CachedFileResponse(
+            file_path, local_file_path, headers=headers, media_type=media_type
+        )
+
+    try:
+        size = await asyncio.to_thread(Storage.get_file_size, file_path)
+        byte_range = parse_range_header(request.headers.get("range"), size)
+        start, end = byte_range or (0, size - 1)
+        chunks = await asyncio.to_thread(
+            Storage.iter_file, file_path, start, end if byte_range else None
+        )
+    except FileNotFoundError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=ERROR_MESSAGES.NOT_FOUND,
+        )
+
+    headers = {
+        **(headers or {}),
+        "Accept-Ranges": "bytes",
+        "Content-Length": str(end - start + 1),
+    }
+    if byte_range:
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return StreamingResponse(
+        chunks,
+        status_code=206 if byte_range else 200,
+        headers=headers,
+        media_type=media_type,
+    )
+
+
 @router.get("/{id}/content")
 async def get_file_content_by_id(
-    id: str, user=Depends(get_verified_user), attachment: bool = Query(False)
+    request: Request,
+    id: str,
+    user=Depends(get_verified_user),
+    attachment: bool = Query(False),
 ):
-    file = Files.get_file_by_id(id)
+    file = await Files.get_file_by_id_async(id)
 
     if not file:
         raise HTTPException(
@@ -538,44 +656,37 @@ async def get_file_content_by_id(
         or has_access_to_file(id, "read", user)
     ):
         try:
-            file_path = Storage.get_file(file.path)
-            file_path = Path(file_path)
-
-            # Check if the file already exists in the cache
-            if file_path.is_file():
-                # Handle Unicode filenames
-                filename = file.meta.get("name", file.filename)
-                encoded_filename = quote(filename)  # RFC5987 encoding
-
-                content_type = file.meta.get("content_type")
-                filename = file.meta.get("name", file.filename)
-                encoded_filename = quote(filename)
-                headers = {}
-
-                if attachment:
+            # Handle Unicode filenames
+            filename = file.meta.get("name", file.filename)
+            encoded_filename = quote(filename)  # RFC5987 encoding
+
+            content_type = file.meta.get("content_type")
+            filename = file.meta.get("name", file.filename)
+            encoded_filename = quote(filename)
+            headers = {}
+
+            if attachment:
+                headers["Content-Disposition"] = (
+                    f"attachment; filename*=UTF-8''{encoded_filename}"
+                )
+            else:
+                if content_type == "application/pdf" or filename.lower().endswith(
+                    ".pdf"
+                ):
+                    headers["Content-Disposition"] = (
+                        f"inline; filename*=UTF-8''{encoded_filename}"
+                    )
+                    content_type = "application/pdf"
+                elif content_type != "text/plain":
                     headers["Content-Disposition"] = (
                         f"attachment; filename*=UTF-8''{encoded_filename}"
                     )
-                else:
-                    if content_type == "application/pdf" or filename.lower().endswith(
-                        ".pdf"
-                    ):
-                        headers["Content-Disposition"] = (
-                            f"inline; filename*=UTF-8''{encoded_filename}"
-                        )
-                        content_type = "application/pdf"
-                    elif content_type != "text/plain":
-                        headers["Content-Disposition"] = (
-                            f"attachment; filename*=UTF-8''{encoded_filename}"
-                        )
-
-                return FileResponse(file_path, headers=headers, media_type=content_type)
 
-            else:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail=ERROR_MESSAGES.NOT_FOUND,
-                )
+            return await get_file_response(
+                request, file.path, headers=headers, media_type=content_type
+            )
+        except HTTPException:
+            raise
         except Exception as e:
             log.exception(e)
             log.error("Error getting file content")
@@ -591,8 +702,10 @@ async def get_file_content_by_id(
 
 
 @router.get("/{id}/content/html")
-async def get_html_file_content_by_id(id: str, user=Depends(get_verified_user)):
-    file = Files.get_file_by_id(id)
+async def get_html_file_content_by_id(
+    request: Request, id: str, user=Depends(get_verified_user)
+):
+    file = await Files.get_file_by_id_async(id)
 
     if not file:
         raise HTTPException(
@@ -613,18 +726,10 @@ async def get_html_file_content_by_id(id: str, user=Depends(get_verified_user)):
         or has_access_to_file(id, "read", user)
     ):
         try:
-            file_path = Storage.get_file(file.path)
-            file_path = Path(file_path)
-
-            # Check if the file already exists in the cache
-            if file_path.is_file():
-                log.info(f"file_path: {file_path}")
-                return FileResponse(file_path)
-            else:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail=ERROR_MESSAGES.NOT_FOUND,
-                )
+            log.info(f"file_path: {file.path}")
+            return await get_file_response(request, file.path)
+        except HTTPException:
+            raise
         except Exception as e:
             log.exception(e)
             log.error("Error getting file content")
@@ -640,8 +745,10 @@ async def get_html_file_content_by_id(id: str, user=Depends(get_verified_user)):
 
 
 @router.get("/{id}/content/{file_name}")
-async def get_file_content_by_id(id: str, user=Depends(get_verified_user)):
-    file = Files.get_file_by_id(id)
+async def get_file_content_by_id(
+    request: Request, id: str, user=Depends(get_verified_user)
+):
+    file = await Files.get_file_by_id_async(id)
 
     if not file:
         raise HTTPException(
@@ -664,17 +771,7 @@ async def get_file_content_by_id(id: str, user=Depends(get_verified_user)):
         }
 
         if file_path:
-            file_path = Storage.get_file(file_path)
-            file_path = Path(file_path)
-
-            # Check if the file already exists in the cache
-            if file_path.is_file():
-                return FileResponse(file_path, headers=headers)
-            else:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail=ERROR_MESSAGES.NOT_FOUND,
-                )
+            return await get_file_response(request, file_path, headers=headers)
         else:
             # File path doesn’t exist, return the content as .txt if possible
             file_content = file.content.get("content", "")
@@ -703,7 +800,7 @@ async def get_file_content_by_id(id: str, user=Depends(get_verified_user)):
 
 @router.delete("/{id}")
 async def delete_file_by_id(id: str, user=Depends(get_verified_user)):
-    file = Files.get_file_by_id(id)
+    file = await Files.get_file_by_id_async(id)
 
     if not file:
         raise HTTPException(
@@ -722,6 +819,7 @@ async def delete_file_by_id(id: str, user=Depends(get_verified_user)):
             try:
                 Storage.delete_file(file.path)
                 VECTOR_DB_CLIENT.delete(collection_name=f"file-{id}")
+                BM25Index.delete_collection(f"file-{id}")
             except Exception as e:
                 log.exception(e)
                 log.error("Error deleting files")
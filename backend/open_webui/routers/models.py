@@ -18,6 +18,7 @@ from fastapi.responses import FileResponse, StreamingResponse
 
 from open_webui.utils.auth import get_admin_user, get_verified_user
 from open_webui.utils.access_control import has_access, has_permission
+from open_webui.utils.credit.utils import model_price_cache
 from open_webui.config import BYPASS_ADMIN_ACCESS_CONTROL, STATIC_DIR
 
 router = APIRouter()
@@ -74,6 +75,7 @@ async def create_new_model(
 
     else:
         model = Models.insert_new_model(form_data, user.id)
+        model_price_cache.clear()
         if model:
             return model
         else:
@@ -106,7 +108,9 @@ class SyncModelsForm(BaseModel):
 async def sync_models(
     request: Request, form_data: SyncModelsForm, user=Depends(get_admin_user)
 ):
-    return Models.sync_models(user.id, form_data.models)
+    models = Models.sync_models(user.id, form_data.models)
+    model_price_cache.clear()
+    return models
 
 
 ###########################
@@ -180,6 +184,7 @@ async def toggle_model_by_id(id: str, user=Depends(get_verified_user)):
             or has_access(user.id, "write", model.access_control)
         ):
             model = Models.toggle_model_by_id(id)
+            model_price_cache.clear()
 
             if model:
                 return model
@@ -230,6 +235,7 @@ async def update_model_by_id(
         )
 
     model = Models.update_model_by_id(id, form_data)
+    model_price_cache.clear()
     return model
 
 
@@ -258,10 +264,12 @@ async def delete_model_by_id(id: str, user=Depends(get_verified_user)):
         )
 
     result = Models.delete_model_by_id(id)
+    model_price_cache.clear()
     return result
 
 
 @router.delete("/delete/all", response_model=bool)
 async def delete_all_models(user=Depends(get_admin_user)):
     result = Models.delete_all_models()
+    model_price_cache.clear()
     return result
@@ -1,12 +1,10 @@
-# TODO: Implement a more intelligent load balancing mechanism for distributing requests among multiple backend instances.
-# Current implementation uses a simple round-robin approach (random.choice). Consider incorporating algorithms like weighted round-robin,
-# least connections, or least response time for better resource utilization and performance optimization.
+# Requests for a model served by several backend instances are spread by the
+# upstream scheduler (utils/upstream.py), see UPSTREAM_SCHEDULER_POLICY.
 
 import asyncio
 import json
 import logging
 import os
-import random
 import re
 import time
 from datetime import datetime
@@ -40,9 +38,10 @@ from pydantic import BaseModel, ConfigDict, validator
 from starlette.background import BackgroundTask
 
 
+from open_webui.models.groups import Groups
 from open_webui.models.models import Models
 from open_webui.utils.credit.usage import CreditDeduct
-from open_webui.utils.credit.utils import check_credit_by_user_id
+from open_webui.utils.credit.utils import check_credit_by_user_id_async
 from open_webui.utils.misc import (
     calculate_sha256,
 )
@@ -53,6 +52,13 @@ from open_webui.utils.payload import (
 )
 from open_webui.utils.auth import get_admin_user, get_verified_user
 from open_webui.utils.access_control import has_access
+from open_webui.utils.session_pool import session_pool
+from open_webui.utils.upstream import (
+    Upstream,
+    UpstreamLease,
+    get_upstream_weight,
+    upstream_scheduler,
+)
 
 
 from open_webui.config import (
@@ -83,26 +89,26 @@ log.setLevel(SRC_LOG_LEVELS["OLLAMA"])
 async def send_get_request(url, key=None, user: UserModel = None):
     timeout = aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT_MODEL_LIST)
     try:
-        async with aiohttp.ClientSession(timeout=timeout, trust_env=True) as session:
-            async with session.get(
-                url,
-                headers={
-                    "Content-Type": "application/json",
-                    **({"Authorization": f"Bearer {key}"} if key else {}),
-                    **(
-                        {
-                            "X-OpenWebUI-User-Name": quote(user.name, safe=" "),
-                            "X-OpenWebUI-User-Id": user.id,
-                            "X-OpenWebUI-User-Email": user.email,
-                            "X-OpenWebUI-User-Role": user.role,
-                        }
-                        if ENABLE_FORWARD_USER_INFO_HEADERS and user
-                        else {}
-                    ),
-                },
-                ssl=AIOHTTP_CLIENT_SESSION_SSL,
-            ) as response:
-                return await response.json()
+        async with session_pool.get_session(url).get(
+            url,
+            headers={
+                "Content-Type": "application/json",
+                **({"Authorization": f"Bearer {key}"} if key else {}),
+                **(
+                    {
+                        "X-OpenWebUI-User-Name": quote(user.name, safe=" "),
+                        "X-OpenWebUI-User-Id": user.id,
+                        "X-OpenWebUI-User-Email": user.email,
+                        "X-OpenWebUI-User-Role": user.role,
+                    }
+                    if ENABLE_FORWARD_USER_INFO_HEADERS and user
+                    else {}
+                ),
+            },
+            ssl=AIOHTTP_CLIENT_SESSION_SSL,
+            timeout=timeout,
+        ) as response:
+            return await response.json()
     except Exception as e:
         # Handle connection error here
         log.error(f"Connection error: {e}")
@@ -111,12 +117,16 @@ async def send_get_request(url, key=None, user: UserModel = None):
 
 async def cleanup_response(
     response: Optional[aiohttp.ClientResponse],
-    session: Optional[aiohttp.ClientSession],
+    session: Optional[aiohttp.ClientSession] = None,
+    lease: Optional[UpstreamLease] = None,
 ):
     if response:
-        response.close()
+        # back to the pool if fully read, the connection is closed otherwise
+        response.release()
     if session:
         await session.close()
+    if lease:
+        lease.release()
 
 
 async def send_post_request(
@@ -127,15 +137,15 @@ async def send_post_request(
     content_type: Optional[str] = None,
     user: UserModel = None,
     metadata: Optional[dict] = None,
+    upstreams: Optional[list[Upstream]] = None,
 ):
+    """
+    With upstreams, url is a path sent to the upstream picked by the
+    scheduler, and to another one if it fails before responding
+    """
 
-    r = None
-    try:
-        session = aiohttp.ClientSession(
-            trust_env=True, timeout=aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT)
-        )
-
-        r = await session.post(
+    async def post(url: str, key: Optional[str]) -> aiohttp.ClientResponse:
+        return await session_pool.get_session(url).post(
             url,
             data=payload,
             headers={
@@ -158,12 +168,25 @@ async def send_post_request(
                 ),
             },
             ssl=AIOHTTP_CLIENT_SESSION_SSL,
+            timeout=aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT),
         )
 
+    r = None
+    lease = None
+    streaming = False
+    try:
+        if upstreams:
+            r, lease = await upstream_scheduler.send(
+                upstreams,
+                lambda upstream: post(f"{upstream.url}{url}", upstream.key),
+            )
+        else:
+            r = await post(url, key)
+
         if r.ok is False:
             try:
                 res = await r.json()
-                await cleanup_response(r, session)
+                await cleanup_response(r, lease=lease)
                 if "error" in res:
                     raise HTTPException(status_code=r.status, detail=res["error"])
             except HTTPException as e:
@@ -182,13 +205,12 @@ async def send_post_request(
             if content_type:
                 response_headers["Content-Type"] = content_type
 
+            streaming = True
             return StreamingResponse(
                 r.content,
                 status_code=r.status,
                 headers=response_headers,
-                background=BackgroundTask(
-                    cleanup_response, response=r, session=session
-                ),
+                background=BackgroundTask(cleanup_response, response=r, lease=lease),
             )
         else:
             res = await r.json()
@@ -204,8 +226,8 @@ async def send_post_request(
             detail=detail if e else "Open WebUI: Server Connection Error",
         )
     finally:
-        if not stream:
-            await cleanup_response(r, session)
+        if not streaming:
+            await cleanup_response(r, lease=lease)
 
 
 def get_api_key(idx, url, configs):
@@ -216,6 +238,31 @@ def get_api_key(idx, url, configs):
     )  # Legacy support
 
 
+def get_ollama_upstreams(request: Request, url_idxs: list[int]) -> list[Upstream]:
+    upstreams = []
+    for url_idx in url_idxs:
+        url = request.app.state.config.OLLAMA_BASE_URLS[url_idx]
+        api_config = request.app.state.config.OLLAMA_API_CONFIGS.get(
+            str(url_idx),
+            request.app.state.config.OLLAMA_API_CONFIGS.get(url, {}),  # Legacy support
+        )
+        upstreams.append(
+            Upstream(
+                url=url,
+                idx=url_idx,
+                key=get_api_key(
+                    url_idx, url, request.app.state.config.OLLAMA_API_CONFIGS
+                ),
+                weight=get_upstream_weight(api_config),
+            )
+        )
+    return upstreams
+
+
+def pick_ollama_url_idx(request: Request, url_idxs: list[int]) -> int:
+    return upstream_scheduler.pick(get_ollama_upstreams(request, url_idxs)).idx
+
+
 ##########################################
 #
 # API routes
@@ -443,14 +490,25 @@ async def get_all_models(request: Request, user: UserModel = None):
     return models
 
 
-async def get_filtered_models(models, user):
-    # Filter models based on user access control
+async def get_filtered_models(models, user, key: str = "model"):
+    # Filter models based on user access control, key names the model id field
+    model_infos = {
+        model_info.id: model_info
+        for model_info in Models.get_models_by_ids(
+            [model[key] for model in models.get("models", [])]
+        )
+    }
+    user_group_ids = Groups.get_group_ids_by_member_id(user.id)
+
     filtered_models = []
     for model in models.get("models", []):
-        model_info = Models.get_model_by_id(model["model"])
+        model_info = model_infos.get(model[key])
         if model_info:
             if user.id == model_info.user_id or has_access(
-                user.id, type="read", access_control=model_info.access_control
+                user.id,
+                type="read",
+                access_control=model_info.access_control,
+                user_group_ids=user_group_ids,
             ):
                 filtered_models.append(model)
     return filtered_models
@@ -969,7 +1027,7 @@ async def show_model_info(
             detail=ERROR_MESSAGES.MODEL_NOT_FOUND(model),
         )
 
-    url_idx = random.choice(models[model]["urls"])
+    url_idx = pick_ollama_url_idx(request, models[model]["urls"])
 
     url = request.app.state.config.OLLAMA_BASE_URLS[url_idx]
     key = get_api_key(url_idx, url, request.app.state.config.OLLAMA_API_CONFIGS)
@@ -1043,7 +1101,7 @@ async def embed(
             model = f"{model}:latest"
 
         if model in models:
-            url_idx = random.choice(models[model]["urls"])
+            url_idx = pick_ollama_url_idx(request, models[model]["urls"])
         else:
             raise HTTPException(
                 status_code=400,
@@ -1122,7 +1180,9 @@ async def embeddings(
 
     # check credit
     if user:
-        check_credit_by_user_id(user_id=user.id, form_data={}, is_embedding=True)
+        await check_credit_by_user_id_async(
+            user_id=user.id, form_data={}, is_embedding=True
+        )
 
     if url_idx is None:
         await get_all_models(request, user=user)
@@ -1134,7 +1194,7 @@ async def embeddings(
             model = f"{model}:latest"
 
         if model in models:
-            url_idx = random.choice(models[model]["urls"])
+            url_idx = pick_ollama_url_idx(request, models[model]["urls"])
         else:
             raise HTTPException(
                 status_code=400,
@@ -1179,7 +1239,7 @@ async def embeddings(
         # calculate usage
         if user:
             input_text = form_data.prompt
-            with CreditDeduct(
+            async with CreditDeduct(
                 user=user,
                 model_id=form_data.model,
                 body={"messages": [{"role": "user", "content": input_text}]},
@@ -1230,6 +1290,7 @@ async def generate_completion(
     url_idx: Optional[int] = None,
     user=Depends(get_verified_user),
 ):
+    url_idxs = [url_idx]
     if url_idx is None:
         await get_all_models(request, user=user)
         models = request.app.state.OLLAMA_MODELS
@@ -1240,14 +1301,15 @@ async def generate_completion(
             model = f"{model}:latest"
 
         if model in models:
-            url_idx = random.choice(models[model]["urls"])
+            url_idxs = models[model]["urls"]
         else:
             raise HTTPException(
                 status_code=400,
                 detail=ERROR_MESSAGES.MODEL_NOT_FOUND(form_data.model),
             )
 
-    url = request.app.state.config.OLLAMA_BASE_URLS[url_idx]
+    upstreams = get_ollama_upstreams(request, url_idxs)
+    url, url_idx = upstreams[0].url, upstreams[0].idx
     api_config = request.app.state.config.OLLAMA_API_CONFIGS.get(
         str(url_idx),
         request.app.state.config.OLLAMA_API_CONFIGS.get(url, {}),  # Legacy support
@@ -1258,10 +1320,10 @@ async def generate_completion(
         form_data.model = form_data.model.replace(f"{prefix_id}.", "")
 
     return await send_post_request(
-        url=f"{url}/api/generate",
+        url="/api/generate",
         payload=form_data.model_dump_json(exclude_none=True).encode(),
-        key=get_api_key(url_idx, url, request.app.state.config.OLLAMA_API_CONFIGS),
         user=user,
+        upstreams=upstreams,
     )
 
 
@@ -1299,15 +1361,26 @@ class GenerateChatCompletionForm(BaseModel):
     )
 
 
+def get_ollama_url_idxs(
+    request: Request, model: str, url_idx: Optional[int] = None
+) -> list[int]:
+    if url_idx is not None:
+        return [url_idx]
+
+    models = request.app.state.OLLAMA_MODELS
+    if model not in models:
+        raise HTTPException(
+            status_code=400,
+            detail=ERROR_MESSAGES.MODEL_NOT_FOUND(model),
+        )
+    return models[model].get("urls", [])
+
+
 async def get_ollama_url(request: Request, model: str, url_idx: Optional[int] = None):
     if url_idx is None:
-        models = request.app.state.OLLAMA_MODELS
-        if model not in models:
-            raise HTTPException(
-                status_code=400,
-                detail=ERROR_MESSAGES.MODEL_NOT_FOUND(model),
-            )
-        url_idx = random.choice(models[model].get("urls", []))
+        url_idx = pick_ollama_url_idx(
+            request, get_ollama_url_idxs(request, model, url_idx)
+        )
     url = request.app.state.config.OLLAMA_BASE_URLS[url_idx]
     return url, url_idx
 
@@ -1377,7 +1450,11 @@ async def generate_chat_completion(
     if ":" not in payload["model"]:
         payload["model"] = f"{payload['model']}:latest"
 
-    url, url_idx = await get_ollama_url(request, payload["model"], url_idx)
+    # connections merged under one model id share its prefix
+    upstreams = get_ollama_upstreams(
+        request, get_ollama_url_idxs(request, payload["model"], url_idx)
+    )
+    url, url_idx = upstreams[0].url, upstreams[0].idx
     api_config = request.app.state.config.OLLAMA_API_CONFIGS.get(
         str(url_idx),
         request.app.state.config.OLLAMA_API_CONFIGS.get(url, {}),  # Legacy support
@@ -1388,13 +1465,13 @@ async def generate_chat_completion(
         payload["model"] = payload["model"].replace(f"{prefix_id}.", "")
 
     return await send_post_request(
-        url=f"{url}/api/chat",
+        url="/api/chat",
         payload=json.dumps(payload),
         stream=form_data.stream,
-        key=get_api_key(url_idx, url, request.app.state.config.OLLAMA_API_CONFIGS),
         content_type="application/x-ndjson",
         user=user,
         metadata=metadata,
+        upstreams=upstreams,
     )
 
 
@@ -1483,7 +1560,11 @@ async def generate_openai_completion(
     if ":" not in payload["model"]:
         payload["model"] = f"{payload['model']}:latest"
 
-    url, url_idx = await get_ollama_url(request, payload["model"], url_idx)
+    # connections merged under one model id share its prefix
+    upstreams = get_ollama_upstreams(
+        request, get_ollama_url_idxs(request, payload["model"], url_idx)
+    )
+    url, url_idx = upstreams[0].url, upstreams[0].idx
     api_config = request.app.state.config.OLLAMA_API_CONFIGS.get(
         str(url_idx),
         request.app.state.config.OLLAMA_API_CONFIGS.get(url, {}),  # Legacy support
@@ -1495,12 +1576,12 @@ async def generate_openai_completion(
         payload["model"] = payload["model"].replace(f"{prefix_id}.", "")
 
     return await send_post_request(
-        url=f"{url}/v1/completions",
+        url="/v1/completions",
         payload=json.dumps(payload),
         stream=payload.get("stream", False),
-        key=get_api_key(url_idx, url, request.app.state.config.OLLAMA_API_CONFIGS),
         user=user,
         metadata=metadata,
+        upstreams=upstreams,
     )
 
 
@@ -1512,7 +1593,7 @@ async def generate_openai_chat_completion(
     url_idx: Optional[int] = None,
     user=Depends(get_verified_user),
 ):
-    check_credit_by_user_id(user_id=user.id, form_data=form_data)
+    await check_credit_by_user_id_async(user_id=user.id, form_data=form_data)
 
     metadata = form_data.pop("metadata", None)
 
@@ -1568,7 +1649,11 @@ async def generate_openai_chat_completion(
     if ":" not in payload["model"]:
         payload["model"] = f"{payload['model']}:latest"
 
-    url, url_idx = await get_ollama_url(request, payload["model"], url_idx)
+    # connections merged under one model id share its prefix
+    upstreams = get_ollama_upstreams(
+        request, get_ollama_url_idxs(request, payload["model"], url_idx)
+    )
+    url, url_idx = upstreams[0].url, upstreams[0].idx
     api_config = request.app.state.config.OLLAMA_API_CONFIGS.get(
         str(url_idx),
         request.app.state.config.OLLAMA_API_CONFIGS.get(url, {}),  # Legacy support
@@ -1579,12 +1664,12 @@ async def generate_openai_chat_completion(
         payload["model"] = payload["model"].replace(f"{prefix_id}.", "")
 
     return await send_post_request(
-        url=f"{url}/v1/chat/completions",
+        url="/v1/chat/completions",
         payload=json.dumps(payload),
         stream=payload.get("stream", False),
-        key=get_api_key(url_idx, url, request.app.state.config.OLLAMA_API_CONFIGS),
         user=user,
         metadata=metadata,
+        upstreams=upstreams,
     )
 
 
@@ -1644,15 +1729,7 @@ async def get_openai_models(
 
     if user.role == "user" and not BYPASS_MODEL_ACCESS_CONTROL:
         # Filter models based on user access control
-        filtered_models = []
-        for model in models:
-            model_info = Models.get_model_by_id(model["id"])
-            if model_info:
-                if user.id == model_info.user_id or has_access(
-                    user.id, type="read", access_control=model_info.access_control
-                ):
-                    filtered_models.append(model)
-        models = filtered_models
+        models = await get_filtered_models({"models": models}, user, key="id")
 
     return {
         "data": models,
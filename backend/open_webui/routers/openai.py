@@ -21,6 +21,7 @@ from fastapi.responses import (
 from pydantic import BaseModel
 from starlette.background import BackgroundTask
 
+from open_webui.models.groups import Groups
 from open_webui.models.models import Models
 from open_webui.config import (
     CACHE_DIR,
@@ -38,7 +39,7 @@ from open_webui.models.users import UserModel
 
 from open_webui.constants import ERROR_MESSAGES
 from open_webui.env import SRC_LOG_LEVELS
-from open_webui.utils.credit.utils import check_credit_by_user_id
+from open_webui.utils.credit.utils import check_credit_by_user_id_async
 
 from open_webui.utils.payload import (
     apply_model_params_to_body_openai,
@@ -51,6 +52,14 @@ from open_webui.utils.misc import (
 from open_webui.utils.auth import get_admin_user, get_verified_user
 from open_webui.utils.access_control import has_access
 from open_webui.utils.credit.usage import CreditDeduct
+from open_webui.utils.session_pool import session_pool
+from open_webui.utils.upstream import (
+    Upstream,
+    UpstreamLease,
+    get_upstream_pool,
+    get_upstream_weight,
+    upstream_scheduler,
+)
 
 log = logging.getLogger(__name__)
 log.setLevel(SRC_LOG_LEVELS["OPENAI"])
@@ -66,25 +75,25 @@ log.setLevel(SRC_LOG_LEVELS["OPENAI"])
 async def send_get_request(url, key=None, user: UserModel = None):
     timeout = aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT_MODEL_LIST)
     try:
-        async with aiohttp.ClientSession(timeout=timeout, trust_env=True) as session:
-            async with session.get(
-                url,
-                headers={
-                    **({"Authorization": f"Bearer {key}"} if key else {}),
-                    **(
-                        {
-                            "X-OpenWebUI-User-Name": quote(user.name, safe=" "),
-                            "X-OpenWebUI-User-Id": user.id,
-                            "X-OpenWebUI-User-Email": user.email,
-                            "X-OpenWebUI-User-Role": user.role,
-                        }
-                        if ENABLE_FORWARD_USER_INFO_HEADERS and user
-                        else {}
-                    ),
-                },
-                ssl=AIOHTTP_CLIENT_SESSION_SSL,
-            ) as response:
-                return await response.json()
+        async with session_pool.get_session(url).get(
+            url,
+            headers={
+                **({"Authorization": f"Bearer {key}"} if key else {}),
+                **(
+                    {
+                        "X-OpenWebUI-User-Name": quote(user.name, safe=" "),
+                        "X-OpenWebUI-User-Id": user.id,
+                        "X-OpenWebUI-User-Email": user.email,
+                        "X-OpenWebUI-User-Role": user.role,
+                    }
+                    if ENABLE_FORWARD_USER_INFO_HEADERS and user
+                    else {}
+                ),
+            },
+            ssl=AIOHTTP_CLIENT_SESSION_SSL,
+            timeout=timeout,
+        ) as response:
+            return await response.json()
     except Exception as e:
         # Handle connection error here
         log.error(f"Connection error: {e}")
@@ -93,12 +102,30 @@ async def send_get_request(url, key=None, user: UserModel = None):
 
 async def cleanup_response(
     response: Optional[aiohttp.ClientResponse],
-    session: Optional[aiohttp.ClientSession],
+    session: Optional[aiohttp.ClientSession] = None,
+    lease: Optional[UpstreamLease] = None,
 ):
     if response:
-        response.close()
+        # back to the pool if fully read, the connection is closed otherwise
+        response.release()
     if session:
         await session.close()
+    if lease:
+        lease.release()
+
+
+def get_openai_upstreams(request: Request, url_idxs: list[int]) -> list[Upstream]:
+    upstreams = []
+    for idx in url_idxs:
+        url = request.app.state.config.OPENAI_API_BASE_URLS[idx]
+        api_config = request.app.state.config.OPENAI_API_CONFIGS.get(
+            str(idx),
+            request.app.state.config.OPENAI_API_CONFIGS.get(url, {}),  # Legacy support
+        )
+        upstreams.append(
+            Upstream(url=url, idx=idx, weight=get_upstream_weight(api_config))
+        )
+    return upstreams
 
 
 def openai_reasoning_model_handler(payload):
@@ -469,12 +496,23 @@ async def get_all_models_responses(request: Request, user: UserModel) -> list:
 
 async def get_filtered_models(models, user):
     # Filter models based on user access control
+    model_infos = {
+        model_info.id: model_info
+        for model_info in Models.get_models_by_ids(
+            [model["id"] for model in models.get("data", [])]
+        )
+    }
+    user_group_ids = Groups.get_group_ids_by_member_id(user.id)
+
     filtered_models = []
     for model in models.get("data", []):
-        model_info = Models.get_model_by_id(model["id"])
+        model_info = model_infos.get(model["id"])
         if model_info:
             if user.id == model_info.user_id or has_access(
-                user.id, type="read", access_control=model_info.access_control
+                user.id,
+                type="read",
+                access_control=model_info.access_control,
+                user_group_ids=user_group_ids,
             ):
                 filtered_models.append(model)
     return filtered_models
@@ -540,6 +578,24 @@ async def get_all_models(request: Request, user: UserModel) -> dict[str, list]:
     models = {"data": merge_models_lists(map(extract_data, responses))}
     log.debug(f"models: {models}")
 
+    # connections of one pool serving the same model id, spread by the
+    # upstream scheduler
+    def get_pool(idx: int) -> tuple:
+        url = request.app.state.config.OPENAI_API_BASE_URLS[idx]
+        api_config = request.app.state.config.OPENAI_API_CONFIGS.get(
+            str(idx),
+            request.app.state.config.OPENAI_API_CONFIGS.get(url, {}),  # Legacy support
+        )
+        return get_upstream_pool(
+            url, request.app.state.config.OPENAI_API_KEYS[idx], api_config
+        )
+
+    url_idxs = {}
+    for model in models["data"]:
+        model_pool = (model["id"], get_pool(model["urlIdx"]))
+        url_idxs.setdefault(model_pool, []).append(model["urlIdx"])
+        model["urlIdxs"] = url_idxs[model_pool]
+
     request.app.state.OPENAI_MODELS = {model["id"]: model for model in models["data"]}
     return models
 
@@ -565,67 +621,66 @@ async def get_models(
         )
 
         r = None
-        async with aiohttp.ClientSession(
-            trust_env=True,
-            timeout=aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT_MODEL_LIST),
-        ) as session:
-            try:
-                headers, cookies = get_headers_and_cookies(
-                    request, url, key, api_config, user=user
-                )
-
-                if api_config.get("azure", False):
-                    models = {
-                        "data": api_config.get("model_ids", []) or [],
-                        "object": "list",
-                    }
-                else:
-                    async with session.get(
-                        f"{url}/models",
-                        headers=headers,
-                        cookies=cookies,
-                        ssl=AIOHTTP_CLIENT_SESSION_SSL,
-                    ) as r:
-                        if r.status != 200:
-                            # Extract response error details if available
-                            error_detail = f"HTTP Error: {r.status}"
-                            res = await r.json()
-                            if "error" in res:
-                                error_detail = f"External Error: {res['error']}"
-                            raise Exception(error_detail)
+        try:
+            headers, cookies = get_headers_and_cookies(
+                request, url, key, api_config, user=user
+            )
 
-                        response_data = await r.json()
+            if api_config.get("azure", False):
+                models = {
+                    "data": api_config.get("model_ids", []) or [],
+                    "object": "list",
+                }
+            else:
+                async with session_pool.get_session(url).get(
+                    f"{url}/models",
+                    headers=headers,
+                    cookies=cookies,
+                    ssl=AIOHTTP_CLIENT_SESSION_SSL,
+                    timeout=aiohttp.ClientTimeout(
+                        total=AIOHTTP_CLIENT_TIMEOUT_MODEL_LIST
+                    ),
+                ) as r:
+                    if r.status != 200:
+                        # Extract response error details if available
+                        error_detail = f"HTTP Error: {r.status}"
+                        res = await r.json()
+                        if "error" in res:
+                            error_detail = f"External Error: {res['error']}"
+                        raise Exception(error_detail)
+
+                    response_data = await r.json()
+
+                    # Check if we're calling OpenAI API based on the URL
+                    if "api.openai.com" in url:
+                        # Filter models according to the specified conditions
+                        response_data["data"] = [
+                            model
+                            for model in response_data.get("data", [])
+                            if not any(
+                                name in model["id"]
+                                for name in [
+                                    "babbage",
+                                    "dall-e",
+                                    "davinci",
+                                    "embedding",
+                                    "tts",
+                                    "whisper",
+                                ]
+                            )
+                        ]
 
-                        # Check if we're calling OpenAI API based on the URL
-                        if "api.openai.com" in url:
-                            # Filter models according to the specified conditions
-                            response_data["data"] = [
-                                model
-                                for model in response_data.get("data", [])
-                                if not any(
-                                    name in model["id"]
-                                    for name in [
-                                        "babbage",
-                                        "dall-e",
-                                        "davinci",
-                                        "embedding",
-                                        "tts",
-                                        "whisper",
-                                    ]
-                                )
-                            ]
-
-                        models = response_data
-            except aiohttp.ClientError as e:
-                # ClientError covers all aiohttp requests issues
-                log.exception(f"Client error: {str(e)}")
-                raise HTTPException(
-                    status_code=500, detail="Open WebUI: Server Connection Error"
-                )
-            except Exception as e:
-                log.exception(f"Unexpected error: {e}")
-                error_detail = f"Unexpected error: {str(e)}"
-                raise HTTPException(status_code=500, detail=error_detail)
+                    models = response_data
+        except aiohttp.ClientError as e:
+            # ClientError covers all aiohttp requests issues
+            log.exception(f"Client error: {str(e)}")
+            raise HTTPException(
+                status_code=500, detail="Open WebUI: Server Connection Error"
+            )
+        except Exception as e:
+            log.exception(f"Unexpected error: {e}")
+            error_detail = f"Unexpected error: {str(e)}"
+            raise HTTPException(status_code=500, detail=error_detail)
 
     if user.role == "user" and not BYPASS_MODEL_ACCESS_CONTROL:
         models["data"] = await get_filtered_models(models, user)
@@ -810,7 +865,7 @@ async def generate_chat_completion(
     user=Depends(get_verified_user),
     bypass_filter: Optional[bool] = False,
 ):
-    check_credit_by_user_id(user_id=user.id, form_data=form_data)
+    await check_credit_by_user_id_async(user_id=user.id, form_data=form_data)
 
     if BYPASS_MODEL_ACCESS_CONTROL:
         bypass_filter = True
@@ -858,26 +913,12 @@ async def generate_chat_completion(
 
     await get_all_models(request, user=user)
     model = request.app.state.OPENAI_MODELS.get(model_id)
-    if model:
-        idx = model["urlIdx"]
-    else:
+    if not model:
         raise HTTPException(
             status_code=404,
             detail="Model not found",
         )
 
-    # Get the API config for the model
-    api_config = request.app.state.config.OPENAI_API_CONFIGS.get(
-        str(idx),
-        request.app.state.config.OPENAI_API_CONFIGS.get(
-            request.app.state.config.OPENAI_API_BASE_URLS[idx], {}
-        ),  # Legacy support
-    )
-
-    prefix_id = api_config.get("prefix_id", None)
-    if prefix_id:
-        payload["model"] = payload["model"].replace(f"{prefix_id}.", "")
-
     # Add user info to the payload if the model is a pipeline
     if "pipeline" in model and model.get("pipeline"):
         payload["user"] = {
@@ -887,73 +928,101 @@ async def generate_chat_completion(
             "role": user.role,
         }
 
-    url = request.app.state.config.OPENAI_API_BASE_URLS[idx]
-    key = request.app.state.config.OPENAI_API_KEYS[idx]
-
-    # Check if model is a reasoning model that needs special handling
-    if is_openai_reasoning_model(payload["model"]):
-        payload = openai_reasoning_model_handler(payload)
-    elif "api.openai.com" not in url:
-        # Remove "max_completion_tokens" from the payload for backward compatibility
-        if "max_completion_tokens" in payload:
-            payload["max_tokens"] = payload["max_completion_tokens"]
-            del payload["max_completion_tokens"]
-
-    if "max_tokens" in payload and "max_completion_tokens" in payload:
-        del payload["max_tokens"]
-
     # Convert the modified body back to JSON
     if "logit_bias" in payload:
         payload["logit_bias"] = json.loads(
             convert_logit_bias_input_to_json(payload["logit_bias"])
         )
 
-    headers, cookies = get_headers_and_cookies(
-        request, url, key, api_config, metadata, user=user
-    )
+    async def send_request(upstream: Upstream) -> aiohttp.ClientResponse:
+        idx = upstream.idx
+        # copied, the payload is adjusted to each connection
+        upstream_payload = {**payload}
+        if "messages" in payload:
+            upstream_payload["messages"] = [
+                {**message} for message in payload["messages"]
+            ]
 
-    if api_config.get("azure", False):
-        api_version = api_config.get("api_version", "2023-03-15-preview")
-        request_url, payload = convert_to_azure_payload(url, payload, api_version)
+        # Get the API config for the model
+        api_config = request.app.state.config.OPENAI_API_CONFIGS.get(
+            str(idx),
+            request.app.state.config.OPENAI_API_CONFIGS.get(
+                request.app.state.config.OPENAI_API_BASE_URLS[idx], {}
+            ),  # Legacy support
+        )
 
-        # Only set api-key header if not using Azure Entra ID authentication
-        auth_type = api_config.get("auth_type", "bearer")
-        if auth_type not in ("azure_ad", "microsoft_entra_id"):
-            headers["api-key"] = key
+        prefix_id = api_config.get("prefix_id", None)
+        if prefix_id:
+            upstream_payload["model"] = upstream_payload["model"].replace(
+                f"{prefix_id}.", ""
+            )
 
-        headers["api-version"] = api_version
-        request_url = f"{request_url}/chat/completions?api-version={api_version}"
-    else:
-        request_url = f"{url}/chat/completions"
+        url = request.app.state.config.OPENAI_API_BASE_URLS[idx]
+        key = request.app.state.config.OPENAI_API_KEYS[idx]
 
-    payload = json.dumps(payload)
+        # Check if model is a reasoning model that needs special handling
+        if is_openai_reasoning_model(upstream_payload["model"]):
+            upstream_payload = openai_reasoning_model_handler(upstream_payload)
+        elif "api.openai.com" not in url:
+            # Remove "max_completion_tokens" from the payload for backward compatibility
+            if "max_completion_tokens" in upstream_payload:
+                upstream_payload["max_tokens"] = upstream_payload[
+                    "max_completion_tokens"
+                ]
+                del upstream_payload["max_completion_tokens"]
 
-    r = None
-    session = None
-    streaming = False
-    response = None
+        if "max_tokens" in upstream_payload and "max_completion_tokens" in (
+            upstream_payload
+        ):
+            del upstream_payload["max_tokens"]
 
-    try:
-        session = aiohttp.ClientSession(
-            trust_env=True,
-            timeout=aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT),
-            read_bufsize=AIOHTTP_CLIENT_READ_BUFFER_SIZE,
+        headers, cookies = get_headers_and_cookies(
+            request, url, key, api_config, metadata, user=user
         )
 
-        r = await session.request(
+        if api_config.get("azure", False):
+            api_version = api_config.get("api_version", "2023-03-15-preview")
+            request_url, upstream_payload = convert_to_azure_payload(
+                url, upstream_payload, api_version
+            )
+
+            # Only set api-key header if not using Azure Entra ID authentication
+            auth_type = api_config.get("auth_type", "bearer")
+            if auth_type not in ("azure_ad", "microsoft_entra_id"):
+                headers["api-key"] = key
+
+            headers["api-version"] = api_version
+            request_url = f"{request_url}/chat/completions?api-version={api_version}"
+        else:
+            request_url = f"{url}/chat/completions"
+
+        return await session_pool.get_session(request_url).request(
             method="POST",
             url=request_url,
-            data=payload,
+            data=json.dumps(upstream_payload),
             headers=headers,
             cookies=cookies,
             ssl=AIOHTTP_CLIENT_SESSION_SSL,
+            timeout=aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT),
+            read_bufsize=AIOHTTP_CLIENT_READ_BUFFER_SIZE,
+        )
+
+    r = None
+    lease = None
+    streaming = False
+    response = None
+
+    try:
+        r, lease = await upstream_scheduler.send(
+            get_openai_upstreams(request, model.get("urlIdxs", [model["urlIdx"]])),
+            send_request,
         )
 
         # Check if response is SSE
         if "text/event-stream" in r.headers.get("Content-Type", ""):
 
             async def consumer_content(content):
-                with CreditDeduct(
+                async with CreditDeduct(
                     user=user,
                     model_id=model_id,
                     body=form_data,
@@ -970,9 +1039,7 @@ async def generate_chat_completion(
                 consumer_content(r.content),
                 status_code=r.status,
                 headers=dict(r.headers),
-                background=BackgroundTask(
-                    cleanup_response, response=r, session=session
-                ),
+                background=BackgroundTask(cleanup_response, response=r, lease=lease),
             )
         else:
             try:
@@ -987,7 +1054,7 @@ async def generate_chat_completion(
                 else:
                     return PlainTextResponse(status_code=r.status, content=response)
 
-            with CreditDeduct(
+            async with CreditDeduct(
                 user=user,
                 model_id=model_id,
                 body=form_data,
@@ -1004,7 +1071,7 @@ async def generate_chat_completion(
         )
     finally:
         if not streaming:
-            await cleanup_response(r, session)
+            await cleanup_response(r, lease=lease)
 
 
 async def embeddings(request: Request, form_data: dict, user):
@@ -1022,9 +1089,11 @@ async def embeddings(request: Request, form_data: dict, user):
 
     # check credit
     if user:
-        check_credit_by_user_id(user_id=user.id, form_data={}, is_embedding=True)
+        await check_credit_by_user_id_async(
+            user_id=user.id, form_data={}, is_embedding=True
+        )
 
-    idx = 0
+    url_idxs = [0]
     # Prepare payload/body
     body = json.dumps(form_data)
     # Find correct backend url/key based on model
@@ -1032,23 +1101,20 @@ async def embeddings(request: Request, form_data: dict, user):
     model_id = form_data.get("model")
     models = request.app.state.OPENAI_MODELS
     if model_id in models:
-        idx = models[model_id]["urlIdx"]
+        url_idxs = models[model_id].get("urlIdxs", [models[model_id]["urlIdx"]])
 
-    url = request.app.state.config.OPENAI_API_BASE_URLS[idx]
-    key = request.app.state.config.OPENAI_API_KEYS[idx]
-    api_config = request.app.state.config.OPENAI_API_CONFIGS.get(
-        str(idx),
-        request.app.state.config.OPENAI_API_CONFIGS.get(url, {}),  # Legacy support
-    )
-
-    r = None
-    session = None
-    streaming = False
+    async def send_request(upstream: Upstream) -> aiohttp.ClientResponse:
+        url = upstream.url
+        key = request.app.state.config.OPENAI_API_KEYS[upstream.idx]
+        api_config = request.app.state.config.OPENAI_API_CONFIGS.get(
+            str(upstream.idx),
+            request.app.state.config.OPENAI_API_CONFIGS.get(url, {}),  # Legacy support
+        )
 
-    headers, cookies = get_headers_and_cookies(request, url, key, api_config, user=user)
-    try:
-        session = aiohttp.ClientSession(trust_env=True)
-        r = await session.request(
+        headers, cookies = get_headers_and_cookies(
+            request, url, key, api_config, user=user
+        )
+        return await session_pool.get_session(url).request(
             method="POST",
             url=f"{url}/embeddings",
             data=body,
@@ -1056,9 +1122,18 @@ async def embeddings(request: Request, form_data: dict, user):
             cookies=cookies,
         )
 
+    r = None
+    lease = None
+    streaming = False
+
+    try:
+        r, lease = await upstream_scheduler.send(
+            get_openai_upstreams(request, url_idxs), send_request
+        )
+
         if "text/event-stream" in r.headers.get("Content-Type", ""):
             if user:
-                with CreditDeduct(
+                async with CreditDeduct(
                     user=user,
                     model_id=model_id,
                     body={
@@ -1073,9 +1148,7 @@ async def embeddings(request: Request, form_data: dict, user):
                 r.content,
                 status_code=r.status,
                 headers=dict(r.headers),
-                background=BackgroundTask(
-                    cleanup_response, response=r, session=session
-                ),
+                background=BackgroundTask(cleanup_response, response=r, lease=lease),
             )
         else:
             try:
@@ -1092,7 +1165,7 @@ async def embeddings(request: Request, form_data: dict, user):
                     )
 
             if user:
-                with CreditDeduct(
+                async with CreditDeduct(
                     user=user,
                     model_id=model_id,
                     body={
@@ -1118,7 +1191,7 @@ async def embeddings(request: Request, form_data: dict, user):
         )
     finally:
         if not streaming:
-            await cleanup_response(r, session)
+            await cleanup_response(r, lease=lease)
 
 
 @router.api_route("/{path:path}", methods=["GET", "POST", "PUT", "DELETE"])
@@ -1140,7 +1213,6 @@ async def proxy(path: str, request: Request, user=Depends(get_verified_user)):
     )
 
     r = None
-    session = None
     streaming = False
 
     try:
@@ -1166,8 +1238,7 @@ async def proxy(path: str, request: Request, user=Depends(get_verified_user)):
         else:
             request_url = f"{url}/{path}"
 
-        session = aiohttp.ClientSession(trust_env=True)
-        r = await session.request(
+        r = await session_pool.get_session(request_url).request(
             method=request.method,
             url=request_url,
             data=body,
@@ -1183,9 +1254,7 @@ async def proxy(path: str, request: Request, user=Depends(get_verified_user)):
                 r.content,
                 status_code=r.status,
                 headers=dict(r.headers),
-                background=BackgroundTask(
-                    cleanup_response, response=r, session=session
-                ),
+                background=BackgroundTask(cleanup_response, response=r),
             )
         else:
             try:
@@ -1211,4 +1280,4 @@ async def proxy(path: str, request: Request, user=Depends(get_verified_user)):
         )
     finally:
         if not streaming:
-            await cleanup_response(r, session)
+            await cleanup_response(r)
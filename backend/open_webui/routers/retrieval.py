@@ -4,11 +4,13 @@ import mimetypes
 import os
 import shutil
 import asyncio
+import anyio
 
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from typing import Iterator, List, Optional, Sequence, Union
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence, Union
 
 from fastapi import (
     Depends,
@@ -31,8 +33,11 @@ from langchain.text_splitter import RecursiveCharacterTextSplitter, TokenTextSpl
 from langchain_text_splitters import MarkdownHeaderTextSplitter
 from langchain_core.documents import Document
 
+from open_webui.models.bm25 import BM25Index
+from open_webui.models.embeddings import ChunkEmbeddings, get_chunk_hash
 from open_webui.models.files import FileModel, Files
 from open_webui.models.knowledge import Knowledges
+from open_webui.socket.main import emit_to_user
 from open_webui.storage.provider import Storage
 
 
@@ -67,14 +72,17 @@ from open_webui.retrieval.web.sougou import search_sougou
 from open_webui.retrieval.web.firecrawl import search_firecrawl
 from open_webui.retrieval.web.external import search_external
 
+from open_webui.retrieval.embedding_cache import embedding_cache
 from open_webui.retrieval.utils import (
     get_embedding_function,
     get_reranking_function,
     get_model_path,
+    ensure_bm25_index,
     query_collection,
     query_collection_with_hybrid_search,
     query_doc,
     query_doc_with_hybrid_search,
+    retrieval_result_cache,
 )
 from open_webui.utils.misc import (
     calculate_sha256_string,
@@ -100,6 +108,9 @@ from open_webui.env import (
     SENTENCE_TRANSFORMERS_MODEL_KWARGS,
     SENTENCE_TRANSFORMERS_CROSS_ENCODER_BACKEND,
     SENTENCE_TRANSFORMERS_CROSS_ENCODER_MODEL_KWARGS,
+    ENABLE_RAG_EMBEDDING_DEDUP,
+    RAG_FILE_PROCESSING_CONCURRENCY,
+    RAG_FILE_PROCESSING_WINDOW_SIZE,
 )
 
 from open_webui.constants import ERROR_MESSAGES
@@ -248,6 +259,22 @@ async def get_embedding_config(request: Request, user=Depends(get_admin_user)):
     }
 
 
+@router.get("/embedding/cache")
+async def get_embedding_cache_stats(user=Depends(get_admin_user)):
+    """
+    Get hit/miss stats of the embedding cache
+    """
+    return embedding_cache.stats()
+
+
+@router.get("/query/cache")
+async def get_query_cache_stats(user=Depends(get_admin_user)):
+    """
+    Get hit/miss stats of the retrieval result cache
+    """
+    return retrieval_result_cache.stats()
+
+
 class OpenAIConfigForm(BaseModel):
     url: str
     key: str
@@ -1192,6 +1219,206 @@ async def update_rag_config(
 ####################################
 
 
+def split_docs(request: Request, docs: list[Document]) -> list[Document]:
+    if request.app.state.config.TEXT_SPLITTER in ["", "character"]:
+        text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=request.app.state.config.CHUNK_SIZE,
+            chunk_overlap=request.app.state.config.CHUNK_OVERLAP,
+            add_start_index=True,
+        )
+        docs = text_splitter.split_documents(docs)
+    elif request.app.state.config.TEXT_SPLITTER == "token":
+        log.info(
+            f"Using token text splitter: {request.app.state.config.TIKTOKEN_ENCODING_NAME}"
+        )
+
+        tiktoken.get_encoding(str(request.app.state.config.TIKTOKEN_ENCODING_NAME))
+        text_splitter = TokenTextSplitter(
+            encoding_name=str(request.app.state.config.TIKTOKEN_ENCODING_NAME),
+            chunk_size=request.app.state.config.CHUNK_SIZE,
+            chunk_overlap=request.app.state.config.CHUNK_OVERLAP,
+            add_start_index=True,
+        )
+        docs = text_splitter.split_documents(docs)
+    elif request.app.state.config.TEXT_SPLITTER == "markdown_header":
+        log.info("Using markdown header text splitter")
+
+        # Define headers to split on - covering most common markdown header levels
+        headers_to_split_on = [
+            ("#", "Header 1"),
+            ("##", "Header 2"),
+            ("###", "Header 3"),
+            ("####", "Header 4"),
+            ("#####", "Header 5"),
+            ("######", "Header 6"),
+        ]
+
+        markdown_splitter = MarkdownHeaderTextSplitter(
+            headers_to_split_on=headers_to_split_on,
+            strip_headers=False,  # Keep headers in content for context
+        )
+
+        md_split_docs = []
+        for doc in docs:
+            md_header_splits = markdown_splitter.split_text(doc.page_content)
+            text_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=request.app.state.config.CHUNK_SIZE,
+                chunk_overlap=request.app.state.config.CHUNK_OVERLAP,
+                add_start_index=True,
+            )
+            md_header_splits = text_splitter.split_documents(md_header_splits)
+
+            # Convert back to Document objects, preserving original metadata
+            for split_chunk in md_header_splits:
+                headings_list = []
+                # Extract header values in order based on headers_to_split_on
+                for _, header_meta_key_name in headers_to_split_on:
+                    if header_meta_key_name in split_chunk.metadata:
+                        headings_list.append(split_chunk.metadata[header_meta_key_name])
+
+                md_split_docs.append(
+                    Document(
+                        page_content=split_chunk.page_content,
+                        metadata={**doc.metadata, "headings": headings_list},
+                    )
+                )
+
+        docs = md_split_docs
+    else:
+        raise ValueError(ERROR_MESSAGES.DEFAULT("Invalid text splitter"))
+
+    return docs
+
+
+def get_document_embedding_function(request: Request):
+    return get_embedding_function(
+        request.app.state.config.RAG_EMBEDDING_ENGINE,
+        request.app.state.config.RAG_EMBEDDING_MODEL,
+        request.app.state.ef,
+        (
+            request.app.state.config.RAG_OPENAI_API_BASE_URL
+            if request.app.state.config.RAG_EMBEDDING_ENGINE == "openai"
+            else (
+                request.app.state.config.RAG_OLLAMA_BASE_URL
+                if request.app.state.config.RAG_EMBEDDING_ENGINE == "ollama"
+                else request.app.state.config.RAG_AZURE_OPENAI_BASE_URL
+            )
+        ),
+        (
+            request.app.state.config.RAG_OPENAI_API_KEY
+            if request.app.state.config.RAG_EMBEDDING_ENGINE == "openai"
+            else (
+                request.app.state.config.RAG_OLLAMA_API_KEY
+                if request.app.state.config.RAG_EMBEDDING_ENGINE == "ollama"
+                else request.app.state.config.RAG_AZURE_OPENAI_API_KEY
+            )
+        ),
+        request.app.state.config.RAG_EMBEDDING_BATCH_SIZE,
+        azure_api_version=(
+            request.app.state.config.RAG_AZURE_OPENAI_API_VERSION
+            if request.app.state.config.RAG_EMBEDDING_ENGINE == "azure_openai"
+            else None
+        ),
+    )
+
+
+def insert_chunks_to_vector_db(
+    request: Request,
+    docs: list[Document],
+    collection_name: str,
+    embedding_function,
+    metadata: Optional[dict] = None,
+    user=None,
+) -> int:
+    """
+    Embed already split documents and add them to the collection
+    """
+    texts = [doc.page_content for doc in docs]
+    metadatas = [
+        {
+            **doc.metadata,
+            **(metadata if metadata else {}),
+            "embedding_config": {
+                "engine": request.app.state.config.RAG_EMBEDDING_ENGINE,
+                "model": request.app.state.config.RAG_EMBEDDING_MODEL,
+            },
+        }
+        for doc in docs
+    ]
+
+    embedding_texts = list(map(lambda x: x.replace("\n", " "), texts))
+    if ENABLE_RAG_EMBEDDING_DEDUP:
+        # only embed chunks not embedded before with this engine and model
+        engine = request.app.state.config.RAG_EMBEDDING_ENGINE
+        model = request.app.state.config.RAG_EMBEDDING_MODEL
+        chunk_hashes = [
+            get_chunk_hash(text, RAG_EMBEDDING_CONTENT_PREFIX)
+            for text in embedding_texts
+        ]
+        vectors = ChunkEmbeddings.get_vectors(engine, model, chunk_hashes)
+        missing = {
+            chunk_hash: text
+            for chunk_hash, text in zip(chunk_hashes, embedding_texts)
+            if chunk_hash not in vectors
+        }
+        if missing:
+            new_embeddings = embedding_function(
+                list(missing.values()),
+                prefix=RAG_EMBEDDING_CONTENT_PREFIX,
+                user=user,
+            )
+            if not new_embeddings or len(new_embeddings) != len(missing):
+                raise ValueError(
+                    ERROR_MESSAGES.DEFAULT("Failed to generate embeddings")
+                )
+            new_vectors = dict(zip(missing.keys(), new_embeddings))
+            ChunkEmbeddings.add_vectors(engine, model, new_vectors)
+            vectors.update(new_vectors)
+        embeddings = [vectors[chunk_hash] for chunk_hash in chunk_hashes]
+        log.info(
+            f"embeddings generated {len(missing)}, reused {len(texts) - len(missing)} for {len(texts)} items"
+        )
+    else:
+        embeddings = embedding_function(
+            embedding_texts,
+            prefix=RAG_EMBEDDING_CONTENT_PREFIX,
+            user=user,
+        )
+        log.info(f"embeddings generated {len(embeddings)} for {len(texts)} items")
+
+    items = [
+        {
+            "id": str(uuid.uuid4()),
+            "text": text,
+            "vector": embeddings[idx],
+            "metadata": metadatas[idx],
+        }
+        for idx, text in enumerate(texts)
+    ]
+
+    # index the chunks stored so far first, so they aren't missed
+    ensure_bm25_index(collection_name)
+
+    VECTOR_DB_CLIENT.insert(
+        collection_name=collection_name,
+        items=items,
+    )
+
+    try:
+        BM25Index.add(
+            collection_name=collection_name,
+            ids=[item["id"] for item in items],
+            texts=texts,
+            metadatas=metadatas,
+        )
+    except Exception as e:
+        # rebuilt from the vector db on the next insert or hybrid search
+        log.exception(f"Error indexing collection {collection_name}: {e}")
+        BM25Index.delete_collection(collection_name)
+
+    return len(items)
+
+
 def save_docs_to_vector_db(
     request: Request,
     docs,
@@ -1236,97 +1463,18 @@ def save_docs_to_vector_db(
                 raise ValueError(ERROR_MESSAGES.DUPLICATE_CONTENT)
 
     if split:
-        if request.app.state.config.TEXT_SPLITTER in ["", "character"]:
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=request.app.state.config.CHUNK_SIZE,
-                chunk_overlap=request.app.state.config.CHUNK_OVERLAP,
-                add_start_index=True,
-            )
-            docs = text_splitter.split_documents(docs)
-        elif request.app.state.config.TEXT_SPLITTER == "token":
-            log.info(
-                f"Using token text splitter: {request.app.state.config.TIKTOKEN_ENCODING_NAME}"
-            )
-
-            tiktoken.get_encoding(str(request.app.state.config.TIKTOKEN_ENCODING_NAME))
-            text_splitter = TokenTextSplitter(
-                encoding_name=str(request.app.state.config.TIKTOKEN_ENCODING_NAME),
-                chunk_size=request.app.state.config.CHUNK_SIZE,
-                chunk_overlap=request.app.state.config.CHUNK_OVERLAP,
-                add_start_index=True,
-            )
-            docs = text_splitter.split_documents(docs)
-        elif request.app.state.config.TEXT_SPLITTER == "markdown_header":
-            log.info("Using markdown header text splitter")
-
-            # Define headers to split on - covering most common markdown header levels
-            headers_to_split_on = [
-                ("#", "Header 1"),
-                ("##", "Header 2"),
-                ("###", "Header 3"),
-                ("####", "Header 4"),
-                ("#####", "Header 5"),
-                ("######", "Header 6"),
-            ]
-
-            markdown_splitter = MarkdownHeaderTextSplitter(
-                headers_to_split_on=headers_to_split_on,
-                strip_headers=False,  # Keep headers in content for context
-            )
-
-            md_split_docs = []
-            for doc in docs:
-                md_header_splits = markdown_splitter.split_text(doc.page_content)
-                text_splitter = RecursiveCharacterTextSplitter(
-                    chunk_size=request.app.state.config.CHUNK_SIZE,
-                    chunk_overlap=request.app.state.config.CHUNK_OVERLAP,
-                    add_start_index=True,
-                )
-                md_header_splits = text_splitter.split_documents(md_header_splits)
-
-                # Convert back to Document objects, preserving original metadata
-                for split_chunk in md_header_splits:
-                    headings_list = []
-                    # Extract header values in order based on headers_to_split_on
-                    for _, header_meta_key_name in headers_to_split_on:
-                        if header_meta_key_name in split_chunk.metadata:
-                            headings_list.append(
-                                split_chunk.metadata[header_meta_key_name]
-                            )
-
-                    md_split_docs.append(
-                        Document(
-                            page_content=split_chunk.page_content,
-                            metadata={**doc.metadata, "headings": headings_list},
-                        )
-                    )
-
-            docs = md_split_docs
-        else:
-            raise ValueError(ERROR_MESSAGES.DEFAULT("Invalid text splitter"))
+        docs = split_docs(request, docs)
 
     if len(docs) == 0:
         raise ValueError(ERROR_MESSAGES.EMPTY_CONTENT)
 
-    texts = [doc.page_content for doc in docs]
-    metadatas = [
-        {
-            **doc.metadata,
-            **(metadata if metadata else {}),
-            "embedding_config": {
-                "engine": request.app.state.config.RAG_EMBEDDING_ENGINE,
-                "model": request.app.state.config.RAG_EMBEDDING_MODEL,
-            },
-        }
-        for doc in docs
-    ]
-
     try:
         if VECTOR_DB_CLIENT.has_collection(collection_name=collection_name):
             log.info(f"collection {collection_name} already exists")
 
             if overwrite:
                 VECTOR_DB_CLIENT.delete_collection(collection_name=collection_name)
+                BM25Index.delete_collection(collection_name)
                 log.info(f"deleting existing collection {collection_name}")
             elif add is False:
                 log.info(
@@ -1335,65 +1483,187 @@ def save_docs_to_vector_db(
                 return True
 
         log.info(f"generating embeddings for {collection_name}")
-        embedding_function = get_embedding_function(
-            request.app.state.config.RAG_EMBEDDING_ENGINE,
-            request.app.state.config.RAG_EMBEDDING_MODEL,
-            request.app.state.ef,
-            (
-                request.app.state.config.RAG_OPENAI_API_BASE_URL
-                if request.app.state.config.RAG_EMBEDDING_ENGINE == "openai"
-                else (
-                    request.app.state.config.RAG_OLLAMA_BASE_URL
-                    if request.app.state.config.RAG_EMBEDDING_ENGINE == "ollama"
-                    else request.app.state.config.RAG_AZURE_OPENAI_BASE_URL
-                )
-            ),
-            (
-                request.app.state.config.RAG_OPENAI_API_KEY
-                if request.app.state.config.RAG_EMBEDDING_ENGINE == "openai"
-                else (
-                    request.app.state.config.RAG_OLLAMA_API_KEY
-                    if request.app.state.config.RAG_EMBEDDING_ENGINE == "ollama"
-                    else request.app.state.config.RAG_AZURE_OPENAI_API_KEY
-                )
-            ),
-            request.app.state.config.RAG_EMBEDDING_BATCH_SIZE,
-            azure_api_version=(
-                request.app.state.config.RAG_AZURE_OPENAI_API_VERSION
-                if request.app.state.config.RAG_EMBEDDING_ENGINE == "azure_openai"
-                else None
-            ),
-        )
+        embedding_function = get_document_embedding_function(request)
 
-        embeddings = embedding_function(
-            list(map(lambda x: x.replace("\n", " "), texts)),
-            prefix=RAG_EMBEDDING_CONTENT_PREFIX,
+        # embed and insert in windows, so vectors of large documents aren't
+        # all held at once
+        log.info(f"adding to collection {collection_name}")
+        window_size = max(RAG_FILE_PROCESSING_WINDOW_SIZE, 1)
+        for start in range(0, len(docs), window_size):
+            insert_chunks_to_vector_db(
+                request,
+                docs[start : start + window_size],
+                collection_name,
+                embedding_function,
+                metadata=metadata,
+                user=user,
+            )
+
+        log.info(f"added {len(docs)} items to collection {collection_name}")
+        return True
+    except Exception as e:
+        log.exception(e)
+        raise e
+
+
+def save_doc_stream_to_vector_db(
+    request: Request,
+    docs: Iterable[Document],
+    collection_name: str,
+    metadata: Optional[dict] = None,
+    user=None,
+    on_progress: Optional[Callable[[int], None]] = None,
+) -> int:
+    """
+    Split, embed and insert documents a window at a time while they are
+    loaded, returns the number of chunks added. Chunks added before an
+    error are kept and searchable.
+    """
+    log.info(f"save_doc_stream_to_vector_db: {collection_name}")
+
+    embedding_function = get_document_embedding_function(request)
+    window_size = max(RAG_FILE_PROCESSING_WINDOW_SIZE, 1)
+
+    total = 0
+    window = []
+    for doc in docs:
+        window.extend(split_docs(request, [doc]))
+        while len(window) >= window_size:
+            total += insert_chunks_to_vector_db(
+                request,
+                window[:window_size],
+                collection_name,
+                embedding_function,
+                metadata=metadata,
+                user=user,
+            )
+            window = window[window_size:]
+            if on_progress:
+                on_progress(total)
+
+    if window:
+        total += insert_chunks_to_vector_db(
+            request,
+            window,
+            collection_name,
+            embedding_function,
+            metadata=metadata,
             user=user,
         )
-        log.info(f"embeddings generated {len(embeddings)} for {len(texts)} items")
+        if on_progress:
+            on_progress(total)
 
-        items = [
-            {
-                "id": str(uuid.uuid4()),
-                "text": text,
-                "vector": embeddings[idx],
-                "metadata": metadatas[idx],
-            }
-            for idx, text in enumerate(texts)
-        ]
+    if total == 0:
+        raise ValueError(ERROR_MESSAGES.EMPTY_CONTENT)
 
-        log.info(f"adding to collection {collection_name}")
-        VECTOR_DB_CLIENT.insert(
-            collection_name=collection_name,
-            items=items,
-        )
+    log.info(f"added {total} items to collection {collection_name}")
+    return total
 
-        log.info(f"added {len(items)} items to collection {collection_name}")
-        return True
+
+def emit_file_event(user, file_id: str, data: dict) -> None:
+    """
+    Send a file processing event to the user's sessions from a sync handler
+    """
+    if user is None:
+        return
+
+    payload = {"file_id": file_id, "data": data}
+    try:
+        anyio.from_thread.run(emit_to_user, user.id, "file-events", payload)
+    except RuntimeError:
+        # not on a worker thread of the event loop
+        try:
+            asyncio.get_running_loop().create_task(
+                emit_to_user(user.id, "file-events", payload)
+            )
+        except RuntimeError:
+            pass
     except Exception as e:
-        log.exception(e)
+        log.debug(f"Error emitting file event for {file_id}: {e}")
+
+
+def process_file_stream(
+    request: Request,
+    file: FileModel,
+    docs: Iterable[Document],
+    collection_name: str,
+    user=None,
+) -> dict:
+    """
+    Add a file to its collection while it is loaded, see save_doc_stream_to_vector_db
+    """
+    # replace chunks of an earlier or interrupted run, embeddings of
+    # unchanged chunks are reused
+    try:
+        VECTOR_DB_CLIENT.delete_collection(collection_name=collection_name)
+    except Exception:
+        pass
+    BM25Index.delete_collection(collection_name)
+
+    pages = []
+    progress = {"pages": 0, "chunks": 0}
+
+    def load_docs():
+        for doc in docs:
+            pages.append(doc.page_content)
+            progress["pages"] += 1
+            yield Document(
+                page_content=doc.page_content,
+                metadata={
+                    **doc.metadata,
+                    "name": file.filename,
+                    "created_by": file.user_id,
+                    "file_id": file.id,
+                    "source": file.filename,
+                },
+            )
+
+    def on_progress(chunks: int):
+        progress["chunks"] = chunks
+        emit_file_event(user, file.id, {"type": "file:progress", **progress})
+
+    try:
+        save_doc_stream_to_vector_db(
+            request,
+            load_docs(),
+            collection_name,
+            metadata={"file_id": file.id, "name": file.filename},
+            user=user,
+            on_progress=on_progress,
+        )
+    except Exception as e:
+        if progress["chunks"]:
+            # keep what was added searchable
+            log.warning(
+                f"kept {progress['chunks']} chunks of file {file.id} after error: {e}"
+            )
+            Files.update_file_data_by_id(file.id, {"content": " ".join(pages)})
+            Files.update_file_metadata_by_id(
+                file.id, {"collection_name": collection_name}
+            )
+        emit_file_event(
+            user,
+            file.id,
+            {"type": "file:status", "status": "failed", "error": str(e), **progress},
+        )
         raise e
 
+    text_content = " ".join(pages)
+    Files.update_file_data_by_id(file.id, {"content": text_content})
+    Files.update_file_hash_by_id(file.id, calculate_sha256_string(text_content))
+    Files.update_file_metadata_by_id(file.id, {"collection_name": collection_name})
+    Files.update_file_data_by_id(file.id, {"status": "completed"})
+    emit_file_event(
+        user, file.id, {"type": "file:status", "status": "completed", **progress}
+    )
+
+    return {
+        "status": True,
+        "collection_name": collection_name,
+        "filename": file.filename,
+        "content": text_content,
+    }
+
 
 class ProcessFileForm(BaseModel):
     file_id: str
@@ -1422,6 +1692,7 @@ def process_file(
             try:
                 # /files/{file_id}/data/content/update
                 VECTOR_DB_CLIENT.delete_collection(collection_name=f"file-{file.id}")
+                BM25Index.delete_collection(f"file-{file.id}")
             except:
                 # Audio file upload pipeline
                 pass
@@ -1512,6 +1783,17 @@ def process_file(
                     DOCUMENT_INTELLIGENCE_KEY=request.app.state.config.DOCUMENT_INTELLIGENCE_KEY,
                     MISTRAL_OCR_API_KEY=request.app.state.config.MISTRAL_OCR_API_KEY,
                 )
+                if not request.app.state.config.BYPASS_EMBEDDING_AND_RETRIEVAL:
+                    return process_file_stream(
+                        request,
+                        file,
+                        loader.lazy_load(
+                            file.filename, file.meta.get("content_type"), file_path
+                        ),
+                        collection_name,
+                        user=user,
+                    )
+
                 docs = loader.load(
                     file.filename, file.meta.get("content_type"), file_path
                 )
@@ -2141,13 +2423,8 @@ def query_doc_handler(
         if request.app.state.config.ENABLE_RAG_HYBRID_SEARCH and (
             form_data.hybrid is None or form_data.hybrid
         ):
-            collection_results = {}
-            collection_results[form_data.collection_name] = VECTOR_DB_CLIENT.get(
-                collection_name=form_data.collection_name
-            )
             return query_doc_with_hybrid_search(
                 collection_name=form_data.collection_name,
-                collection_result=collection_results[form_data.collection_name],
                 query=form_data.query,
                 embedding_function=lambda query, prefix: request.app.state.EMBEDDING_FUNCTION(
                     query, prefix=prefix, user=user
@@ -2281,7 +2558,10 @@ def delete_entries_from_collection(form_data: DeleteForm, user=Depends(get_admin
 
             VECTOR_DB_CLIENT.delete(
                 collection_name=form_data.collection_name,
-                metadata={"hash": hash},
+                filter={"hash": hash},
+            )
+            BM25Index.delete(
+                collection_name=form_data.collection_name, filter={"hash": hash}
             )
             return {"status": True}
         else:
@@ -2294,6 +2574,7 @@ def delete_entries_from_collection(form_data: DeleteForm, user=Depends(get_admin
 @router.post("/reset/db")
 def reset_vector_db(user=Depends(get_admin_user)):
     VECTOR_DB_CLIENT.reset()
+    BM25Index.reset()
     Knowledges.delete_all_knowledge()
 
 
@@ -2360,9 +2641,7 @@ def process_files_batch(
     errors: List[BatchProcessFilesResult] = []
     collection_name = form_data.collection_name
 
-    # Prepare all documents first
-    all_docs: List[Document] = []
-    for file in form_data.files:
+    def _process_file(file: FileModel) -> BatchProcessFilesResult:
         try:
             text_content = file.data.get("content", "")
 
@@ -2383,41 +2662,37 @@ def process_files_batch(
             Files.update_file_hash_by_id(file.id, hash)
             Files.update_file_data_by_id(file.id, {"content": text_content})
 
-            all_docs.extend(docs)
-            results.append(BatchProcessFilesResult(file_id=file.id, status="prepared"))
-
-        except Exception as e:
-            log.error(f"process_files_batch: Error processing file {file.id}: {str(e)}")
-            errors.append(
-                BatchProcessFilesResult(file_id=file.id, status="failed", error=str(e))
-            )
-
-    # Save all documents in one batch
-    if all_docs:
-        try:
             save_docs_to_vector_db(
                 request=request,
-                docs=all_docs,
+                docs=docs,
                 collection_name=collection_name,
                 add=True,
                 user=user,
             )
 
-            # Update all files with collection name
-            for result in results:
-                Files.update_file_metadata_by_id(
-                    result.file_id, {"collection_name": collection_name}
-                )
-                result.status = "completed"
-
+            Files.update_file_metadata_by_id(
+                file.id, {"collection_name": collection_name}
+            )
+            return BatchProcessFilesResult(file_id=file.id, status="completed")
         except Exception as e:
-            log.error(
-                f"process_files_batch: Error saving documents to vector DB: {str(e)}"
+            log.error(f"process_files_batch: Error processing file {file.id}: {str(e)}")
+            return BatchProcessFilesResult(
+                file_id=file.id, status="failed", error=str(e)
             )
-            for result in results:
-                result.status = "failed"
-                errors.append(
-                    BatchProcessFilesResult(file_id=result.file_id, error=str(e))
-                )
+
+    # index the chunks stored so far once, before the workers insert
+    try:
+        ensure_bm25_index(collection_name)
+    except Exception as e:
+        log.exception(f"process_files_batch: Error indexing {collection_name}: {e}")
+
+    # files are saved independently, a failed file doesn't fail the others
+    with ThreadPoolExecutor(
+        max_workers=max(RAG_FILE_PROCESSING_CONCURRENCY, 1)
+    ) as executor:
+        for result in executor.map(_process_file, form_data.files):
+            results.append(result)
+            if result.status == "failed":
+                errors.append(result)
 
     return BatchProcessFilesResponse(results=results, errors=errors)
@@ -44,6 +44,7 @@ from open_webui.env import SRC_LOG_LEVELS, STATIC_DIR
 
 from open_webui.utils.auth import get_admin_user, get_password_hash, get_verified_user
 from open_webui.utils.access_control import get_permissions, has_permission
+from open_webui.utils.credit.ledger import credit_ledger
 
 
 log = logging.getLogger(__name__)
@@ -525,6 +526,7 @@ async def update_user_by_id(
                     ),
                 )
             )
+            credit_ledger.invalidate(user_id)
             setattr(updated_user, "credit", "%.4f" % credit.credit)
 
         if updated_user:
@@ -581,6 +583,7 @@ async def update_credit_by_user_id(
     elif form_data.amount is not None:
         params["amount"] = Decimal(form_data.amount)
         Credits.add_credit_by_user_id(form_data=AddCreditForm(**params))
+    credit_ledger.invalidate(user_id)
 
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
@@ -1,10 +1,15 @@
+import asyncio
 import json
+import logging
 import uuid
+from contextlib import asynccontextmanager
 from open_webui.utils.redis import get_redis_connection
 from open_webui.env import REDIS_KEY_PREFIX
 from typing import Optional, List, Tuple
 import pycrdt as Y
 
+log = logging.getLogger(__name__)
+
 
 class RedisLock:
     def __init__(
@@ -212,3 +217,127 @@ class YdocManager:
                 del self._updates[document_id]
             if document_id in self._users:
                 del self._users[document_id]
+
+
+class ChatMessageBuffer:
+    """
+    Coalesce db updates of chat message events
+
+    Events of one (chat_id, message_id) are applied to an in-memory copy of
+    the message and written in one upsert after flush_interval seconds, or
+    when the response is done. Db calls run in a thread.
+    """
+
+    def __init__(self, chats, flush_interval: float = 1.0):
+        self.chats = chats
+        self.flush_interval = flush_interval
+        # (chat_id, message_id) -> {"message", "fields", "set_current"}
+        self._entries = {}
+        # (chat_id, message_id) -> [lock, refs]
+        self._locks = {}
+        self._timers = {}
+
+    @asynccontextmanager
+    async def _lock(self, key: Tuple[str, str]):
+        lock = self._locks.setdefault(key, [asyncio.Lock(), 0])
+        lock[1] += 1
+        try:
+            async with lock[0]:
+                yield
+        finally:
+            lock[1] -= 1
+            if lock[1] == 0:
+                del self._locks[key]
+
+    @staticmethod
+    def _apply(entry: dict, event_data: dict) -> None:
+        event_type = event_data.get("type")
+        data = event_data.get("data", {})
+        message = entry["message"]
+
+        if event_type == "status":
+            # statuses are only added to existing messages
+            if message:
+                message["statusHistory"] = [*message.get("statusHistory", []), data]
+                entry["fields"]["statusHistory"] = message["statusHistory"]
+
+        elif event_type == "message":
+            if message:
+                message["content"] = message.get("content", "") + data.get(
+                    "content", ""
+                )
+                entry["fields"]["content"] = message["content"]
+                entry["set_current"] = True
+
+        elif event_type == "replace":
+            message["content"] = data.get("content", "")
+            entry["fields"]["content"] = message["content"]
+            entry["set_current"] = True
+
+        elif event_type == "files":
+            message["files"] = data.get("files", []) + message.get("files", [])
+            entry["fields"]["files"] = message["files"]
+            entry["set_current"] = True
+
+        elif event_type in ["source", "citation"]:
+            if data.get("type") is None:
+                message["sources"] = [*message.get("sources", []), data]
+                entry["fields"]["sources"] = message["sources"]
+                entry["set_current"] = True
+
+    async def add_event(self, chat_id: str, message_id: str, event_data: dict):
+        if event_data.get("type") not in [
+            "status",
+            "message",
+            "replace",
+            "files",
+            "source",
+            "citation",
+        ]:
+            return
+
+        key = (chat_id, message_id)
+        async with self._lock(key):
+            entry = self._entries.get(key)
+            if entry is None:
+                message = await self.chats.get_message_by_id_and_message_id_async(
+                    chat_id, message_id
+                )
+                if message is None:
+                    return
+                entry = {"message": message, "fields": {}, "set_current": False}
+                self._entries[key] = entry
+            self._apply(entry, event_data)
+
+        if self.flush_interval <= 0:
+            await self.flush(chat_id, message_id)
+        elif key not in self._timers:
+            self._timers[key] = asyncio.create_task(self._flush_later(key))
+
+    async def _flush_later(self, key: Tuple[str, str]):
+        await asyncio.sleep(self.flush_interval)
+        self._timers.pop(key, None)
+        await self.flush(*key)
+
+    async def flush(self, chat_id: str, message_id: str):
+        key = (chat_id, message_id)
+        timer = self._timers.pop(key, None)
+        if timer is not None and timer is not asyncio.current_task():
+            timer.cancel()
+
+        async with self._lock(key):
+            entry = self._entries.pop(key, None)
+            if not entry or not entry["fields"]:
+                return
+            try:
+                await self.chats.upsert_message_to_chat_by_id_and_message_id_async(
+                    chat_id,
+                    message_id,
+                    entry["fields"],
+                    entry["set_current"],
+                )
+            except Exception as e:
+                log.exception(f"Failed to save chat message {message_id}: {e}")
+
+    async def flush_all(self):
+        await asyncio.gather(*[self.flush(*key) for key in list(self._entries)])
@@ -1,12 +1,17 @@
+import hashlib
 import os
 import shutil
 import json
 import logging
 import re
+import threading
+import uuid
 from abc import ABC, abstractmethod
-from typing import BinaryIO, Tuple, Dict
+from collections import OrderedDict
+from typing import BinaryIO, Callable, Iterator, Optional, Tuple, Dict
 
 import boto3
+from boto3.s3.transfer import TransferConfig
 from botocore.config import Config
 from botocore.exceptions import ClientError
 from open_webui.config import (
@@ -24,6 +29,8 @@ from open_webui.config import (
     AZURE_STORAGE_ENDPOINT,
     AZURE_STORAGE_CONTAINER_NAME,
     AZURE_STORAGE_KEY,
+    STORAGE_CACHE_MAX_SIZE,
+    STORAGE_CHUNK_SIZE,
     STORAGE_PROVIDER,
     UPLOAD_DIR,
 )
@@ -39,16 +46,192 @@ from open_webui.env import SRC_LOG_LEVELS
 log = logging.getLogger(__name__)
 log.setLevel(SRC_LOG_LEVELS["MAIN"])
 
+# Size of the chunks yielded to streaming responses
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def iter_chunks(
+    file: BinaryIO, start: int = 0, end: Optional[int] = None
+) -> Iterator[bytes]:
+    """Yields the bytes from start to end (inclusive) of a file object, then closes it."""
+    try:
+        if start:
+            file.seek(start)
+        remaining = None if end is None else end - start + 1
+        while remaining is None or remaining > 0:
+            chunk = file.read(
+                STREAM_CHUNK_SIZE
+                if remaining is None
+                else min(STREAM_CHUNK_SIZE, remaining)
+            )
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            yield chunk
+    finally:
+        file.close()
+
+
+class LocalFileCache:
+    """
+    Size-bounded LRU of the local copies kept by object storage providers
+
+    Copies live in UPLOAD_DIR under the name of their object. Objects are
+    never changed once uploaded, so a copy is served as is until it is
+    evicted. With a max_size of 0 every copy is kept. Copies pinned by a
+    response still being sent are skipped by eviction; another worker's
+    cache may still evict them, which POSIX systems allow while the file
+    is open.
+    """
+
+    def __init__(self, max_size: int = 0):
+        self.max_size = max_size
+        self._files: Optional[OrderedDict[str, int]] = None
+        self._size = 0
+        # filename -> responses still reading the copy
+        self._pins: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _load(self) -> None:
+        # Copies left by a previous run, oldest first
+        if self._files is not None:
+            return
+        entries = []
+        if os.path.isdir(UPLOAD_DIR):
+            with os.scandir(UPLOAD_DIR) as it:
+                for entry in it:
+                    if entry.is_file():
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, entry.name, stat.st_size))
+        self._files = OrderedDict((name, size) for _, name, size in sorted(entries))
+        self._size = sum(self._files.values())
+
+    def _add(self, filename: str, size: int) -> None:
+        self._size += size - self._files.pop(filename, 0)
+        self._files[filename] = size
+        for evicted in list(self._files):
+            if not self.max_size or self._size <= self.max_size:
+                break
+            if evicted == filename or evicted in self._pins:
+                continue
+            self._size -= self._files.pop(evicted)
+            try:
+                os.remove(f"{UPLOAD_DIR}/{evicted}")
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                log.warning(f"Failed to evict {evicted} from the local cache: {e}")
+
+    def get(self, filename: str, pin: bool = False) -> Optional[str]:
+        """Returns the path of the copy, pinned until unpin if pin is set."""
+        file_path = f"{UPLOAD_DIR}/{filename}"
+        with self._lock:
+            try:
+                size = os.path.getsize(file_path)
+            except OSError:
+                if self._files is not None:
+                    self._size -= self._files.pop(filename, 0)
+                return None
+            self._load()
+            if filename in self._files:
+                self._files.move_to_end(filename)
+            else:
+                # Written by another worker
+                self._add(filename, size)
+            if pin:
+                self._pins[filename] = self._pins.get(filename, 0) + 1
+        return file_path
+
+    def unpin(self, filename: str) -> None:
+        with self._lock:
+            pins = self._pins.pop(filename, 0) - 1
+            if pins > 0:
+                self._pins[filename] = pins
+
+    def put(self, filename: str) -> None:
+        size = os.path.getsize(f"{UPLOAD_DIR}/{filename}")
+        with self._lock:
+            self._load()
+            self._add(filename, size)
+
+    def pop(self, filename: str) -> None:
+        with self._lock:
+            if self._files is not None:
+                self._size -= self._files.pop(filename, 0)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._files = None
+            self._size = 0
+
+    def download(self, filename: str, download: Callable[[str], None]) -> str:
+        """Downloads a copy through a temporary file, so readers never see a partial one."""
+        file_path = f"{UPLOAD_DIR}/{filename}"
+        tmp_file_path = f"{file_path}.{uuid.uuid4().hex}.part"
+        try:
+            download(tmp_file_path)
+            os.replace(tmp_file_path, file_path)
+        finally:
+            if os.path.exists(tmp_file_path):
+                os.remove(tmp_file_path)
+        self.put(filename)
+        return file_path
+
+    def write_through(self, filename: str, chunks: Iterator[bytes]) -> Iterator[bytes]:
+        """Yields the chunks of a whole object while keeping a copy of it."""
+        file_path = f"{UPLOAD_DIR}/{filename}"
+        tmp_file_path = f"{file_path}.{uuid.uuid4().hex}.part"
+        try:
+            with open(tmp_file_path, "wb") as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    yield chunk
+            os.replace(tmp_file_path, file_path)
+            self.put(filename)
+        finally:
+            if os.path.exists(tmp_file_path):
+                os.remove(tmp_file_path)
+
 
 class StorageProvider(ABC):
     @abstractmethod
     def get_file(self, file_path: str) -> str:
+        """Returns the path of a local copy of the file."""
+        pass
+
+    @abstractmethod
+    def get_cached_file(self, file_path: str) -> Optional[str]:
+        """
+        Returns the path of a local copy of the file, if there is one. The
+        copy is kept until release_cached_file is called.
+        """
+        pass
+
+    def release_cached_file(self, file_path: str) -> None:
+        """Lets the local copy returned by get_cached_file be evicted again."""
+        pass
+
+    @abstractmethod
+    def get_file_size(self, file_path: str) -> int:
+        """Raises FileNotFoundError if there is no such file."""
+        pass
+
+    @abstractmethod
+    def iter_file(
+        self, file_path: str, start: int = 0, end: Optional[int] = None
+    ) -> Iterator[bytes]:
+        """
+        Streams the bytes from start to end (inclusive) of the file. Raises
+        FileNotFoundError before any bytes are read if there is no such file.
+        """
         pass
 
     @abstractmethod
     def upload_file(
         self, file: BinaryIO, filename: str, tags: Dict[str, str]
-    ) -> Tuple[bytes, str]:
+    ) -> Tuple[int, str, str]:
+        """Stores the file in chunks, returns its size, sha256 and path."""
         pass
 
     @abstractmethod
@@ -64,20 +247,40 @@ class LocalStorageProvider(StorageProvider):
     @staticmethod
     def upload_file(
         file: BinaryIO, filename: str, tags: Dict[str, str]
-    ) -> Tuple[bytes, str]:
-        contents = file.read()
-        if not contents:
+    ) -> Tuple[int, str, str]:
+        chunk = file.read(STORAGE_CHUNK_SIZE)
+        if not chunk:
             raise ValueError(ERROR_MESSAGES.EMPTY_CONTENT)
         file_path = f"{UPLOAD_DIR}/{filename}"
+        size = 0
+        sha256 = hashlib.sha256()
         with open(file_path, "wb") as f:
-            f.write(contents)
-        return contents, file_path
+            while chunk:
+                f.write(chunk)
+                size += len(chunk)
+                sha256.update(chunk)
+                chunk = file.read(STORAGE_CHUNK_SIZE)
+        return size, sha256.hexdigest(), file_path
 
     @staticmethod
     def get_file(file_path: str) -> str:
         """Handles downloading of the file from local storage."""
         return file_path
 
+    @staticmethod
+    def get_cached_file(file_path: str) -> Optional[str]:
+        return file_path if os.path.isfile(file_path) else None
+
+    @staticmethod
+    def get_file_size(file_path: str) -> int:
+        return os.path.getsize(file_path)
+
+    @staticmethod
+    def iter_file(
+        file_path: str, start: int = 0, end: Optional[int] = None
+    ) -> Iterator[bytes]:
+        return iter_chunks(open(file_path, "rb"), start, end)
+
     @staticmethod
     def delete_file(file_path: str) -> None:
         """Handles deletion of the file from local storage."""
@@ -105,6 +308,10 @@ class LocalStorageProvider(StorageProvider):
             log.warning(f"Directory {UPLOAD_DIR} not found in local storage.")
 
 
+def is_s3_not_found(e: ClientError) -> bool:
+    return e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound")
+
+
 class S3StorageProvider(StorageProvider):
     def __init__(self):
         config = Config(
@@ -139,6 +346,12 @@ class S3StorageProvider(StorageProvider):
 
         self.bucket_name = S3_BUCKET_NAME
         self.key_prefix = S3_KEY_PREFIX if S3_KEY_PREFIX else ""
+        # Multipart transfers, parts are at least 5 MiB
+        self.transfer_config = TransferConfig(
+            multipart_threshold=STORAGE_CHUNK_SIZE,
+            multipart_chunksize=max(STORAGE_CHUNK_SIZE, 5 * 1024 * 1024),
+        )
+        self.cache = LocalFileCache(STORAGE_CACHE_MAX_SIZE)
 
     @staticmethod
     def sanitize_tag_value(s: str) -> str:
@@ -147,12 +360,14 @@ class S3StorageProvider(StorageProvider):
 
     def upload_file(
         self, file: BinaryIO, filename: str, tags: Dict[str, str]
-    ) -> Tuple[bytes, str]:
+    ) -> Tuple[int, str, str]:
         """Handles uploading of the file to S3 storage."""
-        _, file_path = LocalStorageProvider.upload_file(file, filename, tags)
+        size, sha256, file_path = LocalStorageProvider.upload_file(file, filename, tags)
         s3_key = os.path.join(self.key_prefix, filename)
         try:
-            self.s3_client.upload_file(file_path, self.bucket_name, s3_key)
+            self.s3_client.upload_file(
+                file_path, self.bucket_name, s3_key, Config=self.transfer_config
+            )
             if S3_ENABLE_TAGGING and tags:
                 sanitized_tags = {
                     self.sanitize_tag_value(k): self.sanitize_tag_value(v)
@@ -168,10 +383,8 @@ class S3StorageProvider(StorageProvider):
                     Key=s3_key,
                     Tagging=tagging,
                 )
-            return (
-                open(file_path, "rb").read(),
-                f"s3://{self.bucket_name}/{s3_key}",
-            )
+            self.cache.put(filename)
+            return size, sha256, f"s3://{self.bucket_name}/{s3_key}"
         except ClientError as e:
             raise RuntimeError(f"Error uploading file to S3: {e}")
 
@@ -179,10 +392,62 @@ class S3StorageProvider(StorageProvider):
         """Handles downloading of the file from S3 storage."""
         try:
             s3_key = self._extract_s3_key(file_path)
-            local_file_path = self._get_local_file_path(s3_key)
-            self.s3_client.download_file(self.bucket_name, s3_key, local_file_path)
-            return local_file_path
+            filename = self._get_local_filename(s3_key)
+            return self.cache.get(filename) or self.cache.download(
+                filename,
+                lambda local_file_path: self.s3_client.download_file(
+                    self.bucket_name,
+                    s3_key,
+                    local_file_path,
+                    Config=self.transfer_config,
+                ),
+            )
         except ClientError as e:
+            if is_s3_not_found(e):
+                raise FileNotFoundError(f"File not found in S3: {file_path}") from e
+            raise RuntimeError(f"Error downloading file from S3: {e}")
+
+    def get_cached_file(self, file_path: str) -> Optional[str]:
+        s3_key = self._extract_s3_key(file_path)
+        return self.cache.get(self._get_local_filename(s3_key), pin=True)
+
+    def release_cached_file(self, file_path: str) -> None:
+        s3_key = self._extract_s3_key(file_path)
+        self.cache.unpin(self._get_local_filename(s3_key))
+
+    def get_file_size(self, file_path: str) -> int:
+        try:
+            s3_key = self._extract_s3_key(file_path)
+            response = self.s3_client.head_object(Bucket=self.bucket_name, Key=s3_key)
+            return response["ContentLength"]
+        except ClientError as e:
+            if is_s3_not_found(e):
+                raise FileNotFoundError(f"File not found in S3: {file_path}") from e
+            raise RuntimeError(f"Error getting file from S3: {e}")
+
+    def iter_file(
+        self, file_path: str, start: int = 0, end: Optional[int] = None
+    ) -> Iterator[bytes]:
+        """Streams the file from S3 storage, keeping a copy when it is read whole."""
+        try:
+            s3_key = self._extract_s3_key(file_path)
+            if start == 0 and end is None:
+                response = self.s3_client.get_object(
+                    Bucket=self.bucket_name, Key=s3_key
+                )
+                return self.cache.write_through(
+                    self._get_local_filename(s3_key), iter_chunks(response["Body"])
+                )
+
+            response = self.s3_client.get_object(
+                Bucket=self.bucket_name,
+                Key=s3_key,
+                Range=f"bytes={start}-{'' if end is None else end}",
+            )
+            return iter_chunks(response["Body"])
+        except ClientError as e:
+            if is_s3_not_found(e):
+                raise FileNotFoundError(f"File not found in S3: {file_path}") from e
             raise RuntimeError(f"Error downloading file from S3: {e}")
 
     def delete_file(self, file_path: str) -> None:
@@ -195,6 +460,7 @@ class S3StorageProvider(StorageProvider):
 
         # Always delete from local storage
         LocalStorageProvider.delete_file(file_path)
+        self.cache.pop(self._get_local_filename(s3_key))
 
     def delete_all_files(self) -> None:
         """Handles deletion of all files from S3 storage."""
@@ -214,13 +480,14 @@ class S3StorageProvider(StorageProvider):
 
         # Always delete from local storage
         LocalStorageProvider.delete_all_files()
+        self.cache.clear()
 
     # The s3 key is the name assigned to an object. It excludes the bucket name, but includes the internal path and the file name.
     def _extract_s3_key(self, full_file_path: str) -> str:
         return "/".join(full_file_path.split("//")[1].split("/")[1:])
 
-    def _get_local_file_path(self, s3_key: str) -> str:
-        return f"{UPLOAD_DIR}/{s3_key.split('/')[-1]}"
+    def _get_local_filename(self, s3_key: str) -> str:
+        return s3_key.split("/")[-1]
 
 
 class GCSStorageProvider(StorageProvider):
@@ -237,16 +504,20 @@ class GCSStorageProvider(StorageProvider):
             # if running on a Compute Engine instance, credentials would be from Google Metadata server
             self.gcs_client = storage.Client()
         self.bucket = self.gcs_client.bucket(GCS_BUCKET_NAME)
+        # Resumable transfers, chunks are a multiple of 256 KiB
+        self.chunk_size = -(-STORAGE_CHUNK_SIZE // (256 * 1024)) * 256 * 1024
+        self.cache = LocalFileCache(STORAGE_CACHE_MAX_SIZE)
 
     def upload_file(
         self, file: BinaryIO, filename: str, tags: Dict[str, str]
-    ) -> Tuple[bytes, str]:
+    ) -> Tuple[int, str, str]:
         """Handles uploading of the file to GCS storage."""
-        contents, file_path = LocalStorageProvider.upload_file(file, filename, tags)
+        size, sha256, file_path = LocalStorageProvider.upload_file(file, filename, tags)
         try:
-            blob = self.bucket.blob(filename)
+            blob = self.bucket.blob(filename, chunk_size=self.chunk_size)
             blob.upload_from_filename(file_path)
-            return contents, "gs://" + self.bucket_name + "/" + filename
+            self.cache.put(filename)
+            return size, sha256, "gs://" + self.bucket_name + "/" + filename
         except GoogleCloudError as e:
             raise RuntimeError(f"Error uploading file to GCS: {e}")
 
@@ -254,13 +525,47 @@ class GCSStorageProvider(StorageProvider):
         """Handles downloading of the file from GCS storage."""
         try:
             filename = file_path.removeprefix("gs://").split("/")[1]
-            local_file_path = f"{UPLOAD_DIR}/{filename}"
+            local_file_path = self.cache.get(filename)
+            if local_file_path:
+                return local_file_path
+
             blob = self.bucket.get_blob(filename)
-            blob.download_to_filename(local_file_path)
+            if blob is None:
+                raise FileNotFoundError(f"File not found in GCS: {file_path}")
+            blob.chunk_size = self.chunk_size
+            return self.cache.download(filename, blob.download_to_filename)
+        except NotFound as e:
+            raise FileNotFoundError(f"File not found in GCS: {file_path}") from e
+
+    def get_cached_file(self, file_path: str) -> Optional[str]:
+        return self.cache.get(file_path.removeprefix("gs://").split("/")[1], pin=True)
+
+    def release_cached_file(self, file_path: str) -> None:
+        self.cache.unpin(file_path.removeprefix("gs://").split("/")[1])
+
+    def get_file_size(self, file_path: str) -> int:
+        filename = file_path.removeprefix("gs://").split("/")[1]
+        blob = self.bucket.get_blob(filename)
+        if blob is None:
+            raise FileNotFoundError(f"File not found in GCS: {file_path}")
+        return blob.size
 
-            return local_file_path
+    def iter_file(
+        self, file_path: str, start: int = 0, end: Optional[int] = None
+    ) -> Iterator[bytes]:
+        """Streams the file from GCS storage, keeping a copy when it is read whole."""
+        try:
+            filename = file_path.removeprefix("gs://").split("/")[1]
+            blob = self.bucket.blob(filename)
+            # the reader only fetches on the first read, after the response
+            # headers are sent, so check the blob exists here
+            blob.reload()
+            reader = blob.open("rb", chunk_size=self.chunk_size)
+            if start == 0 and end is None:
+                return self.cache.write_through(filename, iter_chunks(reader))
+            return iter_chunks(reader, start, end)
         except NotFound as e:
-            raise RuntimeError(f"Error downloading file from GCS: {e}")
+            raise FileNotFoundError(f"File not found in GCS: {file_path}") from e
 
     def delete_file(self, file_path: str) -> None:
         """Handles deletion of the file from GCS storage."""
@@ -273,6 +578,7 @@ class GCSStorageProvider(StorageProvider):
 
         # Always delete from local storage
         LocalStorageProvider.delete_file(file_path)
+        self.cache.pop(filename)
 
     def delete_all_files(self) -> None:
         """Handles deletion of all files from GCS storage."""
@@ -287,6 +593,7 @@ class GCSStorageProvider(StorageProvider):
 
         # Always delete from local storage
         LocalStorageProvider.delete_all_files()
+        self.cache.clear()
 
 
 class AzureStorageProvider(StorageProvider):
@@ -294,31 +601,44 @@ class AzureStorageProvider(StorageProvider):
         self.endpoint = AZURE_STORAGE_ENDPOINT
         self.container_name = AZURE_STORAGE_CONTAINER_NAME
         storage_key = AZURE_STORAGE_KEY
+        # Block uploads and chunked downloads
+        transfer_options = {
+            "max_single_put_size": STORAGE_CHUNK_SIZE,
+            "max_block_size": STORAGE_CHUNK_SIZE,
+            "max_chunk_get_size": STORAGE_CHUNK_SIZE,
+        }
 
         if storage_key:
             # Configure using the Azure Storage Account Endpoint and Key
             self.blob_service_client = BlobServiceClient(
-                account_url=self.endpoint, credential=storage_key
+                account_url=self.endpoint,
+                credential=storage_key,
+                **transfer_options,
             )
         else:
             # Configure using the Azure Storage Account Endpoint and DefaultAzureCredential
             # If the key is not configured, then the DefaultAzureCredential will be used to support Managed Identity authentication
             self.blob_service_client = BlobServiceClient(
-                account_url=self.endpoint, credential=DefaultAzureCredential()
+                account_url=self.endpoint,
+                credential=DefaultAzureCredential(),
+                **transfer_options,
             )
         self.container_client = self.blob_service_client.get_container_client(
             self.container_name
         )
+        self.cache = LocalFileCache(STORAGE_CACHE_MAX_SIZE)
 
     def upload_file(
         self, file: BinaryIO, filename: str, tags: Dict[str, str]
-    ) -> Tuple[bytes, str]:
+    ) -> Tuple[int, str, str]:
         """Handles uploading of the file to Azure Blob Storage."""
-        contents, file_path = LocalStorageProvider.upload_file(file, filename, tags)
+        size, sha256, file_path = LocalStorageProvider.upload_file(file, filename, tags)
         try:
             blob_client = self.container_client.get_blob_client(filename)
-            blob_client.upload_blob(contents, overwrite=True)
-            return contents, f"{self.endpoint}/{self.container_name}/{filename}"
+            with open(file_path, "rb") as f:
+                blob_client.upload_blob(f, length=size, overwrite=True)
+            self.cache.put(filename)
+            return size, sha256, f"{self.endpoint}/{self.container_name}/{filename}"
         except Exception as e:
             raise RuntimeError(f"Error uploading file to Azure Blob Storage: {e}")
 
@@ -326,13 +646,57 @@ class AzureStorageProvider(StorageProvider):
         """Handles downloading of the file from Azure Blob Storage."""
         try:
             filename = file_path.split("/")[-1]
-            local_file_path = f"{UPLOAD_DIR}/{filename}"
+            local_file_path = self.cache.get(filename)
+            if local_file_path:
+                return local_file_path
+
             blob_client = self.container_client.get_blob_client(filename)
-            with open(local_file_path, "wb") as download_file:
-                download_file.write(blob_client.download_blob().readall())
-            return local_file_path
+
+            def download(local_file_path: str) -> None:
+                with open(local_file_path, "wb") as download_file:
+                    blob_client.download_blob().readinto(download_file)
+
+            return self.cache.download(filename, download)
+        except ResourceNotFoundError as e:
+            raise FileNotFoundError(
+                f"File not found in Azure Blob Storage: {file_path}"
+            ) from e
+
+    def get_cached_file(self, file_path: str) -> Optional[str]:
+        return self.cache.get(file_path.split("/")[-1], pin=True)
+
+    def release_cached_file(self, file_path: str) -> None:
+        self.cache.unpin(file_path.split("/")[-1])
+
+    def get_file_size(self, file_path: str) -> int:
+        try:
+            blob_client = self.container_client.get_blob_client(
+                file_path.split("/")[-1]
+            )
+            return blob_client.get_blob_properties().size
+        except ResourceNotFoundError as e:
+            raise FileNotFoundError(
+                f"File not found in Azure Blob Storage: {file_path}"
+            ) from e
+
+    def iter_file(
+        self, file_path: str, start: int = 0, end: Optional[int] = None
+    ) -> Iterator[bytes]:
+        """Streams the file from Azure Blob Storage, keeping a copy when it is read whole."""
+        try:
+            filename = file_path.split("/")[-1]
+            blob_client = self.container_client.get_blob_client(filename)
+            if start == 0 and end is None:
+                return self.cache.write_through(
+                    filename, blob_client.download_blob().chunks()
+                )
+            return blob_client.download_blob(
+                offset=start, length=None if end is None else end - start + 1
+            ).chunks()
         except ResourceNotFoundError as e:
-            raise RuntimeError(f"Error downloading file from Azure Blob Storage: {e}")
+            raise FileNotFoundError(
+                f"File not found in Azure Blob Storage: {file_path}"
+            ) from e
 
     def delete_file(self, file_path: str) -> None:
         """Handles deletion of the file from Azure Blob Storage."""
@@ -345,6 +709,7 @@ class AzureStorageProvider(StorageProvider):
 
         # Always delete from local storage
         LocalStorageProvider.delete_file(file_path)
+        self.cache.pop(filename)
 
     def delete_all_files(self) -> None:
         """Handles deletion of all files from Azure Blob Storage."""
@@ -357,6 +722,7 @@ class AzureStorageProvider(StorageProvider):
 
         # Always delete from local storage
         LocalStorageProvider.delete_all_files()
+        self.cache.clear()
 
 
 def get_storage_provider(storage_provider: str):
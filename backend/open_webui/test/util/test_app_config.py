@@ -0,0 +1,64 @@
+import json
+
+from open_webui.config import AppConfig, PersistentConfig
+
+
+class FakePipeline:
+    def __init__(self, redis) -> None:
+        self.redis = redis
+        self.commands = []
+
+    def get(self, key):
+        self.commands.append(lambda: self.redis.get(key))
+
+    def execute(self):
+        self.redis.round_trips += 1
+        return [command() for command in self.commands]
+
+
+class FakeRedis:
+    def __init__(self) -> None:
+        self.data = {}
+        self.round_trips = 0
+
+    def get(self, key):
+        self.round_trips += 1
+        return self.data.get(key)
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+
+def get_config(redis: FakeRedis, sync_interval: float) -> AppConfig:
+    config = AppConfig(redis_key_prefix="test", sync_interval=sync_interval)
+    object.__setattr__(config, "_redis", redis)
+    config.SYNC_TEST = PersistentConfig("SYNC_TEST", "test.sync", "local")
+    return config
+
+
+class TestAppConfig:
+    """Test config reads from the local snapshot"""
+
+    def test_reads_without_round_trips(self):
+        """Test repeated reads within the interval don't hit Redis"""
+        redis = FakeRedis()
+        redis.data["test:config:SYNC_TEST"] = json.dumps("shared")
+        config = get_config(redis, sync_interval=60)
+
+        assert config.SYNC_TEST == "shared"
+        round_trips = redis.round_trips
+        for _ in range(100):
+            assert config.SYNC_TEST == "shared"
+        assert redis.round_trips == round_trips
+
+    def test_picks_up_changes_of_other_instances(self):
+        """Test a bumped version reloads the changed value"""
+        redis = FakeRedis()
+        config = get_config(redis, sync_interval=0)
+        assert config.SYNC_TEST == "local"
+
+        redis.data["test:config:SYNC_TEST"] = json.dumps("changed")
+        assert config.SYNC_TEST == "local"
+
+        redis.data["test:config:version"] = "1"
+        assert config.SYNC_TEST == "changed"
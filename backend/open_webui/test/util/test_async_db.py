@@ -0,0 +1,66 @@
+import asyncio
+import time
+import uuid
+from decimal import Decimal
+
+from open_webui.internal.db import get_async_database_url, run_db
+from open_webui.models.credits import AddCreditForm, Credits, SetCreditFormDetail
+from open_webui.models.users import Users
+
+
+class TestAsyncDB:
+    """Test async access to the database"""
+
+    def test_async_database_url(self):
+        """Test database urls map to their async drivers"""
+        assert get_async_database_url("sqlite:////data/webui.db") == (
+            "sqlite+aiosqlite:////data/webui.db"
+        )
+        assert get_async_database_url(
+            "postgresql://u:p@db:5432/webui?sslmode=require"
+        ) == ("postgresql+asyncpg://u:p@db:5432/webui?ssl=require")
+        assert get_async_database_url("sqlite+sqlcipher:///webui.db") is None
+
+    def test_loop_not_blocked(self):
+        """Test the loop keeps running while a query runs"""
+
+        def slow_query(db):
+            time.sleep(0.2)
+            return True
+
+        async def main():
+            ticks = 0
+
+            async def tick():
+                nonlocal ticks
+                while True:
+                    await asyncio.sleep(0.01)
+                    ticks += 1
+
+            ticker = asyncio.create_task(tick())
+            assert await run_db(slow_query)
+            ticker.cancel()
+            return ticks
+
+        assert asyncio.run(main()) >= 10
+
+    def test_credit_variants(self):
+        """Test async credit check and deduct match the sync methods"""
+        user_id = str(uuid.uuid4())
+
+        async def main():
+            credit = await Credits.init_credit_by_user_id_async(user_id)
+            assert await Users.get_user_by_id_async(user_id) is None
+
+            updated = await Credits.add_credit_by_user_id_async(
+                AddCreditForm(
+                    user_id=user_id,
+                    amount=Decimal("-1.5"),
+                    detail=SetCreditFormDetail(desc="test"),
+                )
+            )
+            return credit, updated
+
+        credit, updated = asyncio.run(main())
+        assert updated.credit == credit.credit - Decimal("1.5")
+        assert Credits.get_credit_by_user_id(user_id).credit == updated.credit
@@ -0,0 +1,61 @@
+import uuid
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from open_webui.internal.db import get_db
+from open_webui.models.bm25 import BM25Document, BM25Index
+
+
+@pytest.fixture
+def collection_name():
+    collection_name = f"test-{uuid.uuid4()}"
+    yield collection_name
+    BM25Index.delete_collection(collection_name)
+
+
+class TestBM25Index:
+    """Test writes to the BM25 index"""
+
+    def test_add_replaces_ids(self, collection_name):
+        """Test re-indexing a chunk replaces it instead of duplicating it"""
+        BM25Index.add(collection_name, ["a", "b"], ["apple pie", "banana"], [{}, {}])
+        BM25Index.add(
+            collection_name,
+            ["a", "c", "c"],
+            ["apple tart", "cherry", "cherry cake"],
+            [{}, {}, {}],
+        )
+
+        assert BM25Index.get_doc_count(collection_name) == 3
+        result = BM25Index.search(collection_name, "tart cake pie", limit=10)
+        assert sorted(result.ids) == ["a", "c"]
+        assert "apple tart" in result.documents
+
+    def test_unique_doc_id(self, collection_name):
+        """Test the db rejects a chunk indexed twice"""
+        BM25Index.add(collection_name, ["a"], ["apple"], [{}])
+        with pytest.raises(IntegrityError):
+            with get_db() as db:
+                db.add(
+                    BM25Document(
+                        collection_name=collection_name, doc_id="a", text="apple"
+                    )
+                )
+                db.commit()
+
+    def test_delete_by_filter(self, collection_name):
+        """Test deleting by metadata removes only the matching chunks"""
+        BM25Index.add(
+            collection_name,
+            ["a", "b", "c"],
+            ["apple", "banana", "cherry"],
+            [{"file_id": "1", "page": 1}, {"file_id": "2"}, {"file_id": "1"}],
+        )
+
+        BM25Index.delete(collection_name, filter={"file_id": "1", "page": 1})
+        assert BM25Index.get_doc_count(collection_name) == 2
+
+        BM25Index.delete(collection_name, filter={"file_id": "1"})
+        assert BM25Index.get_doc_count(collection_name) == 1
+        assert BM25Index.search(collection_name, "banana cherry", 10).ids == ["b"]
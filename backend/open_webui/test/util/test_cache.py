@@ -0,0 +1,50 @@
+import time
+
+from open_webui.utils.cache import LRUCache
+
+
+class TestLRUCache:
+    """Test bounded LRU cache"""
+
+    def test_get_and_set(self):
+        """Test hit and miss counters"""
+        cache = LRUCache(max_size=2)
+        assert cache.get("a") is None
+        cache.set("a", 1)
+        assert cache.get("a") == 1
+
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["size"] == 1
+
+    def test_evict_least_recently_used(self):
+        """Test eviction keeps recently used items"""
+        cache = LRUCache(max_size=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert "a" in cache
+        assert "b" not in cache
+        assert "c" in cache
+        assert cache.stats()["evictions"] == 1
+
+    def test_ttl(self):
+        """Test expired items are dropped"""
+        cache = LRUCache(max_size=2, ttl=0.01)
+        cache.set("a", 1)
+        time.sleep(0.02)
+        assert cache.get("a") is None
+        assert len(cache) == 0
+
+    def test_max_bytes(self):
+        """Test size cap in bytes"""
+        cache = LRUCache(max_size=10, max_bytes=10, sizeof=len)
+        cache.set("a", "12345")
+        cache.set("b", "12345")
+        cache.set("c", "12345")
+
+        assert "a" not in cache
+        assert cache.stats()["bytes"] == 10
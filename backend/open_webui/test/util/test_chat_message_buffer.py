@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+
+from open_webui.socket.utils import ChatMessageBuffer
+
+
+class FakeChats:
+    def __init__(self, messages: dict):
+        self.messages = messages
+        self.current_id = None
+        self.reads = 0
+        self.writes = 0
+
+    async def get_message_by_id_and_message_id_async(self, id, message_id):
+        self.reads += 1
+        return dict(self.messages.get(message_id, {}))
+
+    async def upsert_message_to_chat_by_id_and_message_id_async(
+        self, id, message_id, message, set_current=True
+    ):
+        self.writes += 1
+        self.messages[message_id] = {**self.messages.get(message_id, {}), **message}
+        if set_current:
+            self.current_id = message_id
+        return True
+
+
+EVENTS = [
+    {"type": "status", "data": {"description": "searching"}},
+    *[{"type": "message", "data": {"content": f"{i} "}} for i in range(50)],
+    {"type": "files", "data": {"files": [{"id": "f1"}]}},
+    {"type": "citation", "data": {"source": {"name": "doc"}}},
+    {"type": "status", "data": {"description": "done", "done": True}},
+]
+
+EXPECTED = {
+    "content": "hi " + "".join(f"{i} " for i in range(50)),
+    "statusHistory": [
+        {"description": "searching"},
+        {"description": "done", "done": True},
+    ],
+    "files": [{"id": "f1"}],
+    "sources": [{"source": {"name": "doc"}}],
+}
+
+
+class TestChatMessageBuffer:
+    """Test coalescing of chat message event writes"""
+
+    @pytest.mark.asyncio
+    async def test_coalesce_writes(self):
+        """Test many events end in one write with the same message"""
+        chats = FakeChats({"m1": {"content": "hi "}})
+        buffer = ChatMessageBuffer(chats, flush_interval=60)
+        for event in EVENTS:
+            await buffer.add_event("c1", "m1", event)
+        assert chats.writes == 0
+
+        await buffer.flush("c1", "m1")
+        assert chats.messages["m1"] == EXPECTED
+        assert chats.current_id == "m1"
+        assert chats.reads == 1
+        assert chats.writes == 1
+
+    @pytest.mark.asyncio
+    async def test_write_through(self):
+        """Test flush interval 0 writes every event with the same message"""
+        chats = FakeChats({"m1": {"content": "hi "}})
+        buffer = ChatMessageBuffer(chats, flush_interval=0)
+        for event in EVENTS:
+            await buffer.add_event("c1", "m1", event)
+        assert chats.messages["m1"] == EXPECTED
+        assert chats.writes == len(EVENTS)
+
+    @pytest.mark.asyncio
+    async def test_flush_on_timer(self):
+        """Test buffered events are written after the flush interval"""
+        chats = FakeChats({"m1": {"content": "hi "}})
+        buffer = ChatMessageBuffer(chats, flush_interval=0.01)
+        await buffer.add_event("c1", "m1", EVENTS[1])
+        await asyncio.sleep(0.05)
+        assert chats.messages["m1"]["content"] == "hi 0 "
+        assert chats.writes == 1
+
+    @pytest.mark.asyncio
+    async def test_status_only(self):
+        """Test statuses do not change the current message"""
+        chats = FakeChats({"m1": {"content": "hi "}})
+        buffer = ChatMessageBuffer(chats, flush_interval=60)
+        await buffer.add_event("c1", "m1", EVENTS[0])
+        await buffer.add_event("c1", "m2", EVENTS[0])
+        await buffer.flush_all()
+        assert chats.messages["m1"]["statusHistory"] == [{"description": "searching"}]
+        assert "m2" not in chats.messages
+        assert chats.current_id is None
@@ -0,0 +1,129 @@
+import asyncio
+import uuid
+
+from sqlalchemy import event
+
+from open_webui.internal.db import engine, get_db
+from open_webui.models.chats import Chat, ChatForm, ChatMessage, Chats
+
+
+class TestChats:
+    """Test reading chats with pending message updates"""
+
+    def test_merge_many_chats(self):
+        """Test pending messages of over 500 chats are read by chat id in chunks"""
+        chats = [
+            Chat(
+                id=str(uuid.uuid4()),
+                user_id="user",
+                title="chat",
+                chat={"history": {"messages": {}}},
+                created_at=0,
+                updated_at=0,
+                archived=False,
+                meta={},
+            )
+            for _ in range(1001)
+        ]
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            if "FROM chat_message" in statement:
+                statements.append(statement)
+
+        with get_db() as db:
+            for chat in (chats[0], chats[-1]):
+                db.add(
+                    ChatMessage(
+                        chat_id=chat.id,
+                        message_id="m",
+                        message={"content": "hi"},
+                        current_at=1,
+                        updated_at=1_000_000_000,
+                    )
+                )
+            db.commit()
+
+            event.listen(engine, "before_cursor_execute", before_cursor_execute)
+            try:
+                chat_models = Chats._to_chat_models(db, chats)
+            finally:
+                event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+            db.query(ChatMessage).filter(
+                ChatMessage.chat_id.in_([chats[0].id, chats[-1].id])
+            ).delete()
+            db.commit()
+
+        assert len(statements) == 3
+        assert all(" IN " in statement for statement in statements)
+        for chat_model in (chat_models[0], chat_models[-1]):
+            assert chat_model.chat["history"]["currentId"] == "m"
+            assert chat_model.updated_at == 1
+        assert chat_models[1].chat == {"history": {"messages": {}}}
+
+    def test_full_write_keeps_later_updates(self):
+        """Test a full chat write removes only the updates it was read with"""
+        chat_id = Chats.insert_new_chat(
+            "user", ChatForm(chat={"title": "chat", "history": {"messages": {}}})
+        ).id
+        Chats.upsert_message_to_chat_by_id_and_message_id(
+            chat_id, "a", {"content": "first"}
+        )
+        chat = Chats.get_chat_by_id(chat_id)
+        assert set(chat.folded_messages) == {"a"}
+
+        # written by another model's stream after the read
+        Chats.upsert_message_to_chat_by_id_and_message_id(
+            chat_id, "a", {"content": "second"}
+        )
+        Chats.upsert_message_to_chat_by_id_and_message_id(
+            chat_id, "b", {"content": "other"}, set_current=False
+        )
+        Chats.update_chat_by_id(chat_id, chat.chat, chat.folded_messages)
+
+        with get_db() as db:
+            pending = {
+                m.message_id for m in db.query(ChatMessage).filter_by(chat_id=chat_id)
+            }
+        messages = Chats.get_chat_by_id(chat_id).chat["history"]["messages"]
+        assert pending == {"a", "b"}
+        assert messages["a"]["content"] == "second"
+        assert messages["b"]["content"] == "other"
+
+        # compacting folds the rest in
+        chat = asyncio.run(Chats.compact_chat_by_id_async(chat_id))
+        with get_db() as db:
+            assert db.query(ChatMessage).filter_by(chat_id=chat_id).count() == 0
+        Chats.delete_chat_by_id(chat_id)
+        assert chat.chat["history"]["messages"]["a"]["content"] == "second"
+        assert chat.chat["history"]["currentId"] == "a"
+
+    def test_concurrent_first_update(self):
+        """Test two writers creating the same message row both apply"""
+        chat_id = Chats.insert_new_chat(
+            "user", ChatForm(chat={"title": "chat", "history": {"messages": {}}})
+        ).id
+
+        with get_db() as db:
+            get = db.get
+
+            def get_after_other_writer(*args, **kwargs):
+                # the other writer creates the row after this one missed it
+                if not get_after_other_writer.called:
+                    get_after_other_writer.called = True
+                    Chats.upsert_message_to_chat_by_id_and_message_id(
+                        chat_id, "a", {"content": "hi", "sources": [1]}
+                    )
+                    return None
+                return get(*args, **kwargs)
+
+            get_after_other_writer.called = False
+            db.get = get_after_other_writer
+            assert Chats._upsert_message_to_chat_by_id_and_message_id(
+                db, chat_id, "a", {"content": "hi there"}
+            )
+
+        message = Chats.get_message_by_id_and_message_id(chat_id, "a")
+        Chats.delete_chat_by_id(chat_id)
+        assert message == {"content": "hi there", "sources": [1]}
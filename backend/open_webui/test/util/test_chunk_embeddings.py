@@ -0,0 +1,44 @@
+import asyncio
+import time
+import uuid
+
+import pytest
+
+from open_webui.internal.db import get_db
+from open_webui.models.embeddings import ChunkEmbedding, ChunkEmbeddings
+from open_webui.retrieval import utils
+
+
+class TestChunkEmbeddingPrune:
+    """Test the periodic deletion of unused chunk embeddings"""
+
+    def test_periodic_prune(self, monkeypatch):
+        """Test embeddings unused for the configured days are deleted"""
+        model = uuid.uuid4().hex
+        ChunkEmbeddings.add_vectors("bench", model, {"old": [0.1], "new": [0.2]})
+        with get_db() as db:
+            db.query(ChunkEmbedding).filter_by(model=model, chunk_hash="old").update(
+                {"used_at": int(time.time()) - 11 * 86400}
+            )
+            db.commit()
+
+        monkeypatch.setattr(utils, "RAG_EMBEDDING_DEDUP_PRUNE_DAYS", 10)
+        monkeypatch.setattr(utils, "RAG_EMBEDDING_DEDUP_PRUNE_INTERVAL", 60)
+
+        async def main():
+            task = asyncio.create_task(utils.periodic_chunk_embedding_prune())
+            for _ in range(100):
+                await asyncio.sleep(0.01)
+                if "old" not in ChunkEmbeddings.get_vectors(
+                    "bench", model, ["old"], touch=False
+                ):
+                    break
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(main())
+
+        assert ChunkEmbeddings.get_vectors(
+            "bench", model, ["old", "new"], touch=False
+        ) == {"new": [0.2]}
@@ -0,0 +1,210 @@
+import uuid
+from types import SimpleNamespace
+
+from open_webui.retrieval import utils as retrieval_utils
+from open_webui.retrieval.vector.main import VectorDBBase
+from open_webui.retrieval.vector import version
+from open_webui.retrieval.vector.version import CollectionVersions, collection_versions
+
+
+class DummyVectorDB(VectorDBBase):
+    def has_collection(self, collection_name):
+        return True
+
+    def delete_collection(self, collection_name):
+        pass
+
+    def insert(self, collection_name, items):
+        pass
+
+    def upsert(self, collection_name, items):
+        raise ValueError("upsert failed")
+
+    def search(self, collection_name, vectors, limit):
+        return None
+
+    def query(self, collection_name, filter, limit=None):
+        return None
+
+    def get(self, collection_name):
+        return None
+
+    def delete(self, collection_name, ids=None, filter=None):
+        pass
+
+    def reset(self):
+        pass
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    def __getattr__(self, name):
+        def call(*args, **kwargs):
+            self.calls.append((name, args, kwargs))
+            return self
+
+        return call
+
+    def execute(self):
+        if self.redis.error:
+            raise self.redis.error
+        return [
+            getattr(self.redis, name)(*args, **kwargs)
+            for name, args, kwargs in self.calls
+        ]
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+        self.error = None
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+    def set(self, key, value, nx=False):
+        if nx and key in self.data:
+            return False
+        self.data[key] = int(value)
+        return True
+
+    def incr(self, key):
+        self.data[key] = self.data.get(key, 0) + 1
+        return self.data[key]
+
+    def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+
+class TestCollectionVersions:
+    """Test collection version counters"""
+
+    def test_bump(self):
+        """Test bumps change only the bumped collection, reset changes all"""
+        versions = CollectionVersions()
+        before = versions.get_many(["a", "b"])
+
+        versions.bump("a")
+        after = versions.get_many(["a", "b"])
+        assert after[1] != before[1]
+        assert after[2] == before[2]
+
+        versions.bump_all()
+        assert versions.get_many(["b"])[-1] == after[2]
+        assert versions.get_many(["b"]) != (after[0], after[2])
+
+    def test_shared(self, monkeypatch):
+        """Test local versions are only shared when declared single instance"""
+        monkeypatch.setattr(version, "UVICORN_WORKERS", 1)
+        assert CollectionVersions(use_redis=True).shared
+        assert not CollectionVersions().shared
+        assert CollectionVersions(single_instance=True).shared
+
+        monkeypatch.setattr(version, "UVICORN_WORKERS", 4)
+        assert not CollectionVersions(single_instance=True).shared
+
+    def test_writes_bump_version(self):
+        """Test vector db writes bump the version, even when they fail"""
+        client = DummyVectorDB()
+
+        before = collection_versions.get_many(["docs"])
+        client.insert(collection_name="docs", items=[])
+        after_insert = collection_versions.get_many(["docs"])
+        assert after_insert != before
+
+        try:
+            client.upsert("docs", [])
+        except ValueError:
+            pass
+        assert collection_versions.get_many(["docs"]) != after_insert
+
+        before = collection_versions.get_many(["docs"])
+        client.search("docs", [], 1)
+        assert collection_versions.get_many(["docs"]) == before
+
+    def test_redis_bump_after_flush(self):
+        """Test a bump of a key missing from redis doesn't restart at 1"""
+        versions = CollectionVersions(use_redis=True)
+        versions._redis = FakeRedis()
+        versions.bump("a")
+        assert versions.get_many(["a"])[1] > 1
+
+        before = versions.get_many(["a"])
+        versions._redis.data.clear()
+        versions.bump("a")
+        assert versions.get_many(["a"]) != before
+
+    def test_bump_error_clears_cache(self):
+        """Test results cached locally are dropped when a bump fails"""
+        versions = CollectionVersions(use_redis=True)
+        versions._redis = FakeRedis()
+        versions._redis.error = ConnectionError("redis down")
+        cleared = []
+        versions.on_bump_error = lambda: cleared.append(True)
+
+        versions.bump("a")
+        versions.bump_all()
+        assert cleared == [True, True]
+        assert collection_versions.on_bump_error == (
+            retrieval_utils.retrieval_result_cache.clear
+        )
+
+    def test_fallback_cached_as_vector_search(self, monkeypatch):
+        """Test a failed hybrid search caches its fallback as a vector search"""
+        monkeypatch.setattr(retrieval_utils, "RAG_RESULT_CACHE_SIZE", 10)
+        monkeypatch.setattr(collection_versions, "single_instance", True)
+        collection_name = f"test-{uuid.uuid4()}"
+        result = {"documents": [["doc"]], "metadatas": [[{}]], "distances": [[1.0]]}
+
+        def hybrid_search(**kwargs):
+            raise Exception("hybrid search failed")
+
+        monkeypatch.setattr(
+            retrieval_utils, "query_collection_with_hybrid_search", hybrid_search
+        )
+        monkeypatch.setattr(
+            retrieval_utils, "query_collection", lambda **kwargs: result
+        )
+        config = SimpleNamespace(
+            RAG_EMBEDDING_ENGINE="",
+            RAG_EMBEDDING_MODEL="test",
+            RAG_RERANKING_ENGINE="",
+            RAG_RERANKING_MODEL="",
+        )
+        request = SimpleNamespace(
+            app=SimpleNamespace(state=SimpleNamespace(config=config))
+        )
+
+        def search(hybrid_search):
+            return retrieval_utils.get_sources_from_items(
+                request,
+                [{"collection_name": collection_name}],
+                ["query"],
+                None,
+                k=1,
+                reranking_function=None,
+                k_reranker=1,
+                r=0.0,
+                hybrid_bm25_weight=0.5,
+                hybrid_search=hybrid_search,
+            )
+
+        def cache_key(hybrid_search):
+            return retrieval_utils.get_retrieval_cache_key(
+                request,
+                [collection_name],
+                ["query"],
+                1,
+                False,
+                1,
+                0.0,
+                0.5,
+                hybrid_search,
+            )
+
+        assert search(True)[0]["document"] == ["doc"]
+        assert cache_key(True) not in retrieval_utils.retrieval_result_cache
+        assert cache_key(False) in retrieval_utils.retrieval_result_cache
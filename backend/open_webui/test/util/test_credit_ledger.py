@@ -0,0 +1,148 @@
+import uuid
+from decimal import Decimal
+
+from open_webui.models.credits import AddCreditForm, Credits, SetCreditFormDetail
+from open_webui.utils.credit import ledger
+from open_webui.utils.credit.ledger import CreditLedger
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    def __getattr__(self, name):
+        def call(*args, **kwargs):
+            self.calls.append((name, args, kwargs))
+            return self
+
+        return call
+
+    def execute(self):
+        return [
+            getattr(self.redis, name)(*args, **kwargs)
+            for name, args, kwargs in self.calls
+        ]
+
+
+class FakeRedis:
+    """The commands used by the ledger, values stored as bytes like redis"""
+
+    def __init__(self):
+        self.data = {}
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return False
+        self.data[key] = str(value).encode()
+        return True
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+    def incr(self, key):
+        value = int(self.data.get(key, 0)) + 1
+        self.data[key] = str(value).encode()
+        return value
+
+    def hget(self, key, field):
+        return self.data.get(key, {}).get(field)
+
+    def hincrby(self, key, field, amount):
+        hash = self.data.setdefault(key, {})
+        value = int(hash.get(field, 0)) + amount
+        hash[field] = str(value).encode()
+        return value
+
+    def rpush(self, key, value):
+        self.data.setdefault(key, []).append(value.encode())
+
+    def lrange(self, key, start, end):
+        return self.data.get(key, [])[start : end + 1]
+
+    def ltrim(self, key, start, end):
+        self.data[key] = self.data.get(key, [])[start:]
+
+
+def deduct(ledger: CreditLedger, user_id: str, amount: str) -> None:
+    ledger.add_credit(
+        AddCreditForm(
+            user_id=user_id,
+            amount=Decimal(amount),
+            detail=SetCreditFormDetail(desc="test"),
+        )
+    )
+
+
+class TestCreditLedger:
+    """Test the write-behind credit ledger"""
+
+    def test_redis_flush_seen_by_other_workers(self):
+        """Test a worker's cached balance is reloaded after another flushes"""
+        redis = FakeRedis()
+        workers = [CreditLedger(mode="redis", balance_ttl=60) for _ in range(2)]
+        for worker in workers:
+            worker._redis = redis
+        user_id = str(uuid.uuid4())
+        initial = Credits.init_credit_by_user_id(user_id).credit
+
+        deduct(workers[0], user_id, "-0.1")
+        deduct(workers[0], user_id, "-0.2")
+        assert workers[1].get_balance(user_id) == initial - Decimal("0.3")
+
+        assert workers[0].flush() == 2
+        assert Credits.get_credit_by_user_id(user_id).credit == initial - Decimal("0.3")
+        # exact, pending amounts are integers
+        assert redis.hget(workers[0]._pending_key, user_id) == b"0"
+        assert workers[1].get_balance(user_id) == initial - Decimal("0.3")
+
+    def test_redis_invalidate_reloads_everywhere(self):
+        """Test an admin change to a balance is seen by every worker"""
+        redis = FakeRedis()
+        workers = [CreditLedger(mode="redis", balance_ttl=60) for _ in range(2)]
+        for worker in workers:
+            worker._redis = redis
+        user_id = str(uuid.uuid4())
+        initial = Credits.init_credit_by_user_id(user_id).credit
+        assert workers[1].get_balance(user_id) == initial
+
+        Credits.add_credit_by_user_id(
+            AddCreditForm(
+                user_id=user_id,
+                amount=Decimal(5),
+                detail=SetCreditFormDetail(desc="top up"),
+            )
+        )
+        workers[0].invalidate(user_id)
+        assert workers[1].get_balance(user_id) == initial + 5
+
+    def test_memory_journal_per_process(self, monkeypatch, tmp_path):
+        """Test a worker's journal survives other workers and is replayed once it exits"""
+        monkeypatch.setattr(ledger, "DATA_DIR", str(tmp_path))
+        workers = [CreditLedger(mode="memory") for _ in range(2)]
+        user_id = str(uuid.uuid4())
+        initial = Credits.init_credit_by_user_id(user_id).credit
+
+        deduct(workers[0], user_id, "-0.1")
+        deduct(workers[1], user_id, "-0.2")
+        assert workers[1].flush() == 1
+        assert workers[0]._journal_path.read_text().count("\n") == 1
+
+        # still running, not claimed
+        worker = CreditLedger(mode="memory")
+        worker.replay()
+        assert len(worker._queue) == 0
+
+        # exited before flushing
+        workers[0]._journal_lock.close()
+        worker.replay()
+        assert len(worker._queue) == 1
+        assert not workers[0]._journal_path.exists()
+        assert worker.flush() == 1
+        assert Credits.get_credit_by_user_id(user_id).credit == initial - Decimal("0.3")
@@ -0,0 +1,118 @@
+import importlib.util
+import time
+import uuid
+from decimal import Decimal
+from pathlib import Path
+from types import SimpleNamespace
+
+import sqlalchemy as sa
+
+from open_webui.internal.db import get_db
+from open_webui.models.credits import (
+    ROLLUP_PERIODS,
+    CreditLog,
+    CreditLogRollup,
+    CreditLogRollups,
+)
+
+MIGRATION = (
+    Path(__file__).parents[2]
+    / "migrations"
+    / "versions"
+    / "b2e4c6d8f1a3_add_credit_log_rollup.py"
+)
+
+
+def load_migration():
+    spec = importlib.util.spec_from_file_location("add_credit_log_rollup", MIGRATION)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def get_log(user_id: str, created_at: int, tokens: int = 10, price: str = "0.5"):
+    return SimpleNamespace(
+        id=uuid.uuid4().hex,
+        user_id=user_id,
+        credit=Decimal(0),
+        detail={
+            "api_params": {"model": {"id": "gpt-4o"}},
+            "usage": {"total_tokens": tokens, "total_price": price},
+        },
+        created_at=created_at,
+    )
+
+
+def get_rollups(db, user_id: str) -> dict:
+    return {
+        row.id: (row.total_tokens, Decimal(str(row.total_cost)), row.request_count)
+        for row in db.query(CreditLogRollup).filter_by(user_id=user_id)
+    }
+
+
+class TestCreditRollup:
+    """Test building usage rollups from credit logs"""
+
+    def test_migration_backfill(self, monkeypatch):
+        """Test the migration adds existing logs to the rollups"""
+        migration = load_migration()
+        monkeypatch.setattr(migration, "BATCH_SIZE", 2)
+        engine = sa.create_engine("sqlite://")
+        CreditLog.__table__.create(engine)
+        CreditLogRollup.__table__.create(engine)
+
+        day = ROLLUP_PERIODS["day"]
+        logs = [
+            get_log("a", day * 10 + 5),
+            get_log("a", day * 10 + 7200),
+            get_log("b", day * 10 + 7300),
+            get_log("a", day * 12),
+            get_log("a", day * 12 + 1),
+        ]
+        not_usage = get_log("a", day * 11)
+        not_usage.detail = {"desc": "top up"}
+        with engine.begin() as conn:
+            conn.execute(
+                CreditLog.__table__.insert(),
+                [vars(log) for log in [*logs, not_usage]],
+            )
+            migration.backfill(conn)
+            rows = conn.execute(CreditLogRollup.__table__.select()).fetchall()
+
+        expected = {row["id"]: row for row in CreditLogRollups._build_rows(logs)}
+        assert {row.id for row in rows} == set(expected)
+        for row in rows:
+            assert row.total_tokens == expected[row.id]["total_tokens"]
+            assert Decimal(str(row.total_cost)) == expected[row.id]["total_cost"]
+            assert row.request_count == expected[row.id]["request_count"]
+
+    def test_rebuild_keeps_recent_buckets(self):
+        """Test a rebuild leaves the buckets being written to their writers"""
+        user_id = str(uuid.uuid4())
+        now = int(time.time())
+        old_logs = [get_log(user_id, now - 3 * ROLLUP_PERIODS["day"])]
+        recent_log = get_log(user_id, now)
+        with get_db() as db:
+            db.execute(CreditLog.__table__.insert(), [vars(log) for log in old_logs])
+            # old rollups out of date, the recent one added by a writer whose
+            # log is not committed yet
+            CreditLogRollups.add_logs(db, [*old_logs, *old_logs, recent_log])
+            db.commit()
+
+        CreditLogRollups.rebuild(batch_size=2)
+
+        with get_db() as db:
+            rollups = get_rollups(db, user_id)
+            db.query(CreditLogRollup).filter_by(user_id=user_id).delete()
+            db.query(CreditLog).filter_by(user_id=user_id).delete()
+            db.commit()
+
+        expected = {
+            row["id"]: (
+                row["total_tokens"],
+                row["total_cost"],
+                row["request_count"],
+            )
+            for row in CreditLogRollups._build_rows([*old_logs, recent_log])
+        }
+        assert rollups == expected
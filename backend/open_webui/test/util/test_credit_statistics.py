@@ -0,0 +1,30 @@
+import asyncio
+from decimal import Decimal
+
+from open_webui.routers import credit
+
+
+class TestCreditStatistics:
+    """Test the admin usage statistics"""
+
+    def test_logs_without_model_skipped(self, monkeypatch):
+        """Test usage without a model is left out of the totals and pies"""
+        usage = [
+            ("u1", "gpt-4o", 100, Decimal("1.5")),
+            ("u1", "", 50, Decimal("0.5")),
+            ("u2", "gpt-4o", 10, Decimal("0.1")),
+        ]
+        monkeypatch.setattr(
+            credit.CreditLogRollups, "get_usage_by_time", lambda *args: usage
+        )
+        monkeypatch.setattr(credit.TradeTickets, "get_ticket_by_time", lambda *args: [])
+
+        result = asyncio.run(
+            credit.get_statistics(
+                credit.StatisticRequest(start_time=0, end_time=1), None
+            )
+        )
+        assert result["total_tokens"] == 110
+        assert result["total_credit"] == Decimal("1.6")
+        assert result["model_cost_pie"] == [{"name": "gpt-4o", "value": Decimal("1.6")}]
+        assert sum(item["value"] for item in result["user_token_pie"]) == 110
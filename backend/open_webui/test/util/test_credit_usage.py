@@ -0,0 +1,114 @@
+import json
+
+import tiktoken
+
+from open_webui.models.users import UserModel
+from open_webui.utils.credit.models import ChatCompletionChunk, CompletionUsage
+from open_webui.utils.credit.usage import CreditDeduct, calculator
+
+# byte level, tiktoken files are not fetched in tests
+ENCODER = tiktoken.Encoding(
+    name="test_bytes",
+    pat_str=r"""'s|'t|'re|'ve|'m|'ll|'d| ?\p{L}+| ?\p{N}+| ?[^\s\p{L}\p{N}]+|\s+(?!\S)|\s+""",
+    mergeable_ranks={bytes([i]): i for i in range(256)},
+    special_tokens={},
+)
+
+MESSAGES = [
+    {"role": "system", "content": "be brief"},
+    {"role": "user", "content": [{"type": "text", "text": "hello there"}]},
+]
+
+
+def get_chunk(content: str, **kwargs) -> bytes:
+    chunk = {"id": "c1", "choices": [{"delta": {"content": content}}], **kwargs}
+    return f"data: {json.dumps(chunk)}\n\n".encode()
+
+
+def get_credit_deduct() -> CreditDeduct:
+    user = UserModel(
+        id="user",
+        name="user",
+        email="user@example.com",
+        role="user",
+        profile_image_url="",
+        last_active_at=0,
+        updated_at=0,
+        created_at=0,
+    )
+    return CreditDeduct(
+        user=user,
+        model_id="gpt-4o",
+        body={"model": "gpt-4o", "messages": MESSAGES},
+        is_stream=True,
+    )
+
+
+class TestStreamUsage:
+    """Test usage counted from stream chunks"""
+
+    def test_same_totals_as_per_chunk_usage(self, monkeypatch):
+        """Test totals match calculating usage chunk by chunk"""
+        monkeypatch.setattr(calculator, "get_encoder", lambda *args, **kwargs: ENCODER)
+        prompt_calls = []
+        calculate_prompt_tokens = calculator.calculate_prompt_tokens
+
+        def count_prompt_calls(*args, **kwargs):
+            prompt_calls.append(1)
+            return calculate_prompt_tokens(*args, **kwargs)
+
+        monkeypatch.setattr(calculator, "calculate_prompt_tokens", count_prompt_calls)
+        deltas = ["Hi", " there", "", "!", " 你好", " ok"]
+
+        credit_deduct = get_credit_deduct()
+        for delta in deltas:
+            credit_deduct.run(get_chunk(delta))
+        credit_deduct.run(b"data: [DONE]")
+        assert len(prompt_calls) == 1
+
+        expected = CompletionUsage(prompt_tokens=0, completion_tokens=0, total_tokens=0)
+        for delta in deltas:
+            _, chunk_usage = calculator.calculate_usage(
+                cached_usage=expected,
+                model_id="gpt-4o",
+                messages=MESSAGES,
+                response=ChatCompletionChunk.model_validate(
+                    json.loads(get_chunk(delta).decode()[len("data: ") :])
+                ),
+            )
+            expected.prompt_tokens = chunk_usage.prompt_tokens
+            expected.completion_tokens += chunk_usage.completion_tokens
+
+        assert credit_deduct.usage.prompt_tokens == expected.prompt_tokens
+        assert credit_deduct.usage.completion_tokens == expected.completion_tokens
+        assert credit_deduct.usage.total_tokens == (
+            expected.prompt_tokens + expected.completion_tokens
+        )
+        assert not credit_deduct.is_official_usage
+        assert credit_deduct.remote_id == "c1"
+
+    def test_provider_usage_wins(self, monkeypatch):
+        """Test usage reported by the provider replaces the count"""
+        monkeypatch.setattr(calculator, "get_encoder", lambda *args, **kwargs: ENCODER)
+        credit_deduct = get_credit_deduct()
+        credit_deduct.run(get_chunk("Hi"))
+        credit_deduct.run(
+            get_chunk(
+                "",
+                usage={"prompt_tokens": 7, "completion_tokens": 3, "total_tokens": 10},
+            )
+        )
+        credit_deduct.run(get_chunk(" more"))
+
+        assert credit_deduct.is_official_usage
+        assert credit_deduct.usage.prompt_tokens == 7
+        assert credit_deduct.usage.completion_tokens == 3
+        assert credit_deduct.usage.total_tokens == 10
+
+    def test_error_chunk(self, monkeypatch):
+        """Test an error chunk marks the deduction as failed"""
+        monkeypatch.setattr(calculator, "get_encoder", lambda *args, **kwargs: ENCODER)
+        credit_deduct = get_credit_deduct()
+        credit_deduct.run(get_chunk("Hi"))
+        credit_deduct.run(b'data: {"error": {"message": "overloaded"}}')
+        assert credit_deduct.is_error
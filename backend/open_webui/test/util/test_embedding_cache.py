@@ -0,0 +1,57 @@
+from open_webui.retrieval.embedding_cache import EmbeddingCache
+
+
+class TestEmbeddingCache:
+    """Test embedding cache wrapper"""
+
+    def setup_method(self):
+        self.calls = []
+
+        def embedding_function(query, prefix=None, user=None):
+            self.calls.append(query)
+            if isinstance(query, list):
+                return [[float(len(text)), 1.0] for text in query]
+            return [float(len(query)), 1.0]
+
+        self.embedding_function = embedding_function
+
+    def test_only_missing_texts_are_embedded(self):
+        """Test cached texts are skipped and repeats embedded once"""
+        cache = EmbeddingCache(max_size=10)
+        func = cache.wrap(self.embedding_function, "openai", "model")
+
+        assert func("abc") == [3.0, 1.0]
+        assert func(["abc", "de", "de"]) == [[3.0, 1.0], [2.0, 1.0], [2.0, 1.0]]
+        assert self.calls == ["abc", ["de"]]
+
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 3
+
+    def test_key_includes_prefix_and_model(self):
+        """Test same text with another prefix or model is not shared"""
+        cache = EmbeddingCache(max_size=10)
+        func = cache.wrap(self.embedding_function, "openai", "model")
+        other = cache.wrap(self.embedding_function, "openai", "other")
+
+        func("abc", prefix="query: ")
+        func("abc", prefix="passage: ")
+        other("abc", prefix="query: ")
+        assert len(self.calls) == 3
+
+    def test_failure_is_not_cached(self):
+        """Test failed embeddings are returned as is and retried later"""
+        cache = EmbeddingCache(max_size=10)
+        func = cache.wrap(lambda query, prefix=None, user=None: None, "ollama", "m")
+
+        assert func("abc") is None
+        assert len(cache._cache) == 0
+
+    def test_max_bytes(self):
+        """Test byte cap evicts old vectors"""
+        cache = EmbeddingCache(max_size=10, max_bytes=200)
+        func = cache.wrap(self.embedding_function, "openai", "model")
+
+        func(["a", "b", "c"])
+        assert cache.stats()["bytes"] <= 200
+        assert cache.stats()["evictions"] == 1
@@ -0,0 +1,137 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+from open_webui.retrieval import embeddings
+from open_webui.retrieval.embeddings import (
+    EmbeddingClient,
+    EmbeddingRequestError,
+    estimate_tokens,
+    pack_batches,
+)
+
+
+def get_client(monkeypatch, concurrency: int, fail: str = None) -> EmbeddingClient:
+    """A client whose batches embed each text as [index], later batches first"""
+    client = EmbeddingClient(concurrency=concurrency, max_retries=0)
+    client.in_flight = 0
+    client.max_in_flight = 0
+
+    async def embed_batch(engine, model, texts, *args):
+        client.in_flight += 1
+        client.max_in_flight = max(client.max_in_flight, client.in_flight)
+        await asyncio.sleep(0.05 / int(texts[0]) if int(texts[0]) else 0.1)
+        client.in_flight -= 1
+        if fail in texts:
+            raise EmbeddingRequestError("upstream failed")
+        return [[float(text)] for text in texts], len(texts)
+
+    monkeypatch.setattr(client, "_embed_batch", embed_batch)
+    return client
+
+
+class TestPackBatches:
+    """Test embedding batch packing"""
+
+    def test_batch_size(self):
+        """Test batches hold at most batch_size texts"""
+        assert pack_batches(["a"] * 5, 2) == [(0, 2), (2, 4), (4, 5)]
+
+    def test_max_tokens(self):
+        """Test batches are split by estimated tokens"""
+        texts = ["x" * 300, "x" * 300, "x" * 30, "x" * 300]
+        tokens = estimate_tokens(texts[0])
+        assert pack_batches(texts, 10, max_tokens=tokens * 2) == [(0, 2), (2, 4)]
+
+    def test_long_text_gets_own_batch(self):
+        """Test a text over the token limit is still sent"""
+        assert pack_batches(["x" * 3000, "y"], 10, max_tokens=10) == [(0, 1), (1, 2)]
+
+
+class TestEmbeddingClient:
+    """Test batches of one call are embedded concurrently"""
+
+    def test_concurrent_batches_in_order(self, monkeypatch):
+        """Test batches run concurrency at a time and results keep text order"""
+        client = get_client(monkeypatch, concurrency=3)
+        texts = [str(i) for i in range(10)]
+        try:
+            embeddings = client.embed("openai", "m", texts, batch_size=2)
+        finally:
+            asyncio.run(client.close())
+        assert embeddings == [[float(i)] for i in range(10)]
+        assert client.max_in_flight == 3
+
+    def test_failed_batch_fails_call(self, monkeypatch):
+        """Test one failed batch returns None instead of a short list"""
+        client = get_client(monkeypatch, concurrency=4, fail="7")
+        texts = [str(i) for i in range(10)]
+        try:
+            assert client.embed("openai", "m", texts, batch_size=2) is None
+        finally:
+            asyncio.run(client.close())
+
+    def test_embed_async(self, monkeypatch):
+        """Test async callers are not blocked while embedding"""
+        client = get_client(monkeypatch, concurrency=4)
+        ticks = []
+
+        async def tick():
+            while True:
+                ticks.append(1)
+                await asyncio.sleep(0.01)
+
+        async def main():
+            ticker = asyncio.create_task(tick())
+            try:
+                return await client.embed_async(
+                    "openai", "m", ["0", "1", "2"], batch_size=1
+                )
+            finally:
+                ticker.cancel()
+                await client.close()
+
+        assert asyncio.run(main()) == [[0.0], [1.0], [2.0]]
+        assert len(ticks) > 3
+
+    def test_billed_on_caller_thread(self, monkeypatch):
+        """Test the deduction runs on the caller's thread, not the client loop"""
+        deductions = []
+
+        class FakeCreditDeduct:
+            def __init__(self, **kwargs):
+                self.usage = SimpleNamespace(prompt_tokens=0, total_tokens=0)
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *args):
+                deductions.append(threading.current_thread().name)
+
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *args):
+                deductions.append(threading.current_thread().name)
+
+        async def check_credit_async(**kwargs):
+            pass
+
+        monkeypatch.setattr(embeddings, "CreditDeduct", FakeCreditDeduct)
+        monkeypatch.setattr(embeddings, "check_credit_by_user_id", lambda **kw: None)
+        monkeypatch.setattr(
+            embeddings, "check_credit_by_user_id_async", check_credit_async
+        )
+        client = get_client(monkeypatch, concurrency=2)
+        user = SimpleNamespace(id="user")
+
+        async def main():
+            try:
+                return await client.embed_async("openai", "m", ["1"], user=user)
+            finally:
+                await client.close()
+
+        assert client.embed("openai", "m", ["1"], user=user) == [[1.0]]
+        assert asyncio.run(main()) == [[1.0]]
+        current = threading.current_thread().name
+        assert deductions == [current, current]
@@ -0,0 +1,159 @@
+import threading
+import time
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+from langchain_core.documents import Document
+
+from open_webui.models.bm25 import BM25Index
+from open_webui.models.files import FileModel
+from open_webui.retrieval import utils as retrieval_utils
+from open_webui.routers import retrieval
+
+
+class FakeVectorDB:
+    """Thread-safe in-memory collections, slow to read to widen races"""
+
+    def __init__(self):
+        self.collections = {}
+        self.inserts = []
+        self.error = None
+        self.lock = threading.Lock()
+
+    def has_collection(self, collection_name):
+        return collection_name in self.collections
+
+    def get(self, collection_name):
+        if self.error:
+            raise self.error
+        time.sleep(0.05)
+        with self.lock:
+            items = list(self.collections.get(collection_name, []))
+        return SimpleNamespace(
+            ids=[[item["id"] for item in items]],
+            documents=[[item["text"] for item in items]],
+            metadatas=[[item["metadata"] for item in items]],
+        )
+
+    def insert(self, collection_name, items):
+        with self.lock:
+            self.collections.setdefault(collection_name, []).extend(items)
+            self.inserts.append(len(items))
+
+
+def embedding_function(texts, prefix=None, user=None):
+    return [[0.0] for _ in texts]
+
+
+def get_request():
+    config = SimpleNamespace(
+        TEXT_SPLITTER="character",
+        CHUNK_SIZE=10,
+        CHUNK_OVERLAP=0,
+        RAG_EMBEDDING_ENGINE="",
+        RAG_EMBEDDING_MODEL="test",
+    )
+    return SimpleNamespace(app=SimpleNamespace(state=SimpleNamespace(config=config)))
+
+
+def setup(monkeypatch) -> FakeVectorDB:
+    vector_db = FakeVectorDB()
+    monkeypatch.setattr(retrieval, "VECTOR_DB_CLIENT", vector_db)
+    monkeypatch.setattr(retrieval_utils, "VECTOR_DB_CLIENT", vector_db)
+    monkeypatch.setattr(retrieval, "ENABLE_RAG_EMBEDDING_DEDUP", False)
+    monkeypatch.setattr(
+        retrieval, "get_document_embedding_function", lambda request: embedding_function
+    )
+    return vector_db
+
+
+class TestFileIngestion:
+    """Test windowed ingestion of files into the vector db and BM25 index"""
+
+    def test_stream_in_windows(self, monkeypatch):
+        """Test chunks are inserted a window at a time as documents load"""
+        vector_db = setup(monkeypatch)
+        monkeypatch.setattr(retrieval, "RAG_FILE_PROCESSING_WINDOW_SIZE", 4)
+        collection_name = f"test-{uuid.uuid4()}"
+        progress = []
+
+        def docs():
+            for page in range(3):
+                yield Document(page_content=" ".join(["word"] * 6), metadata={})
+
+        try:
+            total = retrieval.save_doc_stream_to_vector_db(
+                get_request(),
+                docs(),
+                collection_name,
+                on_progress=progress.append,
+            )
+            # 3 pages of 3 chunks
+            assert total == 9
+            assert vector_db.inserts == [4, 4, 1]
+            assert progress == [4, 8, 9]
+            assert BM25Index.get_doc_count(collection_name) == 9
+        finally:
+            BM25Index.delete_collection(collection_name)
+
+    def test_concurrent_files_in_one_collection(self, monkeypatch):
+        """Test parallel files index an existing collection once"""
+        vector_db = setup(monkeypatch)
+        monkeypatch.setattr(retrieval, "RAG_FILE_PROCESSING_CONCURRENCY", 4)
+        collection_name = f"test-{uuid.uuid4()}"
+        # stored before the BM25 index existed
+        vector_db.collections[collection_name] = [
+            {"id": str(uuid.uuid4()), "text": "old chunk", "metadata": {}}
+            for _ in range(3)
+        ]
+
+        files = [
+            FileModel(
+                id=str(uuid.uuid4()),
+                user_id="user",
+                filename=f"{i}.txt",
+                data={"content": f"file {i} content"},
+                meta={},
+                created_at=0,
+                updated_at=0,
+            )
+            for i in range(8)
+        ]
+        try:
+            response = retrieval.process_files_batch(
+                get_request(),
+                retrieval.BatchProcessFilesForm(
+                    files=files, collection_name=collection_name
+                ),
+                user=SimpleNamespace(id="user"),
+            )
+            assert response.errors == []
+            assert len(response.results) == len(files)
+
+            stored = len(vector_db.collections[collection_name])
+            assert stored > 3
+            assert BM25Index.get_doc_count(collection_name) == stored
+        finally:
+            BM25Index.delete_collection(collection_name)
+
+    def test_vector_db_error_not_recorded(self, monkeypatch):
+        """Test a failing read leaves the index to be built later"""
+        vector_db = setup(monkeypatch)
+        collection_name = f"test-{uuid.uuid4()}"
+        vector_db.collections[collection_name] = [
+            {"id": "1", "text": "old chunk", "metadata": {}}
+        ]
+
+        vector_db.error = TimeoutError("vector db timed out")
+        with pytest.raises(TimeoutError):
+            retrieval_utils.ensure_bm25_index(collection_name)
+        assert not BM25Index.has_collection(collection_name)
+
+        vector_db.error = None
+        try:
+            retrieval_utils.ensure_bm25_index(collection_name)
+            assert BM25Index.get_doc_count(collection_name) == 1
+        finally:
+            BM25Index.delete_collection(collection_name)
@@ -0,0 +1,66 @@
+import asyncio
+import uuid
+
+from open_webui.internal.db import get_db
+from open_webui.models.files import File, FileForm, Files
+from open_webui.utils.file_status import FileStatusNotifier, file_status
+
+
+class TestFileStatus:
+    """Test file processing status notifications"""
+
+    def test_notify_from_thread(self):
+        """Test a change made in a worker thread wakes up the waiter"""
+        notifier = FileStatusNotifier()
+
+        async def main():
+            changed = notifier.subscribe("f1")
+            other = notifier.subscribe("f2")
+            await asyncio.to_thread(notifier.notify, "f1")
+            await asyncio.wait_for(changed.wait(), timeout=1)
+            assert not other.is_set()
+
+            notifier.unsubscribe("f1", changed)
+            notifier.unsubscribe("f2", other)
+            assert notifier._waiters == {}
+
+        asyncio.run(main())
+
+    def test_status_update(self):
+        """Test status updates notify and are read without the content"""
+        id = str(uuid.uuid4())
+        Files.insert_new_file(
+            "user",
+            FileForm(
+                id=id,
+                filename="test.txt",
+                path="/tmp/test.txt",
+                data={"status": "pending"},
+            ),
+        )
+
+        async def main():
+            changed = file_status.subscribe(id)
+            await asyncio.to_thread(
+                Files.update_file_data_by_id,
+                id,
+                {"status": "failed", "error": "oops", "content": "x" * 1000},
+            )
+            await asyncio.wait_for(changed.wait(), timeout=1)
+            file_status.unsubscribe(id, changed)
+            return await Files.get_file_status_by_id_async(id)
+
+        try:
+            file = asyncio.run(main())
+            assert file.status == "failed"
+            assert file.error == "oops"
+            assert file.user_id == "user"
+            assert Files.get_file_status_by_id(str(uuid.uuid4())) is None
+
+            # written before the status column
+            with get_db() as db:
+                db.query(File).filter_by(id=id).update({"status": None})
+                db.commit()
+            assert Files.get_file_status_by_id(id).status == "failed"
+        finally:
+            Files.delete_file_by_id(id)
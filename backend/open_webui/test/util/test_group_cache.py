@@ -0,0 +1,102 @@
+import asyncio
+import uuid
+from types import SimpleNamespace
+
+from open_webui.models.groups import GroupForm, Groups, GroupTable
+from open_webui.utils import auth
+from open_webui.utils.access_control import has_access
+
+
+class FakeRedis:
+    """Publishes to a list, read back by the pubsub of the listener"""
+
+    def __init__(self):
+        self.published = []
+
+    def publish(self, channel, message):
+        self.published.append((channel, message))
+
+    def pubsub(self):
+        return FakePubSub(self)
+
+
+class FakePubSub:
+    def __init__(self, redis):
+        self.redis = redis
+
+    async def subscribe(self, channel):
+        self.channel = channel
+
+    async def listen(self):
+        for channel, message in self.redis.published:
+            if channel == self.channel:
+                yield {"type": "message", "data": message.encode()}
+
+
+class TestGroupMemberCache:
+    """Test the cached group ids of users"""
+
+    def test_invalidated_on_membership_change(self):
+        """Test adding and removing members is seen right away"""
+        user_id = str(uuid.uuid4())
+        group = Groups.insert_new_group(
+            "admin", GroupForm(name="cache test", description="")
+        )
+        try:
+            assert Groups.get_group_ids_by_member_id(user_id) == set()
+
+            Groups.add_users_to_group(group.id, [user_id])
+            assert Groups.get_group_ids_by_member_id(user_id) == {group.id}
+
+            access_control = {"read": {"group_ids": [group.id], "user_ids": []}}
+            assert has_access(user_id, "read", access_control)
+
+            Groups.remove_users_from_group(group.id, [user_id])
+            assert Groups.get_group_ids_by_member_id(user_id) == set()
+            assert not has_access(user_id, "read", access_control)
+        finally:
+            Groups.delete_group_by_id(group.id)
+
+    def test_invalidation_published(self):
+        """Test a membership change made by another worker drops this worker's copy"""
+        user_id = str(uuid.uuid4())
+        redis = FakeRedis()
+        worker = GroupTable(use_redis=True)
+        worker._redis = redis
+        group = worker.insert_new_group(
+            "admin", GroupForm(name="cache test", description="")
+        )
+        try:
+            assert Groups.get_group_ids_by_member_id(user_id) == set()
+            worker.add_users_to_group(group.id, [user_id])
+            assert Groups.get_group_ids_by_member_id(user_id) == set()
+
+            app = SimpleNamespace(state=SimpleNamespace(redis=redis))
+            asyncio.run(auth.group_cache_listener(app))
+            assert Groups.get_group_ids_by_member_id(user_id) == {group.id}
+        finally:
+            Groups.delete_group_by_id(group.id)
+
+    def test_returns_copy(self):
+        """Test callers can't modify the cached ids"""
+        user_id = str(uuid.uuid4())
+        Groups.get_group_ids_by_member_id(user_id).add("other")
+        assert Groups.get_group_ids_by_member_id(user_id) == set()
+
+    def test_ollama_openai_models_filtered(self, monkeypatch):
+        """Test /ollama/v1/models filters the OpenAI shaped list for users"""
+        from open_webui.routers import ollama
+
+        async def get_all_models(request, user=None):
+            return {"models": [{"model": "mine"}, {"model": "other"}]}
+
+        monkeypatch.setattr(ollama, "get_all_models", get_all_models)
+        monkeypatch.setattr(
+            ollama.Models,
+            "get_models_by_ids",
+            lambda ids: [SimpleNamespace(id="mine", user_id="u1", access_control={})],
+        )
+        user = SimpleNamespace(id="u1", role="user")
+
+        response = asyncio.run(ollama.get_openai_models(None, user=user))
+        assert [model["id"] for model in response["data"]] == ["mine"]
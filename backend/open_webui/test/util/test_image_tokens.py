@@ -0,0 +1,69 @@
+import asyncio
+import base64
+import time
+from io import BytesIO
+
+from PIL import Image
+
+from open_webui.utils.credit import usage, utils
+from open_webui.utils.credit.utils import (
+    ImageURL,
+    calculate_image_token,
+    calculate_image_token_async,
+)
+
+
+def get_data_url(width: int, height: int) -> str:
+    buffer = BytesIO()
+    Image.new("RGB", (width, height)).save(buffer, format="PNG")
+    return "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode()
+
+
+class TestImageTokens:
+    """Test image token counting for billing"""
+
+    def test_unresolved_image_not_downloaded(self, monkeypatch):
+        """Test an image missing from the size cache is billed at the default size"""
+
+        def download(*args, **kwargs):
+            raise AssertionError("image downloaded while billing")
+
+        monkeypatch.setattr(utils.httpx, "Client", download)
+        image = ImageURL(url="http://example.com/a.png", detail="high")
+        width, height = utils.DEFAULT_IMAGE_SIZE
+        assert calculate_image_token("gpt-4o", image) == (
+            utils._calculate_image_token_by_size(85, 170, width, height)
+        )
+
+    def test_resolved_size_used(self):
+        """Test a size resolved ahead of billing is used"""
+        image = ImageURL(url=get_data_url(2048, 512), detail="high")
+        tokens = asyncio.run(calculate_image_token_async("gpt-4o", image))
+        assert tokens == utils._calculate_image_token_by_size(85, 170, 2048, 512)
+        assert calculate_image_token("gpt-4o", image) == tokens
+
+    def test_prefetch_concurrent_with_timeout(self, monkeypatch):
+        """Test prompt images are resolved together and slow ones given up on"""
+        resolved = []
+
+        async def calculate(model_id, image):
+            await asyncio.sleep(10 if "slow" in image.url else 0.2)
+            resolved.append(image.url)
+            return 0
+
+        monkeypatch.setattr(usage, "calculate_image_token_async", calculate)
+        monkeypatch.setattr(usage, "USAGE_IMAGE_SIZE_TIMEOUT", 0.5)
+        messages = [
+            {
+                "role": "user",
+                "content": [
+                    {"type": "image_url", "image_url": {"url": f"http://x/{name}"}}
+                    for name in ("a", "b", "c", "slow")
+                ],
+            }
+        ]
+
+        start = time.perf_counter()
+        asyncio.run(usage.calculator.prefetch_image_tokens("gpt-4o", messages))
+        assert time.perf_counter() - start < 1
+        assert sorted(resolved) == ["http://x/a", "http://x/b", "http://x/c"]
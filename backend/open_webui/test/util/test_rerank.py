@@ -0,0 +1,84 @@
+from langchain_core.documents import Document
+
+from open_webui.retrieval.utils import get_relevance_scores, rerank_documents
+
+
+class TestRelevanceScores:
+    """Test batched scoring of hybrid search candidates"""
+
+    def setup_method(self):
+        self.calls = []
+
+        def embedding_function(texts, prefix=None):
+            self.calls.append(texts)
+            vectors = {"a": [1.0, 0.0], "b": [0.0, 1.0], "ab": [1.0, 1.0]}
+            return [vectors[text] for text in texts]
+
+        def reranking_function(pairs):
+            self.calls.append(pairs)
+            return [float(len(text)) for _, text in pairs]
+
+        self.embedding_function = embedding_function
+        self.reranking_function = reranking_function
+
+    def test_cosine_scores_embed_once(self):
+        """Test queries and distinct documents are embedded in one call each"""
+        items = [
+            ("a", [Document(page_content="a"), Document(page_content="ab")]),
+            ("b", [Document(page_content="ab"), Document(page_content="b")]),
+        ]
+        scores = get_relevance_scores(items, self.embedding_function)
+
+        assert self.calls == [["a", "b"], ["a", "ab", "b"]]
+        assert [round(score, 4) for score in scores[0]] == [1.0, 0.7071]
+        assert [round(score, 4) for score in scores[1]] == [0.7071, 1.0]
+
+    def test_reranker_called_once_per_query(self):
+        """Test passages are deduplicated across items of the same query"""
+        items = [
+            ("q", [Document(page_content="x"), Document(page_content="yy")]),
+            ("q", [Document(page_content="yy"), Document(page_content="zzz")]),
+            ("r", []),
+        ]
+        scores = get_relevance_scores(
+            items, self.embedding_function, self.reranking_function
+        )
+
+        assert self.calls == [[("q", "x"), ("q", "yy"), ("q", "zzz")]]
+        assert scores == [[1.0, 2.0], [2.0, 3.0], []]
+
+    def test_rerank_documents(self):
+        """Test documents are filtered by r, sorted and cut to top_n"""
+        documents = [Document(page_content=text) for text in ["a", "b", "c"]]
+        result = rerank_documents(documents, [0.2, 0.9, 0.5], top_n=2, r_score=0.3)
+
+        assert [doc.page_content for doc in result] == ["b", "c"]
+        assert result[0].metadata["score"] == 0.9
+
+    def test_reranker_error_falls_back(self):
+        """Test a failed reranker call leaves its query's items with cosine scores"""
+
+        def reranking_function(pairs):
+            if pairs[0][0] == "a":
+                raise TimeoutError("reranker timed out")
+            return self.reranking_function(pairs)
+
+        items = [
+            ("a", [Document(page_content="a"), Document(page_content="ab")]),
+            ("b", [Document(page_content="ab"), Document(page_content="b")]),
+        ]
+        scores = get_relevance_scores(
+            items, self.embedding_function, reranking_function
+        )
+
+        assert [round(score, 4) for score in scores[0]] == [1.0, 0.7071]
+        assert scores[1] == [2.0, 1.0]
+
+    def test_embedding_error_unscored(self):
+        """Test items are left unscored instead of raising when embedding fails"""
+
+        def embedding_function(texts, prefix=None):
+            raise ConnectionError("embedding engine down")
+
+        items = [("a", [Document(page_content="a")]), ("b", [])]
+        assert get_relevance_scores(items, embedding_function) == [None, []]
@@ -0,0 +1,59 @@
+import asyncio
+
+from aiohttp import web
+
+from open_webui.utils.session_pool import SessionPool
+
+
+async def handler(request):
+    return web.json_response({"ok": True})
+
+
+async def run_requests(pool: SessionPool, count: int) -> dict:
+    app = web.Application()
+    app.router.add_get("/models", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+
+    async def request():
+        url = f"http://127.0.0.1:{port}/models"
+        async with pool.get_session(url).get(url) as r:
+            return await r.json()
+
+    try:
+        results = await asyncio.gather(*[request() for _ in range(count)])
+        assert results == [{"ok": True}] * count
+        assert pool.get_session(f"http://127.0.0.1:{port}/other") is pool.get_session(
+            f"http://127.0.0.1:{port}/models"
+        )
+        return pool.stats()["origins"][f"http://127.0.0.1:{port}"]
+    finally:
+        await pool.close()
+        await runner.cleanup()
+
+
+class TestSessionPool:
+    """Test pooled upstream sessions"""
+
+    def test_origin(self):
+        """Test urls of the same origin share a key"""
+        assert SessionPool.get_origin("https://API.example.com/v1") == (
+            "https://api.example.com"
+        )
+        assert SessionPool.get_origin("http://localhost:11434/api/chat") == (
+            "http://localhost:11434"
+        )
+
+    def test_connections_reused_and_queued(self):
+        """Test requests reuse connections and wait when the pool is full"""
+        stats = asyncio.run(run_requests(SessionPool(limit=2), 10))
+
+        assert stats["requests"] == 10
+        assert stats["in_flight"] == 0
+        assert stats["queued"] == 0
+        assert stats["connections_created"] == 2
+        assert stats["connections_reused"] == 8
+        assert stats["queued_total"] == 8
@@ -0,0 +1,202 @@
+import asyncio
+import hashlib
+import io
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from open_webui.routers import files
+from open_webui.storage import provider
+
+
+class ChunkedReader(io.BytesIO):
+    """Records the size of every read"""
+
+    def __init__(self, data: bytes):
+        super().__init__(data)
+        self.reads = []
+
+    def read(self, size=-1):
+        self.reads.append(size)
+        return super().read(size)
+
+
+class FakeStorage:
+    """Remote storage without a local copy"""
+
+    def __init__(self, data: bytes):
+        self.data = data
+
+    def get_cached_file(self, file_path):
+        return None
+
+    def get_file_size(self, file_path):
+        return len(self.data)
+
+    def iter_file(self, file_path, start=0, end=None):
+        return provider.iter_chunks(io.BytesIO(self.data), start, end)
+
+
+def get(path: str, headers: dict = {}) -> Request:
+    return Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "path": path,
+            "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+        }
+    )
+
+
+async def read_body(response) -> bytes:
+    return b"".join([chunk async for chunk in response.body_iterator])
+
+
+class TestStorageCache:
+    """Test streamed uploads and downloads of stored files"""
+
+    def test_upload_in_chunks(self, monkeypatch, tmp_path):
+        """Test uploads are copied and hashed chunk by chunk"""
+        monkeypatch.setattr(provider, "UPLOAD_DIR", str(tmp_path))
+        monkeypatch.setattr(provider, "STORAGE_CHUNK_SIZE", 4)
+        data = b"0123456789"
+        reader = ChunkedReader(data)
+
+        size, sha256, file_path = provider.LocalStorageProvider.upload_file(
+            reader, "test.txt", {}
+        )
+        assert reader.reads == [4, 4, 4, 4]
+        assert size == len(data)
+        assert sha256 == hashlib.sha256(data).hexdigest()
+        assert (tmp_path / "test.txt").read_bytes() == data
+
+    def test_lru_eviction(self, monkeypatch, tmp_path):
+        """Test the least recently used copies are evicted past the max size"""
+        monkeypatch.setattr(provider, "UPLOAD_DIR", str(tmp_path))
+        (tmp_path / "old").write_bytes(b"x" * 4)
+        cache = provider.LocalFileCache(max_size=10)
+
+        (tmp_path / "a").write_bytes(b"x" * 4)
+        cache.put("a")
+        assert cache.get("old")
+        (tmp_path / "b").write_bytes(b"x" * 4)
+        cache.put("b")
+
+        assert cache.get("a") is None
+        assert cache.get("old") and cache.get("b")
+        assert not (tmp_path / "a").exists()
+
+        cache.pop("b")
+        (tmp_path / "b").unlink()
+        assert cache.get("b") is None
+        assert cache._size == 4
+
+    def test_write_through(self, monkeypatch, tmp_path):
+        """Test a copy is kept only when the whole file was streamed"""
+        monkeypatch.setattr(provider, "UPLOAD_DIR", str(tmp_path))
+        cache = provider.LocalFileCache()
+        data = b"x" * (provider.STREAM_CHUNK_SIZE * 3)
+
+        chunks = cache.write_through("a", provider.iter_chunks(io.BytesIO(data)))
+        next(chunks)
+        chunks.close()
+        assert list(tmp_path.iterdir()) == []
+
+        assert b"".join(cache.write_through("a", [data[:10], data[10:]])) == data
+        assert cache.get("a") == f"{tmp_path}/a"
+        assert (tmp_path / "a").read_bytes() == data
+
+    def test_range_response(self, monkeypatch):
+        """Test files without a local copy are streamed, honouring Range"""
+        data = bytes(range(100))
+        monkeypatch.setattr(files, "Storage", FakeStorage(data))
+
+        async def main():
+            response = await files.get_file_response(get("/"), "s3://b/f")
+            assert response.status_code == 200
+            assert response.headers["accept-ranges"] == "bytes"
+            assert await read_body(response) == data
+
+            response = await files.get_file_response(
+                get("/", {"Range": "bytes=10-19"}), "s3://b/f"
+            )
+            assert response.status_code == 206
+            assert response.headers["content-range"] == "bytes 10-19/100"
+            assert response.headers["content-length"] == "10"
+            assert await read_body(response) == data[10:20]
+
+            response = await files.get_file_response(
+                get("/", {"Range": "bytes=-5"}), "s3://b/f"
+            )
+            assert await read_body(response) == data[-5:]
+
+            with pytest.raises(HTTPException) as exc:
+                await files.get_file_response(
+                    get("/", {"Range": "bytes=100-"}), "s3://b/f"
+                )
+            assert exc.value.status_code == 416
+
+        asyncio.run(main())
+
+    def test_pinned_not_evicted(self, monkeypatch, tmp_path):
+        """Test a copy still being served is evicted only once released"""
+        monkeypatch.setattr(provider, "UPLOAD_DIR", str(tmp_path))
+        cache = provider.LocalFileCache(max_size=10)
+        for filename in ("a", "b"):
+            (tmp_path / filename).write_bytes(b"x" * 4)
+            cache.put(filename)
+        assert cache.get("a", pin=True)
+
+        (tmp_path / "c").write_bytes(b"x" * 4)
+        cache.put("c")
+        assert (tmp_path / "a").exists()
+        assert not (tmp_path / "b").exists()
+
+        cache.unpin("a")
+        (tmp_path / "d").write_bytes(b"x" * 4)
+        cache.put("d")
+        assert not (tmp_path / "a").exists()
+        assert cache._size == 8
+
+    def test_missing_file(self, monkeypatch):
+        """Test a file missing from storage is a 404"""
+
+        class MissingStorage(FakeStorage):
+            def get_file_size(self, file_path):
+                raise FileNotFoundError(file_path)
+
+        monkeypatch.setattr(files, "Storage", MissingStorage(b""))
+        with pytest.raises(HTTPException) as exc:
+            asyncio.run(files.get_file_response(get("/"), "s3://b/f"))
+        assert exc.value.status_code == 404
+
+    def test_cached_response_released(self, monkeypatch, tmp_path):
+        """Test a served copy is released even when the client disconnects"""
+        monkeypatch.setattr(provider, "UPLOAD_DIR", str(tmp_path))
+        (tmp_path / "f").write_bytes(b"x" * 4)
+        cache = provider.LocalFileCache()
+
+        class CachedStorage(FakeStorage):
+            def get_cached_file(self, file_path):
+                return cache.get("f", pin=True)
+
+            def release_cached_file(self, file_path):
+                cache.unpin("f")
+
+        monkeypatch.setattr(files, "Storage", CachedStorage(b""))
+
+        async def receive():
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            raise OSError("disconnected")
+
+        async def main():
+            response = await files.get_file_response(get("/"), "s3://b/f")
+            assert cache._pins == {"f": 1}
+            with pytest.raises(OSError):
+                await response(get("/").scope, receive, send)
+
+        asyncio.run(main())
+        assert cache._pins == {}
@@ -0,0 +1,131 @@
+import asyncio
+
+import aiohttp
+import pytest
+
+from open_webui.utils.upstream import Upstream, UpstreamScheduler, get_upstream_pool
+
+
+class FakeResponse:
+    def __init__(self, status: int) -> None:
+        self.status = status
+
+    def release(self) -> None:
+        pass
+
+
+UPSTREAMS = [
+    Upstream(url="http://a:11434", idx=0),
+    Upstream(url="http://b:11434", idx=1),
+]
+
+
+class TestUpstreamScheduler:
+    """Test picking, health and retries of upstreams"""
+
+    def test_least_outstanding(self):
+        """Test the upstream with fewer requests in flight per weight is picked"""
+        scheduler = UpstreamScheduler(policy="least_outstanding")
+        lease = scheduler.acquire(UPSTREAMS[0].id)
+        assert scheduler.pick(UPSTREAMS).idx == 1
+
+        lease.release()
+        weighted = [UPSTREAMS[0]._replace(weight=3.0), UPSTREAMS[1]]
+        scheduler.acquire(UPSTREAMS[0].id)
+        scheduler.acquire(UPSTREAMS[1].id)
+        assert scheduler.pick(weighted).idx == 0
+
+    def test_weighted_round_robin(self):
+        """Test picks follow the weights"""
+        scheduler = UpstreamScheduler(policy="weighted_round_robin")
+        weighted = [UPSTREAMS[0]._replace(weight=2.0), UPSTREAMS[1]]
+        picks = [scheduler.pick(weighted).idx for _ in range(6)]
+        assert picks.count(0) == 4
+        assert picks.count(1) == 2
+
+    def test_circuit_breaker(self):
+        """Test a failing upstream is skipped, then probed by a single request"""
+        scheduler = UpstreamScheduler(failure_threshold=2, circuit_breaker_timeout=60)
+        for _ in range(2):
+            scheduler.acquire(UPSTREAMS[0].id).release(failed=True)
+        assert all(scheduler.pick(UPSTREAMS).idx == 1 for _ in range(5))
+
+        scheduler._get_state(UPSTREAMS[0].id).open_until = 0
+        probe = scheduler.acquire(UPSTREAMS[0].id)
+        assert not scheduler.is_available(UPSTREAMS[0].id)
+        probe.release()
+        assert scheduler.is_available(UPSTREAMS[0].id)
+
+        # every upstream down, still try rather than fail
+        for _ in range(2):
+            scheduler.acquire(UPSTREAMS[1].id).release(failed=True)
+        scheduler._get_state(UPSTREAMS[0].id).open_until = float("inf")
+        assert scheduler.pick(UPSTREAMS) in UPSTREAMS
+
+    def test_retry_before_first_byte(self):
+        """Test a connection error or 503 is retried on the other upstream"""
+        scheduler = UpstreamScheduler(max_retries=1)
+        sent = []
+
+        async def send(upstream):
+            sent.append(upstream.idx)
+            if len(sent) == 1:
+                raise aiohttp.ConnectionTimeoutError("connect timed out")
+            return FakeResponse(200)
+
+        r, lease = asyncio.run(scheduler.send(UPSTREAMS, send))
+        assert r.status == 200
+        assert sent[0] != sent[1]
+        assert scheduler.get_in_flight(UPSTREAMS[sent[1]].id) == 1
+        lease.release()
+        assert scheduler.get_in_flight(UPSTREAMS[sent[1]].id) == 0
+        assert scheduler._get_state(UPSTREAMS[sent[0]].id).failures == 1
+
+        async def unavailable(upstream):
+            return FakeResponse(503)
+
+        r, lease = asyncio.run(scheduler.send(UPSTREAMS, unavailable))
+        assert r.status == 503
+        lease.release()
+        assert all(scheduler.get_in_flight(upstream.id) == 0 for upstream in UPSTREAMS)
+
+        async def refused(upstream):
+            raise aiohttp.ConnectionTimeoutError("connect timed out")
+
+        with pytest.raises(aiohttp.ConnectionTimeoutError):
+            asyncio.run(scheduler.send(UPSTREAMS[:1], refused))
+
+    def test_no_retry_after_sending(self):
+        """Test a request that may have reached the upstream is not sent again"""
+        scheduler = UpstreamScheduler(max_retries=1)
+
+        for error in (
+            asyncio.TimeoutError(),
+            aiohttp.SocketTimeoutError("read timed out"),
+            aiohttp.ServerDisconnectedError(),
+        ):
+            sent = []
+
+            async def send(upstream):
+                sent.append(upstream.idx)
+                raise error
+
+            with pytest.raises(type(error)):
+                asyncio.run(scheduler.send(UPSTREAMS, send))
+            assert len(sent) == 1
+            assert scheduler.get_in_flight(UPSTREAMS[sent[0]].id) == 0
+
+    def test_pool(self):
+        """Test only grouped connections or the same url and key are pooled"""
+        assert get_upstream_pool("http://a/v1", "k", {}) == get_upstream_pool(
+            "http://a/v1/", "k", {}
+        )
+        assert get_upstream_pool("http://a/v1", "k", {}) != get_upstream_pool(
+            "http://b/v1", "k", {}
+        )
+        assert get_upstream_pool("http://a/v1", "k1", {}) != get_upstream_pool(
+            "http://a/v1", "k2", {}
+        )
+        assert get_upstream_pool(
+            "http://a/v1", "k1", {"upstream_group": "gpt"}
+        ) == get_upstream_pool("http://b/v1", "k2", {"upstream_group": "gpt"})
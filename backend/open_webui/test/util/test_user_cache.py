@@ -0,0 +1,142 @@
+import asyncio
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+from open_webui.internal.db import get_db
+from open_webui.models.users import User, Users, UsersTable
+from open_webui.utils import auth
+
+
+class FakeRedis:
+    """Publishes to a list, read back by the pubsub of the listener"""
+
+    def __init__(self):
+        self.published = []
+
+    def publish(self, channel, message):
+        self.published.append((channel, message))
+
+    def pubsub(self):
+        return FakePubSub(self)
+
+
+class FakePubSub:
+    def __init__(self, redis):
+        self.redis = redis
+
+    async def subscribe(self, channel):
+        self.channel = channel
+
+    async def listen(self):
+        for channel, message in self.redis.published:
+            if channel == self.channel:
+                yield {"type": "message", "data": message.encode()}
+
+
+def create_user() -> str:
+    id = str(uuid.uuid4())
+    Users.insert_new_user(id, "cache test", f"{id}@example.com", role="user")
+    return id
+
+
+class TestUserCache:
+    """Test the cache of authenticated users"""
+
+    def test_invalidated_on_change(self):
+        """Test the cached user is kept until it is changed"""
+        id = create_user()
+        try:
+            assert Users.get_auth_user_by_id(id).role == "user"
+
+            # changed behind the cache's back, e.g. by another worker
+            with get_db() as db:
+                db.query(User).filter_by(id=id).update({"name": "other"})
+                db.commit()
+            assert Users.get_auth_user_by_id(id).name == "cache test"
+
+            Users.update_user_role_by_id(id, "admin")
+            user = Users.get_auth_user_by_id(id)
+            assert user.role == "admin"
+            assert user.name == "other"
+        finally:
+            Users.delete_user_by_id(id)
+        assert Users.get_auth_user_by_id(id) is None
+
+    def test_api_key_replaced(self):
+        """Test a replaced api key stops working at once"""
+        id = create_user()
+        try:
+            Users.update_user_api_key_by_id(id, "sk-old")
+            assert Users.get_auth_user_by_api_key("sk-old").id == id
+
+            Users.update_user_api_key_by_id(id, "sk-new")
+            assert Users.get_auth_user_by_api_key("sk-old") is None
+            assert Users.get_auth_user_by_api_key("sk-new").id == id
+        finally:
+            Users.delete_user_by_id(id)
+
+    def test_flush_last_active(self):
+        """Test last active times are written in one flush"""
+        ids = [create_user() for _ in range(3)]
+        try:
+            with get_db() as db:
+                db.query(User).filter(User.id.in_(ids)).update({"last_active_at": 0})
+                db.commit()
+
+            for id in ids:
+                Users.mark_user_active_by_id(id)
+            # deleted in the meantime
+            Users.mark_user_active_by_id(str(uuid.uuid4()))
+
+            assert Users.flush_last_active() == 4
+            assert all(Users.get_user_by_id(id).last_active_at > 0 for id in ids)
+            assert Users.flush_last_active() == 0
+        finally:
+            for id in ids:
+                Users.delete_user_by_id(id)
+
+    def test_invalidation_published(self):
+        """Test a change made by another worker drops this worker's copy"""
+        id = create_user()
+        redis = FakeRedis()
+        worker = UsersTable(use_redis=True)
+        worker._redis = redis
+        try:
+            assert Users.get_auth_user_by_id(id).role == "user"
+            worker.update_user_role_by_id(id, "admin")
+
+            app = SimpleNamespace(state=SimpleNamespace(redis=redis))
+            asyncio.run(auth.user_cache_listener(app))
+            assert Users.get_auth_user_by_id(id).role == "admin"
+        finally:
+            Users.delete_user_by_id(id)
+
+    def test_copies_are_deep(self):
+        """Test changing a returned user's dicts leaves the cached user alone"""
+        id = create_user()
+        try:
+            Users.update_user_by_id(id, {"info": {"location": "home"}})
+            Users.get_auth_user_by_id(id).info["location"] = "changed"
+            assert Users.get_auth_user_by_id(id).info == {"location": "home"}
+        finally:
+            Users.delete_user_by_id(id)
+
+    def test_final_flush_error_logged(self, monkeypatch):
+        """Test a failed flush on shutdown doesn't replace the cancellation"""
+
+        def flush_last_active():
+            raise ConnectionError("db down")
+
+        monkeypatch.setattr(auth, "USER_LAST_ACTIVE_FLUSH_INTERVAL", 60)
+        monkeypatch.setattr(Users, "flush_last_active", flush_last_active)
+
+        async def main():
+            task = asyncio.create_task(auth.periodic_user_last_active_flush())
+            await asyncio.sleep(0)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(main())
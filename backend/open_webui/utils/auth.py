@@ -1,3 +1,4 @@
+import asyncio
 import logging
 import shutil
 import uuid
@@ -25,7 +26,8 @@ from opentelemetry import trace
 from open_webui.config import WEBUI_URL
 from open_webui.utils.smtp import send_email
 
-from open_webui.models.users import Users
+from open_webui.models.groups import REDIS_GROUP_CACHE_CHANNEL, Groups
+from open_webui.models.users import REDIS_USER_CACHE_CHANNEL, Users
 
 from open_webui.constants import ERROR_MESSAGES
 
@@ -44,6 +46,7 @@ from open_webui.env import (
     REDIS_SENTINEL_PORT,
     WEBUI_NAME,
     REDIS_CLUSTER,
+    USER_LAST_ACTIVE_FLUSH_INTERVAL,
 )
 
 from fastapi import BackgroundTasks, Depends, HTTPException, Request, Response, status
@@ -291,7 +294,7 @@ def get_current_user(
             )
 
         if data is not None and "id" in data:
-            user = Users.get_user_by_id(data["id"])
+            user = Users.get_auth_user_by_id(data["id"])
             if user is None:
                 raise HTTPException(
                     status_code=status.HTTP_401_UNAUTHORIZED,
@@ -316,12 +319,9 @@ def get_current_user(
                     current_span.set_attribute("client.user.role", user.role)
                     current_span.set_attribute("client.auth.type", "jwt")
 
-                # Refresh the user's last active timestamp asynchronously
-                # to prevent blocking the request
-                if background_tasks:
-                    background_tasks.add_task(
-                        Users.update_user_last_active_by_id, user.id
-                    )
+                # Refresh the user's last active timestamp, written in bulk
+                # by periodic_user_last_active_flush
+                Users.mark_user_active_by_id(user.id)
             return user
         else:
             raise HTTPException(
@@ -344,7 +344,7 @@ def get_current_user(
 
 
 def get_current_user_by_api_key(api_key: str):
-    user = Users.get_user_by_api_key(api_key)
+    user = Users.get_auth_user_by_api_key(api_key)
 
     if user is None:
         raise HTTPException(
@@ -360,11 +360,49 @@ def get_current_user_by_api_key(api_key: str):
             current_span.set_attribute("client.user.role", user.role)
             current_span.set_attribute("client.auth.type", "api_key")
 
-        Users.update_user_last_active_by_id(user.id)
+        Users.mark_user_active_by_id(user.id)
 
     return user
 
 
+async def periodic_user_last_active_flush():
+    try:
+        while True:
+            await asyncio.sleep(USER_LAST_ACTIVE_FLUSH_INTERVAL)
+            try:
+                await asyncio.to_thread(Users.flush_last_active)
+            except Exception as e:
+                log.warning(f"Error writing users' last active times: {e}")
+    finally:
+        try:
+            await asyncio.to_thread(Users.flush_last_active)
+        except Exception as e:
+            log.warning(f"Error writing users' last active times: {e}")
+
+
+async def user_cache_listener(app):
+    pubsub = app.state.redis.pubsub()
+    await pubsub.subscribe(REDIS_USER_CACHE_CHANNEL)
+
+    async for message in pubsub.listen():
+        if message["type"] != "message":
+            continue
+        user_id = message["data"]
+        if isinstance(user_id, bytes):
+            user_id = user_id.decode()
+        Users.invalidate_auth_user_local(user_id)
+
+
+async def group_cache_listener(app):
+    pubsub = app.state.redis.pubsub()
+    await pubsub.subscribe(REDIS_GROUP_CACHE_CHANNEL)
+
+    async for message in pubsub.listen():
+        if message["type"] != "message":
+            continue
+        Groups.invalidate_member_cache_local()
+
+
 def get_verified_user(user=Depends(get_current_user)):
     if user.role not in {"user", "admin"}:
         raise HTTPException(
@@ -0,0 +1,385 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import uuid
+from collections import defaultdict, deque
+from decimal import Decimal
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # windows
+    fcntl = None
+
+from open_webui.env import (
+    CREDIT_LEDGER_BALANCE_TTL,
+    CREDIT_LEDGER_BATCH_SIZE,
+    CREDIT_LEDGER_FLUSH_INTERVAL,
+    CREDIT_LEDGER_MODE,
+    DATA_DIR,
+    INSTANCE_ID,
+    REDIS_CLUSTER,
+    REDIS_KEY_PREFIX,
+    REDIS_SENTINEL_HOSTS,
+    REDIS_SENTINEL_PORT,
+    REDIS_URL,
+    SRC_LOG_LEVELS,
+)
+from open_webui.models.credits import AddCreditForm, CreditLogModel, Credits
+from open_webui.utils.cache import LRUCache
+from open_webui.utils.redis import get_redis_connection, get_sentinels_from_env
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MAIN"])
+
+# pending amounts are kept in redis as integers in the db's 12 decimal scale
+PENDING_UNITS = Decimal(10) ** 12
+
+
+def to_units(amount: Decimal) -> int:
+    return int((Decimal(amount) * PENDING_UNITS).to_integral_value())
+
+
+class CreditLedger:
+    """
+    Write-behind ledger for credit deductions
+
+    Deductions are queued (in memory with a local journal file, or in redis)
+    and flushed to credit_log/credit in batched transactions. Balance checks
+    read the cached db balance plus the amounts not yet flushed.
+
+    In memory mode every process has its own journal. A journal whose
+    process is gone (its lock file is not held) is replayed by the next
+    process that starts. Without fcntl (windows) run a single worker.
+
+    In redis mode every flush bumps a shared epoch, and cached db balances
+    read under an older epoch are reloaded, so no worker adds the reduced
+    pending amount to a balance from before the flush.
+
+    Replaying a batch is safe, logs already in db are skipped.
+    """
+
+    def __init__(
+        self,
+        mode: str = "",
+        flush_interval: float = 1.0,
+        batch_size: int = 500,
+        balance_ttl: float = 5.0,
+    ) -> None:
+        self.mode = mode
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        # user_id -> (balance in db, redis epoch it was read in)
+        self._balances = LRUCache(max_size=10000, ttl=balance_ttl)
+        # user_id -> amount not flushed yet, only used in memory mode
+        self._pending = defaultdict(Decimal)
+        self._queue: deque = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._journal_dir = Path(DATA_DIR)
+        self._journal_path = (
+            self._journal_dir / f"credit_ledger.{uuid.uuid4().hex}.jsonl"
+        )
+        self._journal_lock = None
+        self._redis = None
+        self._queue_key = f"{REDIS_KEY_PREFIX}:credit_ledger:queue"
+        self._pending_key = f"{REDIS_KEY_PREFIX}:credit_ledger:pending_units"
+        # float amounts queued before pending_units, drained by the flush
+        self._legacy_pending_key = f"{REDIS_KEY_PREFIX}:credit_ledger:pending"
+        self._epoch_key = f"{REDIS_KEY_PREFIX}:credit_ledger:epoch"
+        self._lock_key = f"{REDIS_KEY_PREFIX}:credit_ledger:lock"
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode in ("memory", "redis")
+
+    @property
+    def redis(self):
+        if self._redis is None:
+            self._redis = get_redis_connection(
+                redis_url=REDIS_URL,
+                redis_sentinels=get_sentinels_from_env(
+                    REDIS_SENTINEL_HOSTS, REDIS_SENTINEL_PORT
+                ),
+                redis_cluster=REDIS_CLUSTER,
+            )
+        return self._redis
+
+    ####################
+    # Balance
+    ####################
+
+    def _get_redis_pending(self, user_id: str) -> Tuple[Decimal, int]:
+        """
+        Pending amount of the user and the current epoch, read atomically
+        """
+        pipe = self.redis.pipeline()
+        pipe.hget(self._pending_key, user_id)
+        pipe.hget(self._legacy_pending_key, user_id)
+        pipe.get(self._epoch_key)
+        units, legacy, epoch = pipe.execute()
+        pending = Decimal(int(units or 0)) / PENDING_UNITS
+        if legacy:
+            pending += Decimal(legacy.decode() if isinstance(legacy, bytes) else legacy)
+        return pending, int(epoch or 0)
+
+    def get_balance(self, user_id: str) -> Decimal:
+        if self.mode == "redis":
+            # the epoch is read before the db, a flush in between only makes
+            # the next read reload
+            pending, epoch = self._get_redis_pending(user_id)
+            cached = self._balances.get(user_id)
+            if cached is None or cached[1] != epoch:
+                balance = Credits.init_credit_by_user_id(user_id=user_id).credit
+                self._balances.set(user_id, (balance, epoch))
+                return balance + pending
+            return cached[0] + pending
+
+        cached = self._balances.get(user_id)
+        if cached is None:
+            # wait for running flush, so the pending amount is not counted twice
+            with self._flush_lock:
+                balance = Credits.init_credit_by_user_id(user_id=user_id).credit
+                self._balances.set(user_id, (balance, 0))
+                return balance + self._pending.get(user_id, Decimal(0))
+        return cached[0] + self._pending.get(user_id, Decimal(0))
+
+    async def get_balance_async(self, user_id: str) -> Decimal:
+        cached = self._balances.get(user_id)
+        if cached is not None and self.mode != "redis":
+            return cached[0] + self._pending.get(user_id, Decimal(0))
+        return await asyncio.to_thread(self.get_balance, user_id)
+
+    def invalidate(self, user_id: str) -> None:
+        self._balances.pop(user_id)
+        if self.mode == "redis":
+            # reload the balance on every worker
+            try:
+                self.redis.incr(self._epoch_key)
+            except Exception as err:
+                log.error("[credit_ledger] failed to bump epoch: %s", err)
+
+    ####################
+    # Queue
+    ####################
+
+    def add_credit(self, form_data: AddCreditForm) -> None:
+        if not self.enabled:
+            Credits.add_credit_by_user_id(form_data=form_data)
+            return
+
+        log_model = CreditLogModel(
+            user_id=form_data.user_id,
+            credit=self.get_balance(form_data.user_id) + form_data.amount,
+            detail=form_data.detail.model_dump(),
+        )
+        entry = json.dumps(
+            {
+                "log": log_model.model_dump(mode="json"),
+                "amount": str(form_data.amount),
+                "units": to_units(form_data.amount),
+            },
+            default=str,
+        )
+
+        if self.mode == "redis":
+            pipe = self.redis.pipeline()
+            pipe.rpush(self._queue_key, entry)
+            pipe.hincrby(
+                self._pending_key, form_data.user_id, to_units(form_data.amount)
+            )
+            pipe.execute()
+            return
+
+        with self._lock:
+            self._open_journal()
+            with open(self._journal_path, "a", encoding="utf-8") as f:
+                f.write(entry + "\n")
+            self._queue.append(entry)
+            self._pending[form_data.user_id] += form_data.amount
+
+    async def add_credit_async(self, form_data: AddCreditForm) -> None:
+        if not self.enabled:
+            await Credits.add_credit_by_user_id_async(form_data=form_data)
+            return
+        # the journal file or redis are written to, keep them off the loop
+        await asyncio.to_thread(self.add_credit, form_data)
+
+    @staticmethod
+    def _parse_entry(entry: str) -> Tuple[CreditLogModel, Decimal]:
+        data = json.loads(entry)
+        return CreditLogModel.model_validate(data["log"]), Decimal(data["amount"])
+
+    ####################
+    # Journal
+    ####################
+
+    @staticmethod
+    def _try_lock(journal_path: Path):
+        """
+        Lock the journal, returns the open lock file or None if a live
+        process holds it
+        """
+        lock_file = open(journal_path.with_suffix(".lock"), "a")
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                return None
+        return lock_file
+
+    def _open_journal(self) -> None:
+        # held for the life of the process
+        if self._journal_lock is None:
+            self._journal_lock = self._try_lock(self._journal_path)
+
+    def _claim_journal(self, journal_path: Path) -> Optional[List[str]]:
+        """
+        Move the entries of a dead process's journal into this one
+        """
+        lock_file = self._try_lock(journal_path)
+        if lock_file is None:
+            return None
+        try:
+            # claimed by another process since it was listed
+            if not journal_path.exists():
+                return None
+            with open(journal_path, "r", encoding="utf-8") as f:
+                entries = [line.strip() for line in f if line.strip()]
+            if entries:
+                with open(self._journal_path, "a", encoding="utf-8") as f:
+                    f.writelines(entry + "\n" for entry in entries)
+            journal_path.unlink()
+            return entries
+        finally:
+            journal_path.with_suffix(".lock").unlink(missing_ok=True)
+            lock_file.close()
+
+    def replay(self) -> None:
+        """
+        Load entries left in journals by processes that are gone
+        """
+        if self.mode != "memory":
+            return
+        with self._lock:
+            self._open_journal()
+            for journal_path in sorted(self._journal_dir.glob("credit_ledger*.jsonl")):
+                if journal_path == self._journal_path:
+                    continue
+                for entry in self._claim_journal(journal_path) or []:
+                    try:
+                        log_model, amount = self._parse_entry(entry)
+                    except Exception as err:
+                        log.error(
+                            "[credit_ledger] skip broken entry %s: %s", entry, err
+                        )
+                        continue
+                    self._queue.append(entry)
+                    self._pending[log_model.user_id] += amount
+        log.info("[credit_ledger] replay %d entries", len(self._queue))
+
+    ####################
+    # Flush
+    ####################
+
+    def _apply(self, entries: List[str]) -> List[Tuple[CreditLogModel, Decimal]]:
+        logs = [self._parse_entry(entry) for entry in entries]
+        Credits.add_credit_logs_by_batch(logs)
+        return logs
+
+    def _flush_memory(self) -> int:
+        with self._lock:
+            entries = [
+                self._queue[i] for i in range(min(self.batch_size, len(self._queue)))
+            ]
+        if not entries:
+            return 0
+        logs = self._apply(entries)
+        with self._lock:
+            for _ in entries:
+                self._queue.popleft()
+            for log_model, amount in logs:
+                self._pending[log_model.user_id] -= amount
+                if not self._pending[log_model.user_id]:
+                    self._pending.pop(log_model.user_id)
+                self._balances.pop(log_model.user_id)
+            # rewrite journal with entries left
+            tmp_path = self._journal_path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.writelines(entry + "\n" for entry in self._queue)
+            os.replace(tmp_path, self._journal_path)
+        return len(entries)
+
+    def _flush_redis(self) -> int:
+        if not self.redis.set(self._lock_key, INSTANCE_ID, nx=True, ex=60):
+            return 0
+        try:
+            entries = self.redis.lrange(self._queue_key, 0, self.batch_size - 1)
+            if not entries:
+                return 0
+            logs = self._apply(entries)
+            pipe = self.redis.pipeline()
+            pipe.ltrim(self._queue_key, len(entries), -1)
+            for entry, (log_model, amount) in zip(entries, logs):
+                if "units" in json.loads(entry):
+                    pipe.hincrby(
+                        self._pending_key, log_model.user_id, -to_units(amount)
+                    )
+                else:
+                    pipe.hincrbyfloat(
+                        self._legacy_pending_key, log_model.user_id, -float(amount)
+                    )
+            # balances cached by other workers include the flushed amounts
+            pipe.incr(self._epoch_key)
+            pipe.execute()
+            for log_model, _ in logs:
+                self._balances.pop(log_model.user_id)
+            return len(entries)
+        finally:
+            if self.redis.get(self._lock_key) == INSTANCE_ID:
+                self.redis.delete(self._lock_key)
+
+    def flush(self) -> int:
+        """
+        Flush queued entries to db, returns the number of entries written
+        """
+        if not self.enabled:
+            return 0
+        total = 0
+        with self._flush_lock:
+            while True:
+                try:
+                    count = (
+                        self._flush_redis()
+                        if self.mode == "redis"
+                        else self._flush_memory()
+                    )
+                except Exception as err:
+                    log.exception("[credit_ledger] flush failed: %s", err)
+                    break
+                total += count
+                if count < self.batch_size:
+                    break
+        return total
+
+
+credit_ledger = CreditLedger(
+    mode=CREDIT_LEDGER_MODE,
+    flush_interval=CREDIT_LEDGER_FLUSH_INTERVAL,
+    batch_size=CREDIT_LEDGER_BATCH_SIZE,
+    balance_ttl=CREDIT_LEDGER_BALANCE_TTL,
+)
+
+
+async def periodic_credit_ledger_flush():
+    credit_ledger.replay()
+    try:
+        while True:
+            await asyncio.to_thread(credit_ledger.flush)
+            await asyncio.sleep(credit_ledger.flush_interval)
+    finally:
+        await asyncio.to_thread(credit_ledger.flush)
@@ -1,8 +1,9 @@
+import asyncio
 import json
 import logging
 import time
 from decimal import Decimal
-from typing import List, Union
+from typing import List, Optional, Union
 
 import tiktoken
 from fastapi import HTTPException
@@ -15,10 +16,15 @@ from open_webui.config import (
     USAGE_CALCULATE_MINIMUM_COST,
     USAGE_CUSTOM_PRICE_CONFIG,
 )
-from open_webui.env import SRC_LOG_LEVELS
-from open_webui.models.credits import AddCreditForm, Credits, SetCreditFormDetail
-from open_webui.models.models import Models
+from open_webui.env import (
+    SRC_LOG_LEVELS,
+    USAGE_IMAGE_SIZE_TIMEOUT,
+    USAGE_TOKEN_CACHE_SIZE,
+)
+from open_webui.models.credits import AddCreditForm, SetCreditFormDetail
 from open_webui.models.users import UserModel
+from open_webui.utils.cache import LRUCache
+from open_webui.utils.credit.ledger import credit_ledger
 from open_webui.utils.credit.models import (
     MessageContent,
     CompletionUsage,
@@ -27,10 +33,14 @@ from open_webui.utils.credit.models import (
     MessageItem,
 )
 from open_webui.utils.credit.utils import (
-    get_model_price,
+    get_model_with_price,
     get_feature_price,
     calculate_image_token,
+    calculate_image_token_async,
+    image_size_cache,
+    ImageURL,
 )
+from open_webui.utils.misc import calculate_sha256_string
 
 logger = logging.getLogger(__name__)
 logger.setLevel(SRC_LOG_LEVELS["MAIN"])
@@ -43,6 +53,8 @@ class Calculator:
 
     def __init__(self) -> None:
         self._encoder = {}
+        # (encoder name, content hash) -> token count, shared across requests
+        self._token_cache = LRUCache(max_size=USAGE_TOKEN_CACHE_SIZE)
 
     def get_encoder(
         self,
@@ -64,6 +76,82 @@ class Calculator:
             return self.get_encoder(default_model_for_encoding)
         return self.get_encoder(model_id)
 
+    def count_tokens(self, encoder: Encoding, text: str) -> int:
+        if not text:
+            return 0
+        key = (encoder.name, calculate_sha256_string(text))
+        tokens = self._token_cache.get(key)
+        if tokens is None:
+            tokens = len(encoder.encode(text))
+            self._token_cache.set(key, tokens)
+        return tokens
+
+    def cache_stats(self) -> dict:
+        return {
+            "prompt_tokens": self._token_cache.stats(),
+            "image_size": image_size_cache.stats(),
+        }
+
+    def calculate_prompt_tokens(
+        self, encoder: Encoding, model_id: str, messages: List[dict]
+    ) -> int:
+        prompt_tokens = 0
+        for message in [MessageItem.model_validate(message) for message in messages]:
+            if isinstance(message.content, str):
+                prompt_tokens += self.count_tokens(encoder, message.content)
+            if isinstance(message.content, list):
+                for item in message.content:
+                    item: MessageContent
+                    if item.type == "text":
+                        prompt_tokens += self.count_tokens(encoder, item.text)
+                    elif item.type == "image_url":
+                        prompt_tokens += calculate_image_token(model_id, item.image_url)
+        return prompt_tokens
+
+    async def prefetch_image_tokens(self, model_id: str, messages: List[dict]) -> None:
+        """
+        Resolve image sizes off the event loop, so calculate_image_token
+        only hits the cache while billing
+
+        Images are fetched concurrently for at most USAGE_IMAGE_SIZE_TIMEOUT
+        seconds, as the upstream request waits for them. Images not resolved
+        by then are billed at the default size.
+        """
+        images = []
+        for message in messages or []:
+            content = message.get("content") if isinstance(message, dict) else None
+            if not isinstance(content, list):
+                continue
+            for item in content:
+                if not isinstance(item, dict) or item.get("type") != "image_url":
+                    continue
+                image_url = item.get("image_url") or {}
+                images.append(
+                    ImageURL(
+                        url=image_url.get("url") or "",
+                        detail=image_url.get("detail") or "",
+                    )
+                )
+        if not images:
+            return
+
+        results = await asyncio.gather(
+            *[
+                asyncio.wait_for(
+                    calculate_image_token_async(model_id, image),
+                    USAGE_IMAGE_SIZE_TIMEOUT,
+                )
+                for image in images
+            ],
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                logger.warning(
+                    "[prefetch_image_tokens] failed, billed at the default size: %r",
+                    result,
+                )
+
     def calculate_usage(
         self,
         cached_usage: CompletionUsage,
@@ -93,24 +181,9 @@ class Calculator:
             if cached_usage.prompt_tokens:
                 usage.prompt_tokens = cached_usage.prompt_tokens
             else:
-                for message in [
-                    MessageItem.model_validate(message) for message in messages
-                ]:
-                    if isinstance(message.content, str):
-                        usage.prompt_tokens += len(
-                            encoder.encode(message.content or "")
-                        )
-                    if isinstance(message.content, list):
-                        for item in message.content:
-                            item: MessageContent
-                            if item.type == "text":
-                                usage.prompt_tokens += len(
-                                    encoder.encode(item.text or "")
-                                )
-                            elif item.type == "image_url":
-                                usage.prompt_tokens += calculate_image_token(
-                                    model_id, item.image_url
-                                )
+                usage.prompt_tokens = self.calculate_prompt_tokens(
+                    encoder=encoder, model_id=model_id, messages=messages
+                )
 
             # completion tokens
             choices = response.choices
@@ -144,6 +217,9 @@ class CreditDeduct:
 
     with CreditDeduct(xxx) as credit_deduct:
         credit_deduct.run(xxx)
+
+    Use `async with` in async code, so image sizes of the prompt are
+    resolved without blocking the event loop
     """
 
     def __init__(
@@ -158,7 +234,9 @@ class CreditDeduct:
         self.remote_id = ""
         self.user = user
         self.model_id = model_id
-        self.model = Models.get_model_by_id(self.model_id)
+        self.model, model_price = get_model_with_price(
+            self.model_id, is_embedding=is_embedding
+        )
         self.body = body
         self.is_stream = is_stream
         self.usage = CompletionUsage(
@@ -170,7 +248,7 @@ class CreditDeduct:
             self.completion_unit_price,
             self.request_unit_price,
             _,
-        ) = get_model_price(model=self.model, is_embedding=is_embedding)
+        ) = model_price
         self.features = {
             k
             for k, v in (
@@ -180,46 +258,64 @@ class CreditDeduct:
         }
         self.custom_fees = self.build_custom_fees(body)
         self.is_official_usage = False
+        # stream usage accumulator, prompt tokens calculated only once
+        self._encoder: Optional[Encoding] = None
+        self._prompt_tokens: Optional[int] = None
 
     def __enter__(self):
         return self
 
+    async def __aenter__(self):
+        await calculator.prefetch_image_tokens(
+            self.model_id, self.body.get("messages") or []
+        )
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if exc_val or self.is_error:
+            return
+        await credit_ledger.add_credit_async(form_data=self.get_credit_form())
+        self.log_deduct()
+
     def __exit__(self, exc_type, exc_val, exc_tb):
         if exc_val or self.is_error:
             return
-        Credits.add_credit_by_user_id(
-            form_data=AddCreditForm(
-                user_id=self.user.id,
-                amount=Decimal(-self.total_price),
-                detail=SetCreditFormDetail(
-                    usage={
-                        "total_price": float(self.total_price),
-                        "prompt_unit_price": float(self.prompt_unit_price),
-                        "prompt_cache_unit_price": float(self.prompt_cache_unit_price),
-                        "completion_unit_price": float(self.completion_unit_price),
-                        "request_unit_price": float(self.request_unit_price),
-                        "feature_price": float(self.feature_price),
-                        "features": list(self.features),
-                        "custom_fee": float(self.custom_price),
-                        "custom_fee_detail": {
-                            k: float(v / 1000 / 1000)
-                            for k, v in self.custom_fees.items()
-                        },
-                        "is_calculate": not self.is_official_usage,
-                        **self.usage.model_dump(exclude_unset=True, exclude_none=True),
+        credit_ledger.add_credit(form_data=self.get_credit_form())
+        self.log_deduct()
+
+    def get_credit_form(self) -> AddCreditForm:
+        return AddCreditForm(
+            user_id=self.user.id,
+            amount=Decimal(-self.total_price),
+            detail=SetCreditFormDetail(
+                usage={
+                    "total_price": float(self.total_price),
+                    "prompt_unit_price": float(self.prompt_unit_price),
+                    "prompt_cache_unit_price": float(self.prompt_cache_unit_price),
+                    "completion_unit_price": float(self.completion_unit_price),
+                    "request_unit_price": float(self.request_unit_price),
+                    "feature_price": float(self.feature_price),
+                    "features": list(self.features),
+                    "custom_fee": float(self.custom_price),
+                    "custom_fee_detail": {
+                        k: float(v / 1000 / 1000) for k, v in self.custom_fees.items()
                     },
-                    api_params={
-                        "model": (
-                            self.model.model_dump(exclude_unset=True, exclude_none=True)
-                            if self.model
-                            else {"id": self.model_id}
-                        ),
-                        "is_stream": self.is_stream,
-                    },
-                    desc=f"updated by {self.__class__.__name__}",
-                ),
-            )
+                    "is_calculate": not self.is_official_usage,
+                    **self.usage.model_dump(exclude_unset=True, exclude_none=True),
+                },
+                api_params={
+                    "model": (
+                        self.model.model_dump(exclude_unset=True, exclude_none=True)
+                        if self.model
+                        else {"id": self.model_id}
+                    ),
+                    "is_stream": self.is_stream,
+                },
+                desc=f"updated by {self.__class__.__name__}",
+            ),
         )
+
+    def log_deduct(self) -> None:
         logger.info(
             "[credit_deduct] user: %s; model: %s; tokens: %d %d; cost: %s",
             self.user.name,
@@ -399,29 +495,20 @@ class CreditDeduct:
 
         # stream
         if self.is_stream:
-            _response = self.clean_response(
-                response=response,
-                default_response={
-                    "choices": [{"delta": {"content": self.to_str(response)}}],
-                },
-            )
-            if not _response:
-                return
-            # validate
-            response = ChatCompletionChunk.model_validate(_response)
+            self._run_stream(response=response, messages=messages)
+            return
 
         # non-stream
-        else:
-            _response = self.clean_response(
-                response=response,
-                default_response={
-                    "choices": [{"message": {"content": self.to_str(response)}}],
-                },
-            )
-            if not _response:
-                return
-            # validate
-            response = ChatCompletion.model_validate(_response)
+        _response = self.clean_response(
+            response=response,
+            default_response={
+                "choices": [{"message": {"content": self.to_str(response)}}],
+            },
+        )
+        if not _response:
+            return
+        # validate
+        response = ChatCompletion.model_validate(_response)
 
         # check for error
         if _response.get("error"):
@@ -446,14 +533,68 @@ class CreditDeduct:
             return
         if self.is_official_usage:
             return
-        if self.is_stream:
-            self.usage.prompt_tokens = usage.prompt_tokens
-            self.usage.completion_tokens += usage.completion_tokens
-            self.usage.total_tokens = (
-                self.usage.prompt_tokens + self.usage.completion_tokens
+        self.usage = usage
+
+    def _run_stream(self, response: Union[dict, bytes, str], messages: List[dict]):
+        """
+        Lightweight path for stream chunks
+
+        Chunks are read as plain dict, no pydantic model is built per chunk,
+        and only the delta content is encoded
+        """
+        _response = self.clean_response(
+            response=response,
+            default_response={
+                "choices": [{"delta": {"content": self.to_str(response)}}],
+            },
+        )
+        if not _response or not isinstance(_response, dict):
+            return
+
+        # check for error
+        if _response.get("error"):
+            self.is_error = True
+            return
+
+        # record id
+        self.remote_id = _response.get("id", "")
+
+        # use provider usage
+        usage = _response.get("usage")
+        if usage is not None:
+            self.is_official_usage = True
+            self.usage = CompletionUsage.model_validate(
+                dict(usage) if isinstance(usage, dict) else usage
             )
             return
-        self.usage = usage
+        if self.is_official_usage:
+            return
+
+        # prompt tokens
+        if self._encoder is None:
+            self._encoder = calculator.get_encoder(
+                model_id=self.model_id,
+                model_prefix_to_remove=USAGE_CALCULATE_MODEL_PREFIX_TO_REMOVE.value,
+                default_model_for_encoding=USAGE_DEFAULT_ENCODING_MODEL.value,
+            )
+        if self._prompt_tokens is None:
+            self._prompt_tokens = calculator.calculate_prompt_tokens(
+                encoder=self._encoder, model_id=self.model_id, messages=messages
+            )
+
+        # completion tokens
+        content = ""
+        choices = _response.get("choices")
+        if choices and isinstance(choices, list) and isinstance(choices[0], dict):
+            content = (choices[0].get("delta") or {}).get("content") or ""
+        if content and isinstance(content, str):
+            self.usage.completion_tokens += len(self._encoder.encode(content))
+
+        # total tokens
+        self.usage.prompt_tokens = self._prompt_tokens
+        self.usage.total_tokens = (
+            self.usage.prompt_tokens + self.usage.completion_tokens
+        )
 
     def clean_response(
         self, response: Union[dict, bytes, str], default_response: dict
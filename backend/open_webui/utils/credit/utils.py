@@ -1,8 +1,9 @@
+import asyncio
 import base64
 import math
 from decimal import Decimal
 from io import BytesIO
-from typing import Optional, Union
+from typing import Optional, Tuple, Union
 
 import httpx
 from PIL import Image
@@ -19,9 +20,26 @@ from open_webui.config import (
     CREDIT_NO_CREDIT_MSG,
     USAGE_CALCULATE_DEFAULT_EMBEDDING_PRICE,
 )
+from open_webui.env import USAGE_IMAGE_TOKEN_CACHE_SIZE, USAGE_MODEL_PRICE_CACHE_TTL
 from open_webui.models.chats import Chats
 from open_webui.models.credits import Credits
 from open_webui.models.models import Models, ModelModel
+from open_webui.utils.cache import LRUCache
+from open_webui.utils.credit.ledger import credit_ledger
+from open_webui.utils.misc import calculate_sha256_string
+
+# image hash -> (width, height), shared across requests
+image_size_cache = LRUCache(max_size=USAGE_IMAGE_TOKEN_CACHE_SIZE)
+
+# (model id, is embedding) -> (model, resolved price)
+# cleared when models or usage config change
+model_price_cache = LRUCache(max_size=10000, ttl=USAGE_MODEL_PRICE_CACHE_TTL)
+
+# bytes to read for parsing image size
+IMAGE_HEADER_BYTES = 64 * 1024
+
+# billed size of an image whose size couldn't be resolved
+DEFAULT_IMAGE_SIZE = (1024, 1024)
 
 
 def get_model_price(
@@ -84,6 +102,22 @@ def get_model_price(
     )
 
 
+def get_model_with_price(
+    model_id: str, is_embedding: Optional[bool] = False
+) -> Tuple[Optional[ModelModel], Tuple[Decimal, Decimal, Decimal, Decimal, Decimal]]:
+    """
+    Cached version of loading model and get_model_price
+    """
+    key = (model_id, bool(is_embedding))
+    cached = model_price_cache.get(key)
+    if cached is not None:
+        return cached
+    model = Models.get_model_by_id(model_id) if model_id else None
+    result = (model, get_model_price(model, is_embedding=is_embedding))
+    model_price_cache.set(key, result)
+    return result
+
+
 def get_feature_price(features: Union[set, list]) -> Decimal:
     if not features:
         return Decimal(0)
@@ -128,31 +162,67 @@ def is_free_request(model_price: list, form_data: dict) -> bool:
     return is_free_model and is_feature_free
 
 
+def _get_chat_message_ids(form_data: dict) -> Tuple[Optional[str], Optional[str]]:
+    metadata = form_data.get("metadata") or form_data
+    if not isinstance(metadata, dict) or not metadata:
+        return None, None
+    return metadata.get("chat_id"), metadata.get("message_id") or metadata.get("id")
+
+
 def check_credit_by_user_id(
     user_id: str, form_data: dict, is_embedding: bool = False
 ) -> None:
     # load model
     model_id = form_data.get("model") or form_data.get("model_id") or ""
-    model = Models.get_model_by_id(model_id)
-    model_price = get_model_price(model, is_embedding=is_embedding)
+    _, model_price = get_model_with_price(model_id, is_embedding=is_embedding)
     minimum_credit = model_price[-1]
     # check for free
     if is_free_request(model_price=model_price, form_data=form_data):
         return
     # load credit
-    metadata = form_data.get("metadata") or form_data
-    credit = Credits.init_credit_by_user_id(user_id=user_id)
+    if credit_ledger.enabled:
+        credit = credit_ledger.get_balance(user_id=user_id)
+    else:
+        credit = Credits.init_credit_by_user_id(user_id=user_id).credit
     # check for credit
-    if credit is None or credit.credit <= 0 or credit.credit < minimum_credit:
-        if isinstance(metadata, dict) and metadata:
-            chat_id = metadata.get("chat_id")
-            message_id = metadata.get("message_id") or metadata.get("id")
-            if chat_id and message_id:
-                Chats.upsert_message_to_chat_by_id_and_message_id(
-                    chat_id,
-                    message_id,
-                    {"error": {"content": CREDIT_NO_CREDIT_MSG.value}},
-                )
+    if credit is None or credit <= 0 or credit < minimum_credit:
+        chat_id, message_id = _get_chat_message_ids(form_data)
+        if chat_id and message_id:
+            Chats.upsert_message_to_chat_by_id_and_message_id(
+                chat_id,
+                message_id,
+                {"error": {"content": CREDIT_NO_CREDIT_MSG.value}},
+            )
+        raise HTTPException(status_code=403, detail=CREDIT_NO_CREDIT_MSG.value)
+
+
+async def check_credit_by_user_id_async(
+    user_id: str, form_data: dict, is_embedding: bool = False
+) -> None:
+    # load model
+    model_id = form_data.get("model") or form_data.get("model_id") or ""
+    cached = model_price_cache.get((model_id, bool(is_embedding)))
+    _, model_price = cached or await asyncio.to_thread(
+        get_model_with_price, model_id, is_embedding
+    )
+    minimum_credit = model_price[-1]
+    # check for free
+    if is_free_request(model_price=model_price, form_data=form_data):
+        return
+    # load credit
+    if credit_ledger.enabled:
+        credit = await credit_ledger.get_balance_async(user_id=user_id)
+    else:
+        credit = (await Credits.init_credit_by_user_id_async(user_id=user_id)).credit
+    # check for credit
+    if credit is None or credit <= 0 or credit < minimum_credit:
+        chat_id, message_id = _get_chat_message_ids(form_data)
+        if chat_id and message_id:
+            await Chats.upsert_message_to_chat_by_id_and_message_id_async(
+                chat_id,
+                message_id,
+                {"error": {"content": CREDIT_NO_CREDIT_MSG.value}},
+            )
         raise HTTPException(status_code=403, detail=CREDIT_NO_CREDIT_MSG.value)
 
 
@@ -161,14 +231,80 @@ class ImageURL(BaseModel):
     detail: str
 
 
-def calculate_image_token(model_id: str, image: ImageURL) -> int:
+def _get_image_data_head(url: str) -> bytes:
+    # only decode enough base64 to cover the image header
+    image_data = url.split(",", 1)[1] if "," in url else url
+    head_size = IMAGE_HEADER_BYTES // 3 * 4
+    return base64.b64decode(image_data[:head_size].encode("utf-8"))
+
+
+def _get_image_data(url: str) -> bytes:
+    image_data = url.split(",", 1)[1] if "," in url else url
+    return base64.b64decode(image_data.encode("utf-8"))
+
+
+def _parse_image_size(image_data: bytes) -> Optional[Tuple[int, int]]:
+    # PIL reads the size from the header without decoding pixels
+    try:
+        return Image.open(BytesIO(image_data)).size
+    except Exception:
+        return None
+
+
+async def get_image_size_async(url: str) -> Tuple[int, int]:
+    """
+    Size of the image, read from its header where possible. Remote images
+    are fetched with a range request, without blocking the event loop.
+    """
+    key = calculate_sha256_string(url)
+    size = image_size_cache.get(key)
+    if size is not None:
+        return size
+
+    if url.startswith("http"):
+        async with httpx.AsyncClient(trust_env=True, timeout=60) as client:
+            image_data = b""
+            async with client.stream(
+                "GET", url, headers={"Range": f"bytes=0-{IMAGE_HEADER_BYTES - 1}"}
+            ) as response:
+                response.raise_for_status()
+                async for chunk in response.aiter_bytes():
+                    image_data += chunk
+                    if len(image_data) >= IMAGE_HEADER_BYTES:
+                        break
+            size = _parse_image_size(image_data)
+            # header is larger than expected, load the whole image
+            if size is None:
+                response = await client.get(url)
+                response.raise_for_status()
+                size = await asyncio.to_thread(_parse_image_size, response.content)
+    else:
+        size = _parse_image_size(_get_image_data_head(url))
+        if size is None:
+            size = await asyncio.to_thread(
+                lambda: _parse_image_size(_get_image_data(url))
+            )
+
+    if size is None:
+        raise ValueError("cannot identify image size")
+    image_size_cache.set(key, size)
+    return size
+
+
+def _get_image_tile_tokens(model_id: str, image: ImageURL) -> (int, int, Optional[int]):
+    """
+    Returns
+    - base tokens
+    - tile tokens
+    - image tokens if it does not depend on image size
+    """
     if not image or not image.url:
-        return 0
+        return 0, 0, 0
 
     base_tokens = 85
 
     if image.detail == "low":
-        return 85
+        return base_tokens, 0, 85
 
     if image.detail == "auto" or not image.detail:
         image.detail = "high"
@@ -180,23 +316,14 @@ def calculate_image_token(model_id: str, image: ImageURL) -> int:
         base_tokens = 2833
 
     if model_id.find("gemini") != -1 or model_id.find("claude") != -1:
-        return 3 * base_tokens
+        return base_tokens, tile_tokens, 3 * base_tokens
 
-    if image.url.startswith("http"):
-        with httpx.Client(trust_env=True, timeout=60) as client:
-            response = client.get(image.url)
-        response.raise_for_status()
-        image_data = base64.b64encode(response.content).decode("utf-8")
-    else:
-        if "," in image.url:
-            image_data = image.url.split(",", 1)[1]
-        else:
-            image_data = image.url
+    return base_tokens, tile_tokens, None
 
-    image_data = base64.b64decode(image_data.encode("utf-8"))
-    image = Image.open(BytesIO(image_data))
-    width, height = image.size
 
+def _calculate_image_token_by_size(
+    base_tokens: int, tile_tokens: int, width: int, height: int
+) -> int:
     short_side = width
     other_side = height
 
@@ -215,3 +342,26 @@ def calculate_image_token(model_id: str, image: ImageURL) -> int:
     tiles = (short_side + 511) / 512 * ((other_side + 511) / 512)
 
     return math.ceil(tiles * tile_tokens + base_tokens)
+
+
+def calculate_image_token(model_id: str, image: ImageURL) -> int:
+    """
+    Tokens of the image by the size calculate_image_token_async resolved,
+    never downloads the image, so it is safe to call on the event loop
+    """
+    base_tokens, tile_tokens, tokens = _get_image_tile_tokens(model_id, image)
+    if tokens is not None:
+        return tokens
+
+    size = image_size_cache.get(calculate_sha256_string(image.url))
+    width, height = size or DEFAULT_IMAGE_SIZE
+    return _calculate_image_token_by_size(base_tokens, tile_tokens, width, height)
+
+
+async def calculate_image_token_async(model_id: str, image: ImageURL) -> int:
+    base_tokens, tile_tokens, tokens = _get_image_tile_tokens(model_id, image)
+    if tokens is not None:
+        return tokens
+
+    width, height = await get_image_size_async(image.url)
+    return _calculate_image_token_by_size(base_tokens, tile_tokens, width, height)
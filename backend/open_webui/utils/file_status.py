@@ -0,0 +1,101 @@
+import asyncio
+import logging
+import threading
+
+from open_webui.env import (
+    REDIS_CLUSTER,
+    REDIS_KEY_PREFIX,
+    REDIS_SENTINEL_HOSTS,
+    REDIS_SENTINEL_PORT,
+    REDIS_URL,
+    SRC_LOG_LEVELS,
+)
+from open_webui.utils.redis import get_redis_connection, get_sentinels_from_env
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MAIN"])
+
+REDIS_FILE_STATUS_CHANNEL = f"{REDIS_KEY_PREFIX}:files:status"
+
+
+class FileStatusNotifier:
+    """
+    Wakes up the waiters of a file when its processing status changes
+
+    Files are processed in worker threads, waiters are tasks on an event
+    loop. With REDIS_URL set changes are published to every instance, and
+    file_status_listener wakes up the local waiters.
+    """
+
+    def __init__(self, use_redis: bool = False) -> None:
+        self.use_redis = use_redis
+        self._waiters: dict[
+            str, set[tuple[asyncio.AbstractEventLoop, asyncio.Event]]
+        ] = {}
+        self._lock = threading.Lock()
+        self._redis = None
+
+    @property
+    def redis(self):
+        if self._redis is None:
+            self._redis = get_redis_connection(
+                redis_url=REDIS_URL,
+                redis_sentinels=get_sentinels_from_env(
+                    REDIS_SENTINEL_HOSTS, REDIS_SENTINEL_PORT
+                ),
+                redis_cluster=REDIS_CLUSTER,
+                decode_responses=True,
+            )
+        return self._redis
+
+    def subscribe(self, file_id: str) -> asyncio.Event:
+        event = asyncio.Event()
+        with self._lock:
+            self._waiters.setdefault(file_id, set()).add(
+                (asyncio.get_running_loop(), event)
+            )
+        return event
+
+    def unsubscribe(self, file_id: str, event: asyncio.Event) -> None:
+        with self._lock:
+            waiters = self._waiters.get(file_id, set())
+            waiters.difference_update(
+                [waiter for waiter in waiters if waiter[1] is event]
+            )
+            if not waiters:
+                self._waiters.pop(file_id, None)
+
+    def notify_local(self, file_id: str) -> None:
+        with self._lock:
+            waiters = list(self._waiters.get(file_id, ()))
+        for loop, event in waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # loop closed, the waiter is gone
+                pass
+
+    def notify(self, file_id: str) -> None:
+        if self.use_redis:
+            try:
+                self.redis.publish(REDIS_FILE_STATUS_CHANNEL, file_id)
+                return
+            except Exception as e:
+                log.warning(f"Error publishing status of file {file_id}: {e}")
+        self.notify_local(file_id)
+
+
+file_status = FileStatusNotifier(use_redis=bool(REDIS_URL))
+
+
+async def file_status_listener(app):
+    pubsub = app.state.redis.pubsub()
+    await pubsub.subscribe(REDIS_FILE_STATUS_CHANNEL)
+
+    async for message in pubsub.listen():
+        if message["type"] != "message":
+            continue
+        file_id = message["data"]
+        if isinstance(file_id, bytes):
+            file_id = file_id.decode()
+        file_status.notify_local(file_id)
@@ -104,7 +104,7 @@ def convert_response_ollama_to_openai(ollama_response: dict) -> dict:
 async def convert_streaming_response_ollama_to_openai(
     user, model_id, form_data, ollama_streaming_response
 ):
-    with CreditDeduct(
+    async with CreditDeduct(
         user=user,
         model_id=model_id,
         body=form_data,
@@ -0,0 +1,181 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Optional
+from urllib.parse import urlparse
+
+import aiohttp
+
+from open_webui.env import (
+    AIOHTTP_CLIENT_POOL_DNS_CACHE_TTL,
+    AIOHTTP_CLIENT_POOL_KEEPALIVE_TIMEOUT,
+    AIOHTTP_CLIENT_POOL_LIMIT,
+    AIOHTTP_CLIENT_POOL_LIMIT_PER_HOST,
+    SRC_LOG_LEVELS,
+)
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MAIN"])
+
+
+class SessionPool:
+    """
+    App-lifetime aiohttp sessions, one per upstream origin
+
+    Requests to the same connection reuse keep-alive connections instead of
+    paying a TCP and TLS handshake each, and DNS lookups are cached. Timeouts
+    are passed per request. Sessions have no cookie jar, so cookies set by an
+    upstream for one user are never sent along with another user's request.
+    Connections are unlimited unless a limit is given.
+    """
+
+    def __init__(
+        self,
+        limit: int = 0,
+        limit_per_host: int = 0,
+        keepalive_timeout: float = 30,
+        dns_cache_ttl: Optional[int] = 300,
+    ) -> None:
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self._sessions: dict[
+            tuple[asyncio.AbstractEventLoop, str], aiohttp.ClientSession
+        ] = {}
+        self._stats: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get_origin(url: str) -> str:
+        parsed = urlparse(url)
+        return f"{parsed.scheme}://{parsed.netloc}".lower()
+
+    def _get_stats(self, origin: str) -> dict:
+        if origin not in self._stats:
+            self._stats[origin] = {
+                "requests": 0,
+                "in_flight": 0,
+                "queued": 0,
+                "queued_total": 0,
+                "queue_wait_ms": 0.0,
+                "connections_created": 0,
+                "connections_reused": 0,
+            }
+        return self._stats[origin]
+
+    def _get_trace_config(self, stats: dict) -> aiohttp.TraceConfig:
+        # in_flight counts requests until their response headers arrive,
+        # queued the ones waiting for a free connection of a saturated pool
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_request_start(session, ctx, params):
+            stats["requests"] += 1
+            stats["in_flight"] += 1
+
+        async def on_request_done(session, ctx, params):
+            stats["in_flight"] -= 1
+            if getattr(ctx, "queued_at", None) is not None:
+                # cancelled while waiting for a connection
+                stats["queued"] -= 1
+                ctx.queued_at = None
+
+        async def on_connection_queued_start(session, ctx, params):
+            stats["queued"] += 1
+            stats["queued_total"] += 1
+            ctx.queued_at = time.monotonic()
+
+        async def on_connection_queued_end(session, ctx, params):
+            stats["queued"] -= 1
+            stats["queue_wait_ms"] += (time.monotonic() - ctx.queued_at) * 1000
+            ctx.queued_at = None
+
+        async def on_connection_create_end(session, ctx, params):
+            stats["connections_created"] += 1
+
+        async def on_connection_reuseconn(session, ctx, params):
+            stats["connections_reused"] += 1
+
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_request_end.append(on_request_done)
+        trace_config.on_request_exception.append(on_request_done)
+        trace_config.on_connection_queued_start.append(on_connection_queued_start)
+        trace_config.on_connection_queued_end.append(on_connection_queued_end)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+        return trace_config
+
+    def get_session(self, url: str) -> aiohttp.ClientSession:
+        """
+        Shared session of the url's origin, for the running event loop
+
+        Callers must not close it, only release their responses.
+        """
+        loop = asyncio.get_running_loop()
+        origin = self.get_origin(url)
+        key = (loop, origin)
+
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is not None and not session.closed:
+                return session
+
+            # drop sessions of loops that are gone, e.g. asyncio.run in a thread
+            for stale_key in [k for k in self._sessions if k[0].is_closed()]:
+                del self._sessions[stale_key]
+
+            session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self.limit,
+                    limit_per_host=self.limit_per_host,
+                    keepalive_timeout=self.keepalive_timeout,
+                    use_dns_cache=self.dns_cache_ttl is None or self.dns_cache_ttl > 0,
+                    ttl_dns_cache=self.dns_cache_ttl,
+                ),
+                cookie_jar=aiohttp.DummyCookieJar(),
+                trace_configs=[self._get_trace_config(self._get_stats(origin))],
+                trust_env=True,
+            )
+            self._sessions[key] = session
+            return session
+
+    def stats(self) -> dict:
+        with self._lock:
+            sessions = {}
+            for (loop, origin), session in self._sessions.items():
+                if not session.closed:
+                    sessions[origin] = sessions.get(origin, 0) + 1
+
+            return {
+                "limit": self.limit,
+                "limit_per_host": self.limit_per_host,
+                "origins": {
+                    origin: {**stats, "sessions": sessions.get(origin, 0)}
+                    for origin, stats in self._stats.items()
+                },
+            }
+
+    async def close(self) -> None:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            sessions, self._sessions = self._sessions, {}
+
+        for (session_loop, origin), session in sessions.items():
+            if session.closed:
+                continue
+            try:
+                if session_loop is loop:
+                    await session.close()
+                elif session_loop.is_running():
+                    asyncio.run_coroutine_threadsafe(session.close(), session_loop)
+            except Exception as e:
+                log.warning(f"Error closing session of {origin}: {e}")
+
+
+session_pool = SessionPool(
+    limit=AIOHTTP_CLIENT_POOL_LIMIT,
+    limit_per_host=AIOHTTP_CLIENT_POOL_LIMIT_PER_HOST,
+    keepalive_timeout=AIOHTTP_CLIENT_POOL_KEEPALIVE_TIMEOUT,
+    dns_cache_ttl=AIOHTTP_CLIENT_POOL_DNS_CACHE_TTL,
+)
@@ -18,7 +18,7 @@ high-cardinality label sets.
 from __future__ import annotations
 
 import time
-from typing import Dict, List, Sequence, Any
+from typing import Callable, Dict, List, Sequence, Any
 from base64 import b64encode
 
 from fastapi import FastAPI, Request
@@ -47,6 +47,7 @@ from open_webui.env import (
 )
 from open_webui.socket.main import get_active_user_ids
 from open_webui.models.users import Users
+from open_webui.utils.session_pool import session_pool
 
 _EXPORT_INTERVAL_MILLIS = 10_000  # 10 seconds
 
@@ -99,6 +100,14 @@ def _build_meter_provider(resource: Resource) -> MeterProvider:
         View(
             instrument_name="webui.users.active",
         ),
+        View(
+            instrument_name="webui.upstream.requests.in_flight",
+            attribute_keys=["upstream.origin"],
+        ),
+        View(
+            instrument_name="webui.upstream.requests.queued",
+            attribute_keys=["upstream.origin"],
+        ),
     ]
 
     provider = MeterProvider(
@@ -159,6 +168,34 @@ def setup_metrics(app: FastAPI, resource: Resource) -> None:
         callbacks=[observe_active_users],
     )
 
+    def observe_upstream_stats(key: str) -> Callable:
+        def observe(
+            options: metrics.CallbackOptions,
+        ) -> Sequence[metrics.Observation]:
+            return [
+                metrics.Observation(
+                    value=stats[key],
+                    attributes={"upstream.origin": origin},
+                )
+                for origin, stats in session_pool.stats()["origins"].items()
+            ]
+
+        return observe
+
+    meter.create_observable_gauge(
+        name="webui.upstream.requests.in_flight",
+        description="Upstream requests waiting for response headers",
+        unit="requests",
+        callbacks=[observe_upstream_stats("in_flight")],
+    )
+
+    meter.create_observable_gauge(
+        name="webui.upstream.requests.queued",
+        description="Upstream requests waiting for a free pooled connection",
+        unit="requests",
+        callbacks=[observe_upstream_stats("queued")],
+    )
+
     # FastAPI middleware
     @app.middleware("http")
     async def _metrics_middleware(request: Request, call_next):
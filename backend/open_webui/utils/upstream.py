@@ -0,0 +1,404 @@
+import asyncio
+import json
+import logging
+import random
+import time
+from typing import Awaitable, Callable, NamedTuple, Optional
+
+import aiohttp
+
+from open_webui.env import (
+    INSTANCE_ID,
+    REDIS_CLUSTER,
+    REDIS_KEY_PREFIX,
+    REDIS_SENTINEL_HOSTS,
+    REDIS_SENTINEL_PORT,
+    REDIS_URL,
+    SRC_LOG_LEVELS,
+    UPSTREAM_CIRCUIT_BREAKER_TIMEOUT,
+    UPSTREAM_FAILURE_THRESHOLD,
+    UPSTREAM_MAX_RETRIES,
+    UPSTREAM_SCHEDULER_POLICY,
+    UPSTREAM_SYNC_INTERVAL,
+)
+from open_webui.utils.redis import get_redis_connection, get_sentinels_from_env
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MAIN"])
+
+# upstream is overloaded or down, another one may answer
+RETRY_STATUS_CODES = (502, 503, 504)
+
+# the request never reached the upstream, so it is safe to send again.
+# Read timeouts and dropped connections are not retried, the upstream may
+# already be running a request that isn't idempotent
+RETRY_ERRORS = (aiohttp.ClientConnectorError, aiohttp.ConnectionTimeoutError)
+
+
+class Upstream(NamedTuple):
+    url: str
+    idx: int
+    key: Optional[str] = None
+    weight: float = 1.0
+
+    @property
+    def id(self) -> str:
+        # connections may share a url, e.g. with different api keys
+        return f"{self.idx}:{self.url}"
+
+
+def get_upstream_pool(url: str, key: str, api_config: dict) -> tuple:
+    """
+    Connections serving the same model are balanced only if they are in the
+    same pool: the "upstream_group" of their api config, or else the same
+    url and key. Connections that merely share a model id may serve
+    different models or bill different accounts.
+    """
+    group = api_config.get("upstream_group")
+    if group:
+        return ("group", str(group))
+    return ("connection", url.rstrip("/"), key)
+
+
+def get_upstream_weight(api_config: dict) -> float:
+    try:
+        return max(float(api_config.get("weight", 1)), 0.0)
+    except (TypeError, ValueError):
+        return 1.0
+
+
+class UpstreamState:
+    def __init__(self) -> None:
+        self.in_flight = 0
+        self.ewma_ms: Optional[float] = None
+        self.failures = 0
+        self.open_until = 0.0
+        self.probing = False
+        self.current_weight = 0.0
+
+
+class UpstreamLease:
+    """
+    One request on an upstream, released when its response is done
+    """
+
+    def __init__(
+        self, scheduler: "UpstreamScheduler", id: str, probe: bool = False
+    ) -> None:
+        self.scheduler = scheduler
+        self.id = id
+        self.probe = probe
+        self.started = time.monotonic()
+        self.released = False
+
+    def release(self, failed: bool = False) -> None:
+        if self.released:
+            return
+        self.released = True
+        self.scheduler._release(self, failed)
+
+
+class UpstreamScheduler:
+    """
+    Picks the upstream of a model served by several connections
+
+    Policies:
+      - least_outstanding: fewest in-flight requests per unit of weight
+      - ewma: lowest moving average time to first byte, scaled by load
+      - weighted_round_robin: smooth weighted round robin
+      - random: uniform choice
+
+    Health is checked passively: an upstream failing UPSTREAM_FAILURE_THRESHOLD
+    times in a row is skipped for UPSTREAM_CIRCUIT_BREAKER_TIMEOUT seconds,
+    then gets a single probe request. When every upstream is skipped they are
+    all tried anyway rather than failing the request. With REDIS_URL set the
+    in-flight counts of the other workers are synced periodically.
+    """
+
+    def __init__(
+        self,
+        policy: str = "least_outstanding",
+        max_retries: int = 1,
+        failure_threshold: int = 3,
+        circuit_breaker_timeout: float = 30,
+        ewma_alpha: float = 0.3,
+        use_redis: bool = False,
+    ) -> None:
+        self.policy = policy
+        self.max_retries = max(max_retries, 0)
+        self.failure_threshold = max(failure_threshold, 1)
+        self.circuit_breaker_timeout = circuit_breaker_timeout
+        self.ewma_alpha = ewma_alpha
+        self.use_redis = use_redis
+        self._states: dict[str, UpstreamState] = {}
+        self._remote_in_flight: dict[str, int] = {}
+        self._redis = None
+
+    def _get_state(self, id: str) -> UpstreamState:
+        if id not in self._states:
+            self._states[id] = UpstreamState()
+        return self._states[id]
+
+    def get_in_flight(self, id: str) -> int:
+        return self._get_state(id).in_flight + self._remote_in_flight.get(id, 0)
+
+    def is_available(self, id: str) -> bool:
+        state = self._get_state(id)
+        if state.failures < self.failure_threshold:
+            return True
+        # half open, let a single request through
+        return time.monotonic() >= state.open_until and not state.probing
+
+    ####################
+    # Picking
+    ####################
+
+    def pick(self, upstreams: list[Upstream], exclude=()) -> Upstream:
+        candidates = [upstream for upstream in upstreams if upstream.id not in exclude]
+        if not candidates:
+            raise ValueError("No upstream to pick from")
+
+        available = [
+            upstream for upstream in candidates if self.is_available(upstream.id)
+        ]
+        candidates = available or candidates
+        if len(candidates) == 1:
+            return candidates[0]
+
+        if self.policy == "random":
+            return random.choice(candidates)
+        if self.policy == "weighted_round_robin":
+            return self._pick_weighted_round_robin(candidates)
+        if self.policy == "ewma":
+            return self._pick_lowest(candidates, self._get_ewma_cost)
+        return self._pick_lowest(candidates, self._get_outstanding_cost)
+
+    def _get_outstanding_cost(self, upstream: Upstream) -> float:
+        return (self.get_in_flight(upstream.id) + 1) / (upstream.weight or 1e-9)
+
+    def _get_ewma_cost(self, upstream: Upstream) -> float:
+        # unmeasured upstreams cost nothing, so they get probed first
+        ewma_ms = self._get_state(upstream.id).ewma_ms or 0.0
+        return ewma_ms * self._get_outstanding_cost(upstream)
+
+    def _pick_lowest(
+        self, candidates: list[Upstream], cost: Callable[[Upstream], float]
+    ) -> Upstream:
+        costs = [cost(upstream) for upstream in candidates]
+        lowest = min(costs)
+        return random.choice(
+            [upstream for upstream, c in zip(candidates, costs) if c == lowest]
+        )
+
+    def _pick_weighted_round_robin(self, candidates: list[Upstream]) -> Upstream:
+        total = 0.0
+        best = None
+        for upstream in candidates:
+            state = self._get_state(upstream.id)
+            state.current_weight += upstream.weight
+            total += upstream.weight
+            if best is None or state.current_weight > (
+                self._get_state(best.id).current_weight
+            ):
+                best = upstream
+        self._get_state(best.id).current_weight -= total
+        return best
+
+    ####################
+    # Requests
+    ####################
+
+    def acquire(self, id: str) -> UpstreamLease:
+        state = self._get_state(id)
+        state.in_flight += 1
+        probe = state.failures >= self.failure_threshold
+        if probe:
+            state.probing = True
+        return UpstreamLease(self, id, probe=probe)
+
+    def _respond(self, lease: UpstreamLease) -> None:
+        # time to first byte, the lease stays held until the response is done
+        state = self._get_state(lease.id)
+        elapsed_ms = (time.monotonic() - lease.started) * 1000
+        state.ewma_ms = (
+            elapsed_ms
+            if state.ewma_ms is None
+            else self.ewma_alpha * elapsed_ms + (1 - self.ewma_alpha) * state.ewma_ms
+        )
+        state.failures = 0
+        if lease.probe:
+            state.probing = False
+
+    def _release(self, lease: UpstreamLease, failed: bool) -> None:
+        state = self._get_state(lease.id)
+        state.in_flight -= 1
+        if lease.probe:
+            state.probing = False
+        if not failed:
+            return
+
+        state.failures += 1
+        if state.failures >= self.failure_threshold:
+            opened = state.open_until > time.monotonic()
+            state.open_until = time.monotonic() + self.circuit_breaker_timeout
+            if opened:
+                return
+            log.warning(
+                f"Upstream {lease.id} failed {state.failures} times in a row, "
+                f"skipping it for {self.circuit_breaker_timeout}s"
+            )
+
+    async def send(
+        self,
+        upstreams: list[Upstream],
+        send: Callable[[Upstream], Awaitable[aiohttp.ClientResponse]],
+    ) -> tuple[aiohttp.ClientResponse, UpstreamLease]:
+        """
+        Send to a picked upstream, on another one if it can't be connected to
+        or answers 502/503/504
+
+        The lease must be released once the response is consumed.
+        """
+        tried = []
+        attempts = min(
+            len({upstream.id for upstream in upstreams}), self.max_retries + 1
+        )
+        while True:
+            upstream = self.pick(upstreams, exclude=tried)
+            lease = self.acquire(upstream.id)
+            try:
+                r = await send(upstream)
+            except RETRY_ERRORS as e:
+                lease.release(failed=True)
+                tried.append(upstream.id)
+                if len(tried) >= attempts:
+                    raise
+                log.warning(f"Upstream {upstream.id} failed to connect, retrying: {e}")
+                continue
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                lease.release(failed=True)
+                raise
+            except BaseException:
+                lease.release()
+                raise
+
+            if r.status in RETRY_STATUS_CODES:
+                tried.append(upstream.id)
+                lease.release(failed=True)
+                if len(tried) < attempts:
+                    r.release()
+                    log.warning(f"Upstream {upstream.id} returned {r.status}, retrying")
+                    continue
+                # nothing left to try, pass the error response on
+                return r, lease
+
+            self._respond(lease)
+            return r, lease
+
+    ####################
+    # Shared in-flight counts
+    ####################
+
+    @property
+    def redis(self):
+        if self._redis is None:
+            self._redis = get_redis_connection(
+                redis_url=REDIS_URL,
+                redis_sentinels=get_sentinels_from_env(
+                    REDIS_SENTINEL_HOSTS, REDIS_SENTINEL_PORT
+                ),
+                redis_cluster=REDIS_CLUSTER,
+                decode_responses=True,
+            )
+        return self._redis
+
+    @property
+    def _redis_key(self) -> str:
+        return f"{REDIS_KEY_PREFIX}:upstream:in_flight"
+
+    def sync(self, in_flight: dict[str, int], stale_after: float = 10) -> None:
+        """
+        Publish this worker's in-flight counts and read the other workers'
+
+        Counts of workers not heard from in stale_after seconds are dropped,
+        so a crashed worker doesn't hold its counts forever.
+        """
+        now = time.time()
+        pipe = self.redis.pipeline()
+        pipe.hset(
+            self._redis_key,
+            INSTANCE_ID,
+            json.dumps({"ts": now, "in_flight": in_flight}),
+        )
+        pipe.hgetall(self._redis_key)
+        workers = pipe.execute()[-1]
+
+        remote_in_flight = {}
+        stale = []
+        for instance_id, value in workers.items():
+            if instance_id == INSTANCE_ID:
+                continue
+            try:
+                data = json.loads(value)
+            except Exception:
+                data = {"ts": 0}
+            if data.get("ts", 0) < now - stale_after:
+                stale.append(instance_id)
+                continue
+            for id, count in data.get("in_flight", {}).items():
+                remote_in_flight[id] = remote_in_flight.get(id, 0) + count
+
+        if stale:
+            self.redis.hdel(self._redis_key, *stale)
+        self._remote_in_flight = remote_in_flight
+
+    def unregister(self) -> None:
+        self.redis.hdel(self._redis_key, INSTANCE_ID)
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            "policy": self.policy,
+            "upstreams": {
+                id: {
+                    "in_flight": state.in_flight,
+                    "remote_in_flight": self._remote_in_flight.get(id, 0),
+                    "ewma_ms": (
+                        round(state.ewma_ms, 1) if state.ewma_ms is not None else None
+                    ),
+                    "failures": state.failures,
+                    "open": state.failures >= self.failure_threshold
+                    and now < state.open_until,
+                }
+                for id, state in self._states.items()
+            },
+        }
+
+
+upstream_scheduler = UpstreamScheduler(
+    policy=UPSTREAM_SCHEDULER_POLICY,
+    max_retries=UPSTREAM_MAX_RETRIES,
+    failure_threshold=UPSTREAM_FAILURE_THRESHOLD,
+    circuit_breaker_timeout=UPSTREAM_CIRCUIT_BREAKER_TIMEOUT,
+    use_redis=bool(REDIS_URL),
+)
+
+
+async def periodic_upstream_sync():
+    try:
+        while True:
+            in_flight = {
+                id: state.in_flight
+                for id, state in upstream_scheduler._states.items()
+                if state.in_flight
+            }
+            try:
+                await asyncio.to_thread(upstream_scheduler.sync, in_flight)
+            except Exception as e:
+                log.warning(f"Error syncing upstream in-flight counts: {e}")
+            await asyncio.sleep(UPSTREAM_SYNC_INTERVAL)
+    finally:
+        try:
+            await asyncio.to_thread(upstream_scheduler.unregister)
+        except Exception as e:
+            log.debug(f"Error unregistering upstream in-flight counts: {e}")